@@ -13,10 +13,19 @@
   ① 검색(retrieve)
   ② 관련성 평가(grade) — 검색 결과가 질문에 충분한가? (YES/NO)
   ③ 부실하면 쿼리 재작성(rewrite) + 재검색  ← 자기교정 (교차언어·키워드 보강)
+     기본(GRADE_MODE="combined")은 ②가 같은 응답에 재작성 쿼리까지 실어 보낸다 — 콜 하나.
   ④ 근거 기반 생성(generate) + 인용
   ⑤ 근거 자기점검(self-check) — 답이 컨텍스트로 뒷받침되나?
 
 각 단계를 trace로 남겨 판단·재시도 과정을 눈으로 확인할 수 있게 한다.
+앱은 agentic_stream 으로 단계와 답 토큰을 끝나는 대로 받고(첫 토큰까지 판정 1콜),
+평가 하니스는 같은 루프를 agentic_answer(dict 반환)로, 여러 질문은 agentic_answer_batch 로 같은
+페이서를 거쳐 동시에 돈다.
+추측 생성(opt-in, SPECULATIVE_ANSWER)을 켜면 ④를 ②와 동시에 시작하고 ②가 NO 면 버린다.
+로컬 게이트(opt-in, rag_gate)를 켜면 검색 점수가 분명한 턴은 ②를 LLM 없이 정한다.
+⑤도 로컬 점검(rag_grounded, SELF_CHECK="local")으로 바꿀 수 있다 — 그러면 LLM 콜이 하나 준다.
+②④⑤에 싣는 컨텍스트는 rag_compress 가 질문과 가까운 문장만 남겨 토큰 예산 안으로 줄인다.
+앱은 답변 캐시(rag_answer_cache)를 넘긴다 — 이미 답한 질문(의 말바꿈)이면 ①~⑤를 건너뛴다.
 
 알려진 한계(설계상 인지하고 남긴 것):
   · ⑤ 근거점검은 게이트가 아니라 라벨이다 — grounded=NO여도 답변은 이미 반환된다.
@@ -24,22 +33,36 @@
     (그래서 재시도 상한 1이 실질적 한계).
   · ② 관련성 평가는 청크 세트 단위 1회 YES/NO이며, 나쁜 청크를 버리는 필터가 아니다.
   · 재검색 결과는 기존 검색 결과를 덮어쓴다(비교·병합 없음).
+  · 턴 예산이 모자라면 ②③⑤를 건너뛴다(생성 몫은 늘 남긴다) — 그 턴의 답은 덜 점검된 답이다.
 """
+import contextvars
+import hashlib
 import logging
+import os
+import queue
 import re
+import threading
 import time
+from collections import OrderedDict
+from functools import lru_cache
 
+from langchain_core.messages import get_buffer_string
 from langchain_core.prompts import ChatPromptTemplate
 
 from prompts import (
     RAG_ANSWER_PROMPT_TEMPLATE,
     RAG_GRADE_PROMPT_TEMPLATE,
+    RAG_GRADE_OR_REWRITE_PROMPT_TEMPLATE,
     RAG_REWRITE_PROMPT_TEMPLATE,
     RAG_GROUNDEDNESS_PROMPT_TEMPLATE,
     clean_response,
 )
+import rag_compress
+import rag_gate
+import rag_grounded
+from observability import record_llm_call, record_step_latency, step_latency_ms
 from rag_corpus import format_context
-from ratelimit import estimate_tokens, is_daily_limit, pacer_for, parse_wait_seconds
+from ratelimit import estimate_tokens, is_daily_limit, pacer_for, parse_wait_seconds, priority
 
 
 # Groq 무료 티어는 분당 토큰(TPM) 상한이 낮고, **요청한 max_tokens가 그대로 예약분으로
@@ -65,32 +88,81 @@ _FALLBACK_WAITS = (10, 30, 60, 60)
 # 예약해 두고 도는 배치라, 10초 만에 포기하면 그 예약을 버리는 셈이다.
 # 그래서 이 값은 앱 호출부만 넘기고, 하니스는 None(무제한)으로 남는다.
 APP_TURN_BUDGET_S = 25
+# 앱 경로에서 검색 다리(dense/sparse) 하나에 허용할 시간. 넘기면 남은 다리 결과만 쓴다
+# (rag_corpus.HybridRetriever.search). 질의 인코딩 + FAISS 는 평소 수십 ms 라, 이 값에
+# 닿는 건 컨테이너가 다른 세션 임베딩으로 CPU 를 빼앗긴 경우뿐이다. 턴 예산이 한 번 검색에
+# 몇 초씩 새는 것보다 키워드 다리 하나로 답하는 편이 낫다. 하니스(턴 예산 None)는 안 쓴다.
+RETRIEVAL_LEG_TIMEOUT_S = 3.0
+# 추측 생성(opt-in): 첫 검색 청크로 답 생성을 관련성 판정과 **동시에** 시작한다. 판정이 YES 면
+# 이미 흐르고 있는 답을 그대로 쓰고(판정 1콜만큼 첫 토큰이 당겨진다), NO 면 취소하고 버린다.
+# 기본이 꺼져 있는 이유: NO 일 때마다 생성 예산이 통째로 분당 창에 물린다 — 무료 티어 TPM 에서
+# 그건 다음 질문의 429 다. 재작성 비율이 낮은 코퍼스에서만 켠다(RAG_SPECULATIVE=1).
+SPECULATIVE_ANSWER = os.environ.get("RAG_SPECULATIVE", "").lower() in ("1", "true", "yes")
+# ⑤ 근거점검을 누가 하나: "llm"(판정 1콜) | "local"(rag_grounded — 문장별 어휘·임베딩 대조, CPU
+# 수십 ms, 토큰 0). 로컬 점검은 공짜라 llm 모드에서도 함께 돌려 trace 에 남기고(shadow), 평가
+# 리포트가 두 판정의 일치율을 잰다. 그 수치를 확인하기 전까지 기본은 llm.
+SELF_CHECK = os.environ.get("RAG_SELF_CHECK", "llm").lower()
+# ② 관련성 판정과 ③ 재작성을 한 콜로 받을지: "combined"(RAG_GRADE_OR_REWRITE — "USE" 또는
+# "SEARCH: <쿼리>") | "separate"(예전처럼 YES/NO 판정 뒤 재작성 1콜). 첫 검색이 빗나간 턴마다
+# 왕복 하나와 그 예약이 빠진다. 판정만 받는 턴의 출력 예산은 16 → 96토큰으로 늘지만 예약은
+# 실제 사용량(한 단어)으로 바로 확정된다.
+GRADE_MODE = os.environ.get("RAG_GRADE_MODE", "combined").lower()
+
+# agentic_answer_batch 의 동시 실행 상한. 모든 콜은 같은 모델의 페이서(pacer_for)를 거치므로
+# 동시성을 올려도 분당 토큰 한도는 넘지 않는다 — 페이서 앞에서 줄을 서는 스레드만 는다.
+# 4면 판정·생성·근거점검이 서로 다른 질문에서 겹쳐 TPM 창을 꽉 채우기에 충분하다.
+BATCH_CONCURRENCY = 4
 
 _log = logging.getLogger(__name__)
 
 
-def _invoke_with_retry(chain, variables, attempts: int = 5, deadline: float = None):
+def _retry_wait(e, i, attempts, deadline):
+    """429 재시도 전 대기(초). 재시도하면 안 되는 예외면 None — 호출부가 그대로 올린다."""
+    if not _RATE_LIMITED.search(str(e)) or i == attempts - 1:
+        return None
+    if is_daily_limit(e):
+        _log.warning("일일 한도(TPD/RPD) 소진 — 기다려도 안 풀리므로 중단합니다")
+        return None
+    wait = parse_wait_seconds(e) or _FALLBACK_WAITS[min(i, len(_FALLBACK_WAITS) - 1)]
+    wait = min(wait + 0.5, 90)
+    if deadline is not None and time.monotonic() + wait > deadline:
+        _log.warning("rate limit — 남은 턴 예산(%.1fs)보다 대기(%.1fs)가 길어 포기합니다",
+                     max(0.0, deadline - time.monotonic()), wait)
+        return None
+    # print 였다: 앱에서는 서버 로그로만 나가고 방문자는 아무것도 못 봤다.
+    _log.warning("rate limit — %.1fs 대기 후 재시도 (%d/%d)", wait, i + 1, attempts - 1)
+    return wait
+
+
+def _invoke_with_retry(model, messages, attempts: int = 5, deadline: float = None):
     """429면 서버가 알려준 대기시간만큼 쉬고 재시도. 일일 한도면 즉시 중단.
 
     deadline(time.monotonic 절대시각)이 있으면 그 안에 못 끝날 대기는 자지 않는다.
     """
     for i in range(attempts):
         try:
-            return chain.invoke(variables)
+            return model.invoke(messages)
         except Exception as e:  # noqa: BLE001 — 프로바이더 예외 타입에 의존하지 않는다
-            if not _RATE_LIMITED.search(str(e)) or i == attempts - 1:
+            wait = _retry_wait(e, i, attempts, deadline)
+            if wait is None:
                 raise
-            if is_daily_limit(e):
-                _log.warning("일일 한도(TPD/RPD) 소진 — 기다려도 안 풀리므로 중단합니다")
-                raise
-            wait = parse_wait_seconds(e) or _FALLBACK_WAITS[min(i, len(_FALLBACK_WAITS) - 1)]
-            wait = min(wait + 0.5, 90)
-            if deadline is not None and time.monotonic() + wait > deadline:
-                _log.warning("rate limit — 남은 턴 예산(%.1fs)보다 대기(%.1fs)가 길어 포기합니다",
-                             max(0.0, deadline - time.monotonic()), wait)
+            time.sleep(wait)
+
+
+def _stream_with_retry(model, messages, attempts: int = 5, deadline: float = None):
+    """_invoke_with_retry 의 스트리밍판. 재시도는 **첫 청크 전**에 난 429 에만 한다 —
+    이미 토큰을 흘린 뒤에 다시 시작하면 화면에 답이 두 번 찍힌다."""
+    for i in range(attempts):
+        started = False
+        try:
+            for chunk in model.stream(messages):
+                started = True
+                yield chunk
+            return
+        except Exception as e:  # noqa: BLE001
+            wait = None if started else _retry_wait(e, i, attempts, deadline)
+            if wait is None:
                 raise
-            # print 였다: 앱에서는 서버 로그로만 나가고 방문자는 아무것도 못 봤다.
-            _log.warning("rate limit — %.1fs 대기 후 재시도 (%d/%d)", wait, i + 1, attempts - 1)
             time.sleep(wait)
 
 
@@ -101,91 +173,692 @@ def _usage_tokens(resp, fallback: int) -> int:
     return int(total) if total else fallback
 
 
-def _ask(llm, template, _max_tokens=None, _deadline=None, **variables) -> str:
-    """프롬프트 1회 호출 → 후처리된 텍스트. _max_tokens로 출력 예산을 좁힐 수 있다.
+# ── LLM 호출 계층: 컴파일한 템플릿·바인딩한 모델 캐시 ───────────────
+# _ask 는 한 턴에 3~4번, 배치 평가에서는 수백 번 불린다. 예전에는 호출마다 템플릿을 다시
+# 파싱하고(from_template), 모델을 다시 바인딩하고(bind), 예약 추정용으로 한 번·invoke 안에서
+# 또 한 번 프롬프트를 렌더했다. 템플릿은 prompts.py 의 상수 다섯 개뿐이고 모델은 페이지당
+# 하나라 둘 다 캐시하고, 렌더는 한 번 해서 추정과 호출에 같은 메시지를 쓴다.
+# 바인딩 캐시 키의 id(llm) 는 객체가 사라지면 재사용될 수 있어 항목에 llm 자체를 들고 is 로
+# 확인한다. 앱은 리런마다 ChatGroq 을 새로 만드므로 상한을 작게 둔다(옛 모델은 LRU 로 밀려난다).
+_BOUND_CACHE_SIZE = 16
+_BOUND = OrderedDict()
+_BOUND_LOCK = threading.Lock()
+
+
+@lru_cache(maxsize=32)
+def _compiled(template):
+    return ChatPromptTemplate.from_template(template)
+
+
+def _bound(llm, max_tokens):
+    """llm.bind(max_tokens=...) 를 (llm, max_tokens) 당 한 번만."""
+    if not max_tokens:
+        return llm
+    key = (id(llm), max_tokens)
+    with _BOUND_LOCK:
+        hit = _BOUND.get(key)
+        if hit is not None and hit[0] is llm:
+            _BOUND.move_to_end(key)
+            return hit[1]
+    model = llm.bind(max_tokens=max_tokens)
+    with _BOUND_LOCK:
+        _BOUND[key] = (llm, model)
+        _BOUND.move_to_end(key)
+        while len(_BOUND) > _BOUND_CACHE_SIZE:
+            _BOUND.popitem(last=False)
+    return model
+
+
+def _priority_of(template):
+    """페이서 입장 등급 — 방문자가 기다리는 건 답변이라 생성이 판정·근거점검보다 먼저 들어간다.
+    배치(agentic_answer_batch) 안에서는 바깥 등급(batch)이 이긴다."""
+    return "answer" if template is RAG_ANSWER_PROMPT_TEMPLATE else "check"
+
+
+def _prepare(llm, template, max_tokens, variables):
+    """(바인딩한 모델, 렌더한 메시지, 예약 토큰 추정치, 페이서, 준비 ms) — _ask 와 _ask_stream 이
+    같은 예산 계산을 쓰게. 추정은 예전 prompt.format 과 같은 문자열(get_buffer_string)로 센다."""
+    t0 = time.perf_counter()
+    messages = _compiled(template).format_messages(**variables)
+    model = _bound(llm, max_tokens)
+    need = estimate_tokens(get_buffer_string(messages)) + (max_tokens or ANSWER_MAX_TOKENS)
+    pacer = pacer_for(getattr(llm, "model_name", None) or str(getattr(llm, "model", "unknown")))
+    return model, messages, need, pacer, (time.perf_counter() - t0) * 1000
 
-    호출 전 페이서에 예산을 신청하고(선제 대기), 호출 후 실제 사용량을 되먹인다.
-    """
-    prompt = ChatPromptTemplate.from_template(template)
-    model = llm.bind(max_tokens=_max_tokens) if _max_tokens else llm
 
-    rendered = prompt.format(**variables)
-    need = estimate_tokens(rendered) + (_max_tokens or ANSWER_MAX_TOKENS)
-    pacer = pacer_for(getattr(llm, "model_name", None) or str(getattr(llm, "model", "unknown")))
-    pacer.wait_for(need, deadline=_deadline)
+class _Tally:
+    """한 턴이 쓴 토큰 합. 추측 생성 스레드도 더하므로 잠금 아래서 센다."""
 
-    resp = _invoke_with_retry(prompt | model, variables, deadline=_deadline)
-    pacer.record(_usage_tokens(resp, need))
-    return clean_response(resp.content)
+    def __init__(self):
+        self.tokens = 0
+        self._lock = threading.Lock()
 
+    def add(self, n):
+        with self._lock:
+            self.tokens += n
+
+
+def _ask(llm, template, _max_tokens=None, _deadline=None, _usage=None, **variables) -> str:
+    """프롬프트 1회 호출 → 후처리된 텍스트. _max_tokens로 출력 예산을 좁힐 수 있다.
 
-def _yesno(llm, template, _deadline=None, **variables) -> str:
+    호출 전 페이서에 예산을 예약하고(선제 대기), 호출 후 실제 사용량으로 확정한다.
+    호출이 실패하면 예약을 취소한다 — 예전(wait_for → record)도 실패한 호출은 적지 않았다.
+    _usage(_Tally)를 주면 확정한 토큰을 더한다(답변 캐시가 적중 때 아낀 양으로 쓴다).
+    프레임워크 오버헤드(렌더·바인딩·후처리)와 네트워크 시간(invoke)은 따로 기록한다 —
+    페이서 대기는 어느 쪽에도 넣지 않는다(줄 선 시간이지 호출 비용이 아니다).
+    """
+    model, messages, need, pacer, prep_ms = _prepare(llm, template, _max_tokens, variables)
+    with priority(_priority_of(template)):
+        held = pacer.reserve(need, deadline=_deadline)
+    t_net = time.perf_counter()
+    try:
+        resp = _invoke_with_retry(model, messages, deadline=_deadline)
+    except BaseException:
+        pacer.release(held, 0)
+        raise
+    t_post = time.perf_counter()
+    used = _usage_tokens(resp, need)
+    pacer.release(held, used)
+    if _usage is not None:
+        _usage.add(used)
+    text = clean_response(resp.content)
+    record_llm_call(prep_ms + (time.perf_counter() - t_post) * 1000, (t_post - t_net) * 1000)
+    return text
+
+
+def _ask_stream(llm, template, _max_tokens=None, _deadline=None, _meter=None, _usage=None,
+                **variables):
+    """_ask 의 스트리밍판 — 모델 청크를 그대로 흘린다. 후처리는 소비자(ui.stream_answer) 몫.
+
+    사용량은 청크에 실린 usage_metadata 를 더해 스트림이 끝날 때 예약을 확정한다
+    (Groq 는 마지막 청크에 싣는다). 청크가 하나라도 나온 뒤 소비를 멈추면 추정치로 확정한다 —
+    기록을 빠뜨리면 페이서가 실제보다 여유 있다고 믿는다. 첫 청크 전에 실패하면 취소.
+    _meter(dict)를 주면 {"reserved", "tokens"} 를 채운다(추측 생성의 낭비 집계용).
+    """
+    model, messages, need, pacer, prep_ms = _prepare(llm, template, _max_tokens, variables)
+    with priority(_priority_of(template)):
+        held = pacer.reserve(need, deadline=_deadline)
+    if _meter is not None:
+        _meter["reserved"] = need
+
+    used, started = 0, False
+    t_net = time.perf_counter()
+    try:
+        for chunk in _stream_with_retry(model, messages, deadline=_deadline):
+            started = True
+            used += _usage_tokens(chunk, 0)
+            yield chunk
+    finally:
+        spent = (used or need) if started else 0
+        pacer.release(held, spent)
+        # 스트림은 소비자 속도만큼 흐르므로 네트워크 시간에 화면 그리기가 섞인다 — 오버헤드는 준비분만.
+        # 첫 청크 전에 실패·취소된 콜은 남기지 않는다(_ask 도 성공한 콜만 센다) — 턴 예산 추정이 이 값을 본다.
+        if started:
+            record_llm_call(prep_ms, (time.perf_counter() - t_net) * 1000)
+        if _usage is not None:
+            _usage.add(spent)
+        if _meter is not None:
+            _meter["tokens"] = spent
+
+
+def _yesno(llm, template, _deadline=None, _usage=None, **variables) -> str:
     """YES/NO 판정을 결정적으로 파싱."""
-    out = _ask(llm, template, _max_tokens=_YESNO_TOKENS, _deadline=_deadline, **variables).upper()
+    out = _ask(llm, template, _max_tokens=_YESNO_TOKENS, _deadline=_deadline, _usage=_usage,
+               **variables).upper()
     return "YES" if "YES" in out else "NO"
 
 
-def _rewrite(llm, question: str, _deadline=None) -> str:
+def _rewrite(llm, question: str, _deadline=None, _usage=None) -> str:
     """검색용 쿼리 재작성 — 첫 비어있지 않은 줄만."""
     out = _ask(llm, RAG_REWRITE_PROMPT_TEMPLATE, _max_tokens=_REWRITE_TOKENS,
-               _deadline=_deadline, question=question)
+               _deadline=_deadline, _usage=_usage, question=question)
     for line in out.splitlines():
         if line.strip():
             return line.strip()
     return question
 
 
+# 콜론은 필수다 — 없으면 "SEARCHING the docs…" 가 쿼리 "ING the docs…" 가 됐다. 마크다운 강조(**)만 건너뛴다.
+_SEARCH_LINE = re.compile(r"^\W*SEARCH[*_]*\s*:[*_\s]*(.*)$", re.IGNORECASE)
+# 판정은 첫 단어로만 읽는다. 부분 문자열로 찾던 때는 "DON'T USE"·"NOT USEFUL" 이 USE 로,
+# "UNKNOWN"·"NONE" 이 NO 로 읽혔다.
+_VERDICT_WORD = re.compile(r"^\W*([A-Z]+(?:'[A-Z]+)?)\b")
+_NO_WORDS = {"NO", "NOT", "DON'T", "DONT", "UNUSABLE", "INSUFFICIENT", "IRRELEVANT"}
+
+
+def _grade_or_rewrite(llm, question: str, context: str, _deadline=None, _usage=None):
+    """판정+재작성 1콜 → (grade, 재작성 쿼리 | None). grade 는 "YES"/"NO".
+
+    파싱(결정적, 첫 비어있지 않은 줄): "SEARCH: q" → ("NO", q) / 첫 단어가 USE·YES → ("YES", None) /
+    첫 단어가 NO·NOT·DON'T 같은 부정이면 ("NO", None) — 호출부가 재작성 1콜로 메운다(형식을 어긴
+    응답에만 드는 비용이다). 아무것도 못 읽으면 ("YES", None): 쿼리 없이 같은 검색을 되풀이하느니
+    지금 청크를 쓴다.
+    """
+    out = _ask(llm, RAG_GRADE_OR_REWRITE_PROMPT_TEMPLATE, _max_tokens=_REWRITE_TOKENS,
+               _deadline=_deadline, _usage=_usage, question=question, context=context)
+    line = next((l.strip() for l in out.splitlines() if l.strip()), "")
+    m = _SEARCH_LINE.match(line)
+    if m:
+        query = m.group(1).strip().strip('"')
+        return "NO", (query or None)
+    word = _VERDICT_WORD.match(line.upper())
+    if word and word.group(1) in _NO_WORDS:
+        return "NO", None
+    return "YES", None
+
+
+def _out_of_time(e) -> bool:
+    """턴 예산 안에 못 끝난 호출인가 — 페이서 마감(TimeoutError)이나 남은 예산보다 긴 429 대기.
+
+    일일 한도는 아니다 — 그건 생성도 못 하므로 건너뛰지 않고 그대로 올린다.
+    """
+    if not isinstance(e, Exception):
+        return False
+    if isinstance(e, TimeoutError):
+        return True
+    return bool(_RATE_LIMITED.search(str(e))) and not is_daily_limit(e)
+
+
+def _retrieve(retriever, query: str, deadline: float = None):
+    """검색 1회 → (chunks, trace 항목). 다리별 소요 시간을 trace 에 남긴다.
+
+    .search 가 없는 검색기(LangChain retriever 등)는 .invoke 로 부르고 시간은 비워 둔다.
+    """
+    search = getattr(retriever, "search", None)
+    if search is None:
+        chunks, legs = retriever.invoke(query), None
+    else:
+        timeout = None
+        if deadline is not None:
+            timeout = max(0.0, min(RETRIEVAL_LEG_TIMEOUT_S, deadline - time.monotonic()))
+        chunks, legs = search(query, leg_timeout_s=timeout)
+    detail = f"\"{query[:60]}\" → {len(chunks)} chunks"
+    if legs:
+        ms = " · ".join(f"{leg} {legs[f'{leg}_ms']:.0f}ms" for leg in ("dense", "sparse")
+                        if legs.get(f"{leg}_ms") is not None)
+        detail += f" ({ms})"
+        if legs.get("degraded"):
+            detail += f" — {legs['degraded']} leg timed out, single-leg result"
+    step = {"step": "retrieve", "detail": detail}
+    if legs:
+        step["legs"] = legs
+    return chunks, step
+
+
+class _Speculation:
+    """판정과 나란히 도는 답 생성 1회. 데몬 스레드가 _ask_stream 을 큐로 옮긴다.
+
+    예산은 _ask_stream 이 페이서에 예약·확정하므로 여기서는 따로 세지 않는다. cancel() 은
+    스레드가 다음 청크에서 멈추고 제너레이터를 닫게 한다 → 예약이 그때까지 쓴 만큼으로 확정된다.
+    첫 청크 전(요청이 나가 있는 동안)에는 끊을 수 없다 — 그때는 예약분 전체를 **상한 추정**으로 돌려주고
+    추정임을 같이 알린다. 스레드는 계속 돌다가 실제 사용량으로 확정하므로 페이서·원장의 값과 다를 수 있다.
+    """
+
+    _END = object()
+
+    def __init__(self, llm, ctx, question, deadline, usage=None):
+        self.meter = {}
+        self.started = time.monotonic()
+        self.finished = None
+        self._q = queue.Queue()
+        self._cancel = threading.Event()
+        # 문맥 복사 — 배치 안의 추측 생성도 batch 등급으로 페이서에 줄 선다
+        self._thread = threading.Thread(target=contextvars.copy_context().run,
+                                        args=(self._run, llm, ctx, question, deadline, usage),
+                                        name="rag-speculate", daemon=True)
+        self._thread.start()
+
+    def _run(self, llm, ctx, question, deadline, usage):
+        gen = _ask_stream(llm, RAG_ANSWER_PROMPT_TEMPLATE, _max_tokens=ANSWER_MAX_TOKENS,
+                          _deadline=deadline, _meter=self.meter, _usage=usage,
+                          context=ctx, question=question)
+        try:
+            for chunk in gen:
+                if self._cancel.is_set():
+                    break
+                self._q.put(chunk)
+        except BaseException as e:  # noqa: BLE001 — 소비자 쪽(chunks)에서 다시 올린다
+            self._q.put(e)
+        finally:
+            gen.close()
+            self.finished = time.monotonic()
+            self._q.put(self._END)
+
+    def chunks(self):
+        """쌓인 청크부터 이어서 흘린다. 생성 중 예외는 여기서 다시 올린다."""
+        while True:
+            item = self._q.get()
+            if item is self._END:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+
+    def cancel(self, timeout: float = 1.0):
+        """멈추게 하고 (낭비된 토큰 수, 추정인가) 를 돌려준다.
+        timeout 안에 스레드가 끝나면 _ask_stream 이 확정한 실제 값, 아니면 예약분 전체(상한)."""
+        self._cancel.set()
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            return self.meter.get("reserved", 0), True
+        return self.meter.get("tokens", 0), False
+
+
+def _embedding_of(retriever):
+    """검색기가 쓰는 공유 임베더(HybridRetriever.vs.embeddings). 없으면 None — 로컬 점검이 어휘만 본다."""
+    return getattr(getattr(retriever, "vs", None), "embeddings", None)
+
+
+def prompt_fingerprint() -> str:
+    """답을 바꾸는 설정의 지문 — 프롬프트 5종·생성 예산·판정 방식·컨텍스트 예산.
+
+    답변 캐시(rag_answer_cache)의 무효화 키이자 평가 하니스 캐시 키의 RAG 부분이다 —
+    둘이 따로 목록을 들고 있으면 한쪽만 갱신되는 순간 옛 답이 새 설정의 답 행세를 한다.
+    """
+    blob = "|".join([
+        RAG_ANSWER_PROMPT_TEMPLATE, RAG_GRADE_PROMPT_TEMPLATE, RAG_GROUNDEDNESS_PROMPT_TEMPLATE,
+        RAG_REWRITE_PROMPT_TEMPLATE, RAG_GRADE_OR_REWRITE_PROMPT_TEMPLATE,
+        str(ANSWER_MAX_TOKENS), GRADE_MODE, str(rag_compress.CONTEXT_TOKEN_BUDGET),
+    ])
+    return hashlib.sha1(blob.encode("utf-8")).hexdigest()[:12]
+
+
+def _cache_key(llm, retriever):
+    """답변 캐시 키. 코퍼스 스냅샷 키를 모르는 검색기면 None(캐시하지 않는다)."""
+    corpus = (getattr(retriever, "build_stats", None) or {}).get("key")
+    if not corpus:
+        return None
+    model = getattr(llm, "model_name", None) or str(getattr(llm, "model", "unknown"))
+    return f"{corpus}:{prompt_fingerprint()}:{model}"
+
+
 def agentic_answer(llm, retriever, question: str, max_retries: int = 1,
-                   turn_budget_s: float = None) -> dict:
-    """자기교정 RAG 루프 실행. return {answer, chunks, trace, grounded, rewrote}.
+                   turn_budget_s: float = None, speculative: bool = None, gate: bool = None,
+                   self_check: str = None, grade_mode: str = None,
+                   context_budget: int = None, answer_cache=None) -> dict:
+    """자기교정 RAG 루프 실행. return {answer, chunks, trace, grounded, rewrote, context_tokens_saved, skipped}.
 
     trace: [{"step","detail"}] — UI가 에이전트의 단계를 그대로 렌더한다.
+    retrieve 단계에는 다리별 소요 시간 "legs"({dense_ms, sparse_ms, degraded})가 붙는다.
 
     turn_budget_s: 이 턴 전체(3~4콜)에 허용할 벽시계 예산. 앱은 APP_TURN_BUDGET_S 를
     넘기고, 평가 하니스는 None 으로 둬 끈기 있는 백오프를 유지한다(APP_TURN_BUDGET_S 주석).
+    예산이 있으면 선택 단계(판정·재작성·근거점검)는 남은 시간이 그 단계와 생성의 예상 지연
+    (observability.step_latency_ms — 단계별 이동평균)을 덮을 때만 부르고, 선택 단계의 호출은
+    생성 몫을 남긴 마감으로 포기한다. 건너뛴 단계는 trace 에 "skipped": True 로 남고 결과의
+    skipped 에 이름이 모인다 — 판정을 건너뛰면 지금 청크로 답하고, 근거점검을 건너뛰면 로컬
+    판정(rag_grounded)이 라벨이 된다. 레이트리밋에 걸린 턴도 시간 초과 대신 인용 달린 답을 낸다.
+
+    speculative: 첫 판정과 답 생성을 동시에 낼지(None 이면 SPECULATIVE_ANSWER). 켜면 trace 에
+    "speculate" 단계가 붙는다 — {"speculation": {used, wasted_tokens, wasted_estimate, saved_ms}}.
+    wasted_estimate 가 True 면 wasted_tokens 는 측정값이 아니라 예약분 상한이다.
+
+    gate: 검색 점수가 분명하면 LLM 판정 대신 로컬 게이트(rag_gate)로 정할지(None 이면
+    rag_gate.GATE_ENABLED). 켜든 끄든 grade 단계에 "gate" {verdict, source, signals} 가 붙는다 —
+    LLM 이 판정했으면 "llm" 에 그 결과도 — 게이트가 내렸을 결정(shadow)과 나란히 남아 평가
+    리포트가 둘의 일치율을 잰다.
+
+    self_check: 근거점검 방식 "llm" | "local"(None 이면 SELF_CHECK). self_check 단계에 로컬
+    점검 결과 "grounding" {verdict, min_support, sentences[...]} 가 늘 붙는다 — llm 모드면
+    LLM 판정 옆의 shadow, local 모드면 그게 판정이다(LLM 콜 없음).
+
+    grade_mode: "combined"(판정이 NO 면 같은 응답의 재작성 쿼리를 쓴다 — 재작성 콜 없음) |
+    "separate"(YES/NO 뒤 재작성 1콜). None 이면 GRADE_MODE. 어느 쪽이든 trace 에는 grade·rewrite
+    단계가 같은 모양으로 남고, combined 로 받은 rewrite 단계에는 "combined": True 가 붙는다.
+
+    context_budget: 판정·생성·근거점검에 싣는 컨텍스트 토큰 상한(None 이면
+    rag_compress.CONTEXT_TOKEN_BUDGET, 0 이면 압축 없음). 압축하면 retrieve 단계에
+    "compression" {tokens_before, tokens_after, saved, ...} 이 붙고, 결과의
+    context_tokens_saved 는 압축한 컨텍스트를 실은 LLM 콜들이 아낀 토큰의 합이다.
+    반환하는 chunks 는 압축 전 원본이다(출처 표시·평가의 벤더 적중은 원본 청크로 본다).
+
+    answer_cache: rag_answer_cache.AnswerCache(앱은 rag_answer_cache.shared()). 주면 검색 전에
+    질의 벡터로 찾아, 적중이면 저장된 결과를 LLM 콜 없이 돌려준다 — trace 맨 앞에 "cache" 단계
+    {question, similarity, tokens_saved} 가 붙고 나머지는 저장 당시의 trace 다. 적중이 아니면
+    평소대로 돌고 근거점검 YES 인 결과를 그 턴이 쓴 토큰 수와 함께 저장한다. 평가 하니스는
+    넘기지 않는다(매 케이스 실제 경로를 채점한다).
+
+    루프 본체는 _events 하나다 — 앱의 스트리밍(agentic_stream)과 평가 하니스가 같은
+    단계·분기를 탄다. 여기서는 생성을 한 번에(invoke) 받는다.
+    """
+    for ev in _events(llm, retriever, question, max_retries, turn_budget_s, speculative, gate,
+                      self_check, grade_mode, context_budget, answer_cache, stream=False):
+        if ev["event"] == "done":
+            return ev["result"]
+
+
+def agentic_stream(llm, retriever, question: str, max_retries: int = 1,
+                   turn_budget_s: float = None, speculative: bool = None, gate: bool = None,
+                   self_check: str = None, grade_mode: str = None, context_budget: int = None,
+                   answer_cache=None):
+    """agentic_answer 의 제너레이터판 — 단계가 끝나는 대로 이벤트를 흘린다(앱용).
+
+    이벤트(dict, "event" 키로 구분):
+      {"event": "step",  "step": {...}}   trace 항목 하나(retrieve·grade·rewrite·generate·self_check)
+      {"event": "token", "chunk": 청크}    답변 스트림 청크 — ui.stream_answer 에 그대로 넣는다
+      {"event": "done",  "result": {...}} 마지막. agentic_answer 의 반환값과 같은 dict
+
+    순서: retrieve → grade → (rewrite → retrieve) → token… → generate → self_check → done.
+    근거점검 판정은 답이 다 흐른 **뒤에** 온다 — 방문자는 판정 1콜을 기다린 뒤 곧바로 답을
+    읽기 시작하고(예전에는 3~4콜 전부를 스피너 앞에서 기다렸다), 라벨은 나중에 붙는다.
+    답 텍스트는 ui.stream_answer 로 확정한다 — 화면에 그려진 것과 근거점검에 넘기는 것이 같다.
+    """
+    return _events(llm, retriever, question, max_retries, turn_budget_s, speculative, gate,
+                   self_check, grade_mode, context_budget, answer_cache, stream=True)
+
+
+class _Prefetched:
+    """1차 검색을 배치로 미리 해 둔 검색기 — 그 질의 한 번은 배치 결과를, 이후(재작성 질의)는
+    원래 검색기를 쓴다. 나머지 속성(vs·query_cache·build_stats)은 원래 검색기로 넘긴다."""
+
+    def __init__(self, retriever, query, result):
+        self._retriever, self._query, self._result = retriever, query, result
+
+    def search(self, query, k=None, leg_timeout_s=None):
+        if query == self._query and self._result is not None:
+            result, self._result = self._result, None
+            return result
+        return self._retriever.search(query, k=k, leg_timeout_s=leg_timeout_s)
+
+    def invoke(self, query, k=None):
+        return self.search(query, k=k)[0]
+
+    def __getattr__(self, name):
+        return getattr(self._retriever, name)
+
+
+def agentic_answer_batch(llm, retriever, questions, max_retries: int = 1, concurrency: int = None,
+                         **kwargs) -> list:
+    """여러 질문을 한 번에 → [agentic_answer 결과 dict | 예외] (입력 순서 그대로).
+
+    질문을 하나씩 돌리면 질의마다 따로 인코딩하고, 콜마다 혼자 페이서를 기다린다. 여기서는
+      · 1차 검색을 검색기의 search_batch 로 한 번에(질의 임베딩 한 배치 + FAISS 행렬 검색),
+      · 질문별 체인을 스레드 concurrency 개(None 이면 BATCH_CONCURRENCY)로 동시에 돌린다 —
+        LLM 콜은 전부 같은 페이서에 batch 등급으로 예약하므로 처리량은 TPM 예산이 정하고,
+        방문자 턴이 오면 다음 콜부터 그 뒤로 밀린다(ratelimit.PRIORITY_CLASSES).
+    결과 dict 는 agentic_answer 와 같다. 실패한 질문은 그 자리에 예외를 둔다(asyncio.gather 의
+    return_exceptions 처럼) — 한 건의 실패가 나머지를 날리지 않게. 일일 한도에 걸리면 아직
+    시작하지 않은 질문은 돌리지 않고 같은 예외를 둔다(기다려도 안 풀린다).
+    kwargs 는 agentic_answer 로 그대로 간다(turn_budget_s·self_check 등).
     """
+    from concurrent.futures import ThreadPoolExecutor
+
+    questions = list(questions)
+    batch = getattr(retriever, "search_batch", None)
+    first = batch(questions) if batch is not None and questions else [None] * len(questions)
+    halted = []
+
+    def one(i):
+        if halted:
+            return halted[0]
+        r = retriever if first[i] is None else _Prefetched(retriever, questions[i], first[i])
+        try:
+            with priority("batch"):
+                return agentic_answer(llm, r, questions[i], max_retries=max_retries, **kwargs)
+        except Exception as e:  # noqa: BLE001 — 호출부가 질문별로 기록한다
+            if is_daily_limit(e):
+                halted.append(e)
+            return e
+
+    with ThreadPoolExecutor(max_workers=max(1, concurrency or BATCH_CONCURRENCY),
+                            thread_name_prefix="rag-batch") as pool:
+        return list(pool.map(one, range(len(questions))))
+
+
+def _events(llm, retriever, question, max_retries, turn_budget_s, speculative, gate, self_check,
+            grade_mode, context_budget, answer_cache, stream):
     deadline = time.monotonic() + turn_budget_s if turn_budget_s else None
+    if speculative is None:
+        speculative = SPECULATIVE_ANSWER
+    if gate is None:
+        gate = rag_gate.GATE_ENABLED
+    if self_check is None:
+        self_check = SELF_CHECK
+    if grade_mode is None:
+        grade_mode = GRADE_MODE
     trace = []
+    embedding = _embedding_of(retriever)
+    saved = 0               # 압축한 컨텍스트를 실은 LLM 콜들이 아낀 토큰 합
+    usage = _Tally()        # 이 턴이 실제로 쓴 토큰 — 답변 캐시가 적중 때 아낀 양
+
+    skipped = []            # 턴 예산이 모자라 건너뛴 선택 단계
+
+    def step(entry):
+        trace.append(entry)
+        return {"event": "step", "step": entry}
+
+    # 턴 예산 계획 — 선택 단계(판정·재작성·근거점검)는 남은 시간이 그 단계 + 생성의 예상 지연
+    # (observability 의 이동평균)을 덮을 때만 부른다. 예산이 없으면(하니스) 늘 부른다.
+    def shortfall(*steps, then_generate=True):
+        """모자라면 사유 문자열, 충분하면 None."""
+        if deadline is None:
+            return None
+        need = sum(step_latency_ms(s) for s in steps + (("generate",) if then_generate else ()))
+        left = deadline - time.monotonic()
+        if left * 1000 >= need:
+            return None
+        return f"{max(left, 0.0):.1f}s left < ~{need / 1000:.1f}s needed"
+
+    def optional_deadline():
+        # 선택 단계의 호출은 생성 몫을 남기고 포기한다(페이서 대기·429 백오프 포함)
+        return None if deadline is None else deadline - step_latency_ms("generate") / 1000
+
+    def skip(name, why):
+        skipped.append(name)
+        return {"step": name, "detail": f"skipped — {why}", "skipped": True}
+
+    def timed(name, t_call):
+        record_step_latency(name, (time.monotonic() - t_call) * 1000)
+
+    def compressed(chunks, entry):
+        """검색 청크 → 프롬프트에 실을 청크. 통계는 retrieve 단계에 붙인다(단계를 늘리지 않는다)."""
+        qvec = None
+        cache = getattr(retriever, "query_cache", None)
+        if embedding is not None and cache is not None:
+            qvec = cache.embed(embedding, question)     # 1차 검색이 이미 인코딩했다 — 캐시 적중
+        out, stats = rag_compress.compress(question, chunks, embedding=embedding,
+                                           budget=context_budget, query_vector=qvec)
+        if stats["saved"]:
+            entry["compression"] = stats
+            entry["detail"] += f" · context {stats['tokens_before']}→{stats['tokens_after']} tokens"
+        return out, stats["saved"]
+
+    # 답변 캐시 — 질의 벡터는 검색기의 질의 캐시를 거친다(미스여도 곧 1차 검색이 같은 벡터를 쓴다).
+    cache_key = qvec = None
+    if answer_cache is not None and embedding is not None:
+        cache_key = _cache_key(llm, retriever)
+        cache = getattr(retriever, "query_cache", None)
+        if cache_key and cache is not None:
+            qvec = cache.embed(embedding, question)
+            hit = answer_cache.lookup(cache_key, question, qvec)
+            if hit is not None:
+                yield step({"step": "cache",
+                            "detail": f"answer cache hit — \"{hit['question'][:60]}\" "
+                                      f"(cos {hit['similarity']:.2f}), ~{hit['tokens']} tokens saved",
+                            "cache": {"question": hit["question"], "similarity": hit["similarity"],
+                                      "tokens_saved": hit["tokens"]}})
+                stored = hit["result"]
+                for entry in stored["trace"]:
+                    yield step(entry)
+                yield {"event": "done", "result": {**stored, "trace": trace}}
+                return
+
     query = question
-    chunks = retriever.invoke(query)
-    trace.append({"step": "retrieve", "detail": f"\"{query[:60]}\" → {len(chunks)} chunks"})
+    t_call = time.monotonic()
+    chunks, entry = _retrieve(retriever, query, deadline)
+    timed("retrieve", t_call)
+    ctx_chunks, cut = compressed(chunks, entry)
+    yield step(entry)
 
-    rewrote = False
+    rewrote, spec = False, None
     # 판정은 "재검색을 할까?"를 결정할 때만 부른다. 재시도 예산이 남아있지 않으면
     # 판정 결과가 제어를 바꿀 수 없으므로 호출하지 않는다 — 예전에는 마지막 회차에도
     # 판정을 불러 결과를 버렸고, 그건 답변에 영향 없이 LLM 호출만 한 번 더 쓰는 낭비였다.
     for attempt in range(max_retries):
-        grade = _yesno(llm, RAG_GRADE_PROMPT_TEMPLATE, _deadline=deadline,
-                       question=question, context=format_context(chunks))
-        trace.append({"step": "grade", "detail": f"relevant = {grade}"})
-        if grade == "YES":
+        ctx = format_context(ctx_chunks)
+        proposed = None         # combined 판정이 같이 돌려준 재작성 쿼리
+        sig = rag_gate.signals(entry.get("legs"), query, chunks)
+        verdict = rag_gate.decide(sig)
+        if gate and verdict is not None:
+            # 점수가 분명하다 — LLM 왕복 없이 정한다(첫 토큰이 판정 1콜만큼 당겨진다)
+            grade = verdict
+            yield step({"step": "grade", "detail": f"relevant = {grade} (local gate, LLM call skipped)",
+                        "gate": {"verdict": verdict, "source": "gate", "signals": sig}})
+        elif (short := shortfall("grade")) is not None:
+            # 판정을 부르면 생성 몫을 잠식한다 — 지금 청크로 답한다
+            grade = "YES"
+            yield step(skip("grade", short))
+        else:
+            # 추측은 첫 회차만 — 재작성 뒤 판정은 (재시도 상한 1에서) 부를 일이 없다.
+            if speculative and attempt == 0:
+                spec = _Speculation(llm, ctx, question, deadline, usage)
+                saved += cut
+            t_call = time.monotonic()
+            try:
+                if grade_mode == "combined":
+                    grade, proposed = _grade_or_rewrite(llm, question, ctx, _deadline=optional_deadline(),
+                                                        _usage=usage)
+                else:
+                    grade = _yesno(llm, RAG_GRADE_PROMPT_TEMPLATE, _deadline=optional_deadline(),
+                                   _usage=usage, question=question, context=ctx)
+            except BaseException as e:
+                if deadline is None or not _out_of_time(e):
+                    if spec is not None:
+                        spec.cancel(timeout=0)
+                    raise
+                grade = "YES"   # 못 물었다 — 지금 청크로 답한다(추측이 돌고 있으면 그걸 쓴다)
+                graded = skip("grade", f"out of time ({type(e).__name__})")
+            else:
+                saved += cut
+                timed("grade", t_call)
+                graded = {"step": "grade", "detail": f"relevant = {grade}"}
+                if sig is not None:
+                    graded["gate"] = {"verdict": verdict, "source": "llm", "llm": grade, "signals": sig}
+            graded_at = time.monotonic()
+            yield step(graded)
+        retry = grade != "YES"
+        if retry and (short := shortfall(*(("retrieve",) if proposed else ("rewrite", "retrieve")))):
+            # 재검색까지 마치면 생성 몫이 모자란다 — 빗나간 청크라도 인용 달린 답이 시간 초과보다 낫다
+            retry = False
+            yield step(skip("rewrite", short))
+        if spec is not None and not retry:
+            # 절약한 시간 = 생성이 판정과 겹친 구간(판정이 끝나기 전에 생성이 끝났으면 거기까지)
+            saved_ms = round((min(graded_at, spec.finished or graded_at) - spec.started) * 1000)
+            yield step({"step": "speculate", "detail": f"used — saved ~{saved_ms}ms",
+                        "speculation": {"used": True, "wasted_tokens": 0, "wasted_estimate": False,
+                                        "saved_ms": saved_ms}})
+        if not retry:
             break
-        # 부실 → 쿼리 재작성 후 재검색 (자기교정)
-        query = _rewrite(llm, question, _deadline=deadline)
+        if spec is not None:
+            wasted, estimated = spec.cancel()
+            spec = None
+            # 추정치(아직 도는 스레드의 예약분)는 측정값과 섞어 더하지 않도록 표시해 둔다
+            yield step({"step": "speculate",
+                        "detail": f"discarded after grade NO — {'≤' if estimated else ''}{wasted} tokens wasted",
+                        "speculation": {"used": False, "wasted_tokens": wasted, "wasted_estimate": estimated,
+                                        "saved_ms": 0}})
+        # 부실 → 쿼리 재작성 후 재검색 (자기교정). combined 판정이 쿼리를 줬으면 재작성 콜은 없다 —
+        # trace 에는 rewrite 단계가 그대로 남는다(UI·평가가 보는 모양은 같다).
+        if proposed:
+            query = proposed
+            yield step({"step": "rewrite", "detail": query, "combined": True})
+        else:
+            t_call = time.monotonic()
+            try:
+                query = _rewrite(llm, question, _deadline=optional_deadline(), _usage=usage)
+            except Exception as e:  # noqa: BLE001
+                if deadline is None or not _out_of_time(e):
+                    raise
+                yield step(skip("rewrite", f"out of time ({type(e).__name__})"))
+                break
+            timed("rewrite", t_call)
+            yield step({"step": "rewrite", "detail": query})
         rewrote = True
-        trace.append({"step": "rewrite", "detail": query})
-        chunks = retriever.invoke(query)
-        trace.append({"step": "retrieve", "detail": f"\"{query[:60]}\" → {len(chunks)} chunks"})
-
-    # 생성
-    ctx = format_context(chunks)
-    answer = _ask(llm, RAG_ANSWER_PROMPT_TEMPLATE, _max_tokens=ANSWER_MAX_TOKENS,
-                  _deadline=deadline, context=ctx, question=question)
-    trace.append({"step": "generate", "detail": f"{len(answer)} chars"})
-
-    # 근거 자기점검 — LLM에 YES/NO 이진 판정 1회. RAGAS faithfulness(claim 단위 분해·
-    # 연속값)와는 다르며, 게이트가 아니라 라벨로만 쓴다(답변은 이미 생성됨).
-    grounded = _yesno(llm, RAG_GROUNDEDNESS_PROMPT_TEMPLATE, _deadline=deadline,
-                      answer=answer, context=ctx)
-    trace.append({"step": "self_check", "detail": f"grounded = {grounded}"})
-
-    return {"answer": answer, "chunks": chunks, "trace": trace, "grounded": grounded, "rewrote": rewrote}
+        t_call = time.monotonic()
+        chunks, entry = _retrieve(retriever, query, deadline)
+        timed("retrieve", t_call)
+        ctx_chunks, cut = compressed(chunks, entry)
+        yield step(entry)
+
+    # 생성 — 판정 YES 로 살아남은 추측이 있으면 그 스트림을 이어받는다(같은 청크·같은 프롬프트).
+    ctx = format_context(ctx_chunks)
+    t_call = time.monotonic()
+    if spec is None:
+        saved += cut            # 살아남은 추측은 시작할 때 이미 셌다
+    if spec is not None:
+        source = spec.chunks()
+    elif stream:
+        source = _ask_stream(llm, RAG_ANSWER_PROMPT_TEMPLATE, _max_tokens=ANSWER_MAX_TOKENS,
+                             _deadline=deadline, _usage=usage, context=ctx, question=question)
+    if stream:
+        from ui import stream_answer
+
+        streamed = []
+        try:
+            for chunk in source:
+                streamed.append(chunk)
+                yield {"event": "token", "chunk": chunk}
+        finally:
+            if spec is not None:
+                spec.cancel(timeout=0)    # 방문자가 떠났으면 뒤에서 도는 생성도 멈춘다
+        answer = stream_answer(streamed)
+    elif spec is not None:
+        answer = clean_response("".join(c.content for c in source))
+    else:
+        answer = _ask(llm, RAG_ANSWER_PROMPT_TEMPLATE, _max_tokens=ANSWER_MAX_TOKENS,
+                      _deadline=deadline, _usage=usage, context=ctx, question=question)
+    if spec is None:
+        timed("generate", t_call)     # 추측을 이어받은 생성은 판정과 겹쳐 돌았다 — 추정에서 뺀다
+    yield step({"step": "generate", "detail": f"{len(answer)} chars"})
+
+    # 근거 자기점검 — 게이트가 아니라 라벨로만 쓴다(답변은 이미 생성됨). llm 모드는 YES/NO
+    # 이진 판정 1회(RAGAS faithfulness 의 claim 분해·연속값과는 다르다), local 모드는 문장별
+    # 인용 대조(rag_grounded). 로컬 점검은 어느 모드든 돌려 trace 에 남긴다.
+    # 답이 본 것과 같은 (압축한) 청크로 잰다 — 번호는 그대로라 [n] 이 같은 청크를 가리킨다
+    local = rag_grounded.check(answer, ctx_chunks, embedding=embedding)
+    # 소요 시간은 trace 에 넣지 않는다 — 같은 입력이면 같은 trace 여야 스트림·dict 결과가 비교된다
+    grounding = {k: local[k] for k in ("verdict", "min_support", "sentences")}
+    support = "—" if local["min_support"] is None else f"{local['min_support']:.2f}"
+    checked = {"source": self_check}
+    if self_check == "local":
+        grounded = local["verdict"]
+        detail = f"grounded = {grounded} (local, min support {support})"
+    else:
+        # 답은 이미 나왔다 — 라벨 하나 때문에 시간 초과로 답을 잃지 않게, 시간이 모자라면 로컬 판정으로
+        short = shortfall("self_check", then_generate=False)
+        if short is None:
+            t_call = time.monotonic()
+            try:
+                grounded = _yesno(llm, RAG_GROUNDEDNESS_PROMPT_TEMPLATE, _deadline=deadline, _usage=usage,
+                                  answer=answer, context=ctx)
+            except Exception as e:  # noqa: BLE001
+                if deadline is None or not _out_of_time(e):
+                    raise
+                short = f"out of time ({type(e).__name__})"
+            else:
+                timed("self_check", t_call)
+                saved += cut
+                detail = f"grounded = {grounded}"
+        if short is not None:
+            skipped.append("self_check")
+            grounded = local["verdict"]
+            detail = f"grounded = {grounded} (local, min support {support}) — LLM check skipped: {short}"
+            checked = {"source": "local", "skipped": True}
+    yield step({"step": "self_check", "detail": detail, **checked, "grounding": grounding})
+
+    result = {"answer": answer, "chunks": chunks, "trace": trace, "grounded": grounded,
+              "rewrote": rewrote, "context_tokens_saved": saved, "skipped": skipped}
+    # 예산에 쫓겨 단계를 건너뛴 턴은 저장하지 않는다 — 덜 점검한 답을 다음 방문자에게 되풀이하지 않게
+    if qvec is not None and grounded == "YES" and not skipped:
+        answer_cache.store(cache_key, question, qvec, {**result, "trace": list(trace)}, usage.tokens)
+    yield {"event": "done", "result": result}
 
 
 # ── CLI 스모크 테스트: python agent_rag.py ───────────────────────────
 if __name__ == "__main__":
     import tomllib
     from langchain_groq import ChatGroq
+    from groq_transport import http_client
     from rag_corpus import build_retriever
 
     with open(".streamlit/secrets.toml", "rb") as f:
@@ -194,7 +867,7 @@ if __name__ == "__main__":
     print("검색기 구축(임베딩)...")
     r = build_retriever(k=5)
     llm = ChatGroq(model="qwen/qwen3.6-27b", groq_api_key=key, temperature=0,
-                   reasoning_effort="none", max_tokens=ANSWER_MAX_TOKENS)
+                   reasoning_effort="none", max_tokens=ANSWER_MAX_TOKENS, http_client=http_client())
 
     for q in [
         "How does the on-prem pipeline detect data drift?",   # 영어 질문 → 한국어 KETI 문서 (재작성 유도)
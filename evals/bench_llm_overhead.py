@@ -0,0 +1,123 @@
+"""LLM 호출 계층 오버헤드 벤치마크 — 네트워크를 뺀 프레임워크 비용(µs/콜). Groq 토큰 0.
+
+agent_rag._ask 는 턴마다 3~4번 불린다. 예전 경로는 호출마다 템플릿을 파싱하고
+(ChatPromptTemplate.from_template), 모델을 바인딩하고(llm.bind), 예약 추정용 prompt.format 과
+chain.invoke 안에서 프롬프트를 두 번 렌더했다. 지금 경로는 컴파일한 템플릿·바인딩한 모델을
+캐시하고 한 번 렌더한 메시지를 추정과 호출에 같이 쓴다. 이 벤치마크는 두 경로를 같은 가짜
+모델(FakeListChatModel — 네트워크 0)로 돌려 남는 것, 즉 프레임워크 비용만 잰다.
+
+측정
+- 템플릿: prompts.py 의 RAG 프롬프트 다섯 개(판정·재작성·판정+재작성·생성·근거점검)를
+  평가 질의 하나와 그 검색 청크 크기의 컨텍스트로 채운다.
+- legacy: 예전 _ask 의 본문 그대로(from_template → bind → format → prompt | model → invoke).
+- cached: 지금 agent_rag._ask. 페이서는 아무것도 안 하는 것으로 바꿔 사용량 기록을 남기지 않는다.
+- 값: 템플릿마다 n 회 호출의 평균 µs. 첫 호출(캐시 미스)은 워밍업으로 버린다.
+  실제 Groq 콜은 수백 ms 라 여기 숫자는 '콜당 몇 µs 를 줄였나'로 읽는다.
+
+사용:
+    python evals/bench_llm_overhead.py            # → evals/runs/<ts>_llm-overhead.json
+    python evals/bench_llm_overhead.py --n 2000 --no-save
+"""
+import argparse
+import json
+import sys
+import time
+from datetime import datetime, timezone, timedelta
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import agent_rag  # noqa: E402
+from prompts import (  # noqa: E402
+    RAG_ANSWER_PROMPT_TEMPLATE, RAG_GRADE_OR_REWRITE_PROMPT_TEMPLATE, RAG_GRADE_PROMPT_TEMPLATE,
+    RAG_GROUNDEDNESS_PROMPT_TEMPLATE, RAG_REWRITE_PROMPT_TEMPLATE,
+)
+from ratelimit import estimate_tokens  # noqa: E402
+
+_KST = timezone(timedelta(hours=9))
+RUNS_DIR = ROOT / "evals" / "runs"
+_QUESTION = "How do Vertex AI Pipelines run Kubeflow pipelines?"
+# 앱의 검색 k(5) 청크 분량 — 실제 턴과 비슷한 길이의 렌더를 재려고
+_CONTEXT = "\n\n".join(f"[{i}] (Google Cloud · Pipelines) Vertex AI Pipelines run Kubeflow pipelines "
+                       "as serverless jobs on managed infrastructure. " * 6 for i in range(1, 6))
+_QC = {"question": _QUESTION, "context": _CONTEXT}
+# 이름 → (템플릿, _ask 의 max_tokens, 변수) — 앱이 부르는 조합 그대로
+TEMPLATES = {
+    "grade": (RAG_GRADE_PROMPT_TEMPLATE, agent_rag._YESNO_TOKENS, _QC),
+    "rewrite": (RAG_REWRITE_PROMPT_TEMPLATE, agent_rag._REWRITE_TOKENS, {"question": _QUESTION}),
+    "grade_or_rewrite": (RAG_GRADE_OR_REWRITE_PROMPT_TEMPLATE, agent_rag._REWRITE_TOKENS, _QC),
+    "generate": (RAG_ANSWER_PROMPT_TEMPLATE, agent_rag.ANSWER_MAX_TOKENS, _QC),
+    "self_check": (RAG_GROUNDEDNESS_PROMPT_TEMPLATE, agent_rag._YESNO_TOKENS,
+                   {"context": _CONTEXT, "answer": "They run as serverless jobs [1]."}),
+}
+
+
+class _NullPacer:
+    def reserve(self, need, deadline=None):
+        return [0, need]
+
+    def release(self, held, tokens):
+        pass
+
+
+def legacy_ask(llm, template, max_tokens, variables):
+    """예전 agent_rag._ask 의 호출 경로(페이서 제외) — 비교 기준으로만 남긴다."""
+    from langchain_core.prompts import ChatPromptTemplate
+
+    prompt = ChatPromptTemplate.from_template(template)
+    model = llm.bind(max_tokens=max_tokens) if max_tokens else llm
+    estimate_tokens(prompt.format(**variables))
+    return agent_rag.clean_response((prompt | model).invoke(variables).content)
+
+
+def _time_us(fn, n):
+    fn()                                        # 워밍업(캐시 미스) — 평균에서 뺀다
+    t = time.perf_counter()
+    for _ in range(n):
+        fn()
+    return (time.perf_counter() - t) / n * 1e6
+
+
+def run(n=500, out_dir=RUNS_DIR):
+    """두 경로의 템플릿별 µs/콜 → 기록 dict (out_dir=None 이면 저장 안 함)."""
+    from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+    llm = FakeListChatModel(responses=["YES"])
+    saved_pacer = agent_rag.pacer_for
+    agent_rag.pacer_for = lambda model: _NullPacer()
+    try:
+        results = {}
+        for name, (template, max_tokens, variables) in TEMPLATES.items():
+            before = _time_us(lambda: legacy_ask(llm, template, max_tokens, variables), n)
+            after = _time_us(lambda: agent_rag._ask(llm, template, _max_tokens=max_tokens, **variables), n)
+            results[name] = {"legacy_us": round(before, 1), "cached_us": round(after, 1),
+                             "saved_pct": round((1 - after / before) * 100, 1) if before else None}
+            print(f"{name:17s} legacy {before:8.1f} µs  cached {after:8.1f} µs  "
+                  f"(-{results[name]['saved_pct']}%)")
+    finally:
+        agent_rag.pacer_for = saved_pacer
+    rec = {"kind": "llm_overhead_bench", "timestamp": datetime.now(_KST).isoformat(),
+           "prompt_fingerprint": agent_rag.prompt_fingerprint(), "n": n, "results": results}
+    if out_dir is not None:
+        out_dir = Path(out_dir)
+        out_dir.mkdir(exist_ok=True)
+        ts = datetime.now(_KST).strftime("%Y%m%d_%H%M%S")
+        out = out_dir / f"{ts}_llm-overhead.json"
+        out.write_text(json.dumps(rec, ensure_ascii=False, indent=2), encoding="utf-8")
+        rec["path"] = str(out)
+    return rec
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="LLM 호출 계층 오버헤드 벤치마크(Groq 호출 없음)")
+    ap.add_argument("--n", type=int, default=500, help="템플릿당 호출 횟수")
+    ap.add_argument("--no-save", action="store_true", help="evals/runs/ 에 기록하지 않는다")
+    args = ap.parse_args(argv)
+    rec = run(args.n, out_dir=None if args.no_save else RUNS_DIR)
+    if "path" in rec:
+        print(f"\n기록: {Path(rec['path']).relative_to(ROOT)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+"""검색 계층 벤치마크 — 지연(다리별 p50/p95)·구축 시간·메모리·recall@k. Groq 토큰 0.
+
+retrieval_probe.py 가 '결함이 있나'(절단·교차언어)를 보는 진단이라면, 이건 '검색 계층을
+바꿨더니 빨라졌나/나빠졌나'를 시간에 따라 비교하려는 기록이다. BM25 엔진·질의 캐시·
+다리 동시 실행·임베딩 백엔드처럼 LLM 과 무관한 변경은 전체 평가(일일 예산의 ~40%)를
+돌리지 않고 이것만으로 확인한다.
+
+측정
+- 질의: 검색 정답 라벨(expect_vendor)이 있는 질의 전부 —
+  golden_rag.jsonl + archive/golden_rag.dropped.jsonl + retrieval_probe 의 교차언어 질의 5건.
+  archive 케이스는 LLM 토큰 비용 때문에 평가에서 뺀 것이라, 토큰을 안 쓰는 여기서는 되살린다.
+- 코퍼스: rag_docs 청크를 1× · 10× · 100× 로 복제. 복제본 본문 앞에 "[copy n]" 을 붙인다 —
+  RRF 가 본문으로 중복을 합치므로 같은 텍스트면 규모가 커져도 후보가 늘지 않는다.
+  복제본은 원본과 벡터가 거의 같아 **규모에 따른 지연·메모리 곡선**을 보는 용도이고,
+  대규모 recall 은 근접 중복이 상위를 채우는 조건의 값이라 1× 값만 품질 지표로 읽는다.
+- 지연: HybridRetriever.search 의 다리별 시간. cold = 질의 벡터 캐시 미스(인코더 포함),
+  warm = 같은 질의 반복(캐시 적중, 인코더 제외).
+- recall@k: top-k 청크의 vendor 중 expect_vendor 가 있는 질의 비율 — run_evals 의
+  '검색 히트'와 같은 정의.
+- 메모리: FAISS 벡터 + BM25 배열 + 청크 저장소(rag_store) 바이트, 그리고 구축 전후 프로세스 RSS 차이.
+
+사용:
+    python evals/bench_retrieval.py                    # 1·10·100× → evals/runs/<ts>_retrieval-<키>.json
+    python evals/bench_retrieval.py --scales 1,10 --repeat 3
+"""
+import argparse
+import json
+import math
+import sys
+import time
+from datetime import datetime, timezone, timedelta
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from rag_corpus import (  # noqa: E402
+    HybridRetriever, QueryEmbeddingCache, bm25_index, corpus_key, dense_index, load_corpus, _model_id,
+)
+from rag_embed import _rss_bytes  # noqa: E402
+from retrieval_probe import CROSS_LINGUAL_PROBES, KETI_VENDOR  # noqa: E402
+
+_KST = timezone(timedelta(hours=9))
+EVAL_DIR = ROOT / "evals"
+RUNS_DIR = EVAL_DIR / "runs"
+GOLDEN_RAG = (EVAL_DIR / "golden_rag.jsonl", EVAL_DIR / "archive" / "golden_rag.dropped.jsonl")
+RECALL_KS = (1, 3, 5)
+DEFAULT_SCALES = (1, 10, 100)
+
+
+def load_cases(paths=GOLDEN_RAG):
+    """[{id, q, expect_vendor, source}] — 라벨 없는 케이스(거절·환각 유도)는 뺀다."""
+    cases = []
+    for path in paths:
+        for l in path.read_text(encoding="utf-8").splitlines():
+            c = json.loads(l) if l.strip() else {}
+            if c.get("expect_vendor"):
+                cases.append({"id": c["id"], "q": c["q"], "expect_vendor": c["expect_vendor"],
+                              "source": path.name})
+    cases += [{"id": f"probe-xling-{i}", "q": q, "expect_vendor": KETI_VENDOR, "source": "retrieval_probe"}
+              for i, q in enumerate(CROSS_LINGUAL_PROBES, 1)]
+    return cases
+
+
+def scale_corpus(docs, n):
+    """청크를 n 벌로. 복제본마다 본문 앞에 태그를 붙여 RRF 중복 제거에 안 걸리게 한다."""
+    if n == 1:
+        return list(docs)
+    from langchain_core.documents import Document
+
+    out = []
+    for c in range(n):
+        for d in docs:
+            text = d.page_content if c == 0 else f"[copy {c}] {d.page_content}"
+            out.append(Document(page_content=text, metadata={**d.metadata, "copy": c}))
+    return out
+
+
+def percentiles(values):
+    """{p50, p95} (ms). 값이 없으면(예: 다리가 전부 마감 초과) None."""
+    vals = sorted(v for v in values if v is not None)
+    if not vals:
+        return None
+
+    def q(p):
+        # 최근접 순위(nearest-rank) — 표본이 20개 안팎이라 보간보다 '실제로 관측된 값'이 낫다.
+        return vals[max(0, math.ceil(p * len(vals)) - 1)]
+    return {"p50": q(0.50), "p95": q(0.95)}
+
+
+def recall_at(results, cases, ks=RECALL_KS):
+    """top-k vendor 에 expect_vendor 가 있는 질의 비율."""
+    out = {}
+    for k in ks:
+        hits = sum(any(d.metadata.get("vendor") == c["expect_vendor"] for d in docs[:k])
+                   for docs, c in zip(results, cases))
+        out[str(k)] = round(hits / len(cases), 3) if cases else None
+    return out
+
+
+def bench_scale(base_docs, scale, cases, embedding, k, repeat):
+    """한 규모에서 구축 → 질의 repeat 회 → 지표 dict."""
+    import numpy as np
+
+    docs = scale_corpus(base_docs, scale)
+    rss0 = _rss_bytes()
+    t0 = time.perf_counter()
+    vs = dense_index(embedding, embedding.embed_documents([d.page_content for d in docs]))
+    t1 = time.perf_counter()
+    bm25 = bm25_index(docs)
+    t2 = time.perf_counter()
+    # 규모마다 빈 캐시 — 앞 규모의 질의 벡터가 cold 측정을 warm 으로 바꾸지 않게.
+    r = HybridRetriever(vs, docs, bm25, k=max(RECALL_KS + (k,)), query_cache=QueryEmbeddingCache())
+    rss1 = _rss_bytes()
+
+    legs = {"cold": [], "warm": []}
+    results = []
+    for rep in range(repeat):
+        for c in cases:
+            t = time.perf_counter()
+            got, leg = r.search(c["q"])
+            leg["total_ms"] = round((time.perf_counter() - t) * 1000, 1)
+            legs["cold" if rep == 0 else "warm"].append(leg)
+            if rep == 0:
+                results.append(got)
+
+    bm25_bytes = sum(np.asarray(a).nbytes for n, a in bm25.state().items() if n != "vocab")
+    return {
+        "scale": scale,
+        "chunks": len(docs),
+        "build_s": {"dense": round(t1 - t0, 3), "sparse": round(t2 - t1, 3)},
+        "memory_mb": {
+            "faiss": round(vs.index.ntotal * vs.index.d * 4 / 2**20, 2),
+            "bm25": round(bm25_bytes / 2**20, 2),
+            "chunks": round(r.splits.nbytes / 2**20, 2),
+            "rss_delta": round((rss1 - rss0) / 2**20, 1) if rss0 is not None and rss1 is not None else None,
+        },
+        "latency_ms": {
+            phase: {leg: percentiles(l.get(f"{leg}_ms") for l in rows)
+                    for leg in ("dense", "sparse", "total")}
+            for phase, rows in legs.items() if rows
+        },
+        "recall_at_k": recall_at(results, cases),
+    }
+
+
+def run(scales=DEFAULT_SCALES, repeat=5, k=5, embedding=None, out_dir=RUNS_DIR):
+    """벤치마크 전체 → 기록 dict (out_dir 에 JSON 저장; out_dir=None 이면 저장 안 함)."""
+    if embedding is None:
+        from rag_embed import embedding_service
+        embedding = embedding_service()
+    cases = load_cases()
+    base = load_corpus()
+    model = _model_id(embedding)
+    rec = {
+        "kind": "retrieval_bench",
+        "timestamp": datetime.now(_KST).isoformat(),
+        "corpus_key": corpus_key(model=model),
+        "embedding": model,
+        "k": k,
+        "queries": len(cases),
+        "query_sources": {src: sum(c["source"] == src for c in cases)
+                          for src in dict.fromkeys(c["source"] for c in cases)},
+        "repeat": repeat,
+        "results": [],
+    }
+    for s in scales:
+        res = bench_scale(base, s, cases, embedding, k, repeat)
+        rec["results"].append(res)
+        _print_row(res, k)
+    if out_dir is not None:
+        out_dir = Path(out_dir)
+        out_dir.mkdir(exist_ok=True)
+        ts = datetime.now(_KST).strftime("%Y%m%d_%H%M%S")
+        out = out_dir / f"{ts}_retrieval-{rec['corpus_key']}.json"
+        out.write_text(json.dumps(rec, ensure_ascii=False, indent=2), encoding="utf-8")
+        rec["path"] = str(out)
+    return rec
+
+
+def _print_row(res, k):
+    def fmt(p):
+        return f"{p['p50']:.1f}/{p['p95']:.1f}" if p else "—"
+    lat = res["latency_ms"]
+    print(f"{res['scale']:>4}× {res['chunks']:>7,} 청크 | 구축 dense {res['build_s']['dense']:.1f}s "
+          f"sparse {res['build_s']['sparse']:.2f}s | 메모리 faiss {res['memory_mb']['faiss']}MB "
+          f"bm25 {res['memory_mb']['bm25']}MB chunks {res['memory_mb']['chunks']}MB")
+    for phase in ("cold", "warm"):
+        if phase in lat:
+            print(f"      {phase:4s} p50/p95 ms  dense {fmt(lat[phase]['dense'])}  "
+                  f"sparse {fmt(lat[phase]['sparse'])}  total {fmt(lat[phase]['total'])}")
+    print(f"      recall@k {res['recall_at_k']}")
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="검색 계층 벤치마크(Groq 호출 없음)")
+    ap.add_argument("--scales", default=",".join(map(str, DEFAULT_SCALES)),
+                    help="코퍼스 복제 배수, 쉼표 구분 (기본 1,10,100)")
+    ap.add_argument("--repeat", type=int, default=5, help="질의 반복 횟수(첫 회 = cold)")
+    ap.add_argument("--k", type=int, default=5, help="앱 검색기 k (기록용)")
+    ap.add_argument("--no-save", action="store_true", help="evals/runs/ 에 기록하지 않는다")
+    args = ap.parse_args(argv)
+    scales = [int(s) for s in args.scales.split(",") if s.strip()]
+    rec = run(scales, repeat=args.repeat, k=args.k, out_dir=None if args.no_save else RUNS_DIR)
+    if "path" in rec:
+        print(f"\n기록: {Path(rec['path']).relative_to(ROOT)}")
+
+
+if __name__ == "__main__":
+    main()
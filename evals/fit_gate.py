@@ -0,0 +1,118 @@
+"""로컬 검색 게이트(rag_gate) 임계값 보정 — LLM 관련성 판정을 라벨로 삼는다.
+
+질의마다 앱과 같은 검색기로 1차 검색을 하고, 그 청크에 대해
+  · rag_gate.signals(...)   — 게이트 입력(dense_top·sparse_top·overlap·lang_match)
+  · agent_rag 의 관련성 판정 — 같은 프롬프트·같은 출력 예산의 LLM YES/NO(라벨)
+을 모은 뒤 rag_gate.fit 으로 "결정한 건의 LLM 일치율 ≥ GATE_MIN_AGREEMENT" 안에서 결정 비율이
+가장 큰 임계값을 고른다. 결과(임계값·일치율·coverage·라벨 행 전체)는 rag_gate.GATE_FIT_PATH 에
+쓰고, 앱은 다음 기동부터 그 임계값을 읽는다.
+
+질의: golden_rag.jsonl 이 기준이고, 표본이 너무 작아 archive/golden_rag.dropped.jsonl 과
+retrieval_probe 의 교차언어 질의(재작성이 필요한 쪽)를 더한다 — 여기서는 답을 만들지 않고
+판정 1콜(YES/NO 16토큰)만 쓰므로 평가에서 뺀 케이스도 되살릴 수 있다.
+
+사용:
+    python evals/fit_gate.py            # 라벨 수집(Groq 판정 n콜) + 보정 → evals/gate_fit.json
+    python evals/fit_gate.py --refit    # 저장된 라벨로 다시 보정만(Groq 호출 없음)
+"""
+import argparse
+import json
+import sys
+from datetime import datetime, timezone, timedelta
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import rag_gate  # noqa: E402
+from retrieval_probe import CROSS_LINGUAL_PROBES  # noqa: E402
+
+_KST = timezone(timedelta(hours=9))
+EVAL_DIR = ROOT / "evals"
+GOLDEN = (EVAL_DIR / "golden_rag.jsonl", EVAL_DIR / "archive" / "golden_rag.dropped.jsonl")
+
+
+def load_questions(paths=GOLDEN):
+    """[{id, q, source}] — 거절·환각 유도 케이스도 넣는다(NO 라벨이 그쪽에서 나온다)."""
+    out = []
+    for path in paths:
+        for l in path.read_text(encoding="utf-8").splitlines():
+            if l.strip():
+                c = json.loads(l)
+                out.append({"id": c["id"], "q": c["q"], "source": path.name})
+    out += [{"id": f"probe-xling-{i}", "q": q, "source": "retrieval_probe"}
+            for i, q in enumerate(CROSS_LINGUAL_PROBES, 1)]
+    return out
+
+
+def collect(questions, retriever, llm):
+    """질의마다 1차 검색 → {id, q, source, signals, llm}. 게이트 입력이 없으면 signals=None."""
+    from agent_rag import RAG_GRADE_PROMPT_TEMPLATE, _yesno
+    from rag_corpus import format_context
+
+    rows = []
+    for i, c in enumerate(questions, 1):
+        chunks, legs = retriever.search(c["q"])
+        sig = rag_gate.signals(legs, c["q"], chunks)
+        grade = _yesno(llm, RAG_GRADE_PROMPT_TEMPLATE, question=c["q"], context=format_context(chunks))
+        rows.append({**c, "signals": sig, "llm": grade})
+        print(f"  [{i:2}/{len(questions)}] LLM={grade:3}  gate(기본값)={rag_gate.decide(sig, rag_gate.DEFAULT_THRESHOLDS)}"
+              f"  {c['id']}")
+    return rows
+
+
+def report(rows, th):
+    rep = rag_gate.agreement([(r["signals"], r["llm"]) for r in rows if r["signals"]], th)
+    cov = f"{rep['coverage']:.0%}" if rep["coverage"] is not None else "—"
+    agr = f"{rep['agreement']:.0%}" if rep["agreement"] is not None else "—"
+    print(f"    n={rep['n']}  결정 {rep['decided']} (coverage {cov})  LLM 일치 {agr}")
+    return rep
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="로컬 검색 게이트 임계값 보정")
+    ap.add_argument("--refit", action="store_true", help="저장된 라벨로 다시 보정만 한다(Groq 호출 없음)")
+    ap.add_argument("--min-agreement", type=float, default=rag_gate.GATE_MIN_AGREEMENT)
+    args = ap.parse_args(argv)
+
+    path = Path(rag_gate.GATE_FIT_PATH)
+    if args.refit:
+        prev = json.loads(path.read_text(encoding="utf-8"))
+        rows, corpus = prev["rows"], prev.get("corpus_key")
+    else:
+        import tomllib
+        from langchain_groq import ChatGroq
+        from agent_rag import ANSWER_MAX_TOKENS
+        from groq_transport import http_client
+        from rag_corpus import build_retriever, corpus_key
+
+        with open(ROOT / ".streamlit" / "secrets.toml", "rb") as f:
+            key = tomllib.load(f)["groq_api_key"]
+        questions = load_questions()
+        print(f"검색기 구축 · 질의 {len(questions)}건 (판정 {len(questions)}콜)")
+        retriever = build_retriever(k=5)
+        llm = ChatGroq(model="qwen/qwen3.6-27b", groq_api_key=key, temperature=0,
+                       reasoning_effort="none", max_tokens=ANSWER_MAX_TOKENS, http_client=http_client())
+        rows = collect(questions, retriever, llm)
+        corpus = corpus_key()
+
+    print("\n기본 임계값:")
+    before = report(rows, rag_gate.DEFAULT_THRESHOLDS)
+    th, _ = rag_gate.fit([(r["signals"], r["llm"]) for r in rows], min_agreement=args.min_agreement)
+    print(f"보정 임계값 {th}:")
+    after = report(rows, th)
+    rec = {
+        "fitted_at": datetime.now(_KST).isoformat(),
+        "corpus_key": corpus,
+        "min_agreement": args.min_agreement,
+        "thresholds": th,
+        "default": before,
+        "fitted": after,
+        "rows": rows,
+    }
+    path.write_text(json.dumps(rec, ensure_ascii=False, indent=2), encoding="utf-8")
+    print(f"\n기록: {path.relative_to(ROOT)} — 표본이 작다. 일치율은 같은 표본에서 고른 값이라 낙관적이다.")
+
+
+if __name__ == "__main__":
+    main()
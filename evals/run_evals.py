@@ -36,9 +36,9 @@ from prompts import (build_system_prompt, build_chat_system_prompt, get_df_info,
 from profile_graph import normalize_lang  # noqa: E402
 from ratelimit import (  # noqa: E402
     DAILY_TOKEN_BUDGET, estimate_tokens, is_daily_limit, pacer_for,
-    parse_wait_seconds, remaining_today, used_today,
+    parse_wait_seconds, remaining_today, set_api_key, used_today,
 )
-from groq import Groq  # noqa: E402
+from groq_transport import groq_client, http_client  # noqa: E402
 
 CHAT_MODEL = "qwen/qwen3.6-27b"          # 앱 챗봇과 동일
 JUDGE_MODEL = "llama-3.3-70b-versatile"  # 자기채점 편향 회피 위해 다른 계열
@@ -101,26 +101,30 @@ def call_groq(client, **kwargs):
     pacer = pacer_for(model)
     need = estimate_tokens("".join(m.get("content", "") for m in kwargs.get("messages", []))) \
         + int(kwargs.get("max_tokens", 512))
-    pacer.wait_for(need)
+    # 예약 → 확정. 예전의 wait_for → record 는 호출이 끝나야 창에 잡혀, 같은 창을 보는 다른
+    # 호출(공유 창이면 앱 프로세스까지)이 그 사이 같은 여유를 보고 함께 넘쳤다.
+    # batch 등급 — 창의 INTERACTIVE_HEADROOM 몫은 방문자 턴에 남긴다.
+    held = pacer.reserve(need, priority="batch")
 
     last = None
     for attempt in range(5):
         try:
-            r = client.chat.completions.with_raw_response.create(**kwargs)
-            pacer.update_limit(dict(r.headers))
-            parsed = r.parse()
+            # 상한·서버 쪽 창 사용량은 클라이언트의 응답 훅(groq_transport)이 페이서에 먹인다
+            parsed = client.chat.completions.create(**kwargs)
             used = getattr(getattr(parsed, "usage", None), "total_tokens", None)
-            pacer.record(int(used) if used else need)
+            pacer.commit(held, int(used) if used else need)
             return parsed
         except Exception as e:  # noqa: BLE001
             last = e
             if is_daily_limit(e):
                 print("  · 일일 한도(TPD/RPD) 소진 — 중단합니다")
+                pacer.release(held)
                 raise
             wait = parse_wait_seconds(e) or _FALLBACK_WAITS[min(attempt, len(_FALLBACK_WAITS) - 1)]
             wait = min(wait + 0.5, 90)
             print(f"  · rate limit — {wait:.0f}s 대기 후 재시도 ({attempt + 1}/4)")
             time.sleep(wait)
+    pacer.release(held)             # 429 로만 끝났다 — 서버가 받지 않은 호출이라 창에서 뺀다
     raise last
 
 
@@ -142,18 +146,16 @@ def _graph_fingerprint() -> str:
 
 def fingerprint(resume: str) -> str:
     """캐시 무효화 키 — 모델·프롬프트·이력서 중 하나라도 바뀌면 값이 달라진다."""
-    from prompts import (RAG_ANSWER_PROMPT_TEMPLATE, RAG_GRADE_PROMPT_TEMPLATE,
-                         RAG_GROUNDEDNESS_PROMPT_TEMPLATE, RAG_REWRITE_PROMPT_TEMPLATE)
-    from agent_rag import ANSWER_MAX_TOKENS
+    from agent_rag import prompt_fingerprint
     blob = "|".join([
-        CHAT_MODEL, JUDGE_MODEL, str(CHAT_TEMPERATURE), str(RAG_TEMPERATURE), str(ANSWER_MAX_TOKENS),
+        CHAT_MODEL, JUDGE_MODEL, str(CHAT_TEMPERATURE), str(RAG_TEMPERATURE),
         build_system_prompt("한국어", resume), ROUTER_PROMPT_TEMPLATE,
         # 챗 프롬프트에 질문별 GraphRAG 서브그래프가 들어가므로 **그래프 자체**도
         # 캐시 키다. 이게 빠지면 노드/엣지를 고쳐도 --resume 가 옛 PASS 를 재활용해
         # 회귀 게이트가 거짓 안심을 준다(이 블록이 존재하는 바로 그 이유).
         _graph_fingerprint(),
-        RAG_ANSWER_PROMPT_TEMPLATE, RAG_GRADE_PROMPT_TEMPLATE,
-        RAG_GROUNDEDNESS_PROMPT_TEMPLATE, RAG_REWRITE_PROMPT_TEMPLATE,
+        # RAG 프롬프트·생성 예산·판정 방식·컨텍스트 압축 예산 — 앱의 답변 캐시와 같은 지문이다.
+        prompt_fingerprint(),
         # 라우터 입력의 절반은 df 요약이다 — 포맷이 바뀌면 라우팅 결과도 바뀔 수 있다.
         inspect.getsource(get_df_info),
     ])
@@ -408,78 +410,117 @@ def run_router_evals(client, cases, ckpt=None):
 
 
 # ── Agentic RAG 평가 ────────────────────────────────────────────────
+def _score_rag(case, res):
+    """agentic_answer 결과 1건 → 채점 행."""
+    answer = res["answer"]
+    grounded = (res["grounded"] == "YES")
+    inc_ok, inc_note = check_includes(answer, case.get("must_include_any", []))
+    exc_ok, exc_note = check_excludes(answer, case.get("must_not_include", []))
+
+    # 검색 히트: 기대 vendor가 검색된 청크에 포함됐는가
+    vendors = sorted({c.metadata.get("vendor", "") for c in res["chunks"]})
+    ret_ok, ret_note = True, ""
+    if case.get("expect_vendor"):
+        ret_ok = case["expect_vendor"] in vendors
+        ret_note = f"검색 vendor={vendors}"
+
+    if case["category"] == "refuse":
+        passed = inc_ok and exc_ok and grounded
+    else:  # factual
+        passed = inc_ok and exc_ok and ret_ok and grounded
+
+    # 로컬 검색 게이트(rag_gate)가 내렸을 결정 vs 실제 LLM 판정 — 하니스는 게이트를 켜지
+    # 않으므로 모든 판정이 LLM 이고, 게이트 결정은 shadow 로 나란히 남는다.
+    gate = [{"verdict": s["gate"]["verdict"], "llm": s["gate"]["llm"]} for s in res["trace"]
+            if s["step"] == "grade" and s.get("gate", {}).get("source") == "llm"]
+    # 로컬 근거 점검(rag_grounded)도 같은 방식 — 하니스는 LLM 근거점검을 쓰고 로컬 결과는 옆에 남는다.
+    check = next((s for s in res["trace"] if s["step"] == "self_check"), {})
+    local = check.get("grounding") or {}
+    return {
+        "id": case["id"], "category": case["category"], "q": case["q"],
+        "answer": answer, "inc_ok": inc_ok, "inc_note": inc_note,
+        "exc_ok": exc_ok, "exc_note": exc_note, "ret_ok": ret_ok, "ret_note": ret_note,
+        "grounded": grounded, "rewrote": res["rewrote"], "passed": passed, "gate": gate,
+        "local_grounded": local.get("verdict"), "local_support": local.get("min_support"),
+        "context_tokens_saved": res.get("context_tokens_saved", 0),
+    }
+
+
+# 한 배치로 동시에 돌릴 케이스 수. 배치가 끝날 때마다 체크포인트를 쓴다 — 전부 한 배치로 돌리면
+# 중간에 끊겼을 때 --resume 가 건질 게 없다.
+RAG_BATCH_SIZE = 8
+
+
 def run_rag_evals(secrets, cases, ckpt=None):
     """MLOps 문서 Agentic RAG 평가 — 검색 히트·근거·거절을 검증.
 
     앱 페이지(pages/4)와 동일한 agentic_answer(검색→관련성평가→재작성→생성→근거점검)를
-    그대로 호출하므로 '실제 운영 경로'를 채점한다.
+    그대로 호출하므로 '실제 운영 경로'를 채점한다. 케이스는 agentic_answer_batch 로
+    RAG_BATCH_SIZE 건씩 동시에 돈다 — 1차 검색은 배치 한 번, LLM 콜은 공유 페이서가 TPM 예산에
+    맞춰 흘려보낸다(예전에는 케이스마다 순서대로 돌고 사이사이 SLEEP 을 쉬었다).
     채점: 결정적(키워드 포함/금지) + 검색 vendor 히트 + 근거 자기점검(grounded).
     """
     from langchain_groq import ChatGroq
     from rag_corpus import build_retriever
-    from agent_rag import agentic_answer, ANSWER_MAX_TOKENS
+    from agent_rag import agentic_answer_batch, ANSWER_MAX_TOKENS
 
-    print("  검색기 구축(임베딩)...")
+    print("  검색기 구축(스냅샷 있으면 복원)...")
     retriever = build_retriever(k=5)
+    b = retriever.build_stats
+    print(f"  · 인덱스: {b['source']} ({b['seconds']}s · 재사용 {b['reused']} · 재임베딩 {b['embedded']} 청크)")
     llm = ChatGroq(model=CHAT_MODEL, groq_api_key=secrets["groq_api_key"],
-                   temperature=RAG_TEMPERATURE, reasoning_effort="none", max_tokens=ANSWER_MAX_TOKENS)
+                   temperature=RAG_TEMPERATURE, reasoning_effort="none", max_tokens=ANSWER_MAX_TOKENS,
+                   http_client=http_client())
 
-    results = []
-    for i, case in enumerate(cases, 1):
+    done = {}
+    for case in cases:
         cached = ckpt.get("rag", case["id"]) if ckpt else None
         if cached is not None:
-            results.append(cached)
-            print(f"  [{i:2}/{len(cases)}] {'PASS' if cached['passed'] else 'FAIL'}  {case['id']} (캐시)")
-            continue
-        try:
-            res = agentic_answer(llm, retriever, case["q"], max_retries=1)
-        except Exception as e:  # noqa: BLE001
-            if is_daily_limit(e):
-                # 일일 한도는 기다려도 안 풀린다 → 남은 케이스를 시도해봐야 전부 실패한다.
-                # '시도했으나 실패'로 기록하면 리포트가 품질 실패처럼 보이므로, 아예
-                # 실행하지 않은 것으로 남기고 중단한다(커버리지 표기가 이를 드러낸다).
-                print(f"  · 일일 한도 소진 — 남은 {len(cases) - i + 1}건은 실행하지 않고 중단합니다")
-                break
-            # 한 건의 실패(일시적 레이트리밋·네트워크)가 이미 채점된 케이스까지 날리지 않게
-            # 에러로 기록하고 계속 간다. 리포트에 '실행 실패'로 남아 은폐되지 않는다.
-            print(f"  [{i:2}/{len(cases)}] ERROR {case['id']} — {type(e).__name__}: {str(e)[:120]}")
-            results.append({
-                "id": case["id"], "category": case["category"], "q": case["q"],
-                "answer": "", "inc_ok": False, "inc_note": f"실행 실패: {type(e).__name__}",
-                "exc_ok": True, "exc_note": "", "ret_ok": False, "ret_note": "",
-                "grounded": False, "rewrote": False, "passed": False, "errored": True,
-            })
-            time.sleep(SLEEP)
-            continue
-        answer = res["answer"]
-        grounded = (res["grounded"] == "YES")
-        inc_ok, inc_note = check_includes(answer, case.get("must_include_any", []))
-        exc_ok, exc_note = check_excludes(answer, case.get("must_not_include", []))
-
-        # 검색 히트: 기대 vendor가 검색된 청크에 포함됐는가
-        vendors = sorted({c.metadata.get("vendor", "") for c in res["chunks"]})
-        ret_ok, ret_note = True, ""
-        if case.get("expect_vendor"):
-            ret_ok = case["expect_vendor"] in vendors
-            ret_note = f"검색 vendor={vendors}"
-
-        if case["category"] == "refuse":
-            passed = inc_ok and exc_ok and grounded
-        else:  # factual
-            passed = inc_ok and exc_ok and ret_ok and grounded
+            done[case["id"]] = cached
+    pending = [c for c in cases if c["id"] not in done]
+    if done:
+        print(f"  · 체크포인트에서 {len(done)}건 재사용")
+
+    t0, not_run = time.perf_counter(), 0
+    for start in range(0, len(pending), RAG_BATCH_SIZE):
+        chunk = pending[start:start + RAG_BATCH_SIZE]
+        outs = agentic_answer_batch(llm, retriever, [c["q"] for c in chunk], max_retries=1)
+        for case, res in zip(chunk, outs):
+            if isinstance(res, Exception):
+                if is_daily_limit(res):
+                    # 일일 한도는 기다려도 안 풀린다. '시도했으나 실패'로 기록하면 리포트가 품질
+                    # 실패처럼 보이므로 실행하지 않은 것으로 남긴다(커버리지 표기가 이를 드러낸다).
+                    not_run += 1
+                    continue
+                # 한 건의 실패(일시적 레이트리밋·네트워크)가 이미 채점된 케이스까지 날리지 않게
+                # 에러로 기록하고 계속 간다. 리포트에 '실행 실패'로 남아 은폐되지 않는다.
+                print(f"  ERROR {case['id']} — {type(res).__name__}: {str(res)[:120]}")
+                done[case["id"]] = {
+                    "id": case["id"], "category": case["category"], "q": case["q"],
+                    "answer": "", "inc_ok": False, "inc_note": f"실행 실패: {type(res).__name__}",
+                    "exc_ok": True, "exc_note": "", "ret_ok": False, "ret_note": "",
+                    "grounded": False, "rewrote": False, "passed": False, "errored": True,
+                }
+                continue
+            done[case["id"]] = _score_rag(case, res)
+            if ckpt:
+                ckpt.put("rag", case["id"], done[case["id"]])
+        if not_run:
+            not_run += len(pending) - start - len(chunk)
+            print(f"  · 일일 한도 소진 — {not_run}건은 실행하지 않고 중단합니다")
+            break
+    if pending:
+        print(f"  · {len(pending) - not_run}건 실행 {time.perf_counter() - t0:.0f}s")
 
-        results.append({
-            "id": case["id"], "category": case["category"], "q": case["q"],
-            "answer": answer, "inc_ok": inc_ok, "inc_note": inc_note,
-            "exc_ok": exc_ok, "exc_note": exc_note, "ret_ok": ret_ok, "ret_note": ret_note,
-            "grounded": grounded, "rewrote": res["rewrote"], "passed": passed,
-        })
-        if ckpt:
-            ckpt.put("rag", case["id"], results[-1])
-        mark = "PASS" if passed else "FAIL"
+    results = []
+    for i, case in enumerate(cases, 1):
+        r = done.get(case["id"])
+        if r is None:
+            continue
+        results.append(r)
+        mark = "ERROR" if r.get("errored") else ("PASS" if r["passed"] else "FAIL")
         print(f"  [{i:2}/{len(cases)}] {mark}  {case['id']} ({case['category']})"
-              + ("  ✏️rewrote" if res["rewrote"] else ""))
-        time.sleep(SLEEP)
+              + ("  ✏️rewrote" if r.get("rewrote") else ""))
     return results
 
 
@@ -626,6 +667,23 @@ def write_report(chat_results, router_results, rag_results, use_judge, judge_mod
         lines.append("- 코퍼스: MLOps 파이프라인 공식 문서(Google·AWS·Azure·Vertex) + 온프레 KETI 파이프라인(정제본)")
         lines.append(f"- 경로: agentic_answer(검색→관련성평가→쿼리재작성→생성→근거 자기점검) — 재작성 발동 {rew}/{n}건")
         lines.append("- 채점: 결정적 키워드(포함·금지) + 검색 vendor 히트 + 근거 자기점검(grounded)")
+        gates = [g for r in rag_results for g in r.get("gate", [])]
+        decided = [g for g in gates if g["verdict"] is not None]
+        if gates:
+            agree = sum(g["verdict"] == g["llm"] for g in decided)
+            lines.append(f"- 로컬 검색 게이트(shadow): 관련성 판정 {len(gates)}건 중 {len(decided)}건 결정"
+                         f"({pct(len(decided), len(gates))}) — LLM 판정과 일치 {agree}/{len(decided)}"
+                         f" ({pct(agree, len(decided))}), 나머지는 불확실 구간(LLM 몫)")
+        checked = [r for r in rag_results if r.get("local_grounded")]
+        if checked:
+            same = [r for r in checked if (r["local_grounded"] == "YES") == r["grounded"]]
+            differ = ", ".join(r["id"] for r in checked if r not in same)
+            lines.append(f"- 로컬 근거 점검(shadow): LLM 근거점검과 일치 {len(same)}/{len(checked)}"
+                         f" ({pct(len(same), len(checked))})" + (f" — 불일치: {differ}" if differ else ""))
+        saved = [r["context_tokens_saved"] for r in rag_results if "context_tokens_saved" in r]
+        if saved:
+            lines.append(f"- 컨텍스트 압축: 프롬프트 토큰 {sum(saved):,} 절약 — 턴당 평균 {sum(saved) / len(saved):.0f}"
+                         f" (압축 발동 {sum(1 for v in saved if v)}/{len(saved)}턴)")
         errs = sum(1 for r in rag_results if r.get("errored"))
         if errs:
             lines.append(f"- ⚠ 이 중 {errs}건은 **실행 실패**(레이트리밋·네트워크)로 미채점 — 품질 실패와 구분할 것")
@@ -787,7 +845,8 @@ def main():
     args = ap.parse_args()
 
     secrets = load_secrets()
-    client = Groq(api_key=secrets["groq_api_key"])
+    set_api_key(secrets["groq_api_key"])      # PACER_BACKEND=sqlite 면 앱과 같은 창으로 페이싱
+    client = groq_client(secrets["groq_api_key"])   # 응답 헤더가 모델 페이서에 들어간다
     resume = secrets["resume_text"]
     use_judge = not args.no_judge
 
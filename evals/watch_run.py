@@ -77,10 +77,10 @@ def main():
 
     sys.path.insert(0, str(ROOT / "evals"))
     from run_evals import CHAT_MODEL
-    from groq import Groq
+    from groq_transport import groq_client
 
     secrets = tomllib.load(open(ROOT / ".streamlit" / "secrets.toml", "rb"))
-    client = Groq(api_key=secrets["groq_api_key"])
+    client = groq_client(secrets["groq_api_key"])
 
     target = golden_count("rag") if args.section == "rag" else sum(golden_count(k) for k in GOLDEN)
     cmd = [sys.executable, str(ROOT / "evals" / "run_evals.py"), "--resume"]
@@ -60,7 +60,7 @@ def role_of(path):
         return "eval"
     if base == "jisangfolio_mcp":
         return "mcp"
-    if base in ("rag_corpus", "agent_rag"):
+    if base == "agent_rag" or base.startswith("rag_"):
         return "rag"
     return "core"
 
@@ -0,0 +1,82 @@
+"""
+Groq 클라이언트 공용 HTTP 전송 — 모든 응답의 레이트리밋 헤더를 모델별 페이서에 먹인다.
+
+예전에는 evals/run_evals.call_groq 만 with_raw_response 로 x-ratelimit-limit-tokens 를 읽었다.
+ChatGroq(agent_rag·데이터 분석·문서 페이지), Chat 페이지 스트리밍, MCP ask_jisang 은 헤더를
+버려서 그 페이서들은 DEFAULT_TPM 추정과 로컬 예약만 보고 페이싱했다 — 같은 키를 쓰는 다른
+프로세스(평가·MCP)가 창을 얼마나 썼는지는 429 가 나고서야 알았다.
+
+여기서는 httpx 응답 훅 하나로 SDK 경로와 LangChain 경로를 같이 덮는다. 훅은 **헤더가 도착한
+시점**(본문을 읽기 전)에 불리므로 stream=True 응답도 첫 청크 전에 잡힌다. 모델 이름은 요청
+본문(JSON)에서 읽고, ratelimit.pacer_for(model).observe_headers 가 상한과 서버 쪽 창 사용량
+(x-ratelimit-remaining-tokens/-requests, reset-*)을 받아 다음 예약에 반영한다.
+"""
+import json
+import logging
+import threading
+
+from ratelimit import pacer_for
+
+_log = logging.getLogger(__name__)
+
+_CLIENT = None
+_CLIENT_LOCK = threading.Lock()
+_WARNED = set()             # 헤더 반영이 한 번이라도 실패한 모델 — 경고는 모델마다 한 번
+_WARNED_LOCK = threading.Lock()
+
+
+def _model_of(request):
+    """요청 본문의 "model" — JSON 이 아니거나(파일 업로드 등) 본문이 스트림이면 None."""
+    try:
+        body = json.loads(request.content or b"{}")
+    except (ValueError, UnicodeDecodeError, RuntimeError):   # RuntimeError: 아직 안 읽은 스트림 본문
+        return None
+    return body.get("model") if isinstance(body, dict) else None
+
+
+def observe_response(response):
+    """httpx 응답 훅 — 레이트리밋 헤더가 있으면 그 요청 모델의 페이서에 알린다.
+
+    429 응답도 헤더를 싣고 오므로 그대로 먹인다(remaining 0 → reset 까지 창이 찬 것으로 본다).
+    훅 안의 예외는 호출 자체를 깨뜨리므로 응답은 살리되, 페이서가 헤더를 못 받는 모델은 모델마다
+    한 번 경고로 남긴다 — 조용히 넘기면 그 모델만 추정 상한으로 페이싱되는 걸 429 가 나기 전엔 모른다.
+    """
+    headers = response.headers
+    if not any(k.startswith("x-ratelimit-") for k in headers.keys()):
+        return
+    model = _model_of(response.request)
+    if not model:
+        return
+    try:
+        pacer_for(model).observe_headers(headers)
+    except Exception:  # noqa: BLE001 — 페이싱 힌트일 뿐, 응답은 살린다
+        with _WARNED_LOCK:
+            first = model not in _WARNED
+            _WARNED.add(model)
+        if first:
+            _log.warning("레이트리밋 헤더를 %s 페이서에 반영하지 못했습니다 — 추정 상한으로 페이싱합니다",
+                         model, exc_info=True)
+
+
+def http_client():
+    """프로세스에 하나인 httpx.Client(응답 훅 장착). Groq(http_client=...)·ChatGroq(http_client=...) 에 넘긴다.
+
+    groq 가 있으면 SDK 기본값(타임아웃·연결 한도)을 그대로 쓰는 DefaultHttpxClient, 없으면 httpx.Client.
+    연결 풀도 같이 나눠 쓰므로 페이지마다 클라이언트를 새로 만들어도 TLS 연결을 다시 맺지 않는다.
+    """
+    global _CLIENT
+    with _CLIENT_LOCK:
+        if _CLIENT is None:
+            try:
+                from groq import DefaultHttpxClient as _Client
+            except ImportError:
+                from httpx import Client as _Client
+            _CLIENT = _Client(event_hooks={"response": [observe_response]})
+        return _CLIENT
+
+
+def groq_client(api_key: str):
+    """헤더를 페이서에 먹이는 groq.Groq — 원본 SDK 경로(Chat 페이지·MCP·평가 하니스)용."""
+    from groq import Groq
+
+    return Groq(api_key=api_key, http_client=http_client())
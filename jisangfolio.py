@@ -6,6 +6,7 @@ import streamlit.components.v1 as components
 import os
 from ui import apply_style
 import profile_graph
+import rag_warmup
 
 st.set_page_config(
     page_title="JisangFolio",
@@ -13,6 +14,9 @@ st.set_page_config(
     layout="centered"
 )
 apply_style()
+# MLOps Docs 검색기를 백그라운드에서 미리 데운다(opt-in: RAG_WARMUP=1). 프로세스당 한 번만 뜨고
+# 렌더를 막지 않는다 — 무거운 import 는 스레드 안에서 일어난다.
+rag_warmup.start()
 
 # OG 메타태그를 st.markdown 으로 주입하던 코드가 여기 있었다 — 제거했다.
 #
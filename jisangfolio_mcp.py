@@ -203,7 +203,9 @@ def ask_jisang(question: str) -> str:
     """Ask Jisang anything — Groq + Qwen3 27B answers in the first person.
     Requires the GROQ_API_KEY environment variable."""
     import os
-    from groq import Groq
+    import time
+    from groq_transport import groq_client
+    from ratelimit import estimate_tokens, pacer_for, parse_wait_seconds
 
     api_key = os.environ.get("GROQ_API_KEY")
     if not api_key:
@@ -223,16 +225,34 @@ Answer the question in the first person, based on the [Résumé] below.
 [Résumé]
 {resume_context}"""
 
-    client = Groq(api_key=api_key)
-    response = client.chat.completions.create(
-        model="qwen/qwen3.6-27b",
-        messages=[
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": question},
-        ],
-        max_tokens=800,
-        reasoning_effort="none",  # thinking off → faster
-    )
+    # 앱·평가와 같은 키면 같은 분당 한도를 나눠 쓴다. 응답 헤더가 서버 쪽 창 사용량을 페이서에
+    # 알려 주므로, 예약은 mcp 등급으로 그 창 기준에서 선다(방문자 답변보다 뒤, 배치보다 앞).
+    pacer = pacer_for("qwen/qwen3.6-27b")
+    try:
+        held = pacer.reserve(estimate_tokens(system_prompt + question) + 800,
+                             deadline=time.monotonic() + 30, priority="mcp")
+    except TimeoutError as e:
+        # 30초 안에 창이 안 빈다 — 도구 오류 대신 언제 다시 물으면 되는지 돌려준다.
+        # 대기 끝에 포기했으면 남은 시간을 모른다 — 창 길이(60초)로 답한다.
+        wait = parse_wait_seconds(e) or 60
+        return (f"Rate limited — the shared Groq token window is full right now. "
+                f"Please retry in about {int(wait + 0.999)} s.")
+    client = groq_client(api_key)
+    try:
+        response = client.chat.completions.create(
+            model="qwen/qwen3.6-27b",
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": question},
+            ],
+            max_tokens=800,
+            reasoning_effort="none",  # thinking off → faster
+        )
+    except BaseException:
+        pacer.release(held)
+        raise
+    used = getattr(getattr(response, "usage", None), "total_tokens", None)
+    pacer.commit(held, int(used) if used else held[1])
     content = response.choices[0].message.content or ""
     # 후처리는 prompts.clean_response 하나만 쓴다. 예전엔 여기서 </think> 를 직접 잘랐고,
     # 그 사본이 두 경우에 앱과 다르게 굴었다:
@@ -6,6 +6,7 @@
 외부 SaaS(Langfuse·Arize Phoenix) 대신, 온프레미스/무외부의존 철학에 맞춰 인앱으로 구현.
 컨테이너 수명 동안 공유되는 스토어(@st.cache_resource)에 쌓고 Observability 페이지에서 시각화한다.
 """
+import threading
 import time
 
 
@@ -49,9 +50,13 @@ def summarize_guard(traces):
 
 
 def log_trace(page: str, model: str, route: str, latency_ms: int,
-              guard: str = None, nodes=None, ok: bool = True, ts: float = None):
+              guard: str = None, nodes=None, ok: bool = True, ts: float = None,
+              ttft_ms: int = None):
     """한 턴을 트레이스로 기록한다.
 
+    ttft_ms: 답의 첫 토큰이 화면에 나오기까지(스트리밍 경로만). 안 잰 턴은 None 으로 둔다 —
+    0 으로 채우면 대시보드 중앙값이 거짓으로 내려간다.
+
     guard 기본값은 None이다 — "ok"를 기본으로 두면 **가드레일을 아예 돌지 않은 경로**까지
     대시보드에 '통과'로 찍힌다. 측정 안 한 것은 측정 안 했다고 보여주는 게 이 모듈의 원칙
     (docstring 첫 문단 참조)이라, 호출부가 실제 판정을 넘기지 않으면 미측정으로 남긴다.
@@ -66,6 +71,7 @@ def log_trace(page: str, model: str, route: str, latency_ms: int,
         "guard": guard,          # None = 미측정 (UI에서 "—"로 렌더)
         "nodes": nodes or [],
         "ok": ok,
+        "ttft_ms": int(ttft_ms) if ttft_ms is not None else None,
     })
     if len(traces) > 500:            # 상한 (메모리 보호)
         del traces[: len(traces) - 500]
@@ -79,6 +85,108 @@ def clear_traces():
     _store()["traces"].clear()
 
 
+# ── 단계별 지연 추정 ──────────────────────────────────────────────
+# agent_rag 가 턴 예산(APP_TURN_BUDGET_S) 안에서 선택 단계(판정·재작성·근거점검)를 부를지
+# 정할 때 쓴다. 트레이스 스토어와 달리 streamlit 없이 동작해야 해서(평가 하니스·CI) 프로세스
+# 전역 dict 에 둔다 — QUERY_CACHE 와 같은 수명이다.
+# 사전값: 측정이 쌓이기 전(컨테이너 첫 턴)의 추정. 무료 티어 Groq 왕복을 넉넉히 잡은 값이다 —
+# 작게 잡으면 첫 턴이 생성 몫까지 판정에 써 버린다.
+STEP_LATENCY_PRIOR_MS = {"retrieve": 400, "grade": 1500, "rewrite": 1200,
+                         "generate": 5000, "self_check": 1500}
+# 지수이동평균 가중치 — 최근 턴을 더 믿는다(레이트리밋 구간에 들어가면 빨리 따라간다).
+LATENCY_EWMA_ALPHA = 0.3
+
+_LATENCY = {}
+_LATENCY_LOCK = threading.Lock()
+
+
+def record_step_latency(step: str, ms: float):
+    """단계 하나가 끝난 시간을 추정치에 반영한다(첫 측정은 사전값이 아니라 측정값으로 시작)."""
+    with _LATENCY_LOCK:
+        cur = _LATENCY.get(step)
+        if cur is None:
+            _LATENCY[step] = {"ewma_ms": float(ms), "n": 1, "last_ms": float(ms)}
+        else:
+            cur["ewma_ms"] += LATENCY_EWMA_ALPHA * (float(ms) - cur["ewma_ms"])
+            cur["n"] += 1
+            cur["last_ms"] = float(ms)
+
+
+def step_latency_ms(step: str) -> float:
+    """단계의 예상 지연(ms). 측정이 없으면 사전값, 사전값도 없으면 0."""
+    with _LATENCY_LOCK:
+        cur = _LATENCY.get(step)
+        return cur["ewma_ms"] if cur else float(STEP_LATENCY_PRIOR_MS.get(step, 0))
+
+
+def step_latency_stats() -> dict:
+    """{단계: {ewma_ms, n, last_ms}} — 측정된 단계만. 대시보드용 사본."""
+    with _LATENCY_LOCK:
+        return {k: dict(v) for k, v in _LATENCY.items()}
+
+
+def reset_step_latency():
+    with _LATENCY_LOCK:
+        _LATENCY.clear()
+
+
+# ── LLM 호출 오버헤드 ─────────────────────────────────────────────
+# agent_rag._ask 가 호출마다 프레임워크 오버헤드(프롬프트 렌더·모델 바인딩·후처리)와 네트워크
+# 시간(invoke)을 나눠 기록한다. 오버헤드가 네트워크의 몇 % 인지 보려는 것이라 합계만 든다.
+_LLM_CALLS = {"n": 0, "overhead_ms": 0.0, "network_ms": 0.0}
+
+
+def record_llm_call(overhead_ms: float, network_ms: float):
+    with _LATENCY_LOCK:
+        _LLM_CALLS["n"] += 1
+        _LLM_CALLS["overhead_ms"] += float(overhead_ms)
+        _LLM_CALLS["network_ms"] += float(network_ms)
+
+
+def llm_call_stats() -> dict:
+    """{n, overhead_ms_avg, network_ms_avg} — 호출이 없으면 평균은 None."""
+    with _LATENCY_LOCK:
+        n = _LLM_CALLS["n"]
+        return {"n": n,
+                "overhead_ms_avg": round(_LLM_CALLS["overhead_ms"] / n, 3) if n else None,
+                "network_ms_avg": round(_LLM_CALLS["network_ms"] / n, 1) if n else None}
+
+
+# ── 페이서 입장 대기 ──────────────────────────────────────────────
+# ratelimit 의 우선순위 입장 줄이 등급(answer·check·mcp·batch)별로 기록한다 — 지금 줄 선 호출 수와
+# 들어가기까지 기다린 시간. 방문자 등급의 대기가 길면 배치가 창을 너무 많이 쓰고 있다는 뜻이다.
+_ADMISSION = {}
+
+
+def _admission_row(cls):
+    return _ADMISSION.setdefault(cls, {"queued": 0, "peak_queued": 0, "granted": 0,
+                                       "wait_ms_total": 0.0, "wait_ms_max": 0.0})
+
+
+def record_admission_queued(cls: str, delta: int):
+    with _LATENCY_LOCK:
+        row = _admission_row(cls)
+        row["queued"] += delta
+        row["peak_queued"] = max(row["peak_queued"], row["queued"])
+
+
+def record_admission_wait(cls: str, wait_ms: float):
+    with _LATENCY_LOCK:
+        row = _admission_row(cls)
+        row["granted"] += 1
+        row["wait_ms_total"] += float(wait_ms)
+        row["wait_ms_max"] = max(row["wait_ms_max"], float(wait_ms))
+
+
+def admission_stats() -> dict:
+    """{등급: {queued, peak_queued, granted, wait_ms_avg, wait_ms_max}}"""
+    with _LATENCY_LOCK:
+        return {cls: {"queued": r["queued"], "peak_queued": r["peak_queued"], "granted": r["granted"],
+                      "wait_ms_avg": round(r["wait_ms_total"] / r["granted"], 1) if r["granted"] else None,
+                      "wait_ms_max": round(r["wait_ms_max"], 1)}
+                for cls, r in _ADMISSION.items()}
+
+
 class timer:
     """with timer() as t: ...  → t.ms 로 경과 밀리초."""
     def __enter__(self):
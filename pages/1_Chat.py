@@ -1,11 +1,11 @@
 import streamlit as st
-from groq import Groq
 from datetime import datetime, timezone, timedelta
 from prompts import build_chat_system_prompt
 from ui import apply_style, friendly_llm_error, replayable_history, stream_answer
 import time
 from guardrails import check_input, blocked_message
-from ratelimit import quota_message, session_quota_exceeded
+from ratelimit import quota_message, session_quota_exceeded, set_api_key
+from groq_transport import groq_client
 from observability import log_trace
 from sheetlog import log_conversation
 from notify import notify_new_session
@@ -23,7 +23,9 @@ except KeyError:
     st.error("⚠️ Secrets(API 키 또는 이력서 텍스트)가 설정되지 않았습니다.")
     st.stop()
 
-client = Groq(api_key=groq_api_key)
+set_api_key(groq_api_key)
+# 스트리밍 응답의 레이트리밋 헤더도 모델 페이서에 들어간다 — RAG 페이지가 같은 창을 본다
+client = groq_client(groq_api_key)
 
 # 시스템 프롬프트는 prompts.py(SSOT)에서 조립 — 평가 하니스(evals/)와 동일 소스 공유
 
@@ -1,5 +1,4 @@
 import os
-import re
 import time
 import streamlit as st
 import pandas as pd
@@ -13,7 +12,11 @@ from guardrails import check_input, blocked_message
 from ui import apply_style, friendly_llm_error, stream_answer, REPLAYABLE_ROLES
 from observability import log_trace
 from codeguard import run_generated_code
-# Heavy torch/faiss deps (FAISS · HuggingFaceEmbeddings) are imported lazily,
+from groq_transport import http_client
+from ratelimit import set_api_key
+# 하이브리드 검색기(FAISS + BM25, RRF)는 MLOps 문서 RAG 와 같은 구현을 공유한다.
+from rag_corpus import HybridRetriever, bm25_index, dense_index
+# Heavy torch/faiss deps (FAISS · the embedding backend in rag_embed) are imported lazily,
 # only when embedding is actually needed — keeps first render light.
 
 st.set_page_config(page_title="JisangFolio · Data Analysis", page_icon="📂")
@@ -24,6 +27,7 @@ try:
 except KeyError:
     st.error("⚠️ groq_api_key is not set in Secrets.")
     st.stop()
+set_api_key(groq_api_key)
 
 GROQ_MODEL = "qwen/qwen3.6-27b"
 SAMPLE_PATH = os.path.join(os.path.dirname(__file__), "..", "assets", "tebo_sample.xlsx")
@@ -55,38 +59,6 @@ with st.sidebar:
     st.caption("This analysis runs on AI-generated code. If the numbers matter, double-check against the source data :)")
 
 
-def _tok(s):
-    return re.findall(r"[a-z0-9가-힣]+", (s or "").lower())
-
-
-def _rrf(ranklists, k=5, c=60):
-    """Reciprocal Rank Fusion — fuse multiple ranked doc lists into one."""
-    scores, docmap = {}, {}
-    for docs in ranklists:
-        for rank, d in enumerate(docs):
-            key = d.page_content
-            scores[key] = scores.get(key, 0.0) + 1.0 / (c + rank + 1)
-            docmap[key] = d
-    top = sorted(scores, key=scores.get, reverse=True)[:k]
-    return [docmap[key] for key in top]
-
-
-class HybridRetriever:
-    """Hybrid retrieval: dense (FAISS) + sparse (BM25), fused with RRF.
-    Same .invoke(query) interface as a LangChain retriever."""
-
-    def __init__(self, vectorstore, splits, bm25, k=5):
-        self.vs, self.splits, self.bm25, self.k = vectorstore, splits, bm25, k
-
-    def invoke(self, query, k=None):
-        k = k or self.k
-        dense = self.vs.similarity_search(query, k=k * 3)
-        scores = self.bm25.get_scores(_tok(query))
-        order = sorted(range(len(scores)), key=lambda i: scores[i], reverse=True)[:k * 3]
-        sparse = [self.splits[i] for i in order]
-        return _rrf([dense, sparse], k=k)
-
-
 # --- File processing ---
 # 임베딩할 최대 행 수. 상한이 없던 시절엔 행 수에 비례해 임베딩이 돌았고, 그 작업이
 # @st.cache_resource 아래(=모든 방문자가 공유하는 프로세스)에서 실행됐다. 즉 방문자
@@ -99,8 +71,7 @@ MAX_INDEX_ROWS = 2000
 @st.cache_resource(show_spinner="Analyzing the uploaded file...", max_entries=3, ttl=1800)
 def build_vectorstore(file_bytes: bytes, file_name: str):
     import io
-    from langchain_community.vectorstores import FAISS
-    from langchain_community.embeddings import HuggingFaceEmbeddings
+    from rag_embed import embedding_service
     try:
         if file_name.endswith(".csv"):
             try:
@@ -141,19 +112,17 @@ def build_vectorstore(file_bytes: bytes, file_name: str):
         st.error("❌ Could not process the data.")
         return None, None
 
-    embedding = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
+    # 프로세스 공유 임베딩 서비스 — MLOps 문서 인덱스와 같은 모델 객체를 쓴다(가중치 1벌).
+    embedding = embedding_service()
     progress_bar = st.progress(0, text="Building embeddings...")
-    vectorstore = None
+    vectors = []
     batch_size = 10
 
     for i in range(0, len(splits), batch_size):
-        batch = splits[i : i + batch_size]
+        batch = [d.page_content for d in splits[i : i + batch_size]]
         for attempt in range(4):
             try:
-                if vectorstore is None:
-                    vectorstore = FAISS.from_documents(batch, embedding=embedding)
-                else:
-                    vectorstore.add_documents(batch)
+                vectors += embedding.embed_documents(batch)
                 break
             except Exception as e:
                 if attempt == 3:
@@ -165,6 +134,9 @@ def build_vectorstore(file_bytes: bytes, file_name: str):
         progress_bar.progress(percent, text=f"Building embeddings... ({int(percent * 100)}%)")
 
     progress_bar.empty()
+    # 벡터 행 i = splits[i]. 청크 본문·메타데이터는 HybridRetriever 의 열 방향 저장소(rag_store)가
+    # 들고, FAISS 래퍼에는 Document 를 싣지 않는다 — 2,000행 상한에서 청크가 메모리에 두 벌 남지 않게.
+    vectorstore = dense_index(embedding, vectors)
     st.sidebar.success(f"✅ Indexed records: {vectorstore.index.ntotal}")
     if truncated:
         st.info(
@@ -173,8 +145,7 @@ def build_vectorstore(file_bytes: bytes, file_name: str):
             "only keyword/semantic search is capped, to keep this shared free-tier demo responsive."
         )
 
-    from rank_bm25 import BM25Okapi
-    bm25 = BM25Okapi([_tok(d.page_content) for d in splits])
+    bm25 = bm25_index(splits)
     k = max(1, min(10, vectorstore.index.ntotal // 5))
     # Hybrid: dense (FAISS) + sparse (BM25) fused with RRF
     return df, HybridRetriever(vectorstore, splits, bm25, k=k)
@@ -298,11 +269,11 @@ for msg in st.session_state["data_messages"]:
 # reasoning_effort="none": 아래 router_llm 이 같은 이유로 이미 끄고 있었는데 이쪽만 빠져 있었다.
 # 코드 생성 경로에서 사고가 켜져 있으면 <think> 가 응답을 채우고, 길면 닫히지도 못한 채 잘린다.
 llm = ChatGroq(model=GROQ_MODEL, groq_api_key=groq_api_key, temperature=0,
-               reasoning_effort="none")
+               reasoning_effort="none", http_client=http_client())
 # 라우팅 전용 핸들 — 한 단어만 내면 되므로 추론을 끈다(사고 텍스트가 파싱을 오염시키던
 # 문제 제거 + 지연 감소). 평가 하니스 classify()와 동일 설정이라 측정값이 앱을 대변한다.
 router_llm = ChatGroq(model=GROQ_MODEL, groq_api_key=groq_api_key, temperature=0,
-                      reasoning_effort="none", max_tokens=200)
+                      reasoning_effort="none", max_tokens=200, http_client=http_client())
 user_input = st.chat_input("Ask anything about this data")
 if not user_input and st.session_state["data_pending"]:
     user_input = st.session_state["data_pending"]
@@ -2,7 +2,13 @@ import streamlit as st
 import pandas as pd
 from datetime import datetime, timezone, timedelta
 from ui import apply_style
-from observability import get_traces, clear_traces, summarize_guard
+from observability import (admission_stats, get_traces, clear_traces, llm_call_stats, step_latency_stats,
+                           summarize_guard)
+from rag_answer_cache import ANSWER_CACHE
+from rag_corpus import QUERY_CACHE
+from rag_embed import service_stats
+from ratelimit import PRIORITY_CLASSES
+import rag_warmup
 
 _KST = timezone(timedelta(hours=9))  # 표시용 한국 표준시(서버 UTC 무관하게 고정)
 
@@ -55,6 +61,12 @@ c4.metric("Guardrail blocks", _blocked,
           delta=f"{_unmeasured} not measured" if _unmeasured else None,
           delta_color="off")
 
+# 스트리밍 경로(MLOps Docs)만 첫 토큰 시간을 잰다. 안 잰 턴은 빼고 본다 — 0 으로 치면 중앙값이 거짓이 된다.
+_ttft = df["ttft_ms"].dropna() if "ttft_ms" in df else pd.Series(dtype=float)
+if len(_ttft):
+    st.caption(f"Time to first answer token (streamed turns, n={len(_ttft)}): "
+               f"p50 {int(_ttft.median())} ms · p95 {int(_ttft.quantile(0.95))} ms")
+
 st.divider()
 
 col_a, col_b = st.columns(2)
@@ -71,3 +83,66 @@ df["guard"] = df["guard"].fillna("—").replace({"": "—"})
 show = df[["time", "page", "route", "model", "latency_ms", "guard", "nodes_str"]].iloc[::-1].head(50)
 show = show.rename(columns={"time": "time (KST)", "latency_ms": "latency(ms)", "nodes_str": "graph nodes"})
 st.dataframe(show, use_container_width=True, hide_index=True)
+
+# 에이전트 단계별 지연 이동평균 — MLOps Docs 가 턴 예산 안에서 어떤 단계를 부를지 이 값으로 정한다.
+_lat = step_latency_stats()
+if _lat:
+    st.caption("Agent step latency (EWMA, drives turn-budget planning): "
+               + " · ".join(f"{k} {int(v['ewma_ms'])} ms (n={v['n']})" for k, v in _lat.items()))
+_calls = llm_call_stats()
+if _calls["n"]:
+    st.caption(f"LLM call overhead (prompt render · model binding · post-processing): "
+               f"{_calls['overhead_ms_avg']:.2f} ms/call vs network {_calls['network_ms_avg']:.0f} ms/call "
+               f"(n={_calls['n']})")
+# 페이서 입장 줄 — 등급 순서(answer → check → mcp → batch)대로 창에 들어간다
+_adm = admission_stats()
+if _adm:
+    st.caption("Pacer admission by priority: " + " · ".join(
+        f"{cls} {r['granted']} granted, avg wait {r['wait_ms_avg'] or 0:.0f} ms (max {r['wait_ms_max']:.0f}), "
+        f"{r['queued']} queued" for cls, r in sorted(_adm.items(), key=lambda kv: PRIORITY_CLASSES.index(kv[0]))))
+
+st.subheader("Retrieval")
+# 질의 임베딩 캐시는 프로세스 전역이라(두 검색기·모든 세션 공유) 트레이스와 달리 재시작 전까지 누적된다.
+_qc = QUERY_CACHE.stats()
+r1, r2, r3 = st.columns(3)
+r1.metric("Query-embedding cache hit rate", f"{_qc['hit_rate']:.0%}")
+r2.metric("Hits / misses", f"{_qc['hits']} / {_qc['misses']}")
+r3.metric("Cached queries", f"{_qc['size']} / {_qc['maxsize']}")
+
+# MLOps Docs 답변 캐시 — 적중 턴은 LLM 콜이 0이다. 아낀 토큰은 저장 당시 그 턴이 쓴 양의 합.
+_ac = ANSWER_CACHE.stats()
+a1, a2, a3 = st.columns(3)
+a1.metric("Answer cache hit rate", f"{_ac['hit_rate']:.0%}",
+          delta=f"{_ac['hits']} / {_ac['hits'] + _ac['misses']} turns", delta_color="off")
+a2.metric("Tokens saved", f"{_ac['tokens_saved']:,}")
+a3.metric("Cached answers", f"{_ac['size']} / {_ac['maxsize']}",
+          delta=f"{_ac['invalidations']} invalidations" if _ac["invalidations"] else None, delta_color="off")
+
+# 임베딩 모델은 프로세스에 (백엔드, 모델)당 한 벌 — 두 페이지·평가 하니스가 공유한다(rag_embed).
+# RSS 증가분은 로드 순간의 프로세스 전체 변화라 동시에 다른 일이 있었으면 섞인다 — 가중치
+# 크기와 같이 본다.
+_svcs = service_stats()
+if not _svcs:
+    st.caption("Embedding model not loaded yet — it loads on the first index build in this process.")
+for _s in _svcs:
+    st.caption(f"Embedding service · `{_s['model']}` ({_s['backend']}) · loaded in {_s['load_s']}s")
+    e1, e2, e3, e4 = st.columns(4)
+    e1.metric("Weights", f"{_s['weights_mb']} MB" if _s["weights_mb"] is not None else "—")
+    e2.metric("RSS at load", f"+{_s['rss_delta_mb']} MB" if _s["rss_delta_mb"] is not None else "—")
+    e3.metric("Documents embedded", f"{_s['docs']:,}", delta=f"{_s['doc_calls']} calls", delta_color="off")
+    e4.metric("Query embeddings", f"{_s['query_calls']:,}", delta=f"{_s['embed_s']}s total", delta_color="off")
+
+# 백그라운드 예열(rag_warmup). 단계별 시간은 '첫 방문자가 안 기다려도 된 시간'의 내역이다.
+_w = rag_warmup.status()
+if _w["status"] == "idle":
+    st.caption("Retriever warm-up is off — set RAG_WARMUP=1 to pre-build the MLOps docs index on first load.")
+else:
+    _src = f" · index {_w['source']}" if _w["source"] else ""
+    st.caption(f"Retriever warm-up · **{_w['status']}**{_src}"
+               + (f" · {_w['total_s']}s total" if "total_s" in _w else ""))
+    if _w["steps"]:
+        w_cols = st.columns(len(_w["steps"]))
+        for _c, (_name, _sec) in zip(w_cols, _w["steps"].items()):
+            _c.metric(_name.replace("_", " ").capitalize(), f"{_sec}s")
+    if _w["error"]:
+        st.caption(f"Warm-up failed — the first visitor builds the index instead: `{_w['error']}`")
@@ -13,9 +13,13 @@ from langchain_groq import ChatGroq
 
 from guardrails import check_input, blocked_message
 from observability import log_trace, timer
+from ratelimit import set_api_key
+from groq_transport import http_client
 from rag_corpus import build_retriever, source_lines
-from agent_rag import ANSWER_MAX_TOKENS, APP_TURN_BUDGET_S, agentic_answer
-from ui import apply_style, friendly_llm_error
+import rag_answer_cache
+import rag_warmup
+from agent_rag import ANSWER_MAX_TOKENS, APP_TURN_BUDGET_S, agentic_stream
+from ui import apply_style, friendly_llm_error, stream_answer
 
 st.set_page_config(page_title="JisangFolio · MLOps Docs", page_icon="📚")
 apply_style()
@@ -25,6 +29,7 @@ try:
 except KeyError:
     st.error("⚠️ groq_api_key is not set in Secrets.")
     st.stop()
+set_api_key(groq_api_key)
 
 GROQ_MODEL = "qwen/qwen3.6-27b"
 
@@ -36,10 +41,13 @@ SAMPLE_QUESTIONS = [
 ]
 
 
-# 코퍼스 검색기는 컨테이너 수명 동안 한 번만 구축(임베딩)하고 공유
-@st.cache_resource(show_spinner="Indexing MLOps docs (embedding)...")
+# 코퍼스 검색기는 컨테이너 수명 동안 한 번만 구축하고 공유. 디스크 스냅샷(rag_index/)이
+# 키와 맞으면 임베딩 없이 복원된다(rag_corpus.build_retriever). 홈에서 백그라운드 예열
+# (rag_warmup, RAG_WARMUP=1)이 돌았으면 그 결과를 쓰고, 아직 도는 중이면 끝나길 기다린다.
+@st.cache_resource(show_spinner="Loading the MLOps docs index...")
 def get_retriever():
-    return build_retriever(k=5)
+    warmed = rag_warmup.retriever()
+    return warmed if warmed is not None else build_retriever(k=rag_warmup.DOCS_RETRIEVER_K)
 
 
 # --- Sidebar ---
@@ -84,7 +92,7 @@ for msg in st.session_state["rag_messages"]:
 # 문서 RAG는 검색된 근거로 바로 답하면 되므로 사고가 불필요하고, 켜두면 토큰을
 # 사고에 다 써(2048 cap) 답이 잘리는 문제가 있었다 → 끄니 빠르고·안 잘리고·인용 정확.
 llm = ChatGroq(model=GROQ_MODEL, groq_api_key=groq_api_key, temperature=0,
-               reasoning_effort="none", max_tokens=ANSWER_MAX_TOKENS)
+               reasoning_effort="none", max_tokens=ANSWER_MAX_TOKENS, http_client=http_client())
 
 user_input = st.chat_input("Ask about MLOps pipelines...")
 if not user_input and st.session_state["rag_pending"]:
@@ -117,31 +125,73 @@ if user_input:
             # turn_budget_s 를 넘기는 이유: 재시도 백오프는 호출당 최대 90초까지 자고
             # 한 턴에 3~4콜이 있어, 상한이 없으면 방문자가 몇 분간 멈춘 화면을 본다.
             # 무인 실행(평가 하니스)은 이 인자를 안 넘겨 끈기 있는 백오프를 유지한다.
-            result = None
+            # 스트리밍: 단계는 끝나는 대로 상태 박스에, 답은 토큰 단위로 흘린다. 방문자는 판정
+            # 1콜 뒤 곧바로 답을 읽기 시작하고, 근거점검 배지는 답 아래에 나중에 붙는다.
+            _icon = {"cache": "♻️", "retrieve": "🔎", "grade": "⚖️", "speculate": "⚡", "rewrite": "✏️",
+                     "generate": "💬", "self_check": "✅"}
+            result, err, ttft_ms = None, None, None
+            status = st.status("🔁 Agent: retrieve → grade → (rewrite) → answer → self-check...")
+            answer_slot = st.empty()
+
+            def _show_step(s):
+                status.markdown(f"{_icon.get(s['step'], '•')} **{s['step']}** — {s['detail']}")
+
+            def _tokens(first, events):
+                """첫 token 이벤트부터 generate 단계 전까지의 청크 — stream_answer 가 소비한다."""
+                yield first["chunk"]
+                for ev in events:
+                    if ev["event"] != "token":
+                        _show_step(ev["step"])
+                        return
+                    yield ev["chunk"]
+
+            t0 = time.perf_counter()
             with timer() as t:
-                with st.spinner("🔁 Agent: retrieve → grade → (rewrite) → answer → self-check..."):
-                    try:
-                        result = agentic_answer(llm, retriever, user_input, max_retries=1,
-                                                turn_budget_s=APP_TURN_BUDGET_S)
-                    except Exception as e:                     # noqa: BLE001
-                        result = None
-                        err = e
+                try:
+                    # 샘플 질문·그 말바꿈은 답변 캐시에서 바로 나온다(token 이벤트 없이 done 으로)
+                    events = agentic_stream(llm, retriever, user_input, max_retries=1,
+                                            turn_budget_s=APP_TURN_BUDGET_S,
+                                            answer_cache=rag_answer_cache.shared())
+                    for ev in events:
+                        if ev["event"] == "step":
+                            _show_step(ev["step"])
+                        elif ev["event"] == "token":
+                            ttft_ms = (time.perf_counter() - t0) * 1000
+                            status.update(label="💬 Answering — self-check follows...")
+                            stream_answer(_tokens(ev, events),
+                                          render=lambda text: answer_slot.markdown(text + "▌"))
+                        elif ev["event"] == "done":
+                            result = ev["result"]
+                except Exception as e:                     # noqa: BLE001
+                    result = None
+                    err = e
 
             if result is None:
                 # 이 페이지만 자체 오류 문구를 갖고 있었고, 그것도 UI 가 영어인데 한국어였다.
                 # 영어권 방문자가 429 를 만나면 한국어 안내를 봤다 → 공용 헬퍼로 통일.
+                # 답이 흐르다 끊겼으면 그 부분 답은 지운다 — 근거점검을 못 거친 반쪽 답이다.
+                answer_slot.empty()
+                status.update(label="🔁 Agent stopped", state="error")
                 msg = friendly_llm_error(err)
                 st.warning(msg)
                 st.caption("Retrieval succeeded — the failure was in the model call.")
                 st.session_state["rag_messages"].append(ChatMessage(role="assistant", content=msg))
                 log_trace(page="rag_docs", route="agentic_rag", model=GROQ_MODEL,
-                          latency_ms=t.ms, guard="ok", nodes=["llm_error"], ok=False)
+                          latency_ms=t.ms, guard="ok", nodes=["llm_error"], ok=False, ttft_ms=ttft_ms)
                 st.stop()
 
             answer = result["answer"]
             chunks = result["chunks"]
 
-            st.markdown(answer)
+            answer_slot.markdown(answer)
+            cached = result["trace"][0]["step"] == "cache"
+            status.update(label="🔁 Agent steps" + (" · answered from cache" if cached else "")
+                          + (" · rewrote the query & retried" if result["rewrote"] else ""),
+                          state="complete", expanded=False)
+
+            # 턴 예산(레이트리밋 대기)에 쫓겨 건너뛴 단계 — 답은 나왔지만 덜 점검됐다는 걸 숨기지 않는다
+            if result.get("skipped"):
+                st.caption("⏱ Skipped to stay within the time budget: " + ", ".join(result["skipped"]))
 
             # 근거 자기점검 배지 (faithfulness)
             if result["grounded"] == "YES":
@@ -149,14 +199,6 @@ if user_input:
             else:
                 st.caption("⚠️ Self-check: answer may contain unsupported claims")
 
-            # 🔁 단계 트레이스 — 자기교정 루프(판단·재시도)를 눈에 보이게
-            _icon = {"retrieve": "🔎", "grade": "⚖️", "rewrite": "✏️",
-                     "generate": "💬", "self_check": "✅"}
-            title = "🔁 Agent steps" + (" · rewrote the query & retried" if result["rewrote"] else "")
-            with st.expander(title):
-                for s in result["trace"]:
-                    st.markdown(f"{_icon.get(s['step'], '•')} **{s['step']}** — {s['detail']}")
-
             # 📎 출처 (검색된 청크 = 인용 번호와 대응)
             with st.expander(f"📎 Sources ({len(chunks)} retrieved)"):
                 for s in source_lines(chunks):
@@ -167,7 +209,8 @@ if user_input:
                     st.markdown(line)
 
         st.session_state["rag_messages"].append(ChatMessage(role="assistant", content=answer))
-        log_trace(page="rag_docs", route="agentic_rag", model=GROQ_MODEL,
+        # 캐시 적중은 route 로 가른다 — 지연 통계에 섞이면 체인의 실제 지연이 거짓으로 내려간다
+        log_trace(page="rag_docs", route="agentic_rag_cache" if cached else "agentic_rag", model=GROQ_MODEL,
                   latency_ms=t.ms, guard="ok",
                   nodes=[s["step"] for s in result["trace"]],
-                  ok=(result["grounded"] == "YES"))
+                  ok=(result["grounded"] == "YES"), ttft_ms=ttft_ms)
@@ -205,6 +205,29 @@ Original query: {question}
 Rewritten query:"""
 
 
+# ── 판정+재작성 한 번에 (Agentic RAG: 쓸 것인가, 아니면 무엇으로 다시 찾을 것인가?) ──
+# 관련성 판정이 NO 면 예전에는 재작성 1콜이 뒤따랐다 — 왕복 두 번, 페이서 예약 두 번. 판정
+# 프롬프트는 이미 질문과 청크를 다 보고 있으니 같은 호출에서 재작성 쿼리까지 받는다.
+# 출력은 "USE" 또는 "SEARCH: <쿼리>" 한 줄 — agent_rag._grade_or_rewrite 가 결정적으로 파싱한다.
+# 판정 기준 문구는 RAG_GRADE_PROMPT_TEMPLATE, 재작성 지침은 RAG_REWRITE_PROMPT_TEMPLATE 와 같게 둔다.
+RAG_GRADE_OR_REWRITE_PROMPT_TEMPLATE = """/no_think
+You are deciding ONE thing for a retrieval system: use these results, or discard them and search again with a differently-worded query?
+
+[Question]
+{question}
+
+[Retrieved excerpts]
+{context}
+
+Judge only whether these excerpts are on-topic and usable as source material for the question.
+- If they are on-topic and usable — even if they cover the question only partially, or if answering fully would require combining several of them — output exactly: USE
+  Partial coverage is normal and is NOT a reason to search again.
+- Only if they are off-topic, about a different subject, or so unrelated that a differently-worded search would clearly do better, output one line: SEARCH: <better search query>
+  The corpus is bilingual (English + Korean) MLOps documentation. If the question is English but the target docs may be Korean (e.g., the on-prem KETI pipeline), add key Korean technical terms. Add concrete technical keywords (tool names, pipeline stages) that would appear in the docs.
+
+Output only USE, or SEARCH: followed by the query on the same line. No explanation."""
+
+
 # ── 근거 자기점검 프롬프트 (Agentic RAG: 생성한 답이 컨텍스트로 뒷받침되나?) ──
 # 생성 후 검증 단계. 답변이 컨텍스트 밖 사실을 지어냈는지 이진(YES/NO)으로 판정한다.
 # 게이트가 아니라 라벨 — 판정 결과는 UI 배지·트레이스·평가 채점에만 쓰이고 답변을 막지 않는다.
@@ -0,0 +1,110 @@
+"""의미 기반 답변 캐시 — 같은(또는 거의 같은) 질문에 에이전트 체인을 다시 돌리지 않는다.
+
+MLOps Docs 방문자는 대부분 사이드바의 SAMPLE_QUESTIONS 를 누르거나 그 말바꿈을 묻는다. 코퍼스는
+배포 사이에 안 바뀌는데, 질문마다 판정·생성·근거점검 3~4콜(턴당 수천 토큰)이 8,000 TPM 창에
+물린다. 여기서는 질의 임베딩(검색기의 질의 캐시가 이미 인코딩한 벡터)으로 이전 턴의 결과를
+찾아, 코사인이 SIMILARITY_MIN 이상이면 저장된 답·청크·trace·근거 라벨을 그대로 돌려준다.
+
+무효화: 캐시 키 = 코퍼스 스냅샷 키(rag_corpus.corpus_key) + 프롬프트 지문(agent_rag.
+prompt_fingerprint — 평가 하니스의 캐시 키와 같은 재료) + 모델. 키가 바뀌면 통째로 비운다.
+코퍼스 키를 모르는 검색기(.build_stats 가 없거나 임의 docs 로 만든 것)는 캐시하지 않는다 —
+같은 코퍼스라는 걸 증명할 수 없으면 옛 답을 돌려줄 근거도 없다.
+
+말바꿈 허용의 함정: MiniLM 에서 "maturity level 1" 과 "level 2" 는 코사인이 아주 가깝다.
+그래서 질문에 든 숫자 집합이 다르면 유사도와 무관하게 다른 질문으로 본다. 근거점검이 YES 인
+답만 저장한다 — 의심스러운 답을 다음 방문자에게 되풀이하지 않는다.
+"""
+import os
+import re
+import threading
+from collections import OrderedDict
+
+ANSWER_CACHE_ENABLED = os.environ.get("RAG_ANSWER_CACHE", "1").lower() not in ("0", "false", "no")
+# 적중 하한(코사인). 말바꿈은 받고 다른 질문은 막는 선 — 낮추기 전에 평가 질문 쌍으로 확인할 것.
+SIMILARITY_MIN = float(os.environ.get("RAG_ANSWER_CACHE_SIM", "0.92"))
+ANSWER_CACHE_SIZE = 256
+
+_NUM = re.compile(r"\d+(?:\.\d+)?")
+
+
+def _numbers(text):
+    return frozenset(_NUM.findall(text or ""))
+
+
+def _unit(vec):
+    import numpy as np
+
+    v = np.asarray(vec, dtype=np.float32)
+    return v / max(float(np.linalg.norm(v)), 1e-12)
+
+
+class AnswerCache:
+    """(캐시 키) 아래 [질문 → (단위 벡터, 결과, 턴 토큰)] LRU. 세션이 공유하므로 잠금 아래서 갱신한다."""
+
+    def __init__(self, maxsize=ANSWER_CACHE_SIZE, threshold=None):
+        self.maxsize = maxsize
+        self.threshold = SIMILARITY_MIN if threshold is None else threshold
+        self.hits = self.misses = self.invalidations = self.tokens_saved = 0
+        self._key = None
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _switch(self, key):
+        # 잠금 안에서만 부른다
+        if key != self._key:
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+            self._key = key
+
+    def lookup(self, key, question, vector):
+        """적중이면 {"question", "similarity", "result", "tokens"}, 아니면 None."""
+        q = _unit(vector)
+        nums = _numbers(question)
+        with self._lock:
+            self._switch(key)
+            best, best_sim = None, self.threshold
+            for text, (vec, result, tokens) in self._entries.items():
+                if _numbers(text) != nums:
+                    continue
+                sim = float(vec @ q)
+                if sim >= best_sim:
+                    best, best_sim = text, sim
+            if best is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(best)
+            _, result, tokens = self._entries[best]
+            self.hits += 1
+            self.tokens_saved += tokens
+            return {"question": best, "similarity": round(best_sim, 3), "result": result, "tokens": tokens}
+
+    def store(self, key, question, vector, result, tokens):
+        with self._lock:
+            self._switch(key)
+            self._entries[question] = (_unit(vector), result, int(tokens))
+            self._entries.move_to_end(question)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._entries),
+                    "maxsize": self.maxsize, "hit_rate": self.hits / total if total else 0.0,
+                    "tokens_saved": self.tokens_saved, "invalidations": self.invalidations}
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._key = None
+            self.hits = self.misses = self.invalidations = self.tokens_saved = 0
+
+
+# 프로세스 전역 — 모든 방문자 세션이 같이 쓴다(QUERY_CACHE 와 같은 수명).
+ANSWER_CACHE = AnswerCache()
+
+
+def shared():
+    """앱이 넘길 캐시 — RAG_ANSWER_CACHE=0 이면 None(캐시 없이 매번 체인을 돈다)."""
+    return ANSWER_CACHE if ANSWER_CACHE_ENABLED else None
@@ -0,0 +1,268 @@
+"""BM25 희소 검색 엔진 — rank_bm25.BM25Okapi 를 대체하는 벡터화 구현 (NumPy 전용).
+
+HybridRetriever 의 sparse 다리는 BM25Okapi.get_scores 였다. 그 함수는 질의어마다 **문서
+전체를 파이썬 리스트 컴프리헨션으로 돈다**(doc_freqs 딕셔너리 조회 N번). 그다음 k*3 개만
+쓰면서 `sorted(range(len(scores)))` 로 전 문서를 정렬했다. 데이터 분석 페이지 인덱스(최대
+2,000행)에서는 이게 임베딩 다음으로 큰 질의당 비용이었다.
+
+여기서는
+  · 문서×용어 빈도를 CSR 배열(indptr·용어 id·빈도)로 한 번 만들어 두고,
+  · 그걸 전치한 용어→포스팅 CSR 에 **idf 와 길이 정규화까지 곱한 가중치**를 미리 구워 둔다.
+  · 질의 점수 = 질의어마다 포스팅 구간을 점수 벡터에 더하기(희소 행렬×질의 벡터와 같다).
+  · top-k 는 argpartition 으로 O(N) 에 뽑고 후보만 정렬한다.
+
+동치성(테스트가 고정): 점수는 BM25Okapi 와 **비트 단위로 같다**. 원소별 식과 연산 순서를
+라이브러리와 똑같이 두고, 질의어 순서대로(중복 질의어 포함) 더하기 때문이다. idf 의
+epsilon 하한(음수 idf → epsilon × 평균 idf)도 같은 순서로 합산해 재현한다. 순위의 동점
+처리도 예전 `sorted(..., reverse=True)` 와 같다 — 점수가 같으면 앞 문서가 먼저.
+그래서 토크나이저(rag_corpus._tok)가 같은 한 검색 결과가 바뀌지 않는다.
+
+실측(python rag_bm25.py, 질의 20개 평균 · top-15, 2026-10-18 · 로컬 CPU, 두 번 돌린 범위):
+    문서 수    BM25Okapi+sorted   이 엔진      배율     순위 동일
+      1,000        2.1–2.4 ms     0.08–0.09 ms   24–30×     예
+     10,000       24–37 ms        0.14–0.18 ms  170–210×    예
+    100,000      280–300 ms       0.76 ms       370–400×    예
+  색인 구축(10만 문서)은 3.7s 대 3.3s 로 비슷하다 — 둘 다 파이썬 Counter 토큰 집계가
+  지배한다. 한 번 만들고 질의마다 쓰는 구조라 질의 쪽만 줄였다.
+"""
+import math
+from collections import Counter
+
+import numpy as np
+
+# rank_bm25.BM25Okapi 기본값 — 동치성 테스트가 이 값으로 라이브러리와 비교한다.
+K1, B, EPSILON = 1.5, 0.75, 0.25
+
+
+class BM25Index:
+    """문서×용어 CSR 위의 Okapi BM25. get_scores / top_n 이 검색 인터페이스다.
+
+    저장 상태(state)는 문서 방향 CSR 원빈도(indptr·term_ids·tf) + 어휘(vocab) + 문서
+    빈도(df) 뿐이다. idf·가중 포스팅은 상태에서 결정적으로 다시 계산한다.
+    """
+
+    def __init__(self, vocab, indptr, term_ids, tf, df=None, k1=K1, b=B, epsilon=EPSILON):
+        self.k1, self.b, self.epsilon = k1, b, epsilon
+        self.vocab = list(vocab)
+        self.term_index = {t: i for i, t in enumerate(self.vocab)}
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        self.term_ids = np.asarray(term_ids, dtype=np.int32)
+        self.tf = np.asarray(tf, dtype=np.int32)
+        n_terms = len(self.vocab)
+        self.df = (np.bincount(self.term_ids, minlength=n_terms) if df is None
+                   else np.asarray(df, dtype=np.int64))
+        self._doc_of = np.repeat(np.arange(self.corpus_size, dtype=np.int64), np.diff(self.indptr))
+        self.doc_len = np.bincount(self._doc_of, weights=self.tf, minlength=self.corpus_size)
+        self.avgdl = float(self.doc_len.sum()) / self.corpus_size if self.corpus_size else 0.0
+        self.idf = self._idf()
+        self._postings()
+
+    # ── 구축 ───────────────────────────────────────────────────────
+    @classmethod
+    def from_tokens(cls, token_lists, **kw):
+        """토큰 리스트들 → 색인. 어휘 순서는 첫 등장 순(BM25Okapi 의 문서 빈도 딕셔너리와 같다)."""
+        vocab, term_index = [], {}
+        indptr, term_ids, tf = [0], [], []
+        for toks in token_lists:
+            for t, n in Counter(toks).items():
+                i = term_index.get(t)
+                if i is None:
+                    i = term_index[t] = len(vocab)
+                    vocab.append(t)
+                term_ids.append(i)
+                tf.append(n)
+            indptr.append(len(term_ids))
+        return cls(vocab, indptr, term_ids, tf, **kw)
+
+    def splice(self, segments):
+        """기존 행 구간을 재사용하고 새 문서를 끼워 넣은 새 색인을 만든다(증분 재색인용).
+
+        segments: 최종 행 순서대로 ("keep", start, end) 또는 ("new", token_lists).
+        남는 행은 다시 토큰화하지 않고 용어 id·빈도 배열을 그대로 옮긴다. 문서 빈도는 빠지는
+        행의 항을 빼고 새 행의 항을 더해 갱신한다. 마지막에 어휘를 첫 등장 순으로 다시 매겨,
+        같은 코퍼스를 처음부터 만든 색인과 상태가 똑같아지게 한다(점수도 비트 단위로 같다).
+        """
+        vocab, term_index = list(self.vocab), dict(self.term_index)
+        df = self.df.astype(np.int64).copy()
+        kept = np.zeros(self.corpus_size, dtype=bool)
+        ids_parts, tf_parts, nnz = [], [], []
+        for seg in segments:
+            if seg[0] == "keep":
+                _, s, e = seg
+                kept[s:e] = True
+                lo, hi = self.indptr[s], self.indptr[e]
+                ids_parts.append(self.term_ids[lo:hi])
+                tf_parts.append(self.tf[lo:hi])
+                nnz.extend(np.diff(self.indptr[s:e + 1]).tolist())
+            else:
+                ids, tfs = [], []
+                for toks in seg[1]:
+                    counts = Counter(toks)
+                    for t, n in counts.items():
+                        i = term_index.get(t)
+                        if i is None:
+                            i = term_index[t] = len(vocab)
+                            vocab.append(t)
+                        ids.append(i)
+                        tfs.append(n)
+                    nnz.append(len(counts))
+                ids_parts.append(np.asarray(ids, dtype=np.int32))
+                tf_parts.append(np.asarray(tfs, dtype=np.int32))
+        # 빠지는 행(삭제·변경된 문서)의 항을 문서 빈도에서 뺀다.
+        dropped = np.repeat(~kept, np.diff(self.indptr))
+        df -= np.bincount(self.term_ids[dropped], minlength=len(df))
+        term_ids = np.concatenate(ids_parts) if ids_parts else np.zeros(0, dtype=np.int32)
+        tf = np.concatenate(tf_parts) if tf_parts else np.zeros(0, dtype=np.int32)
+        # 새 행의 항을 더한다(새 어휘는 뒤에 붙는다).
+        df = np.concatenate([df, np.zeros(len(vocab) - len(df), dtype=np.int64)])
+        new_rows = np.repeat(_new_row_mask(segments), nnz)
+        df += np.bincount(term_ids[new_rows], minlength=len(vocab))
+        indptr = np.concatenate([[0], np.cumsum(nnz)])
+
+        # 어휘 재정렬: 문서 빈도 0 이 된 항은 빼고, 남은 항은 첫 등장 순으로 다시 번호를 매긴다.
+        uniq, first = np.unique(term_ids, return_index=True)
+        order = uniq[np.argsort(first, kind="stable")]
+        remap = np.full(len(vocab), -1, dtype=np.int64)
+        remap[order] = np.arange(len(order))
+        return BM25Index([vocab[i] for i in order], indptr, remap[term_ids], tf, df=df[order],
+                         k1=self.k1, b=self.b, epsilon=self.epsilon)
+
+    # ── 상태 저장/복원 (rag_index 스냅샷) ────────────────────────────
+    def state(self) -> dict:
+        return {"vocab": self.vocab, "indptr": self.indptr, "term_ids": self.term_ids,
+                "tf": self.tf, "df": self.df}
+
+    @classmethod
+    def from_state(cls, state, **kw):
+        return cls(state["vocab"], state["indptr"], state["term_ids"], state["tf"],
+                   df=state.get("df"), **kw)
+
+    # ── 점수 ───────────────────────────────────────────────────────
+    @property
+    def corpus_size(self) -> int:
+        return len(self.indptr) - 1
+
+    def _idf(self):
+        # 어휘 크기만큼의 파이썬 루프(구축 시 한 번). np.log 는 SIMD 구현이라 math.log 와
+        # 마지막 비트가 다를 수 있고, 평균도 BM25Okapi 처럼 어휘 순서대로 하나씩 더해야
+        # epsilon 하한이 같은 값이 된다.
+        n = self.corpus_size
+        idf = [math.log(n - f + 0.5) - math.log(f + 0.5) for f in self.df.tolist()]
+        if not idf:
+            return np.zeros(0)
+        eps = self.epsilon * sum(idf) / len(idf)
+        return np.array([eps if v < 0 else v for v in idf])
+
+    def _postings(self):
+        """문서 방향 CSR → 용어 방향 CSR, 각 포스팅에 BM25 가중치를 미리 곱해 둔다."""
+        order = np.argsort(self.term_ids, kind="stable")        # 용어별로, 안에서는 문서 순
+        self._post_docs = self._doc_of[order]
+        tf = self.tf[order].astype(np.float64)
+        dl = self.doc_len[self._post_docs]
+        k1, b = self.k1, self.b
+        # 원소별 식을 BM25Okapi.get_scores 와 같은 순서로 둔다(동치성의 근거).
+        self._post_w = self.idf[self.term_ids[order]] * (
+            tf * (k1 + 1) / (tf + k1 * (1 - b + b * dl / self.avgdl)))
+        self._post_ptr = np.concatenate(
+            [[0], np.cumsum(np.bincount(self.term_ids, minlength=len(self.vocab)))])
+
+    def get_scores(self, query_tokens) -> np.ndarray:
+        """질의 토큰 → 문서별 BM25 점수. 중복 질의어는 BM25Okapi 처럼 중복해서 더한다."""
+        scores = np.zeros(self.corpus_size)
+        for t in query_tokens:
+            i = self.term_index.get(t)
+            if i is None:
+                continue
+            s, e = self._post_ptr[i], self._post_ptr[i + 1]
+            scores[self._post_docs[s:e]] += self._post_w[s:e]
+        return scores
+
+    def top_n(self, query_tokens, n) -> np.ndarray:
+        """상위 n 문서 번호(점수 내림차순, 동점이면 앞 문서 먼저)."""
+        return top_k(self.get_scores(query_tokens), n)
+
+
+def top_k(scores, k) -> np.ndarray:
+    """argpartition 으로 상위 k 를 O(N) 에 고르고 후보만 정렬한다.
+
+    경계 동점을 argpartition 에 맡기면 어느 문서가 뽑힐지 임의라, 예전 전체 정렬과 결과가
+    달라진다. 그래서 k 번째 점수보다 큰 문서는 전부, 같은 문서는 앞 번호부터 채운다.
+    점수 0 인 문서도 k 를 채우는 데 쓰인다 — 예전 구현이 그랬고 RRF 입력 길이가 같아야 한다.
+    """
+    n = len(scores)
+    k = min(k, n)
+    if k <= 0:
+        return np.zeros(0, dtype=np.int64)
+    if k < n:
+        kth = scores[np.argpartition(-scores, k - 1)[k - 1]]
+        above = np.flatnonzero(scores > kth)
+        ties = np.flatnonzero(scores == kth)[:k - len(above)]
+        cand = np.concatenate([above, ties])
+    else:
+        cand = np.arange(n)
+    return cand[np.lexsort((cand, -scores[cand]))]
+
+
+def _new_row_mask(segments):
+    mask = []
+    for seg in segments:
+        if seg[0] == "keep":
+            mask.extend([False] * (seg[2] - seg[1]))
+        else:
+            mask.extend([True] * len(seg[1]))
+    return np.asarray(mask, dtype=bool)
+
+
+# ── 벤치마크: python rag_bm25.py ──────────────────────────────────
+def _synthetic_corpus(n_docs, seed=0):
+    """rag_docs 의 실제 어휘로 만든 합성 문서(청크 길이 분포를 흉내 낸 토큰 창)."""
+    import glob
+    import os
+    import re
+
+    toks = []
+    for path in sorted(glob.glob(os.path.join(os.path.dirname(__file__), "rag_docs", "*.md"))):
+        with open(path, encoding="utf-8") as f:
+            toks += re.findall(r"[a-z0-9가-힣]+", f.read().lower())
+    rng = np.random.default_rng(seed)
+    starts = rng.integers(0, len(toks) - 120, size=n_docs)
+    sizes = rng.integers(30, 120, size=n_docs)
+    return [toks[s:s + n] for s, n in zip(starts, sizes)], toks
+
+
+def main():
+    import time
+
+    try:
+        from rank_bm25 import BM25Okapi
+    except ImportError:
+        BM25Okapi = None
+        print("rank_bm25 가 없어 이 엔진만 잽니다.")
+
+    print(f"{'문서 수':>9} | {'BM25Okapi+sorted':>16} | {'이 엔진':>10} | 배율 | 순위 동일")
+    for n_docs in (1_000, 10_000, 100_000):
+        corpus, vocab_src = _synthetic_corpus(n_docs)
+        rng = np.random.default_rng(1)
+        queries = [[vocab_src[i] for i in rng.integers(0, len(vocab_src), size=6)] for _ in range(20)]
+        idx = BM25Index.from_tokens(corpus)
+        k = 15
+
+        t0 = time.perf_counter()
+        new = [idx.top_n(q, k).tolist() for q in queries]
+        t_new = (time.perf_counter() - t0) / len(queries) * 1000
+
+        if BM25Okapi is None:
+            print(f"{n_docs:>9,} | {'—':>16} | {t_new:>8.2f}ms |  —   | —")
+            continue
+        ref = BM25Okapi(corpus)
+        t0 = time.perf_counter()
+        old = []
+        for q in queries:
+            scores = ref.get_scores(q)
+            old.append(sorted(range(len(scores)), key=lambda i: scores[i], reverse=True)[:k])
+        t_old = (time.perf_counter() - t0) / len(queries) * 1000
+        print(f"{n_docs:>9,} | {t_old:>14.2f}ms | {t_new:>8.2f}ms | {t_old / t_new:>4.0f}× | {old == new}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""생성 전 컨텍스트 압축 — 청크에서 질문과 가까운 문장만 남겨 프롬프트 토큰을 줄인다.
+
+format_context 는 검색한 청크 5개(각 최대 500자)를 통째로 판정·생성·근거점검 프롬프트에 싣는다.
+한국어는 estimate_tokens 로 글자당 0.9토큰이라 KETI 문서 다섯 청크면 컨텍스트만 2천 토큰을
+넘고, 그게 한 턴에 두세 번 실리면서 8,000 TPM 페이서(TokenPacer)를 기다리게 만든다.
+
+여기서는 청크를 문장으로 쪼개 질문과의 유사도로 순위를 매기고, 예산(CONTEXT_TOKEN_BUDGET)
+안에서 높은 문장부터 남긴다.
+  · 유사도: 공유 임베더(검색기와 같은 모델)의 코사인. 질문 벡터는 검색기의 질의 캐시에서
+    꺼낸다(이미 인코딩했다). 임베더가 없으면 내용어 겹침(rag_grounded.content_terms)으로.
+  · 인용 번호 보존: 청크 수와 순서를 바꾸지 않는다 — 청크마다 가장 가까운 문장 하나는 반드시
+    남겨 [n] 이 가리키는 대상이 사라지지 않게 한다. 남긴 문장은 원래 순서로, 건너뛴 자리는 " … ".
+  · 예산 안이면 손대지 않는다 — 영어 청크 다섯 개는 대개 예산 안이라 답이 바뀌지 않는다.
+"""
+import os
+import re
+
+from rag_corpus import format_context
+from rag_grounded import content_terms
+from ratelimit import estimate_tokens
+
+# 압축 후 컨텍스트(format_context 결과) 토큰 상한. 0 이면 압축하지 않는다.
+# 영어 500자 청크 5개(≈ 650토큰)는 통과하고, 한국어 청크가 섞이면 걸리는 선.
+CONTEXT_TOKEN_BUDGET = int(os.environ.get("RAG_CONTEXT_TOKENS", "900"))
+_GAP = " … "
+
+_SPLIT = re.compile(r"(?<=[.!?。])\s+|\n+")
+
+
+def _sentences(text):
+    return [s.strip() for s in _SPLIT.split(text or "") if s.strip()]
+
+
+def _scores(question, texts, embedding, query_vector):
+    """문장별 질문 유사도. 임베더가 없거나 고장 나면 내용어 겹침 비율."""
+    if embedding is not None:
+        try:
+            import numpy as np
+
+            vecs = np.asarray(embedding.embed_documents(texts), dtype=np.float32)
+            q = np.asarray(query_vector if query_vector is not None else embedding.embed_query(question),
+                           dtype=np.float32)
+            vecs /= np.maximum(np.linalg.norm(vecs, axis=1, keepdims=True), 1e-12)
+            q /= max(float(np.linalg.norm(q)), 1e-12)
+            return (vecs @ q).tolist()
+        except Exception:  # noqa: BLE001 — 압축은 최적화다. 임베더 고장으로 답을 막지 않는다
+            pass
+    qt = content_terms(question)
+    return [len(qt & content_terms(t)) / (len(qt) or 1) for t in texts]
+
+
+def _rebuild(chunk, text):
+    return type(chunk)(page_content=text, metadata=chunk.metadata)
+
+
+def compress(question, chunks, embedding=None, budget=None, query_vector=None):
+    """return (압축한 청크 리스트, 통계). 청크 수·순서·metadata 는 그대로다.
+
+    통계: {tokens_before, tokens_after, saved, sentences_kept, sentences_total}
+    (토큰은 format_context 결과에 estimate_tokens — 페이서가 예약하는 것과 같은 셈).
+    """
+    budget = CONTEXT_TOKEN_BUDGET if budget is None else budget
+    before = estimate_tokens(format_context(chunks))
+    stats = {"tokens_before": before, "tokens_after": before, "saved": 0,
+             "sentences_kept": None, "sentences_total": None}
+    if not budget or before <= budget or not chunks:
+        return list(chunks), stats
+
+    per_chunk = [_sentences(c.page_content) for c in chunks]
+    units = [(ci, si) for ci, sents in enumerate(per_chunk) for si in range(len(sents))]
+    texts = [per_chunk[ci][si] for ci, si in units]
+    scores = _scores(question, texts, embedding, query_vector)
+    cost = [max(estimate_tokens(t) - 8, 1) for t in texts]   # estimate_tokens 의 고정 +8 은 한 번만
+    overhead = before - sum(cost)                             # 번호·출처 태그·구분 줄
+
+    order = sorted(range(len(units)), key=lambda i: -scores[i])
+    keep, used = set(), overhead
+    for ci in range(len(chunks)):                             # 청크마다 최고 문장 하나는 필수
+        best = next((i for i in order if units[i][0] == ci), None)
+        if best is not None:
+            keep.add(best)
+            used += cost[best]
+    for i in order:
+        if i not in keep and used + cost[i] <= budget:
+            keep.add(i)
+            used += cost[i]
+
+    out = []
+    for ci, chunk in enumerate(chunks):
+        picked = sorted(units[i][1] for i in keep if units[i][0] == ci)
+        if not picked:
+            out.append(chunk)
+            continue
+        parts, prev = [], None
+        for si in picked:
+            if prev is not None:
+                parts.append(" " if si == prev + 1 else _GAP)
+            parts.append(per_chunk[ci][si])
+            prev = si
+        out.append(_rebuild(chunk, "".join(parts)))
+
+    after = estimate_tokens(format_context(out))
+    stats.update(tokens_after=after, saved=before - after,
+                 sentences_kept=len(keep), sentences_total=len(units))
+    return out, stats
@@ -7,16 +7,29 @@ rag_docs/ 안의 공식 MLOps 파이프라인 문서(Google/AWS/Azure/Vertex + 
 - 청킹: 마크다운 헤딩(##/###) 단위로 먼저 나눠 "어느 문서·어느 섹션"을 메타데이터로
   보존(출처 인용의 근거). 긴 섹션만 CHUNK_SIZE로 재분할(임베딩 절단 상한 기준).
 - 검색: FAISS(dense, 의미) + BM25(sparse, 키워드)를 Reciprocal Rank Fusion으로 융합.
-  pages/2_Data_Analysis.py의 HybridRetriever와 동일 패턴(일관성).
+  HybridRetriever 는 pages/2_Data_Analysis.py 도 이 모듈에서 가져다 쓴다(일관성).
+  BM25 는 rag_bm25.BM25Index(NumPy CSR) — rank_bm25 와 같은 점수를 벡터화해 낸다.
 - 임베딩: sentence-transformers/all-MiniLM-L6-v2 (로컬, 외부 API 없음 — 온프레 철학).
+  백엔드(PyTorch FP32 / ONNX Runtime INT8)는 rag_embed.get_embedding 이 고른다.
+- 스냅샷: 구축한 FAISS 인덱스·청크·BM25 통계를 rag_index/<키>/ 에 저장하고, 키(문서 해시 +
+  청킹 파라미터 + 임베딩 모델)가 같으면 임베딩 없이 mmap 으로 다시 읽는다.
 """
+import glob
+import hashlib
+import json
+import logging
 import os
 import re
-import glob
+import shutil
+import tempfile
+import threading
+import time
+from collections import OrderedDict
 
 # 무거운 torch/faiss/embeddings 의존은 build_retriever 안에서 지연 임포트한다.
 
 RAG_DIR = os.path.join(os.path.dirname(__file__), "rag_docs")
+EMBED_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
 
 # 청킹 크기. 임베딩 인코더(all-MiniLM-L6-v2)의 max_seq_length=256 word piece가 상한이라,
 # 이 값이 크면 청크 뒷부분이 dense 벡터에 아예 들어가지 않는다(BM25만 보게 됨).
@@ -25,37 +38,256 @@ RAG_DIR = os.path.join(os.path.dirname(__file__), "rag_docs")
 CHUNK_SIZE = 500
 CHUNK_OVERLAP = 80
 
+_log = logging.getLogger(__name__)
+
 
-# ── 토크나이저 / RRF (2_Data_Analysis.py와 동일 구현) ──────────────
+# ── 토크나이저 / 하이브리드 검색기 (2_Data_Analysis.py 도 공유) ──
+# RRF 융합·청크 저장소는 rag_store — 융합은 본문 문자열이 아니라 정수 청크 id 위에서 돈다.
 def _tok(s):
     return re.findall(r"[a-z0-9가-힣]+", (s or "").lower())
 
 
-def _rrf(ranklists, k=5, c=60):
-    """Reciprocal Rank Fusion — 여러 랭크 리스트를 하나로 융합."""
-    scores, docmap = {}, {}
-    for docs in ranklists:
-        for rank, d in enumerate(docs):
-            key = d.page_content
-            scores[key] = scores.get(key, 0.0) + 1.0 / (c + rank + 1)
-            docmap[key] = d
-    top = sorted(scores, key=scores.get, reverse=True)[:k]
-    return [docmap[key] for key in top]
+# ── 질의 임베딩 캐시 ─────────────────────────────────────────────
+# 같은 질의가 여러 번 인코딩된다: agentic_answer 는 한 턴에 두 번 검색하고(재작성 전후로
+# 질의가 같을 때가 많다), 방문자는 같은 예시 질문 버튼을 누르고, 평가 하니스는 고정된 골든
+# 질문을 되풀이한다. 질의 벡터를 LRU 로 들고 있다가 적중하면 FAISS 를 벡터로 바로 검색해
+# 인코더(CPU 에서 질의당 수십 ms)를 건너뛴다.
+#
+# 키 = (임베딩 모델, 공백 정규화한 질의). 모델이 키에 없으면 데이터 분석 인덱스와 MLOps
+# 인덱스가 다른 모델을 쓰게 되는 날 엉뚱한 공간의 벡터가 조용히 쓰인다. 대소문자는 건드리지
+# 않는다 — 인코더가 대소문자를 구분할 수 있으니 벡터를 바꿀 수 있는 정규화는 하지 않는다.
+# 384차원 float 512개 ≈ 0.8MB 라 무료 티어 메모리에 부담이 없다.
+QUERY_CACHE_SIZE = 512
+
+
+def _normalize_query(text):
+    return " ".join((text or "").split())
+
+
+def _model_id(embedding):
+    return getattr(embedding, "model_name", None) or type(embedding).__name__
+
+
+class QueryEmbeddingCache:
+    """(모델, 정규화 질의) → 질의 벡터 LRU. 세션·페이지가 공유하므로 잠금 아래서 갱신한다."""
+
+    def __init__(self, maxsize=QUERY_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.hits = self.misses = 0
+        self._vecs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def embed(self, embedding, text):
+        key = (_model_id(embedding), _normalize_query(text))
+        with self._lock:
+            vec = self._vecs.get(key)
+            if vec is not None:
+                self._vecs.move_to_end(key)
+                self.hits += 1
+                return vec
+            self.misses += 1
+        # 인코딩은 잠금 밖에서 — 느린 미스 하나가 다른 세션의 적중을 막으면 안 된다.
+        # 같은 질의가 동시에 미스하면 두 번 인코딩될 수 있지만 결과는 같다.
+        vec = embedding.embed_query(key[1])
+        with self._lock:
+            self._vecs[key] = vec
+            self._vecs.move_to_end(key)
+            while len(self._vecs) > self.maxsize:
+                self._vecs.popitem(last=False)
+        return vec
+
+    def embed_many(self, embedding, texts):
+        """여러 질의의 벡터 — 미스만 모아 embed_documents 한 번(배치)으로 인코딩한다.
+
+        이 앱의 임베더(rag_embed)는 질의·문서 인코딩이 같다(embed_query = embed_documents([q])[0]).
+        질의에 접두어를 붙이는 모델(e5 등)로 바꾸면 여기서 embed_query 로 돌아가야 한다.
+        """
+        model = _model_id(embedding)
+        keys = [_normalize_query(t) for t in texts]
+        found = {}
+        with self._lock:
+            for key in keys:
+                vec = self._vecs.get((model, key))
+                if vec is not None:
+                    self._vecs.move_to_end((model, key))
+                    self.hits += 1
+                    found[key] = vec
+                else:
+                    self.misses += 1
+        missing = list(dict.fromkeys(k for k in keys if k not in found))
+        if missing:
+            vecs = embedding.embed_documents(missing)
+            with self._lock:
+                for key, vec in zip(missing, vecs):
+                    self._vecs[(model, key)] = found[key] = vec
+                    self._vecs.move_to_end((model, key))
+                while len(self._vecs) > self.maxsize:
+                    self._vecs.popitem(last=False)
+        return [found[k] for k in keys]
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._vecs),
+                    "maxsize": self.maxsize, "hit_rate": self.hits / total if total else 0.0}
+
+    def clear(self):
+        with self._lock:
+            self._vecs.clear()
+            self.hits = self.misses = 0
+
+
+# 프로세스 전역 — 두 HybridRetriever(MLOps 문서·데이터 분석)와 모든 세션이 같이 쓴다.
+QUERY_CACHE = QueryEmbeddingCache()
+
+
+# ── dense/sparse 다리 동시 실행 ─────────────────────────────────────
+# 두 다리는 서로 독립이고 FAISS·NumPy·인코더(torch)는 GIL 을 놓는다. 순서대로 돌 이유가 없다.
+# 풀은 프로세스에 하나 — 세션마다 만들면 스레드가 방문자 수만큼 는다. 워커 수는 동시 검색
+# 2건(=다리 4개)을 받는 정도로 작게 잡는다. 마감을 넘긴 다리는 취소할 수 없어 풀에서 끝까지
+# 돌고 결과만 버려진다 — 그래서 다리 수보다 워커를 넉넉히 둔다.
+RETRIEVAL_WORKERS = 4
+_POOL = None
+_POOL_LOCK = threading.Lock()
+
+
+def _pool():
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is None:
+            from concurrent.futures import ThreadPoolExecutor
+            _POOL = ThreadPoolExecutor(max_workers=RETRIEVAL_WORKERS, thread_name_prefix="retrieval")
+        return _POOL
+
+
+def _timed(fn, *args):
+    t0 = time.perf_counter()
+    out = fn(*args)
+    return out, round((time.perf_counter() - t0) * 1000, 1)
 
 
 class HybridRetriever:
-    """dense(FAISS) + sparse(BM25) 하이브리드 검색, RRF 융합. .invoke(query) 인터페이스."""
+    """dense(FAISS) + sparse(BM25) 하이브리드 검색, RRF 융합. .invoke(query) 인터페이스.
 
-    def __init__(self, vectorstore, splits, bm25, k=5):
-        self.vs, self.splits, self.bm25, self.k = vectorstore, splits, bm25, k
+    질의 벡터는 query_cache(기본: 프로세스 전역 QUERY_CACHE)를 거쳐 FAISS 를 벡터로 검색한다.
+    두 다리는 공유 스레드 풀에서 동시에 돈다. 다리별 소요 시간이 필요하면 .search() 를 쓴다.
+
+    청크는 rag_store.ChunkStore(열 방향)로 들고, 두 다리는 정수 청크 id 를 돌려준다 —
+    FAISS 행 i 가 청크 i 여야 한다(build_retriever·데이터 분석 페이지 모두 순서대로 넣는다).
+    Document 는 융합한 top-k 만 만든다.
+    """
+
+    def __init__(self, vectorstore, splits, bm25, k=5, query_cache=None):
+        from rag_store import ChunkStore
+
+        self.vs, self.bm25, self.k = vectorstore, bm25, k
+        self.splits = splits if isinstance(splits, ChunkStore) else ChunkStore.from_documents(splits)
+        if vectorstore.index.ntotal != len(self.splits):
+            raise ValueError(f"벡터 {vectorstore.index.ntotal}행 ↔ 청크 {len(self.splits)}개 — 행 i 가 청크 i 여야 한다")
+        self.query_cache = query_cache if query_cache is not None else QUERY_CACHE
+
+    def _dense(self, query, n):
+        import numpy as np
+
+        vec = self.query_cache.embed(self.vs.embeddings, query)
+        dist, rows = self.vs.index.search(np.asarray([vec], dtype=np.float32), n)
+        keep = rows[0] >= 0           # 청크가 n 개보다 적으면 FAISS 가 -1 로 채운다
+        # IndexFlatL2 는 제곱 거리를 준다. 단위 벡터(MiniLM 은 정규화해 내보낸다)면 코사인 = 1 - d²/2.
+        return rows[0][keep], 1.0 - dist[0][keep] / 2
+
+    def _sparse(self, query, n):
+        from rag_bm25 import top_k
 
-    def invoke(self, query, k=None):
-        k = k or self.k
-        dense = self.vs.similarity_search(query, k=k * 3)
         scores = self.bm25.get_scores(_tok(query))
-        order = sorted(range(len(scores)), key=lambda i: scores[i], reverse=True)[:k * 3]
-        sparse = [self.splits[i] for i in order]
-        return _rrf([dense, sparse], k=k)
+        ids = top_k(scores, n)
+        return ids, scores[ids]
+
+    def search(self, query, k=None, leg_timeout_s=None):
+        """return (docs, legs). legs = {"dense_ms", "sparse_ms", "degraded", "scores"}.
+
+        scores = {"dense_top"(코사인), "sparse_top"(BM25), "overlap"(두 다리 top-k 가 겹친 비율)}
+        — 판정을 로컬에서 갈음할지 정하는 rag_gate 의 입력. 다리 하나를 버렸으면 None.
+
+        leg_timeout_s: 다리별 마감(초). 그 안에 못 끝난 다리는 버리고 남은 다리 결과만
+        융합한다 — degraded 에 버린 다리 이름이 남는다. 둘 다 넘기면 먼저 끝나는 쪽을 기다린다
+        (빈 결과로 답을 만들게 할 수는 없다). None 이면 둘 다 기다린다(평가 하니스의 결정성).
+        다리 안의 예외는 그대로 올라간다 — 조용히 한 다리로 버티면 고장이 안 보인다.
+        """
+        from concurrent.futures import FIRST_COMPLETED, wait
+
+        k = k or self.k
+        pool = _pool()
+        futs = {"dense": pool.submit(_timed, self._dense, query, k * 3),
+                "sparse": pool.submit(_timed, self._sparse, query, k * 3)}
+        done, _ = wait(futs.values(), timeout=leg_timeout_s)
+        if not done:
+            done, _ = wait(futs.values(), return_when=FIRST_COMPLETED)
+        finished, dropped = {}, []
+        for name, fut in futs.items():
+            if fut in done:
+                finished[name] = fut.result()
+            else:
+                dropped.append(name)
+        if dropped:
+            _log.warning("검색 다리 %s 가 %.1fs 안에 끝나지 않아 한 다리 결과만 씁니다", dropped[0], leg_timeout_s)
+        return self._fuse(k, finished, dropped)
+
+    def _fuse(self, k, finished, dropped):
+        """다리 결과 {이름: ((ids, scores), ms)} → (docs, legs). search 와 search_batch 가 같이 쓴다."""
+        from rag_store import rrf
+
+        legs, ranklists, tops = {}, [], {}
+        for name in ("dense", "sparse"):
+            if name in finished:
+                (ids, scores), ms = finished[name]
+                # 본문이 같은 청크는 첫 청크 id 로 — 예전 본문 키 RRF 처럼 한 후보로 합쳐진다.
+                ranklists.append(self.splits.canon[ids])
+                tops[name] = float(scores[0]) if len(scores) else 0.0
+                legs[f"{name}_ms"] = ms
+            else:
+                legs[f"{name}_ms"] = None
+        legs["degraded"] = dropped[0] if dropped else None
+        legs["scores"] = None
+        if not dropped:
+            shared = set(ranklists[0][:k].tolist()) & set(ranklists[1][:k].tolist())
+            legs["scores"] = {"dense_top": round(tops["dense"], 4), "sparse_top": round(tops["sparse"], 4),
+                              "overlap": round(len(shared) / k, 3)}
+        return self.splits.docs(rrf(ranklists, k=k)), legs
+
+    def search_batch(self, queries, k=None):
+        """여러 질의를 한 번에 → [(docs, legs)] — 질의마다 search(q) 와 같은 결과다(다리 마감 없음).
+
+        질의 임베딩은 미스만 모아 한 배치(QueryEmbeddingCache.embed_many), FAISS 는 질의 행렬로
+        한 번 검색한다. BM25 는 질의마다(점수 계산이 이미 NumPy 벡터 연산이다). dense_ms 는 배치
+        전체 시간을 질의 수로 나눈 값이다. 평가 하니스·agentic_answer_batch 용.
+        """
+        import numpy as np
+
+        queries = list(queries)
+        if not queries:
+            return []
+        k = k or self.k
+        t0 = time.perf_counter()
+        vecs = self.query_cache.embed_many(self.vs.embeddings, queries)
+        dist, rows = self.vs.index.search(np.asarray(vecs, dtype=np.float32), k * 3)
+        dense_ms = round((time.perf_counter() - t0) * 1000 / len(queries), 1)
+        out = []
+        for i, query in enumerate(queries):
+            keep = rows[i] >= 0
+            dense = (rows[i][keep], 1.0 - dist[i][keep] / 2)
+            finished = {"dense": (dense, dense_ms), "sparse": _timed(self._sparse, query, k * 3)}
+            out.append(self._fuse(k, finished, []))
+        return out
+
+    def invoke(self, query, k=None):
+        return self.search(query, k=k)[0]
+
+
+def bm25_index(docs):
+    """Document 리스트 → BM25 색인(rag_bm25.BM25Index). 토크나이저는 _tok."""
+    from rag_bm25 import BM25Index
+
+    return BM25Index.from_tokens(_tok(d.page_content) for d in docs)
 
 
 # ── 코퍼스 로딩 · 청킹 ────────────────────────────────────────────
@@ -72,11 +304,17 @@ def _parse_header(text: str) -> dict:
     return meta
 
 
-def load_corpus(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP):
+def _doc_paths():
+    return sorted(glob.glob(os.path.join(RAG_DIR, "*.md")))
+
+
+def load_corpus(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP, files=None):
     """rag_docs/*.md 를 헤딩 단위로 청킹한 Document 리스트로 반환.
 
-    각 청크 metadata: source_file, vendor, title, url, section(헤딩 경로).
+    각 청크 metadata: source_file, vendor, title, url, section(헤딩 경로),
+    chunk_id("<파일명>#<파일 안 순번>" — 증분 재색인 매니페스트가 쓰는 안정 id).
     chunk_size는 retrieval_probe.py로 절단률을 재며 튜닝하라고 인자로 열어 둔다.
+    files: 파일명 집합을 주면 그 문서만 청킹한다(증분 재색인이 바뀐 문서만 다시 자를 때).
     """
     from langchain_text_splitters import (
         MarkdownHeaderTextSplitter,
@@ -91,10 +329,13 @@ def load_corpus(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP):
     char_splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
 
     docs = []
-    for path in sorted(glob.glob(os.path.join(RAG_DIR, "*.md"))):
-        raw = open(path, encoding="utf-8").read()
+    for path in _doc_paths():
         fname = os.path.basename(path)
+        if files is not None and fname not in files:
+            continue
+        raw = open(path, encoding="utf-8").read()
         hdr = _parse_header(raw)
+        n = 0
         # <!-- ... --> 주석(메타 헤더) 제거 후 본문만 청킹
         body = re.sub(r"<!--.*?-->", "", raw, flags=re.DOTALL)
 
@@ -114,22 +355,294 @@ def load_corpus(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP):
                         "title": hdr.get("title", fname),
                         "url": hdr.get("url", ""),
                         "section": section_path,
+                        "chunk_id": f"{fname}#{n}",
                     },
                 ))
+                n += 1
     return docs
 
 
-def build_retriever(docs=None, k=5):
-    """코퍼스 → FAISS+BM25 하이브리드 검색기. docs 미지정 시 load_corpus()."""
+# ── 인덱스 스냅샷 · 증분 재색인 ───────────────────────────────────
+# 컨테이너가 뜰 때마다 첫 방문자가 청킹 + 전 청크 임베딩 + BM25 구축을 기다렸다.
+# 코퍼스는 배포 사이에 안 바뀌므로 결과를 디스크에 두고, 같은 입력이면 다시 읽기만 한다.
+#
+# 키에 들어가는 것 = 결과를 바꿀 수 있는 모든 입력: 문서 바이트, CHUNK_SIZE/OVERLAP,
+# 임베딩 모델, 스냅샷 포맷 버전. 하나라도 빠지면 문서를 고쳐도 옛 인덱스가 조용히
+# 재사용된다(평가 하니스 캐시 핑거프린트와 같은 이유 — evals/run_evals.fingerprint).
+#
+# 키가 어긋나도 전부 다시 하지 않는다. 스냅샷마다 파일별 매니페스트
+# (내용 해시 → 청크 id → 벡터 행 범위)를 남겨 두고, 같은 벡터 공간(모델·청킹 파라미터·
+# 포맷)의 직전 스냅샷에서 **해시가 같은 문서의 청크·벡터·BM25 행을 그대로 옮겨 온다**.
+# 다시 자르고 임베딩하는 건 추가·변경된 문서뿐이고, 삭제된 문서는 벡터와 문서 빈도에서 빠진다.
+# 온프레 문서 하나가 37KB 라, 클라우드 문서 하나를 고칠 때마다 그걸 다시 임베딩할 이유가 없다.
+#
+# rag_index/ 는 일부러 git-ignore 하지 않는다. 커밋해 두면 새 배포(=빈 컨테이너)에서도
+# 첫 요청이 임베딩을 건너뛴다. 키가 어긋난 낡은 스냅샷은 조용히 무시되고 새로 구축되므로
+# 커밋된 스냅샷이 틀린 답을 낼 수는 없다 — 최악이 '예전처럼 느림'이다.
+INDEX_DIR = os.path.join(os.path.dirname(__file__), "rag_index")
+# v2: 파일별 매니페스트(manifest.json) + BM25 문서 빈도(df) 저장.
+# v3: BM25 를 rag_bm25 의 CSR 배열(.npy, mmap)로 저장.
+SNAPSHOT_VERSION = 3
+# 키가 바뀔 때마다 디렉토리가 하나씩 생기므로 최근 것만 남긴다(디스크 단조 증가 방지).
+_KEEP_SNAPSHOTS = 3
+# BM25 CSR 배열 — 스냅샷에 bm25_<이름>.npy 로 저장한다(어휘는 bm25.json).
+_BM25_ARRAYS = ("indptr", "term_ids", "tf", "df")
+
+
+def _file_hashes() -> dict:
+    """{파일명: 내용 sha1} — 파일 순서는 _doc_paths 의 정렬 순서."""
+    out = {}
+    for path in _doc_paths():
+        with open(path, "rb") as f:
+            out[os.path.basename(path)] = hashlib.sha1(f.read()).hexdigest()
+    return out
+
+
+def _space(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP, model=EMBED_MODEL) -> dict:
+    """벡터 공간 — 이게 같은 스냅샷끼리만 벡터를 옮겨 쓸 수 있다."""
+    return {"version": SNAPSHOT_VERSION, "model": model,
+            "chunk_size": chunk_size, "chunk_overlap": chunk_overlap}
+
+
+def corpus_key(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP, model=EMBED_MODEL) -> str:
+    """스냅샷 키 — 문서·청킹 파라미터·임베딩 모델 중 하나라도 바뀌면 값이 달라진다."""
+    blob = json.dumps([SNAPSHOT_VERSION, model, chunk_size, chunk_overlap, _file_hashes()])
+    return hashlib.sha1(blob.encode("utf-8")).hexdigest()[:16]
+
+
+def _write_bm25(dirpath, bm25):
+    import numpy as np
+
+    state = bm25.state()
+    with open(os.path.join(dirpath, "bm25.json"), "w", encoding="utf-8") as f:
+        json.dump({"vocab": state["vocab"]}, f, ensure_ascii=False)
+    for name in _BM25_ARRAYS:
+        np.save(os.path.join(dirpath, f"bm25_{name}.npy"), state[name])
+
+
+def _read_bm25(dirpath):
+    """BM25 배열은 mmap 으로 연다 — 가중 포스팅을 만들 때 한 번 훑고 끝이다."""
+    import numpy as np
+    from rag_bm25 import BM25Index
+
+    with open(os.path.join(dirpath, "bm25.json"), encoding="utf-8") as f:
+        state = json.load(f)
+    for name in _BM25_ARRAYS:
+        state[name] = np.load(os.path.join(dirpath, f"bm25_{name}.npy"), mmap_mode="r")
+    return BM25Index.from_state(state)
+
+
+def _save_snapshot(key, index, docs, bm25, manifest):
+    """임시 디렉토리에 다 쓴 뒤 rename — 쓰다 죽어도 반쯤 쓴 스냅샷이 '적중'하지 않는다."""
+    import faiss
+
+    os.makedirs(INDEX_DIR, exist_ok=True)
+    tmp = tempfile.mkdtemp(prefix=f".{key}.", dir=INDEX_DIR)
+    try:
+        faiss.write_index(index, os.path.join(tmp, "index.faiss"))
+        with open(os.path.join(tmp, "chunks.json"), "w", encoding="utf-8") as f:
+            json.dump([{"text": d.page_content, "metadata": d.metadata} for d in docs],
+                      f, ensure_ascii=False)
+        _write_bm25(tmp, bm25)
+        with open(os.path.join(tmp, "manifest.json"), "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        os.rename(tmp, os.path.join(INDEX_DIR, key))
+    except OSError:
+        # 같은 키를 다른 프로세스(앱 ↔ 평가 하니스)가 먼저 써 두었거나 디스크 문제.
+        # 어느 쪽이든 인덱스는 이미 메모리에 있으므로 실행은 계속한다.
+        shutil.rmtree(tmp, ignore_errors=True)
+        return
+    _prune_snapshots(keep=key)
+
+
+def _snapshot_dirs():
+    """완성된 스냅샷 디렉토리(최근 것부터). 임시 디렉토리('.'으로 시작)는 제외."""
+    try:
+        entries = [e for e in os.scandir(INDEX_DIR) if e.is_dir() and not e.name.startswith(".")]
+    except OSError:
+        return []
+    return sorted(entries, key=lambda e: e.stat().st_mtime, reverse=True)
+
+
+def _prune_snapshots(keep):
+    stale = [e for e in _snapshot_dirs() if e.name != keep][_KEEP_SNAPSHOTS - 1:]
+    for e in stale:
+        shutil.rmtree(e.path, ignore_errors=True)
+
+
+def _read_index(path):
+    """FAISS 인덱스를 mmap 으로 연다. 플랫 인덱스 mmap 을 모르는 빌드면 통째로 읽는다."""
+    import faiss
+
+    flags = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP) | faiss.IO_FLAG_READ_ONLY
+    try:
+        return faiss.read_index(path, flags)
+    except RuntimeError:
+        return faiss.read_index(path)
+
+
+def _read_snapshot(snap):
+    """스냅샷 디렉토리 → {manifest, index, docs(ChunkStore), bm25}. 없거나 깨졌으면 None."""
+    if not os.path.exists(os.path.join(snap, "manifest.json")):
+        return None
+    from rag_store import ChunkStore
+
+    try:
+        with open(os.path.join(snap, "manifest.json"), encoding="utf-8") as f:
+            manifest = json.load(f)
+        index = _read_index(os.path.join(snap, "index.faiss"))
+        with open(os.path.join(snap, "chunks.json"), encoding="utf-8") as f:
+            rows = json.load(f)
+        # 청크는 Document 를 거치지 않고 곧장 열 방향 저장소로.
+        docs = ChunkStore.from_records([c["text"] for c in rows], [c["metadata"] for c in rows])
+        bm25 = _read_bm25(snap)
+    except (OSError, ValueError, KeyError, RuntimeError) as e:
+        # 깨진 스냅샷을 믿고 쓰느니 새로 구축한다 — 느려질 뿐 틀리지는 않는다.
+        _log.warning("인덱스 스냅샷 %s 를 읽지 못했습니다 (%s)", os.path.basename(snap), type(e).__name__)
+        return None
+    if not (index.ntotal == len(docs) == bm25.corpus_size):
+        _log.warning("인덱스 스냅샷 %s 의 행 수가 어긋나 쓰지 않습니다", os.path.basename(snap))
+        return None
+    return {"manifest": manifest, "index": index, "docs": docs, "bm25": bm25}
+
+
+def _base_snapshot(space):
+    """같은 벡터 공간의 가장 최근 스냅샷 — 증분 재색인의 출발점."""
+    for e in _snapshot_dirs():
+        try:
+            with open(os.path.join(e.path, "manifest.json"), encoding="utf-8") as f:
+                if json.load(f).get("space") != space:
+                    continue
+        except (OSError, ValueError):
+            continue
+        base = _read_snapshot(e.path)
+        if base:
+            return base
+    return None
+
+
+def _reindex(embedding, base):
+    """base 에서 해시가 같은 문서는 옮겨 오고, 추가·변경 문서만 청킹·임베딩한다.
+
+    return (index, docs, bm25, files_manifest, counts)
+    BM25 는 BM25Index.splice 로 남는 문서의 행을 그대로 옮기고 새 문서만 토큰화한다 —
+    문서 빈도(df)는 빠지는 문서의 항을 빼고 새 문서의 항을 더해 갱신한다.
+    """
+    import faiss
+    import numpy as np
+    from rag_bm25 import BM25Index
+
+    hashes = _file_hashes()
+    old = base["manifest"]["files"] if base else {}
+    reuse = {f for f, h in hashes.items() if old.get(f, {}).get("hash") == h}
+
+    fresh_docs = load_corpus(files=set(hashes) - reuse) if len(reuse) < len(hashes) else []
+    fresh_vecs = (np.asarray(embedding.embed_documents([d.page_content for d in fresh_docs]),
+                             dtype="float32") if fresh_docs else None)
+    fresh_by_file = {}
+    for i, d in enumerate(fresh_docs):
+        fresh_by_file.setdefault(d.metadata["source_file"], []).append(i)
+
+    base_bm25 = base["bm25"] if base else BM25Index.from_tokens([])
+    dropped = sum(e["rows"][1] - e["rows"][0] for f, e in old.items() if f not in reuse)
+
+    docs, parts, segments, files = [], [], [], {}
+    for fname in hashes:
+        start = len(docs)
+        if fname in reuse:
+            s, e = old[fname]["rows"]
+            docs += base["docs"][s:e]
+            segments.append(("keep", s, e))
+            if e > s:
+                parts.append(base["index"].reconstruct_n(s, e - s))
+        else:
+            rows = fresh_by_file.get(fname, [])
+            docs += [fresh_docs[i] for i in rows]
+            segments.append(("new", [_tok(fresh_docs[i].page_content) for i in rows]))
+            if rows:
+                parts.append(fresh_vecs[rows])
+        files[fname] = {"hash": hashes[fname],
+                        "chunk_ids": [d.metadata["chunk_id"] for d in docs[start:]],
+                        "rows": [start, len(docs)]}
+
+    if base:
+        dim = base["index"].d
+    elif fresh_vecs is not None:
+        dim = fresh_vecs.shape[1]
+    else:
+        # 스냅샷도 새로 임베딩한 청크도 없다(빈 코퍼스) — 차원은 모델에 물어 빈 인덱스를 만든다
+        dim = len(embedding.embed_query(" "))
+    index = faiss.IndexFlatL2(dim)
+    if parts:
+        index.add(np.ascontiguousarray(np.vstack(parts), dtype="float32"))
+    counts = {"reused": len(docs) - len(fresh_docs), "embedded": len(fresh_docs), "removed": dropped}
+    return index, docs, base_bm25.splice(segments), files, counts
+
+
+def dense_index(embedding, index):
+    """FAISS 인덱스 → LangChain FAISS 래퍼(HybridRetriever 의 vectorstore 자리).
+
+    docstore 는 비워 둔다 — HybridRetriever 는 FAISS 행 번호를 청크 id 로 바로 쓰고 본문은
+    ChunkStore 에서 꺼낸다. 여기에 Document 를 채우면 청크 전체가 메모리에 한 벌 더 남는다.
+    index 자리에 벡터 리스트를 주면 IndexFlatL2 를 만들어 넣는다(FAISS.from_documents 와 같은 인덱스).
+    """
+    import numpy as np
+    from langchain_community.docstore.in_memory import InMemoryDocstore
     from langchain_community.vectorstores import FAISS
-    from langchain_community.embeddings import HuggingFaceEmbeddings
-    from rank_bm25 import BM25Okapi
 
-    docs = docs if docs is not None else load_corpus()
-    embedding = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
-    vectorstore = FAISS.from_documents(docs, embedding=embedding)
-    bm25 = BM25Okapi([_tok(d.page_content) for d in docs])
-    return HybridRetriever(vectorstore, docs, bm25, k=k)
+    if not hasattr(index, "ntotal"):
+        import faiss
+
+        vecs = np.asarray(index, dtype="float32")
+        index = faiss.IndexFlatL2(vecs.shape[1])
+        index.add(vecs)
+    return FAISS(embedding, index, InMemoryDocstore({}), {})
+
+
+def build_retriever(docs=None, k=5, embedding=None, snapshot=True):
+    """코퍼스 → FAISS+BM25 하이브리드 검색기. docs 미지정 시 load_corpus().
+
+    docs 를 넘기면 호출부가 만든 임의 코퍼스(청킹 실험 등)로 보고 스냅샷을 쓰지 않는다.
+    기본 코퍼스는 corpus_key() 가 같으면 rag_index/ 에서 복원하고, 아니면 직전 스냅샷에서
+    안 바뀐 문서를 옮겨 와 증분 구축한 뒤 저장한다. 어느 경로였는지와 재사용/재임베딩
+    청크 수는 retriever.build_stats 에 남는다.
+    """
+    t0 = time.perf_counter()
+    if embedding is None:
+        from rag_embed import embedding_service
+        embedding = embedding_service()
+
+    # 모델 id 에는 백엔드가 들어 있다(rag_embed) — FP32 인덱스와 INT8 인덱스는 키가 갈린다.
+    model = _model_id(embedding)
+    key = corpus_key(model=model) if docs is None and snapshot else None
+    hit = _read_snapshot(os.path.join(INDEX_DIR, key)) if key else None
+    if hit:
+        docs = hit["docs"]
+        vectorstore = dense_index(embedding, hit["index"])
+        bm25 = hit["bm25"]
+        source, counts = "snapshot", {"reused": len(docs), "embedded": 0, "removed": 0}
+    elif key:
+        space = _space(model=model)
+        base = _base_snapshot(space)
+        index, docs, bm25, files, counts = _reindex(embedding, base)
+        vectorstore = dense_index(embedding, index)
+        source = "incremental" if counts["reused"] else "built"
+        _save_snapshot(key, index, docs, bm25, {
+            "space": space, "files": files, "n_chunks": len(docs),
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        })
+        _log.info("MLOps 문서 인덱스 구축: 재사용 %d · 재임베딩 %d · 제거 %d 청크",
+                  counts["reused"], counts["embedded"], counts["removed"])
+    else:
+        docs = docs if docs is not None else load_corpus()
+        vectorstore = dense_index(embedding, embedding.embed_documents([d.page_content for d in docs]))
+        bm25 = bm25_index(docs)
+        source, counts = "built", {"reused": 0, "embedded": len(docs), "removed": 0}
+
+    retriever = HybridRetriever(vectorstore, docs, bm25, k=k)
+    retriever.build_stats = {"source": source, "key": key, "chunks": len(docs), **counts,
+                             "seconds": round(time.perf_counter() - t0, 3)}
+    return retriever
 
 
 # ── 인용/문맥 포맷 (생성 단계에서 사용) ──────────────────────────
@@ -168,8 +681,11 @@ if __name__ == "__main__":
     for src, n in by_src.items():
         print(f"  {src}: {n} 청크")
 
-    print("\n검색기 구축 중(임베딩)...")
-    r = build_retriever(corpus, k=4)
+    print("\n검색기 구축 중(스냅샷이 있으면 복원, 없으면 임베딩)...")
+    r = build_retriever(k=4)
+    b = r.build_stats
+    print(f"  → {b['source']} · {b['seconds']}s · 재사용 {b['reused']} · 재임베딩 {b['embedded']} "
+          f"· 제거 {b['removed']} 청크 · key={b['key']}")
 
     for q in [
         "What is MLOps level 1 pipeline automation?",
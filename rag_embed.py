@@ -0,0 +1,287 @@
+"""임베딩 백엔드 — PyTorch FP32(HuggingFaceEmbeddings) ↔ ONNX Runtime INT8 를 갈아 끼우는 자리.
+
+MLOps 문서 인덱스(rag_corpus.build_retriever)와 데이터 분석 업로드 인덱스
+(pages/2_Data_Analysis.build_vectorstore)가 모두 여기서 임베딩 객체를 받는다.
+무료 티어 컨테이너는 GPU 없는 CPU 2코어라, FP32 PyTorch 로 2,000행 파일을 임베딩하면
+진행 바가 필요할 만큼 오래 걸린다. 같은 all-MiniLM-L6-v2 를 ONNX 로 내보내 INT8 동적
+양자화한 뒤 ONNX Runtime 으로 돌리면 같은 CPU 에서 훨씬 빠르다(수치는 아래 CLI 로 잰다).
+
+백엔드
+- "torch"     : 지금까지와 같은 HuggingFaceEmbeddings. 기본값.
+- "onnx-int8" : sentence-transformers 의 ONNX 백엔드 + export_dynamic_quantized_onnx_model.
+                양자화 모델은 .onnx_models/ 에 한 번 만들어 두고 재사용한다.
+                sentence-transformers[onnx](optimum·onnxruntime)가 없으면 경고를 남기고
+                torch 로 내려간다 — 백엔드 하나 때문에 사이트가 안 뜨면 안 된다.
+
+공유 서비스: 호출부는 get_embedding 이 아니라 embedding_service() 를 쓴다. 프로세스에
+(백엔드, 모델)당 하나만 만들어 두 페이지·평가 하니스·retrieval_probe 가 같은 가중치를 쓴다
+— 예전엔 두 페이지가 각자 HuggingFaceEmbeddings 를 만들어 torch 모델이 컨테이너에 두 번
+올라갔다. 메모리·호출 수는 service_stats() 로 Observability 페이지에 나온다.
+
+고르는 법: EMBED_BACKEND 상수, 또는 환경 변수 EMBED_BACKEND(배포 설정에서 코드 수정 없이).
+기본값을 onnx-int8 로 바꾸는 건 `python rag_embed.py` 의 동치성 검사(코사인 ≥ 0.99)를
+배포와 같은 이미지에서 통과한 뒤에 한다.
+
+벡터 공간: INT8 벡터는 FP32 벡터와 '거의' 같지 같지는 않다. 그래서 임베딩 객체의
+model_name 에 백엔드를 붙여("…@onnx-int8-avx2") 인덱스 스냅샷 키와 질의 임베딩 캐시 키가
+백엔드마다 갈라지게 한다 — FP32 로 만든 인덱스를 INT8 질의로 검색하는 일이 없게.
+"""
+import logging
+import os
+import threading
+import time
+
+from rag_corpus import EMBED_MODEL
+
+EMBED_BACKEND = os.environ.get("EMBED_BACKEND", "torch")
+BACKENDS = ("torch", "onnx-int8")
+# ONNX Runtime intra-op 스레드. 무료 티어 vCPU 수에 맞춘다 — 더 주면 Streamlit 스크립트
+# 스레드·검색 풀과 코어를 다퉈 오히려 느려진다. 0 이면 ONNX Runtime 이 코어 수로 정한다.
+ONNX_THREADS = int(os.environ.get("EMBED_THREADS", "2"))
+# 동적 양자화 타깃. avx2 는 x86 어디서나 돈다. avx512_vnni 는 더 빠르지만 그 명령어가
+# 없는 호스트에서는 모델이 아예 안 뜬다 — 배포 호스트 CPU 를 모르니 보수적으로 잡는다.
+ONNX_QUANT = "avx2"
+# 내보낸·양자화한 모델(~90MB FP32 + ~23MB INT8). rag_index/ 안에 두면 스냅샷 정리
+# (_prune_snapshots)가 스냅샷으로 보고 지운다. 커밋할 물건도 아니라 git-ignore 한다.
+ONNX_DIR = os.path.join(os.path.dirname(__file__), ".onnx_models")
+# 동치성 기준: 같은 텍스트의 FP32 벡터와 INT8 벡터 코사인의 **최솟값**.
+PARITY_MIN_COSINE = 0.99
+# 공유 서비스가 embed_documents 를 나눠 보내는 크기. 2,000행 업로드를 한 번에 넘기면
+# 패딩된 텐서가 통째로 메모리에 올라간다 — 배치로 끊어 최대 사용량을 묶는다.
+EMBED_BATCH_SIZE = 64
+
+_log = logging.getLogger(__name__)
+
+
+def _st_embeddings_class():
+    """SentenceTransformer 를 LangChain Embeddings 로 감싼 클래스(지연 정의 — import 가 무겁다)."""
+    from langchain_core.embeddings import Embeddings
+
+    class SentenceTransformerEmbeddings(Embeddings):
+        """HuggingFaceEmbeddings 와 같은 encode 인자로 부른다 — 출력 차이는 백엔드 몫만 남게."""
+
+        def __init__(self, model, model_name, batch_size=32):
+            self.model, self.model_name, self.batch_size = model, model_name, batch_size
+
+        def embed_documents(self, texts):
+            texts = [t.replace("\n", " ") for t in texts]
+            return self.model.encode(texts, batch_size=self.batch_size,
+                                     show_progress_bar=False).tolist()
+
+        def embed_query(self, text):
+            return self.embed_documents([text])[0]
+
+    return SentenceTransformerEmbeddings
+
+
+def _quantized_path(model):
+    return os.path.join(ONNX_DIR, model.replace("/", "__"))
+
+
+def _onnx_int8(model, threads):
+    """INT8 ONNX 모델을 (없으면 내보내고 양자화해서) ONNX Runtime 으로 연다."""
+    import onnxruntime as ort
+    from sentence_transformers import SentenceTransformer, export_dynamic_quantized_onnx_model
+
+    path = _quantized_path(model)
+    file_name = f"onnx/model_qint8_{ONNX_QUANT}.onnx"
+    if not os.path.exists(os.path.join(path, file_name)):
+        # FP32 ONNX 로 내보낸(export) 모델을 저장하고, 그 옆에 동적 양자화본을 만든다.
+        fp32 = SentenceTransformer(model, backend="onnx", device="cpu")
+        fp32.save(path)
+        export_dynamic_quantized_onnx_model(fp32, ONNX_QUANT, path)
+        _log.info("INT8 ONNX 임베딩 모델 생성: %s", os.path.join(path, file_name))
+
+    opts = ort.SessionOptions()
+    opts.intra_op_num_threads = threads
+    opts.inter_op_num_threads = 1
+    st_model = SentenceTransformer(path, backend="onnx", device="cpu", model_kwargs={
+        "file_name": file_name, "provider": "CPUExecutionProvider", "session_options": opts})
+    return _st_embeddings_class()(st_model, f"{model}@onnx-int8-{ONNX_QUANT}")
+
+
+def get_embedding(backend=None, model=EMBED_MODEL, threads=None):
+    """백엔드 이름 → LangChain Embeddings. 결과의 model_name 이 벡터 공간 id 다."""
+    backend = backend or EMBED_BACKEND
+    if backend not in BACKENDS:
+        raise ValueError(f"알 수 없는 임베딩 백엔드: {backend!r} (가능: {', '.join(BACKENDS)})")
+    if backend == "onnx-int8":
+        try:
+            return _onnx_int8(model, ONNX_THREADS if threads is None else threads)
+        except ImportError as e:
+            _log.warning("onnx-int8 임베딩 백엔드를 쓸 수 없어 torch 로 내려갑니다 (%s)", e)
+    from langchain_community.embeddings import HuggingFaceEmbeddings
+    return HuggingFaceEmbeddings(model_name=model)
+
+
+# ── 프로세스 공유 임베딩 서비스 ──────────────────────────────────
+# Streamlit 은 세션마다 페이지 스크립트를 다시 돌리지만 임포트된 모듈은 프로세스에 하나라,
+# 모듈 전역에 두면 모든 세션·페이지가 같은 객체를 본다(st.cache_resource 없이도 — 그래서
+# streamlit 이 없는 평가 하니스·retrieval_probe 도 같은 경로를 쓴다).
+_SERVICES = {}
+_SERVICES_LOCK = threading.Lock()
+
+
+def _rss_bytes():
+    """현재 프로세스 상주 메모리(RSS). /proc 이 없는 OS 면 None."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def _weights_bytes(inner):
+    """임베딩 모델 가중치 바이트(알 수 있을 때만). torch 는 파라미터 합, ONNX 는 모델 파일 크기."""
+    st_model = getattr(inner, "model", None) or getattr(inner, "_client", None) or getattr(inner, "client", None)
+    try:
+        n = sum(p.numel() * p.element_size() for p in st_model.parameters())
+        if n:
+            return n
+    except (AttributeError, TypeError):
+        pass
+    if "@onnx" in getattr(inner, "model_name", ""):
+        model = inner.model_name.split("@", 1)[0]
+        path = os.path.join(_quantized_path(model), f"onnx/model_qint8_{ONNX_QUANT}.onnx")
+        if os.path.exists(path):
+            return os.path.getsize(path)
+    return None
+
+
+def _service_class():
+    from langchain_core.embeddings import Embeddings
+
+    class EmbeddingService(Embeddings):
+        """임베딩 모델 하나를 감싸 배치로 나눠 부르고 호출 수·시간을 센다."""
+
+        def __init__(self, inner, backend, load_s, rss_delta):
+            self.inner, self.backend = inner, backend
+            self.model_name = getattr(inner, "model_name", None) or type(inner).__name__
+            self.load_s, self.rss_delta = load_s, rss_delta
+            self.weights = _weights_bytes(inner)
+            self._lock = threading.Lock()
+            self.doc_calls = self.docs = self.query_calls = 0
+            self.embed_s = 0.0
+
+        def _count(self, t0, **inc):
+            with self._lock:
+                for k, v in inc.items():
+                    setattr(self, k, getattr(self, k) + v)
+                self.embed_s += time.perf_counter() - t0
+
+        def embed_documents(self, texts):
+            t0 = time.perf_counter()
+            out = []
+            for i in range(0, len(texts), EMBED_BATCH_SIZE):
+                out += self.inner.embed_documents(texts[i:i + EMBED_BATCH_SIZE])
+            self._count(t0, doc_calls=1, docs=len(texts))
+            return out
+
+        def embed_query(self, text):
+            t0 = time.perf_counter()
+            vec = self.inner.embed_query(text)
+            self._count(t0, query_calls=1)
+            return vec
+
+        def stats(self) -> dict:
+            mb = lambda n: round(n / 2**20, 1) if n is not None else None
+            with self._lock:
+                return {"model": self.model_name, "backend": self.backend,
+                        "load_s": round(self.load_s, 2), "rss_delta_mb": mb(self.rss_delta),
+                        "weights_mb": mb(self.weights), "doc_calls": self.doc_calls,
+                        "docs": self.docs, "query_calls": self.query_calls,
+                        "embed_s": round(self.embed_s, 2)}
+
+    return EmbeddingService
+
+
+def embedding_service(backend=None, model=EMBED_MODEL):
+    """프로세스 공유 임베딩 서비스. (백엔드, 모델)마다 처음 부를 때 한 번만 모델을 올린다.
+
+    모델 로딩은 잠금 아래서 한다 — 두 페이지가 동시에 첫 요청을 받으면 둘 다 로드해
+    메모리 최대치가 두 배가 되는, 이 서비스가 막으려던 바로 그 일이 난다.
+    """
+    backend = backend or EMBED_BACKEND
+    with _SERVICES_LOCK:
+        svc = _SERVICES.get((backend, model))
+        if svc is None:
+            rss0, t0 = _rss_bytes(), time.perf_counter()
+            inner = get_embedding(backend, model)
+            rss1 = _rss_bytes()
+            svc = _service_class()(inner, backend, time.perf_counter() - t0,
+                                   rss1 - rss0 if rss0 is not None and rss1 is not None else None)
+            _SERVICES[(backend, model)] = svc
+            _log.info("임베딩 모델 로드: %s (%.1fs)", svc.model_name, svc.load_s)
+        return svc
+
+
+def service_stats():
+    """올라가 있는 임베딩 서비스들의 stats() — 아직 아무도 임베딩을 안 했으면 빈 리스트."""
+    with _SERVICES_LOCK:
+        return [svc.stats() for svc in _SERVICES.values()]
+
+
+# ── 동치성 · 처리량 ──────────────────────────────────────────────
+def parity(texts, reference, candidate) -> dict:
+    """같은 텍스트의 두 백엔드 벡터 코사인 — {min, mean, n}. 기준은 min 으로 본다."""
+    import numpy as np
+
+    a = np.asarray(reference.embed_documents(texts), dtype="float64")
+    b = np.asarray(candidate.embed_documents(texts), dtype="float64")
+    cos = (a * b).sum(1) / (np.linalg.norm(a, axis=1) * np.linalg.norm(b, axis=1))
+    return {"min": float(cos.min()), "mean": float(cos.mean()), "n": len(texts)}
+
+
+def throughput(embedding, texts, batch_size=64) -> float:
+    """청크/초. 첫 배치(세션 준비·스레드 풀 기동)는 한 번 태운 뒤 잰다."""
+    import time
+
+    embedding.embed_documents(texts[:8])
+    t0 = time.perf_counter()
+    for i in range(0, len(texts), batch_size):
+        embedding.embed_documents(texts[i:i + batch_size])
+    return len(texts) / (time.perf_counter() - t0)
+
+
+def _upload_texts(limit=2000):
+    """데이터 분석 페이지가 업로드 파일을 임베딩하는 모양 그대로(행 → "열: 값" 줄)."""
+    import pandas as pd
+
+    df = pd.read_excel(os.path.join(os.path.dirname(__file__), "assets", "tebo_sample.xlsx")).head(limit)
+    return ["\n".join(f"{c}: {r[c]}" for c in df.columns if pd.notna(r[c]) and str(r[c]).strip())
+            for _, r in df.iterrows()]
+
+
+# ── CLI: python rag_embed.py [--threads N] ───────────────────────
+def main(argv=None):
+    import argparse
+
+    from rag_corpus import load_corpus
+
+    ap = argparse.ArgumentParser(description="임베딩 백엔드 동치성 검사 · 처리량 벤치마크")
+    ap.add_argument("--threads", type=int, default=ONNX_THREADS, help="ONNX Runtime intra-op 스레드")
+    args = ap.parse_args(argv)
+
+    torch_emb = get_embedding("torch")
+    onnx_emb = get_embedding("onnx-int8", threads=args.threads)
+    if "@onnx" not in onnx_emb.model_name:
+        print("onnx-int8 백엔드를 열지 못했습니다 — pip install 'sentence-transformers[onnx]'")
+        return 2
+
+    paths = {"corpus (rag_docs 청크)": [d.page_content for d in load_corpus()],
+             "upload (tebo_sample 행)": _upload_texts()}
+    ok = True
+    for name, texts in paths.items():
+        p = parity(texts, torch_emb, onnx_emb)
+        t_fp32, t_int8 = throughput(torch_emb, texts), throughput(onnx_emb, texts)
+        ok &= p["min"] >= PARITY_MIN_COSINE
+        print(f"\n[{name}] {p['n']}개")
+        print(f"  코사인 min {p['min']:.4f} · mean {p['mean']:.4f} (기준 min ≥ {PARITY_MIN_COSINE})")
+        print(f"  처리량 torch FP32 {t_fp32:,.0f} 청크/s · onnx INT8({args.threads}스레드) "
+              f"{t_int8:,.0f} 청크/s · {t_int8 / t_fp32:.1f}×")
+    print("\n동치성:", "통과" if ok else "실패 — 기본 백엔드로 쓰지 말 것")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
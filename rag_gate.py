@@ -0,0 +1,146 @@
+"""검색 신뢰도 게이트 — 점수가 분명할 때 LLM 관련성 판정(grade) 1콜을 건너뛴다.
+
+agent_rag 는 매 턴 "다시 검색할까?"를 묻는 데 Groq 왕복 한 번을 쓴다(첫 토큰 앞의 유일한 콜).
+그런데 HybridRetriever.search 가 이미 계산한 점수가 그 답을 상당 부분 예측한다:
+  · dense_top  — 최상위 청크의 코사인 유사도
+  · sparse_top — 최상위 BM25 점수(0 이면 질의어가 코퍼스 어디에도 없다)
+  · overlap    — dense·sparse 두 다리 top-k 가 겹친 비율(두 다리가 같은 곳을 가리키나)
+  · lang_match — 검색된 청크 중 질의와 같은 문자 체계(한글/라틴)인 비율. 영어 질의로 한국어
+                 KETI 문서를 찾는 교차언어 실패가 재작성의 주된 이유라 따로 본다.
+
+결정은 세 갈래다: 분명히 YES / 분명히 NO / 모르겠다(None → 지금처럼 LLM 판정).
+규칙은 일부러 단순한 임계값 두 묶음이다 — 표본이 수십 건이라 가중치를 학습하면 과적합이고,
+임계값은 trace 에서 사람이 읽고 반박할 수 있다.
+
+보정(calibration): `python evals/fit_gate.py` 가 golden_rag(+ archive·교차언어 프로브) 질의를
+검색해 신호를 모으고, 같은 청크에 대한 LLM 판정을 라벨로 받아 "결정한 건의 LLM 일치율 ≥
+GATE_MIN_AGREEMENT" 를 지키는 임계값 중 결정 비율(coverage)이 가장 큰 것을 고른다. 결과는
+GATE_FIT_PATH 에 남고 여기서 읽는다. 저장소에는 보정 파일이 없다(Groq 라벨 콜이 필요하다) —
+fit_gate.py 를 돌리기 전까지는 DEFAULT_THRESHOLDS(보수적 손값)를 쓰고, 그 값의 일치율은 아무도 재지 않았다.
+
+opt-in(RAG_GATE=1): 게이트가 틀리면 재작성이 필요한 질문을 그냥 통과시킨다. 보정 파일이 생기고
+그 일치율을 확인하기 전에는 켜지 않는다 — 보정 없이 켜면 한 번 경고한다. 꺼져 있어도 판정 trace 에는 게이트가 **내렸을** 결정이 남아
+(shadow) 평가 리포트가 실제 LLM 판정과의 일치율을 잰다.
+"""
+import json
+import logging
+import os
+import re
+from functools import lru_cache
+
+GATE_ENABLED = os.environ.get("RAG_GATE", "").lower() in ("1", "true", "yes")
+GATE_FIT_PATH = os.path.join(os.path.dirname(__file__), "evals", "gate_fit.json")
+# 보정 목표: 게이트가 결정한 건 중 LLM 판정과 같은 비율의 하한.
+GATE_MIN_AGREEMENT = 0.95
+# 보정 전 손값. YES 는 세 신호가 모두 강할 때만, NO 는 의미·키워드 둘 다 안 맞을 때만.
+# 나머지는 전부 LLM 으로 간다 — 틀린 YES(재작성 기회 상실)가 콜 하나보다 비싸다.
+DEFAULT_THRESHOLDS = {"yes_dense": 0.6, "yes_overlap": 0.4, "yes_lang": 0.6,
+                      "no_dense": 0.2, "no_sparse": 0.0}
+
+_log = logging.getLogger(__name__)
+
+_HANGUL = re.compile(r"[가-힣]")
+_LATIN = re.compile(r"[A-Za-z]")
+
+
+def _script(text):
+    """'ko' | 'en' | None(글자가 없다). 한글이 글자의 30% 이상이면 ko — 한국어 문서에도 영어 용어가 많다."""
+    ko, en = len(_HANGUL.findall(text)), len(_LATIN.findall(text))
+    if not ko + en:
+        return None
+    return "ko" if ko >= 0.3 * (ko + en) else "en"
+
+
+def signals(legs, query, chunks):
+    """검색 1회의 게이트 입력. 점수가 없으면(다리 하나 버림, .search 없는 검색기) None."""
+    scores = (legs or {}).get("scores")
+    if not scores or not chunks:
+        return None
+    q = _script(query)
+    same = sum(_script(c.page_content) == q for c in chunks) if q else 0
+    return {**scores, "lang_match": round(same / len(chunks), 3) if q else 1.0}
+
+
+@lru_cache(maxsize=1)
+def _fitted():
+    try:
+        with open(GATE_FIT_PATH, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        if GATE_ENABLED:
+            _log.warning("RAG_GATE 가 켜졌지만 보정 파일(%s)이 없어 검증 안 된 손값으로 판정을 건너뜁니다 — "
+                         "python evals/fit_gate.py 를 먼저 돌리세요", GATE_FIT_PATH)
+        return None
+
+
+def thresholds():
+    """보정 파일의 임계값, 없으면 DEFAULT_THRESHOLDS."""
+    fit = _fitted()
+    return dict(fit["thresholds"]) if fit and fit.get("thresholds") else dict(DEFAULT_THRESHOLDS)
+
+
+def decide(sig, th=None):
+    """"YES" | "NO" | None(불확실 — LLM 에 맡긴다)."""
+    if sig is None:
+        return None
+    th = th or thresholds()
+    if (sig["dense_top"] >= th["yes_dense"] and sig["overlap"] >= th["yes_overlap"]
+            and sig["lang_match"] >= th["yes_lang"]):
+        return "YES"
+    if sig["dense_top"] < th["no_dense"] and sig["sparse_top"] <= th["no_sparse"]:
+        return "NO"
+    return None
+
+
+def agreement(rows, th):
+    """rows=[(signals, llm_grade)] 에 임계값을 적용한 결과 — {n, decided, coverage, agreement}.
+
+    agreement 는 게이트가 결정한 건 중 LLM 과 같은 비율(결정한 게 없으면 None).
+    """
+    verdicts = [(decide(sig, th), grade) for sig, grade in rows]
+    decided = [(v, g) for v, g in verdicts if v is not None]
+    return {"n": len(rows), "decided": len(decided),
+            "coverage": round(len(decided) / len(rows), 3) if rows else None,
+            "agreement": round(sum(v == g for v, g in decided) / len(decided), 3) if decided else None}
+
+
+def _grid(values, lo, hi, step):
+    """관측값 사이의 경계들 + 양 끝 — 후보 임계값. 관측값이 없으면 등간격."""
+    pts = sorted(set(values))
+    mids = [(a + b) / 2 for a, b in zip(pts, pts[1:])]
+    out = {lo, hi, *(round(m, 4) for m in mids)}
+    if not pts:
+        out |= {round(lo + i * step, 4) for i in range(int((hi - lo) / step) + 1)}
+    return sorted(out)
+
+
+def fit(rows, min_agreement=GATE_MIN_AGREEMENT):
+    """rows=[(signals, llm_grade)] → (임계값, agreement 보고). 일치율 하한을 지키며 coverage 최대.
+
+    YES 규칙과 NO 규칙을 따로 고른다(서로의 결정 영역이 겹치지 않는다 — YES 는 dense_top 이
+    높고 NO 는 낮다). 하한을 지키는 후보가 없으면 그 규칙은 아무것도 결정하지 않게 둔다.
+    """
+    rows = [(s, g) for s, g in rows if s is not None]
+    never = {"yes_dense": 2.0, "yes_overlap": 2.0, "yes_lang": 2.0, "no_dense": -2.0, "no_sparse": -1.0}
+
+    def best(keys, grid):
+        # grid 는 엄격한 후보부터 — coverage 가 같으면 먼저 본(더 보수적인) 후보를 남긴다
+        chosen, decided = {k: never[k] for k in keys}, 0
+        for cand in grid:
+            rep = agreement(rows, {**never, **cand})
+            if rep["decided"] > decided and rep["agreement"] >= min_agreement:
+                chosen, decided = cand, rep["decided"]
+        return chosen
+
+    dense = [s["dense_top"] for s, _ in rows]
+    yes_grid = [{"yes_dense": d, "yes_overlap": o, "yes_lang": l}
+                for d in sorted(_grid(dense, 0.0, 1.0, 0.05), reverse=True)
+                for o in sorted(_grid([s["overlap"] for s, _ in rows], 0.0, 1.0, 0.2), reverse=True)
+                for l in (1.0, 0.8, 0.6, 0.4, 0.0)]
+    no_grid = [{"no_dense": d, "no_sparse": sp}
+               for d in _grid(dense, -1.0, 1.0, 0.05)
+               for sp in sorted({0.0, *(s["sparse_top"] for s, _ in rows)})]
+    no_grid.sort(key=lambda c: (c["no_dense"], c["no_sparse"]))
+    th = {**best(("yes_dense", "yes_overlap", "yes_lang"), yes_grid),
+          **best(("no_dense", "no_sparse"), no_grid)}
+    return th, agreement(rows, th)
@@ -0,0 +1,114 @@
+"""로컬 근거 점검 — 답의 문장마다 인용한 [n] 청크가 뒷받침하는지 LLM 없이 잰다.
+
+agent_rag 의 ⑤ 근거 자기점검은 LLM 1콜(RAG_GROUNDEDNESS_PROMPT_TEMPLATE)을 쓰는데, 결과는
+게이트가 아니라 라벨이다 — 8,000 TPM 에서 턴당 3~4콜 중 하나를 라벨 하나에 쓰는 셈이다.
+여기서는 같은 질문("답이 컨텍스트로 뒷받침되나?")을 문장 단위로 CPU 에서 답한다.
+
+문장마다:
+  · 인용: 문장 안의 [n] → n 번째 청크. 인용이 없는 문장은 청크 전체와 비교한다.
+  · lexical  — 문장의 내용어 중 인용 청크(들)에 있는 비율. 한글 어절은 글자 2-gram 으로 쪼갠다
+               (조사가 붙어 어절 단위로는 거의 안 맞는다).
+  · semantic — 공유 임베더(검색기와 같은 모델)로 잰 문장 ↔ 인용 청크 코사인의 최댓값.
+               임베더가 없으면(CI, .invoke 만 있는 검색기) 생략하고 lexical 만 쓴다.
+  · support  — 둘의 가중합(SEMANTIC_WEIGHT). support ≥ SUPPORT_MIN 이면 뒷받침된 문장.
+판정: 내용이 있는 문장이 전부 뒷받침되면 YES. 거절 문장("not in the indexed docs")은 근거가
+필요 없는 문장으로 빼므로 거절만 있는 답은 YES — LLM 프롬프트와 같은 규칙이다.
+
+임계값은 손값이다. 앱 기본을 이쪽으로 바꾸기 전에 평가 하니스가 매 실행 LLM 판정과 나란히
+이 결과를 기록하고(shadow) 리포트에 일치율을 남긴다 — 그 수치를 보고 바꾼다.
+"""
+import re
+import time
+
+# support = (1 - w) * lexical + w * semantic. 임베더가 없으면 lexical 만.
+SEMANTIC_WEIGHT = 0.5
+SUPPORT_MIN = 0.45
+# 내용어가 이보다 적은 문장(연결 문장·"Yes." 등)은 판정에서 뺀다.
+MIN_TERMS = 3
+
+_CITE = re.compile(r"\[(\d+)\]")
+_SENT_SPLIT = re.compile(r"(?<=[.!?。])\s+|\n+")
+_BULLET = re.compile(r"^\s*(?:[-*•]|\d+[.)])\s*")
+_REFUSAL = re.compile(r"not (?:in|covered (?:by|in)) the (?:indexed )?doc|"
+                      r"(?:색인된|인덱스된|제공된)?\s*문서에(?:는)?\s*(?:없|나와 있지 않)", re.IGNORECASE)
+_STOP = frozenset("""a an the and or of to in on for with by as at from is are was were be been it its this
+that these those can may uses use used using which what how when where why not no also into via than
+then there their they you your we our will would should could does do did has have had""".split())
+
+
+def content_terms(text):
+    """내용어 집합. 라틴 토큰은 그대로(불용어·1글자 제외), 한글 어절은 글자 2-gram."""
+    out = set()
+    for tok in re.findall(r"[a-z0-9가-힣]+", _CITE.sub(" ", text).lower()):
+        if re.match(r"[가-힣]", tok):
+            out.update(tok[i:i + 2] for i in range(len(tok) - 1))
+        elif len(tok) > 1 and tok not in _STOP:
+            out.add(tok)
+    return out
+
+
+def sentences(answer):
+    """[(문장, 인용 번호 리스트)] — 목록 기호는 떼고 빈 줄은 버린다."""
+    out = []
+    for raw in _SENT_SPLIT.split(answer or ""):
+        s = _BULLET.sub("", raw).strip()
+        if s:
+            out.append((s, [int(n) for n in _CITE.findall(s)]))
+    return out
+
+
+def is_refusal(answer):
+    return bool(_REFUSAL.search(answer or ""))
+
+
+def _cosines(embedding, texts, chunk_texts):
+    """[문장 i 의 청크별 코사인 리스트]. 한 번의 embed_documents 로 문장·청크를 같이 인코딩."""
+    import numpy as np
+
+    vecs = np.asarray(embedding.embed_documents(list(texts) + list(chunk_texts)), dtype=np.float32)
+    vecs /= np.maximum(np.linalg.norm(vecs, axis=1, keepdims=True), 1e-12)
+    s, c = vecs[:len(texts)], vecs[len(texts):]
+    return (s @ c.T).tolist()
+
+
+def check(answer, chunks, embedding=None) -> dict:
+    """return {verdict, min_support, sentences[{text, cites, lexical, semantic, support}], ms, refusal}.
+
+    cites 는 실제로 있는 청크 번호만 남긴다(범위 밖 [n] 은 인용 없음으로 본다 — 그러면 청크
+    전체와 비교되고, 근거가 없으면 support 가 낮게 나와 NO 가 된다).
+    """
+    t0 = time.perf_counter()
+    chunk_texts = [c.page_content for c in chunks]
+    chunk_terms = [content_terms(t) for t in chunk_texts]
+    rows, refusal = [], False
+    for text, cites in sentences(answer):
+        terms = content_terms(text)
+        if is_refusal(text):
+            refusal = True            # 거절 문장 자체는 근거가 필요 없다 — 나머지 문장만 본다
+            continue
+        if len(terms) < MIN_TERMS:
+            continue
+        cites = [n for n in cites if 1 <= n <= len(chunks)]
+        rows.append({"text": text, "cites": cites, "_terms": terms})
+
+    sem = None
+    if embedding is not None and rows and chunk_texts:
+        try:
+            sem = _cosines(embedding, [r["text"] for r in rows], chunk_texts)
+        except Exception:  # noqa: BLE001 — 임베더 고장이 판정을 막지 않게 lexical 로 내려간다
+            sem = None
+
+    for i, r in enumerate(rows):
+        idx = [n - 1 for n in r["cites"]] or range(len(chunk_texts))
+        terms = r.pop("_terms")
+        # 여러 청크를 인용한 문장은 사실을 합쳐 쓴다 — 인용 청크 어휘의 합집합과 비교한다
+        pool = set().union(*(chunk_terms[j] for j in idx))
+        r["lexical"] = round(len(terms & pool) / len(terms), 3)
+        r["semantic"] = round(max(sem[i][j] for j in idx), 3) if sem is not None and idx else None
+        r["support"] = (r["lexical"] if r["semantic"] is None
+                        else round((1 - SEMANTIC_WEIGHT) * r["lexical"] + SEMANTIC_WEIGHT * r["semantic"], 3))
+
+    min_support = min((r["support"] for r in rows), default=None)
+    verdict = "YES" if min_support is None or min_support >= SUPPORT_MIN else "NO"
+    return {"verdict": verdict, "min_support": min_support, "sentences": rows,
+            "refusal": refusal, "ms": round((time.perf_counter() - t0) * 1000, 1)}
@@ -0,0 +1,268 @@
+"""열(column) 방향 청크 저장소 + 정수 id 위의 RRF 융합 (NumPy 전용).
+
+HybridRetriever 는 청크마다 LangChain Document(파이썬 객체 + 메타데이터 dict)를 들고
+있었고, RRF 는 점수를 `d.page_content`(데이터 분석 인덱스는 행당 최대 1,000자)로 키잉해
+두 다리가 모두 Document 리스트를 돌려줘야 했다. 같은 Document 들은 LangChain FAISS 래퍼의
+docstore 에도 한 벌 더 잡혀 있었다.
+
+여기서는
+  · 청크 = 정수 id. 본문은 UTF-8 **버퍼 하나** + 오프셋 배열, 같은 본문은 한 번만 담는다.
+  · 메타데이터는 열마다 타입 배열 — 정수 열은 int64 배열, 나머지는 사전 인코딩(값 목록 + int32 코드).
+  · 본문이 같은 청크는 구축 때 한 번 해시해 canon(첫 청크 id)으로 묶는다. 예전 RRF 가 본문으로
+    중복을 합치던 동작을 질의마다 문자열을 해시하지 않고 그대로 재현한다.
+  · RRF 는 다리별 id 배열을 이어 붙여 안정 정렬 + bincount 로 합산한다.
+  · Document 는 최종 top-k 만 만든다.
+
+동치성(테스트가 고정): 융합 점수는 예전 dict 누적과 **같은 순서로** 더해져 비트 단위로 같고,
+동점은 먼저 나온 청크가 먼저다(예전 dict 삽입 순서 + 안정 정렬). 본문이 같은 청크 둘이 후보에
+있으면 예전에는 나중에 본 쪽 객체를, 이제는 첫 청크를 돌려준다 — 본문은 같다.
+
+실측(python rag_store.py, 합성 데이터 분석 행(12열 "열: 값" 줄) · 다리마다 후보 15 → top-5,
+2026-10-18 · 로컬 CPU, 두 번 돌린 범위 — 20만은 한 번):
+    청크 수    Document 리스트   이 저장소    id 가 나온 뒤 융합+top-k(예전 → 지금)
+      2,000        4.2 MB          1.1 MB       50–55 → 122 µs
+     20,000       35.4 MB         11.3 MB       76–79 → 103–107 µs
+    200,000      354 MB          113 MB          152 → 127 µs
+  메모리는 3.1–3.8× 준다 — 객체·dict 헤더가 사라지고, 한글이 섞인 본문이 파이썬 str(UCS-2)
+  대신 UTF-8 로 담기기 때문이다. 예전에는 같은 Document 가 FAISS docstore 에도 잡혀 있었으므로
+  이제 dense_index 는 docstore 를 비워 둔다.
+  지연은 정직하게 말해 **작은 인덱스에서 수십 µs 느리다.** 후보가 30개뿐이라 NumPy 호출
+  고정비가 dict 보다 크고, 예전에는 미리 만들어 둔 Document 를 돌려줬지만 이제 top-k 5개를
+  그때 만든다(Document 하나 ~10 µs). 예전 경로는 청크 수가 늘수록 캐시 밖 객체를 건드려
+  느려지고, 20만 청크쯤에서 역전된다. 어느 쪽이든 질의 인코딩(수~수십 ms)에 비하면 잡음이라,
+  이 변경의 값은 메모리다.
+"""
+import numpy as np
+
+
+def rrf(ranklists, k=5, c=60):
+    """Reciprocal Rank Fusion over 정수 id 배열 → 상위 k id(np.int64).
+
+    점수 = Σ 1/(c + rank + 1). 동점이면 이어 붙인 순서에서 먼저 나온 id 가 먼저.
+    """
+    lists = [np.asarray(r, dtype=np.int64) for r in ranklists]
+    lists = [r for r in lists if len(r)]
+    if not lists:
+        return np.zeros(0, dtype=np.int64)
+    ids = np.concatenate(lists)
+    weights = np.concatenate([1.0 / (c + np.arange(len(r), dtype=np.float64) + 1) for r in lists])
+    # 안정 정렬로 같은 id 를 모으면 묶음 안 순서가 입력 순서 그대로다. bincount 는 그 순서로
+    # 더한다 — 예전 `scores.get(key, 0.0) + w` 와 같은 부동소수 합.
+    order = np.argsort(ids, kind="stable")
+    sid = ids[order]
+    head = np.empty(len(sid), dtype=bool)
+    head[0] = True
+    np.not_equal(sid[1:], sid[:-1], out=head[1:])
+    scores = np.bincount(np.cumsum(head) - 1, weights=weights[order])
+    first = order[head]
+    return sid[head][np.lexsort((first, -scores))[:k]]
+
+
+def _document_class():
+    from langchain_core.documents import Document
+
+    return Document
+
+
+class ChunkStore:
+    """청크 n 개를 열 방향으로. store[i] / store.docs(ids) 가 그때그때 Document 를 만든다.
+
+    factory: Document 를 만들 클래스(page_content=, metadata= 키워드). from_documents 는
+    받은 객체의 클래스를 그대로 쓴다 — 기본은 langchain_core Document(지연 import).
+    """
+
+    def __init__(self, buf, offsets, slot, canon, keys, columns, factory=None):
+        self._buf = buf
+        self._offsets = offsets
+        self._slot = slot
+        self.canon = canon
+        self._keys = keys
+        self._columns = columns
+        self._factory = factory
+
+    # ── 구축 ───────────────────────────────────────────────────────
+    @classmethod
+    def from_records(cls, texts, metadatas, factory=None):
+        """본문 리스트 + 메타데이터 dict 리스트 → 저장소."""
+        parts, offsets, slot_of = [], [0], {}
+        slot, canon = [], []
+        first_chunk = []
+        for i, text in enumerate(texts):
+            s = slot_of.get(text)
+            if s is None:
+                s = slot_of[text] = len(parts)
+                b = text.encode("utf-8")
+                parts.append(b)
+                offsets.append(offsets[-1] + len(b))
+                first_chunk.append(i)
+            slot.append(s)
+            canon.append(first_chunk[s])
+
+        metadatas = list(metadatas)
+        keys = list(dict.fromkeys(k for m in metadatas for k in m))
+        columns = {k: _column([m.get(k, _MISSING) for m in metadatas]) for k in keys}
+        return cls(b"".join(parts), np.asarray(offsets, dtype=np.int64),
+                   np.asarray(slot, dtype=np.int32), np.asarray(canon, dtype=np.int64),
+                   keys, columns, factory)
+
+    @classmethod
+    def from_documents(cls, docs):
+        docs = list(docs)
+        return cls.from_records([d.page_content for d in docs], [d.metadata for d in docs],
+                                factory=type(docs[0]) if docs else None)
+
+    # ── 조회 ───────────────────────────────────────────────────────
+    def __len__(self):
+        return len(self._slot)
+
+    def text(self, i):
+        s = int(self._slot[i])
+        a, b = self._offsets[s:s + 2].tolist()
+        return self._buf[a:b].decode("utf-8")
+
+    def metadata(self, i):
+        out = {}
+        for k in self._keys:
+            v = _cell(self._columns[k], i)
+            if v is not _MISSING:
+                out[k] = v
+        return out
+
+    def doc(self, i):
+        if self._factory is None:
+            self._factory = _document_class()
+        return self._factory(page_content=self.text(i), metadata=self.metadata(i))
+
+    def docs(self, ids):
+        return [self.doc(int(i)) for i in ids]
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return self.docs(range(*i.indices(len(self))))
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return self.doc(i)
+
+    def __iter__(self):
+        return (self.doc(i) for i in range(len(self)))
+
+    @property
+    def nbytes(self):
+        """버퍼·배열·사전 값 목록의 대략 바이트(파이썬 객체 헤더는 sys.getsizeof 기준)."""
+        import sys
+
+        n = len(self._buf) + self._offsets.nbytes + self._slot.nbytes + self.canon.nbytes
+        for kind, values, codes in self._columns.values():
+            n += codes.nbytes + (values.nbytes if kind == "int" else sum(map(sys.getsizeof, values)))
+        return n
+
+
+# ── 메타데이터 열 ─────────────────────────────────────────────────
+# (kind, values, codes)
+#   "int": values = int64 배열(행마다), codes = 있음 표시(bool)
+#   "cat": values = 서로 다른 값 목록,  codes = int32 인덱스(-1 = 그 행에 키 없음)
+#   "obj": values = 행마다 원래 값(해시 불가 값이 섞인 열)   codes = 있음 표시(bool)
+_MISSING = object()
+
+
+def _column(cells):
+    present = np.asarray([v is not _MISSING for v in cells], dtype=bool)
+    vals = [v for v in cells if v is not _MISSING]
+    if vals and all(type(v) is int for v in vals):
+        return "int", np.asarray([v if v is not _MISSING else 0 for v in cells], dtype=np.int64), present
+    try:
+        index, values, codes = {}, [], []
+        for v in cells:
+            if v is _MISSING:
+                codes.append(-1)
+                continue
+            c = index.get(v)
+            if c is None:
+                c = index[v] = len(values)
+                values.append(v)
+            codes.append(c)
+        return "cat", values, np.asarray(codes, dtype=np.int32)
+    except TypeError:
+        return "obj", list(cells), present
+
+
+def _cell(column, i):
+    kind, values, codes = column
+    if kind == "cat":
+        c = codes[i]
+        return values[c] if c >= 0 else _MISSING
+    if not codes[i]:
+        return _MISSING
+    return int(values[i]) if kind == "int" else values[i]
+
+
+# ── 벤치마크: python rag_store.py ─────────────────────────────────
+def _synthetic_rows(n, seed=0):
+    """데이터 분석 페이지의 행 청크를 흉내 낸 (본문, 메타데이터) — "열: 값" 줄 묶음."""
+    rng = np.random.default_rng(seed)
+    words = ("pipeline", "model", "serving", "latency", "region", "seoul", "busan", "store",
+             "revenue", "장비", "센서", "온도", "정상", "이상", "batch", "feature", "drift")
+    texts, metas = [], []
+    for i in range(n):
+        lines = [f"col_{c}: " + " ".join(rng.choice(words, size=rng.integers(3, 9)))
+                 for c in range(12)]
+        texts.append("\n".join(lines))
+        metas.append({"row": i, "source": "upload.xlsx", "summary_title": lines[0][:50]})
+    return texts, metas
+
+
+def _old_rrf(ranklists, k=5, c=60):
+    """예전 rag_corpus._rrf — 본문 문자열 키 dict 누적(비교 기준)."""
+    scores, docmap = {}, {}
+    for docs in ranklists:
+        for rank, d in enumerate(docs):
+            key = d.page_content
+            scores[key] = scores.get(key, 0.0) + 1.0 / (c + rank + 1)
+            docmap[key] = d
+    top = sorted(scores, key=scores.get, reverse=True)[:k]
+    return [docmap[key] for key in top]
+
+
+def main():
+    import time
+    import tracemalloc
+
+    Document = _document_class()
+
+    def traced(fn):
+        tracemalloc.start()
+        out = fn()
+        mem = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        return out, mem
+
+    print(f"{'청크 수':>9} | {'Document 리스트':>15} | {'이 저장소':>9} | 융합+top-k 예전 → 지금 | 결과 동일")
+    for n in (2_000, 20_000, 200_000):
+        # 예전: 본문 str·메타데이터 dict 를 Document 가 소유 — 본문까지 포함해 잰다.
+        docs, mem_docs = traced(lambda: [Document(page_content=t, metadata=m)
+                                         for t, m in zip(*_synthetic_rows(n))])
+        texts, metas = _synthetic_rows(n)
+        store, mem_store = traced(lambda: ChunkStore.from_records(texts, metas))
+        del texts, metas
+
+        # 다리가 id 를 돌려준 뒤의 단계만 잰다(FAISS·BM25 검색 자체는 양쪽이 같다).
+        # 예전: dense 히트를 docstore 에서 Document 로, sparse 는 리스트에서 → 본문 키 RRF.
+        docstore = {str(i): d for i, d in enumerate(docs)}
+        rng = np.random.default_rng(1)
+        queries = [(rng.choice(n, 15, replace=False), rng.choice(n, 15, replace=False)) for _ in range(500)]
+        t0 = time.perf_counter()
+        old = [_old_rrf([[docstore[str(i)] for i in a], [docs[i] for i in b]]) for a, b in queries]
+        t_old = (time.perf_counter() - t0) / len(queries) * 1e6
+        t0 = time.perf_counter()
+        new = [store.docs(rrf([store.canon[a], store.canon[b]])) for a, b in queries]
+        t_new = (time.perf_counter() - t0) / len(queries) * 1e6
+        same = [[d.page_content for d in r] for r in old] == [[d.page_content for d in r] for r in new]
+        print(f"{n:>9,} | {mem_docs / 2**20:>12.1f} MB | {mem_store / 2**20:>6.1f} MB | "
+              f"{t_old:>8.0f} → {t_new:>4.0f} µs      | {same}")
+        del docs, docstore, store
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""컨테이너 기동 직후 MLOps 문서 검색기를 백그라운드에서 미리 데운다(opt-in).
+
+rag_corpus 는 torch·faiss·sentence-transformers 를 일부러 늦게 import 한다 — 홈·챗봇만 보는
+방문자가 그 비용을 낼 이유가 없어서다. 그 대가로 MLOps Docs 페이지의 **첫 방문자**가 무거운
+import + 임베딩 모델 로드 + 인덱스 복원(또는 구축)을 스피너 앞에서 전부 기다렸다.
+
+여기서는 홈(jisangfolio.py)이 처음 렌더될 때 데몬 스레드 하나를 띄워 그 일을 미리 한다.
+  ① 무거운 스택 import  ② 공유 임베딩 서비스 로드(rag_embed)  ③ 검색기 복원/구축
+  ④ 질의 한 번(인코더 첫 추론·검색 풀 기동)
+결과는 retriever() 로 내보내고, pages/4 의 get_retriever() 가 그걸 가져다 쓴다. 예열이 아직
+도는 중에 방문자가 먼저 도착하면 **새로 만들지 않고 예열이 끝나길 기다린다** — 둘이 동시에
+구축하면 같은 모델·인덱스가 메모리에 두 번 올라간다.
+
+opt-in 인 이유: 무료 티어는 유휴 시 잠들고 방문 때 깨어난다. 홈만 보고 나가는 방문자가
+대부분이면 예열은 쓰이지 않을 메모리(모델 ~90MB + torch)를 상주시킨다. 켜는 법은
+환경 변수 RAG_WARMUP=1. 상태·단계별 시간은 status() 로 Observability 페이지에 나온다.
+"""
+import logging
+import os
+import threading
+import time
+
+# pages/4 의 검색기와 같은 k — 예열 결과를 그대로 넘겨주므로 달라지면 안 된다.
+DOCS_RETRIEVER_K = 5
+WARMUP_ENABLED = os.environ.get("RAG_WARMUP", "").lower() in ("1", "true", "yes")
+# 예열 마지막 단계에서 던지는 질의. 결과는 버린다(질의 캐시에 한 칸 남을 뿐).
+WARMUP_QUERY = "What is an MLOps pipeline?"
+
+_log = logging.getLogger(__name__)
+
+
+class _Warmup:
+    """프로세스당 하나. 상태 전이: idle → running → ready | failed."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.done = threading.Event()
+        self.thread = None
+        self.state = {"status": "idle", "started": None, "finished": None,
+                      "steps": {}, "source": None, "error": None}
+        self.retriever = None
+
+
+_WARM = _Warmup()
+
+
+def _import_stacks():
+    import faiss  # noqa: F401
+    import langchain_community.vectorstores  # noqa: F401
+    import sentence_transformers  # noqa: F401
+
+
+def _load_embedder():
+    from rag_embed import embedding_service
+    return embedding_service()
+
+
+def _build_retriever(embedding):
+    from rag_corpus import build_retriever
+    return build_retriever(k=DOCS_RETRIEVER_K, embedding=embedding)
+
+
+def _first_query(retriever):
+    retriever.invoke(WARMUP_QUERY)
+
+
+def _run(w):
+    def step(name, fn, *args):
+        t0 = time.perf_counter()
+        out = fn(*args)
+        with w.lock:
+            w.state["steps"][name] = round(time.perf_counter() - t0, 2)
+        return out
+
+    try:
+        step("imports", _import_stacks)
+        embedding = step("embedder", _load_embedder)
+        retriever = step("retriever", _build_retriever, embedding)
+        step("first_query", _first_query, retriever)
+    except Exception as e:  # noqa: BLE001 — 예열 실패는 방문자 경로(직접 구축)로 넘긴다
+        _log.warning("검색기 예열 실패 — 첫 방문자가 직접 구축합니다 (%s: %s)", type(e).__name__, e)
+        with w.lock:
+            w.state.update(status="failed", error=f"{type(e).__name__}: {e}", finished=time.time())
+    else:
+        with w.lock:
+            w.retriever = retriever
+            w.state.update(status="ready", finished=time.time(),
+                           source=getattr(retriever, "build_stats", {}).get("source"))
+        _log.info("검색기 예열 완료: %s", w.state["steps"])
+    finally:
+        w.done.set()
+
+
+def start(force=False):
+    """예열 스레드를 띄운다(프로세스당 한 번). 꺼져 있으면 아무것도 안 한다. return 띄웠는지."""
+    if not (WARMUP_ENABLED or force):
+        return False
+    w = _WARM
+    with w.lock:
+        if w.thread is not None:
+            return False
+        w.state.update(status="running", started=time.time())
+        w.thread = threading.Thread(target=_run, args=(w,), name="rag-warmup", daemon=True)
+    w.thread.start()
+    return True
+
+
+def retriever(timeout=None):
+    """예열한 검색기. 예열이 안 돌았거나 실패했으면 None — 호출부가 직접 구축한다.
+
+    진행 중이면 끝날 때까지(최대 timeout 초) 기다린다. 기다리다 시간이 다 되면 None 이라
+    호출부가 직접 구축하게 되는데, 그건 예열이 몇 분씩 멈춘 비정상일 때뿐이다.
+    """
+    w = _WARM
+    if w.thread is None:
+        return None
+    w.done.wait(timeout)
+    with w.lock:
+        return w.retriever
+
+
+def status() -> dict:
+    """{status, started, finished, steps{단계: 초}, source(snapshot/incremental/built), error, total_s}."""
+    w = _WARM
+    with w.lock:
+        st = {**w.state, "steps": dict(w.state["steps"])}
+    if st["started"] and st["finished"]:
+        st["total_s"] = round(st["finished"] - st["started"], 2)
+    return st
@@ -5,21 +5,42 @@ Agentic RAG는 질문 하나당 판정→(재작성)→생성→근거점검으
 상한을 넘기는 건 예외 상황이 아니라 정상 부하다. 그래서 두 겹을 둔다.
 
   ① TokenPacer — 최근 60초 사용량을 추적해, 다음 호출이 상한을 넘길 것 같으면 미리 잔다.
-     성공한 호출의 **실제 usage**를 되먹여 추정 오차가 누적되지 않게 한다.
+     호출 전에 추정치를 예약(reserve)하고, 끝나면 **실제 usage**로 확정(commit)해
+     추정 오차가 누적되지 않게 한다.
   ② parse_wait_seconds — 그래도 429가 나면 서버가 알려준 대기시간을 그대로 존중한다.
      "9.8s"·"1m20s"·"1h2m3s"·"90ms" 형식을 모두 처리한다 — 초 단위만 파싱하던 구현은
      분 단위 응답에서 조용히 폴백으로 떨어져(1·2·4·8초) 사실상 재시도를 포기했다.
+     페이서가 마감 안에 못 들어가 던지는 TimeoutError 도 같은 꼴("try again in 12.3s")로
+     창이 비는 시각을 싣는다 — 호출부가 그대로 "N초 뒤 다시"를 알릴 수 있게.
 
 모델별로 버킷이 따로이므로 페이서도 모델별로 둔다(pacer_for).
+같은 키를 쓰는 여러 프로세스(앱·평가 하니스·MCP)가 한 창을 보게 하려면
+PACER_BACKEND=sqlite 로 공유 창(SharedTokenPacer)을 켠다 — 기본은 프로세스 안 메모리다.
+창 앞에는 우선순위 입장 순서가 있다(PRIORITY_CLASSES) — 방문자 답변이 평가 배치 뒤에 줄 서지 않게.
+Groq 응답 헤더(groq_transport 의 응답 훅 → observe_headers)가 서버 쪽 창 사용량을 알려 주면
+그 값을 reset 까지 창의 하한으로 둔다 — 로컬 추정만으로는 다른 클라이언트가 쓴 몫이 안 보인다.
 """
+import contextlib
+import contextvars
+import hashlib
+import heapq
+import itertools
 import json
 import os
 import re
+import sqlite3
 import threading
 import time
 from collections import deque
 from datetime import datetime
 
+try:
+    import fcntl
+except ImportError:       # Windows — 원장 잠금은 프로세스 안에서만
+    fcntl = None
+
+from observability import record_admission_queued, record_admission_wait
+
 # 무료 티어 기본값. 실제 값은 응답 헤더 x-ratelimit-limit-tokens 로 갱신된다.
 DEFAULT_TPM = 8000
 # 상한의 몇 %까지만 쓸지 — 프롬프트 토큰 추정 오차와 동시성 여지를 남긴다.
@@ -28,6 +49,39 @@ SAFETY = 0.85
 _DURATION_PARTS = re.compile(r"([\d.]+)\s*(ms|h|m|s)")
 _TRY_AGAIN = re.compile(r"try again in\s*([0-9hms.\s]+)", re.IGNORECASE)
 
+# ── 입장 우선순위 ───────────────────────────────────────────────────
+# 예전 wait_for 는 먼저 온 순서대로 잤다. 그래서 방문자의 답변 생성이 백그라운드 평가 실행이나
+# 근거점검 콜 몰림 뒤에서 창 한 바퀴(최대 60초)를 기다렸다. 이제 기다리는 호출은 (등급, 도착 순)
+# 으로 줄 서고, 줄 맨 앞만 창에 들어간다. 앞일수록 먼저:
+#   answer — 방문자 턴의 답변 생성 · check — 같은 턴의 판정·재작성·근거점검
+#   mcp — MCP 서버(ask_jisang) · batch — 평가 하니스·agentic_answer_batch
+PRIORITY_CLASSES = ("answer", "check", "mcp", "batch")
+# batch 는 창의 이 몫을 비워 둔 채로만 들어간다. 이미 돌고 있는 배치 작업도 콜마다 다시 줄을
+# 서므로(콜 경계에서 선점), 방문자가 오면 다음 콜부터 뒤로 밀리고 남겨 둔 몫으로 방문자가 바로 들어간다.
+INTERACTIVE_HEADROOM = 0.25
+
+_PRIORITY = contextvars.ContextVar("pacer_priority", default=None)
+
+
+def _rank(cls):
+    return PRIORITY_CLASSES.index(cls)
+
+
+@contextlib.contextmanager
+def priority(cls):
+    """이 블록 안의 페이서 입장 등급. 중첩하면 **낮은 쪽**이 이긴다 — 배치 작업 안의 답변 생성은
+    배치다(안쪽 콜이 스스로 등급을 올리지 못한다). 스레드로 넘기려면 contextvars 로 문맥을 복사한다."""
+    cur = _PRIORITY.get()
+    token = _PRIORITY.set(cls if cur is None or _rank(cls) > _rank(cur) else cur)
+    try:
+        yield
+    finally:
+        _PRIORITY.reset(token)
+
+
+def current_priority() -> str:
+    return _PRIORITY.get() or PRIORITY_CLASSES[0]
+
 
 def parse_duration(text):
     """'1m20s' → 80.0, '9.8s' → 9.8, '90ms' → 0.09. 못 읽으면 None."""
@@ -53,20 +107,107 @@ def parse_wait_seconds(err):
     return parse_duration(m.group(1)) if m else None
 
 
+def _header_int(headers, key):
+    try:
+        return int(float(headers.get(key)))
+    except (TypeError, ValueError):
+        return None
+
+
+def server_window(headers, limit: int = DEFAULT_TPM):
+    """응답 헤더 → (서버가 보는 분당 토큰 사용량, 그 값이 풀리는 시각(time.time)) | None.
+
+    x-ratelimit-remaining-tokens 가 남은 분당 토큰, x-ratelimit-reset-tokens 가 다 찰 때까지의
+    시간이다. 요청 한도(x-ratelimit-remaining-requests)가 0 이면 reset-requests 까지 창을 가득 찬
+    것으로 본다 — 토큰이 남아도 요청이 안 들어간다.
+    """
+    headers = headers or {}
+    now = time.time()
+    out = None
+    remaining = _header_int(headers, "x-ratelimit-remaining-tokens")
+    limit = _header_int(headers, "x-ratelimit-limit-tokens") or limit
+    if remaining is not None:
+        reset = parse_duration(headers.get("x-ratelimit-reset-tokens")) or 0.0
+        out = (max(limit - remaining, 0), now + reset)
+    if _header_int(headers, "x-ratelimit-remaining-requests") == 0:
+        reset = parse_duration(headers.get("x-ratelimit-reset-requests"))
+        if reset:
+            out = (max(limit, out[0] if out else 0), max(now + reset, out[1] if out else 0))
+    return out
+
+
 def is_daily_limit(err) -> bool:
     """일일 한도(TPD/RPD)면 기다려도 안 풀린다 — 재시도 대신 즉시 중단해야 한다."""
     msg = str(err).lower()
     return "per day" in msg or "tpd" in msg or "rpd" in msg
 
 
+class _Reservation(list):
+    """[timestamp, tokens] 예약. pending 은 아직 확정(commit)하지 않은 동안 True.
+    cls 는 입장한 등급 — 확정은 priority 블록 밖에서 일어나므로 문맥 대신 이 값을 사용량 로그에 남긴다."""
+
+    pending = True
+    cls = None
+
+
+class _Window(deque):
+    """(timestamp, tokens) 창 + 합계(total)·미확정 예약 합(pending). append·popleft 가 같이 고친다.
+
+    예전 _used 는 대기 루프를 돌 때마다 창 전체를 다시 더했다. 기록은 시간순으로만 붙고
+    앞에서만 빠지므로 합계를 들고 다니면 확인이 O(1)(만료분 제거는 분할 상환 O(1))이다.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.total = 0
+        self.pending = 0
+
+    def append(self, entry):
+        super().append(entry)
+        self.total += entry[1]
+        if getattr(entry, "pending", False):
+            self.pending += entry[1]
+
+    def popleft(self):
+        entry = super().popleft()
+        self.total -= entry[1]
+        if getattr(entry, "pending", False):
+            self.pending -= entry[1]
+            entry.pending = False
+        return entry
+
+    def holds(self, entry) -> bool:
+        """entry 가 아직 창 안인가 — 시간순이라 맨 앞보다 늦으면 안이다(같은 시각은 함께 빠진다)."""
+        return bool(self) and entry[0] >= self[0][0]
+
+
 class TokenPacer:
-    """최근 60초 토큰 사용량을 보고 선제적으로 재우는 슬라이딩 윈도우 페이서."""
+    """최근 60초 토큰 사용량을 보고 선제적으로 재우는 슬라이딩 윈도우 페이서.
+
+    reserve → (호출) → commit(실제 사용량) / release(취소) 가 기본 흐름이다. 확인과 예약 적재가
+    한 잠금 안에서 일어나므로 동시에 들어온 호출들이 같은 여유를 보고 함께 상한을 넘기지 못한다.
+    기다리는 호출은 조건 변수에서 잔다 — 예약이 취소·축소되거나 줄 맨 앞이 바뀌면 바로 깨고,
+    아니면 가장 오래된 기록이 창 밖으로 나가는 시각에 깬다(폴링하지 않는다).
+    """
 
-    def __init__(self, tpm_limit: int = DEFAULT_TPM, safety: float = SAFETY, verbose: bool = True):
+    # 조건 변수 대기의 상한(초). None 이면 창이 비는 시각까지 잔다 — 다른 프로세스가 창을
+    # 바꾸는 공유 창은 알림을 못 받으므로 짧게 잡는다(SharedTokenPacer).
+    _MAX_WAIT_S = None
+
+    def __init__(self, tpm_limit: int = DEFAULT_TPM, safety: float = SAFETY, verbose: bool = True,
+                 model: str = None):
         self.limit = tpm_limit
+        self.model = model     # 사용량 로그에 남길 모델 이름
         self.safety = safety
         self.verbose = verbose
-        self.events = deque()  # (timestamp, tokens)
+        self.events = _Window()  # (timestamp, tokens) — 예약분은 [timestamp, tokens] 리스트
+        # 재진입 잠금 — 대기 루프가 조건 변수를 쥔 채 _take 를 부르고, _take 가 다시 잡는다
+        self._lock = threading.RLock()
+        self._cond = threading.Condition(self._lock)
+        self._queue = []       # 기다리는 호출의 (등급, 도착 순) 힙 — 맨 앞만 창에 들어간다
+        self._arrivals = itertools.count()
+        # 서버가 본 창 (토큰, 풀리는 시각, 헤더를 읽은 시각) — 같은 키의 다른 클라이언트 사용량까지 들어 있다
+        self._floor = (0, 0.0, 0.0)
 
     @property
     def budget(self) -> float:
@@ -77,50 +218,387 @@ class TokenPacer:
         try:
             limit = int((headers or {}).get("x-ratelimit-limit-tokens", 0))
             if limit > 0:
-                self.limit = limit
+                with self._cond:
+                    self.limit = limit
+                    self._cond.notify_all()      # 상한이 올랐으면 기다리던 호출이 들어갈 수 있다
         except (TypeError, ValueError):
             pass
 
-    def _used(self, now: float) -> float:
+    def observe_headers(self, headers):
+        """Groq 응답 헤더로 상한과 서버 쪽 창 사용량을 받아들인다(groq_transport 의 응답 훅이 부른다).
+
+        로컬 창은 이 프로세스가 예약한 것만 안다. 서버는 같은 키의 모든 호출(다른 페이지·MCP·
+        평가)을 본다. 그래서 reset 시각까지 창 사용량을 max(로컬 합계, 서버 값 + 헤더를 읽은 뒤의
+        로컬 예약)으로 센다. 로컬 합계 전체를 더하지 않는 건 그 앞의 몫은 서버 값에 이미 들어 있어서다.
+        """
+        self.update_limit(headers)
+        seen = server_window(headers, self.limit)
+        if seen is not None:
+            self._set_floor(*seen)
+
+    def _set_floor(self, tokens, until, seen=None):
+        with self._cond:
+            prev = self._floor_at(time.time())
+            self._floor = (int(tokens), float(until), time.time() if seen is None else seen)
+            if tokens < prev:
+                self._cond.notify_all()          # 서버 쪽이 더 비었다 — 기다리던 호출이 들어갈 수 있다
+
+    def _floor_at(self, now):
+        tokens, until, _ = self._floor
+        return tokens if now < until else 0
+
+    def _view(self, now, local, pending, since, since_pending):
+        """(창 사용량, 미확정 예약이 모두 풀렸을 때의 사용량).
+
+        서버 값이 살아 있으면 그 값에 헤더를 읽은 뒤 예약한 몫(since)을 더한다 — 그 예약들은 서버가
+        아직 못 봤다. 로컬 합계가 더 크면(서버 값이 오래됐거나 작으면) 로컬 합계를 쓴다."""
+        floor = self._floor_at(now)
+        if not floor:
+            return local, local - pending
+        return max(local, floor + since), max(local - pending, floor + since - since_pending)
+
+    def _blocked(self, now, used, settled, oldest, need, share):
+        """창에 못 들어갈 때 (잘 시간, 사용량, 미확정 예약이 풀리면 들어갈 수 있나).
+        깨는 시각 = 가장 오래된 기록이 창 밖으로 나가거나 서버 하한이 풀리는 쪽 중 이른 것."""
+        wake = [60 - (now - oldest) + 0.3] if oldest is not None else []
+        if self._floor_at(now):
+            wake.append(self._floor[1] - now + 0.05)
+        return min(wake) if wake else 0.3, used, settled + need <= self.budget * share
+
+    def _state(self, now):
+        """(창 합계, 미확정 합, 가장 오래된 시각, 헤더를 읽은 뒤 예약한 합, 그중 미확정 합) — 잠금 안에서."""
         while self.events and now - self.events[0][0] > 60:
             self.events.popleft()
-        return sum(t for _, t in self.events)
+        since = since_pending = 0
+        if self._floor_at(now):
+            seen = self._floor[2]
+            for entry in reversed(self.events):          # 헤더 뒤의 예약만 — 창 끝에서 몇 개
+                if entry[0] < seen:
+                    break
+                since += entry[1]
+                if getattr(entry, "pending", False):
+                    since_pending += entry[1]
+        oldest = self.events[0][0] if self.events else None
+        return self.events.total, self.events.pending, oldest, since, since_pending
+
+    def _used(self, now: float) -> float:
+        with self._lock:
+            local, pending, _, since, since_pending = self._state(now)
+            return self._view(now, local, pending, since, since_pending)[0]
 
-    def wait_for(self, need: int, deadline: float = None):
-        """다음 호출이 need 토큰을 쓸 예정 — 창이 빌 때까지 잔다.
+    def wait_for(self, need: int, deadline: float = None, priority: str = None):
+        """다음 호출이 need 토큰을 쓸 예정 — 창이 빌 때까지 잔다. **예약하지 않는다.**
 
         deadline(time.monotonic 절대시각)을 주면 그 안에 못 끝날 대기는 자지 않고
         TimeoutError 로 즉시 포기한다. 무인 실행(평가 하니스)에서는 끈기 있게 기다리는
         게 옳지만, 사람이 화면을 보고 있는 앱에서는 몇 분짜리 sleep 이 곧 '멈춘 사이트'다.
+        priority 는 PRIORITY_CLASSES 중 하나 — 없으면 문맥(ratelimit.priority 블록)의 등급.
+        확인만 하므로 동시에 부르면 함께 통과한다 — 호출 전에는 reserve 를 쓸 것.
+        """
+        self._admit(need, deadline, hold=False, cls=priority)
+
+    def reserve(self, need: int, deadline: float = None, priority: str = None):
+        """wait_for 와 같이 기다린 뒤, 통과하는 순간 need 를 창에 **예약분으로 올린다**.
+
+        wait_for → (호출) → record 는 호출이 끝나야 창에 잡힌다. 호출이 동시에 나가면
+        (판정과 추측 생성) 둘 다 같은 여유를 보고 통과해 상한을 넘긴다. 반환값을 commit 에
+        넘겨 실제 사용량으로 바꾸거나, 호출이 나가지 않았으면 release 로 취소한다.
         """
-        while True:
-            if deadline is not None and time.monotonic() >= deadline:
-                raise TimeoutError("pacing budget exhausted for this turn")
+        return self._admit(need, deadline, hold=True, cls=priority)
+
+    def commit(self, reservation, used: int):
+        """예약을 실제 사용량으로 확정한다. 예약보다 적게 썼으면 남은 만큼 기다리던 호출을 깨운다."""
+        used = max(int(used), 0)
+        with self._cond:
+            delta = used - reservation[1]
+            if self.events.holds(reservation):
+                self.events.total += delta
+                if getattr(reservation, "pending", False):
+                    self.events.pending -= reservation[1]
+            reservation.pending = False
+            reservation[1] = used
+            if delta < 0:
+                self._cond.notify_all()
+        if used:
+            record_usage(used, model=self.model, caller=reservation.cls)
+
+    def release(self, reservation, used: int = 0):
+        """예약 취소(호출이 나가지 않았다). used 를 주면 commit 과 같다 — 예전 호출부 호환."""
+        self.commit(reservation, used)
+
+    def _take(self, need, hold, share):
+        """창의 share 몫 안에 자리가 있으면 (True, 예약|None).
+        없으면 (False, (잘 시간, 최근 1분 사용량, 미확정 예약이 풀리면 들어갈 수 있나))."""
+        with self._lock:
             now = time.time()
-            used = self._used(now)
-            if used + need <= self.budget or not self.events:
-                return
-            # 가장 오래된 기록이 창 밖으로 나갈 때까지
-            sleep_for = 60 - (now - self.events[0][0]) + 0.3
-            if deadline is not None and time.monotonic() + sleep_for > deadline:
-                raise TimeoutError("pacing wait would exceed this turn's deadline")
-            if self.verbose and sleep_for > 1:
-                print(f"    · TPM 페이싱 — {sleep_for:.0f}s 대기 (최근 1분 {used:.0f}/{self.budget:.0f} 토큰)")
-            time.sleep(max(sleep_for, 0.3))
+            local, pending, oldest, since, since_pending = self._state(now)
+            used, settled = self._view(now, local, pending, since, since_pending)
+            # 빈 창이면 예산보다 큰 호출도 들여보낸다 — 영영 못 들어가는 것보다 낫다
+            if used + need <= self.budget * share or not used:
+                if not hold:
+                    return True, None
+                entry = _Reservation([now, max(int(need), 0)])
+                self.events.append(entry)
+                return True, entry
+            return False, self._blocked(now, used, settled, oldest, need, share)
+
+    def _wait(self, timeout):
+        """조건 변수에서 잔다(잠금을 쥐고 부른다). timeout=None 이면 알림까지."""
+        if self._MAX_WAIT_S is not None:
+            timeout = self._MAX_WAIT_S if timeout is None else min(timeout, self._MAX_WAIT_S)
+        self._cond.wait(timeout)
+
+    def _admit(self, need, deadline, hold, cls=None):
+        cls = current_priority() if cls is None else cls
+        ticket = (_rank(cls), next(self._arrivals))
+        share = 1 - INTERACTIVE_HEADROOM if cls == "batch" else 1.0
+        t0 = time.monotonic()
+        record_admission_queued(cls, 1)
+        retry_at = None         # 마지막으로 본, 창이 비는 시각(monotonic) — 포기할 때 알려 준다
+        with self._cond:
+            heapq.heappush(self._queue, ticket)
+            try:
+                while True:
+                    left = None if deadline is None else deadline - time.monotonic()
+                    if left is not None and left <= 0:
+                        hint = (f" (try again in {retry_at - time.monotonic():.1f}s)"
+                                if retry_at is not None and retry_at > time.monotonic() else "")
+                        raise TimeoutError("pacing budget exhausted for this turn" + hint)
+                    if self._queue[0] != ticket:
+                        # 앞에 더 높은(또는 먼저 온 같은) 등급이 기다린다 — 그쪽이 들어가거나 떠나면 깬다
+                        self._wait(left)
+                        continue
+                    ok, got = self._take(need, hold, share)
+                    if ok:
+                        record_admission_wait(cls, (time.monotonic() - t0) * 1000)
+                        if got is not None:
+                            got.cls = cls
+                        return got
+                    sleep_for, used, freeable = got
+                    retry_at = time.monotonic() + sleep_for
+                    # 만료로 비는 시각이 마감 뒤라도, 진행 중인 예약이 확정·취소되며 자리가 날 수
+                    # 있으면 마감까지 기다린다. 그마저 없으면 헛되이 자지 않고 바로 포기한다.
+                    if left is not None and sleep_for > left:
+                        if not freeable:
+                            raise TimeoutError(f"pacing wait would exceed this turn's deadline "
+                                               f"(try again in {sleep_for:.1f}s)")
+                        sleep_for = left
+                    if self.verbose and sleep_for > 1:
+                        print(f"    · TPM 페이싱 — {sleep_for:.0f}s 대기 "
+                              f"(최근 1분 {used:.0f}/{self.budget * share:.0f} 토큰, {cls})")
+                    self._wait(sleep_for)
+            finally:
+                self._queue.remove(ticket)
+                heapq.heapify(self._queue)
+                self._cond.notify_all()          # 다음 줄 맨 앞이 확인하도록
+                record_admission_queued(cls, -1)
 
     def record(self, tokens: int):
-        self.events.append((time.time(), max(int(tokens), 0)))
+        """예약 없이 이미 끝난 호출의 사용량을 창에 올린다(wait_for 로 기다린 호출부용)."""
+        with self._lock:
+            self.events.append((time.time(), max(int(tokens), 0)))
         # TPM 창(분 단위)과 별개로 일일 원장에도 누적한다 — TPD 는 헤더로 안 오므로
         # 우리가 세지 않으면 아무도 모른다.
-        record_usage(max(int(tokens), 0))
+        record_usage(max(int(tokens), 0), model=self.model)
+
+
+# ── 프로세스 간 공유 창 ─────────────────────────────────────────────
+# 위 페이서의 창(events)은 인터프리터 하나 안에만 있다. 그런데 같은 Groq 키의 같은 TPM 버킷을
+# 배포 앱·MCP 서버·run_evals·watch_run 이 같이 쓴다 — 서로의 사용량을 못 보니 각자 "여유 있다"며
+# 통과해 합쳐서 상한을 넘기고 429 로 부딪힌다. PACER_BACKEND=sqlite 면 창을 로컬 SQLite(WAL)에
+# 두고, 창 확인과 예약 적재를 BEGIN IMMEDIATE 트랜잭션 하나로 묶어 프로세스 사이에서도 원자적으로
+# 예약한다. 버킷 = API 키 해시 + 모델 — 키가 다른 프로세스끼리는 서로 막지 않는다.
+# 테스트와 단일 프로세스 배포에는 메모리 창이 기본이다(파일도 잠금도 없다).
+PACER_BACKEND = os.environ.get("PACER_BACKEND", "memory").lower()
+PACER_DB_PATH = os.environ.get("PACER_DB", os.path.join(os.path.dirname(__file__), "evals", ".pacer.sqlite"))
+# 다른 프로세스가 트랜잭션을 쥐고 있을 때 기다릴 최대 초 — 트랜잭션은 쿼리 서너 개라 금방 풀린다.
+_DB_BUSY_TIMEOUT_S = 10
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS pacer_events (
+    id INTEGER PRIMARY KEY, bucket TEXT NOT NULL, ts REAL NOT NULL, tokens INTEGER NOT NULL,
+    pending INTEGER NOT NULL DEFAULT 0);
+CREATE INDEX IF NOT EXISTS pacer_events_bucket_ts ON pacer_events (bucket, ts);
+CREATE TABLE IF NOT EXISTS pacer_limits (bucket TEXT PRIMARY KEY, tpm INTEGER NOT NULL);
+CREATE TABLE IF NOT EXISTS pacer_server (
+    bucket TEXT PRIMARY KEY, tokens INTEGER NOT NULL, until REAL NOT NULL, seen REAL NOT NULL);
+"""
+
+
+class SharedTokenPacer(TokenPacer):
+    """창을 SQLite 파일에 두는 TokenPacer — 같은 파일·버킷을 여는 모든 프로세스가 한 창으로 페이싱한다.
+
+    예약은 [timestamp, tokens, rowid] — 앞 두 칸은 메모리 페이서와 같고, rowid 로 commit 이
+    자기 행을 실제 사용량으로 고친다. 헤더로 배운 상한도 버킷별로 파일에 남겨 다른 프로세스가 같이 쓴다.
+    """
+
+    # 다른 프로세스의 취소·축소는 조건 변수로 알 수 없으니 1초마다 창을 다시 본다
+    _MAX_WAIT_S = 1.0
+
+    def __init__(self, bucket: str, path: str = None, tpm_limit: int = DEFAULT_TPM, safety: float = SAFETY,
+                 verbose: bool = True):
+        super().__init__(tpm_limit, safety, verbose, model=bucket.split(":", 1)[-1])
+        self.bucket = bucket
+        self.path = path or PACER_DB_PATH
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        # 연결 하나를 프로세스 안 스레드가 _db_lock 아래에서 나눠 쓴다. 프로세스 사이 직렬화는
+        # SQLite 파일 잠금이 한다. isolation_level=None — 트랜잭션 경계를 직접 쓴다.
+        # _db_lock 은 조건 변수(self._lock)와 따로다: 다른 프로세스가 쓰기 잠금을 쥐면 BEGIN IMMEDIATE 가
+        # _DB_BUSY_TIMEOUT_S 까지 기다리는데, 그동안 조건 변수를 쥐고 있으면 헤더 반영·확정·다른 스레드의
+        # 대기 루프까지 같이 멈춘다. 순서는 늘 _db_lock → 조건 변수(메모리 갱신·알림만) — 거꾸로는 없다.
+        self._db_lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, timeout=_DB_BUSY_TIMEOUT_S, isolation_level=None,
+                                   check_same_thread=False)
+        with self._db_lock:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.executescript(_SCHEMA)
+
+    def _tx(self, fn, write=True):
+        """fn(db) 를 트랜잭션 하나로 — 쓰기면 읽고 판단하고 적는 사이에 다른 프로세스가 끼지 못한다.
+        읽기(write=False)는 지연 트랜잭션이라 다른 프로세스의 쓰기를 기다리지 않는다(WAL 스냅숏)."""
+        with self._db_lock:
+            self._db.execute("BEGIN IMMEDIATE" if write else "BEGIN")
+            try:
+                out = fn(self._db)
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            self._db.execute("COMMIT")
+            return out
+
+    def update_limit(self, headers):
+        before = self.limit
+        super().update_limit(headers)
+        if self.limit != before:
+            self._tx(lambda db: db.execute("INSERT OR REPLACE INTO pacer_limits VALUES (?, ?)",
+                                           (self.bucket, self.limit)))
+
+    def _set_floor(self, tokens, until, seen=None):
+        # 다른 프로세스가 받은 응답의 헤더도 같은 창에 걸리도록 파일에 남긴다 — 파일 먼저, 메모리·알림은 그 뒤
+        seen = time.time() if seen is None else seen
+        self._tx(lambda db: db.execute("INSERT OR REPLACE INTO pacer_server VALUES (?, ?, ?, ?)",
+                                       (self.bucket, int(tokens), float(until), seen)))
+        super()._set_floor(tokens, until, seen)
+
+    def _window(self, db, now, prune=True):
+        """_state 와 같은 5개 값 — prune 이면 창 밖 행을 지운다(쓰기 트랜잭션에서만). 트랜잭션 안에서만 부른다.
+        SUM 은 (bucket, ts) 인덱스 범위 스캔이라 창 안 행 수(분당 수십 콜)에 비례한다.
+        상한·서버 하한도 파일 쪽 값으로 맞춘다."""
+        if prune:
+            db.execute("DELETE FROM pacer_events WHERE bucket = ? AND ts < ?", (self.bucket, now - 60))
+        limit = db.execute("SELECT tpm FROM pacer_limits WHERE bucket = ?", (self.bucket,)).fetchone()
+        floor = db.execute("SELECT tokens, until, seen FROM pacer_server WHERE bucket = ?",
+                           (self.bucket,)).fetchone()
+        with self._cond:
+            if limit:
+                self.limit = limit[0]
+            if floor:
+                self._floor = tuple(floor)
+        local, oldest, pending = db.execute(
+            "SELECT COALESCE(SUM(tokens), 0), MIN(ts), COALESCE(SUM(tokens * pending), 0) "
+            "FROM pacer_events WHERE bucket = ? AND ts >= ?", (self.bucket, now - 60)).fetchone()
+        since = since_pending = 0
+        if self._floor_at(now):
+            since, since_pending = db.execute(
+                "SELECT COALESCE(SUM(tokens), 0), COALESCE(SUM(tokens * pending), 0) "
+                "FROM pacer_events WHERE bucket = ? AND ts >= ?",
+                (self.bucket, max(self._floor[2], now - 60))).fetchone()
+        return local, pending, oldest, since, since_pending
+
+    def _state(self, now):
+        return self._tx(lambda db: self._window(db, now, prune=False), write=False)
+
+    def _used(self, now: float) -> float:
+        # 조건 변수 없이 — 파일 스냅숏 하나면 된다
+        local, pending, _, since, since_pending = self._state(now)
+        return self._view(now, local, pending, since, since_pending)[0]
+
+    def _take(self, need, hold, share):
+        # 줄(우선순위)은 프로세스 안에서만 선다. 프로세스 사이에서는 batch 의 INTERACTIVE_HEADROOM 이
+        # 공유 창 기준으로 걸리므로, 평가 프로세스가 돌아도 앱 프로세스의 방문자 몫은 남는다.
+        def take(db):
+            now = time.time()
+            local, pending, oldest, since, since_pending = self._window(db, now)
+            used, settled = self._view(now, local, pending, since, since_pending)
+            if used + need <= self.budget * share or not used:
+                if not hold:
+                    return True, None
+                tokens = max(int(need), 0)
+                cur = db.execute("INSERT INTO pacer_events (bucket, ts, tokens, pending) VALUES (?, ?, ?, 1)",
+                                 (self.bucket, now, tokens))
+                return True, _Reservation([now, tokens, cur.lastrowid])
+            return False, self._blocked(now, used, settled, oldest, need, share)
+
+        # _admit 은 조건 변수를 쥐고 부른다 — 파일 잠금을 기다리는 동안은 놓는다. 줄 맨 앞은 여전히
+        # 이 호출이라 다른 스레드가 새치기하지 못한다. 그 사이 놓친 알림은 _MAX_WAIT_S 폴링이 잡는다.
+        self._cond.release()
+        try:
+            return self._tx(take)
+        finally:
+            self._cond.acquire()
+
+    def commit(self, reservation, used: int):
+        used = max(int(used), 0)
+        if used:
+            self._tx(lambda db: db.execute("UPDATE pacer_events SET tokens = ?, pending = 0 WHERE id = ?",
+                                           (used, reservation[2])))
+        else:
+            self._tx(lambda db: db.execute("DELETE FROM pacer_events WHERE id = ?", (reservation[2],)))
+        with self._cond:
+            shrank = used < reservation[1]
+            reservation[1] = used
+            reservation.pending = False
+            if shrank:
+                self._cond.notify_all()
+        if used:
+            record_usage(used, model=self.model, caller=reservation.cls)
+
+    def record(self, tokens: int):
+        tokens = max(int(tokens), 0)
+        self._tx(lambda db: db.execute("INSERT INTO pacer_events (bucket, ts, tokens) VALUES (?, ?, ?)",
+                                       (self.bucket, time.time(), tokens)))
+        record_usage(tokens, model=self.model)
 
 
 _PACERS = {}
+_PACERS_LOCK = threading.Lock()
+_API_KEY = None
+
+
+def set_api_key(api_key):
+    """이 프로세스가 쓰는 Groq 키를 알린다 — 공유 창의 버킷이 키별로 갈린다.
+
+    앱·하니스는 키를 secrets.toml 에서 읽으므로 환경변수(GROQ_API_KEY)만으로는 같은 키인지 모른다.
+    키 자체는 저장하지 않고 해시 앞자리만 버킷 이름에 쓴다.
+    """
+    global _API_KEY
+    _API_KEY = api_key or None
+
+
+def _bucket(model):
+    key = _API_KEY or os.environ.get("GROQ_API_KEY") or ""
+    return f"{hashlib.sha1(key.encode()).hexdigest()[:12]}:{model}"
 
 
 def pacer_for(model: str) -> TokenPacer:
-    """모델별 페이서 — Groq 한도는 모델 단위로 따로 걸린다."""
-    return _PACERS.setdefault(model, TokenPacer())
+    """모델별 페이서 — Groq 한도는 모델 단위로 따로 걸린다. PACER_BACKEND=sqlite 면 프로세스 간 공유 창."""
+    bucket = _bucket(model)
+    with _PACERS_LOCK:
+        pacer = _PACERS.get(bucket)
+        if pacer is None:
+            pacer = _PACERS[bucket] = _new_pacer(bucket, model)
+        return pacer
+
+
+def _new_pacer(bucket, model):
+    if PACER_BACKEND == "sqlite":
+        try:
+            return SharedTokenPacer(bucket)
+        except (OSError, sqlite3.Error) as e:
+            # 읽기 전용 파일시스템 등 — 공유 창을 못 열어도 페이싱 자체는 계속한다
+            print(f"⚠️  공유 페이서 창({PACER_DB_PATH})을 열지 못해 프로세스 안 창으로 돌아갑니다: {e}")
+    return TokenPacer(model=model)
 
 
 def estimate_tokens(text: str) -> int:
@@ -137,19 +615,46 @@ def estimate_tokens(text: str) -> int:
 # 있는 예산에 뛰어들어 몇 케이스 만에 'per day' 에러로 죽었다(실제로 그렇게 한 번 죽었다).
 # 남은 예산을 알아야 실행 여부를 판단할 수 있으므로 직접 적어 둔다.
 #
-# ⚠️ 한계: 이 원장은 **로컬 실행분만** 본다. 배포된 앱이 같은 키로 쓰는 토큰은 안 보이므로
-#    실제 사용량의 하한이다. 그래서 SAFE_SHARE 로 여유를 남기는 게 여전히 필요하다.
+# ⚠️ 한계: 이 원장은 **이 머신의 실행분만** 본다. 다른 곳에 배포된 앱이 같은 키로 쓰는 토큰은
+#    안 보이므로 실제 사용량의 하한이다. 그래서 SAFE_SHARE 로 여유를 남기는 게 여전히 필요하다.
+#
+# 구조: 콜마다 한 줄(JSON: ts·day·tokens·model·caller)을 로그(.daily_usage.log)에 **덧붙이기만**
+# 한다. 예전엔 콜마다 일별 합계 JSON 전체를 읽고 다시 써서 os.replace 했다 — 모든 챗·RAG·평가
+# 콜의 요청 경로에 있는 동기 파일 I/O 였고, 잠금은 프로세스 안에서만 걸렸다. 이제
+#   · 덧붙이기 = O_APPEND 한 번의 write(한 줄 < PIPE_BUF) — 여러 프로세스가 동시에 붙여도 줄이 섞이지 않는다,
+#   · 로그가 USAGE_COMPACT_BYTES 를 넘으면 일별 합계(.daily_usage.json)로 접고 로그를 비운다,
+#   · used_today 는 메모리 집계(합계 JSON + 읽은 로그 위치)에 새로 붙은 줄만 더해 답한다.
+# 압축과 덧붙이기는 잠금 파일(flock)로 갈린다 — 덧붙이기·읽기는 공유, 압축은 배타.
 DAILY_TOKEN_BUDGET = 200_000
 _LEDGER_PATH = os.path.join(os.path.dirname(__file__), "evals", ".daily_usage.json")
+USAGE_COMPACT_BYTES = 256 * 1024      # ≈ 2,000 콜
+_LEDGER_DAYS = 7                      # 날짜 키가 무한히 쌓이지 않게 최근 7일만
 
 
 def _today():
     return datetime.now().strftime("%Y-%m-%d")
 
 
-# 원장 갱신은 read-modify-write 라서 동시 기록이 서로를 덮어쓴다(40스레드 × 100토큰을
-# 넣었더니 4,000 이 아니라 200 만 남았다). 읽는 쪽(하니스)은 순차라 지금 당장 오답을
-# 보지는 않지만, 배포 앱은 세션마다 스레드로 기록하므로 원인은 실재한다.
+def _log_path():
+    return os.path.splitext(_LEDGER_PATH)[0] + ".log"
+
+
+@contextlib.contextmanager
+def _file_lock(exclusive):
+    """원장 잠금 파일에 flock — fcntl 이 없는 플랫폼(Windows)에서는 프로세스 안 잠금만 남는다."""
+    if fcntl is None:
+        yield
+        return
+    os.makedirs(os.path.dirname(_LEDGER_PATH), exist_ok=True)
+    fd = os.open(os.path.splitext(_LEDGER_PATH)[0] + ".lock", os.O_CREAT | os.O_RDWR, 0o644)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        yield
+    finally:
+        os.close(fd)                  # 닫으면 잠금도 풀린다
+
+
+# 메모리 집계와 압축을 프로세스 안에서 직렬화한다(덧붙이기 자체는 잠금이 필요 없다).
 _LEDGER_LOCK = threading.Lock()
 
 
@@ -173,27 +678,126 @@ def _load_ledger():
         return {}
 
 
-def record_usage(tokens: int):
-    """이번 호출에 쓴(=예약한) 토큰을 오늘자에 누적한다."""
-    with _LEDGER_LOCK:
+def _fold(data, days):
+    """로그 바이트(완결된 줄만)를 {day: tokens} 에 더한다. 못 읽는 줄은 건너뛴다."""
+    for line in data.splitlines():
+        try:
+            rec = json.loads(line)
+            days[rec["day"]] = int(days.get(rec["day"], 0)) + int(rec["tokens"])
+        except (ValueError, KeyError, TypeError):
+            continue
+    return days
+
+
+def _log_state():
+    """(로그 파일 정체(inode, dev) | None, 크기)"""
+    try:
+        st = os.stat(_log_path())
+        return (st.st_ino, st.st_dev), st.st_size
+    except FileNotFoundError:
+        return None, 0
+
+
+def _ledger_state():
+    """합계 JSON 의 (inode, mtime) | None — os.replace 로 바뀌면 달라진다."""
+    try:
+        st = os.stat(_LEDGER_PATH)
+        return st.st_ino, st.st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+class _UsageAggregate:
+    """{day: tokens} = 일별 합계 JSON + 로그에서 읽은 데까지. refresh 는 새로 붙은 바이트만 읽는다.
+
+    다른 프로세스가 압축하면(로그가 새 파일이 되거나 합계 JSON 이 바뀜) 처음부터 다시 읽는다.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.days = {}
+        self.offset = 0
+        self.loaded = False
+        self.log_id = self.ledger_id = None
+
+    def refresh(self):
+        log_id, size = _log_state()
+        if not self.loaded or log_id != self.log_id or _ledger_state() != self.ledger_id or size < self.offset:
+            self.days = _load_ledger()
+            self.ledger_id = _ledger_state()            # 손상 격리로 파일이 옮겨졌을 수 있다
+            self.log_id, self.offset, self.loaded = log_id, 0, True
+        if size > self.offset:
+            with open(_log_path(), "rb") as f:
+                f.seek(self.offset)
+                data = f.read(size - self.offset)
+            end = data.rfind(b"\n") + 1                 # 쓰는 중인 마지막 줄은 다음에
+            _fold(data[:end], self.days)
+            self.offset += end
+        return self.days
+
+
+_AGGREGATE = None
+
+
+def _aggregate():
+    global _AGGREGATE
+    if _AGGREGATE is None or _AGGREGATE.path != _LEDGER_PATH:
+        _AGGREGATE = _UsageAggregate(_LEDGER_PATH)
+    return _AGGREGATE
+
+
+def _write_ledger(led):
+    os.makedirs(os.path.dirname(_LEDGER_PATH), exist_ok=True)
+    # 임시 파일 → os.replace 로 원자적 교체. 곧바로 open(..,"w") 하면
+    # 쓰다가 죽었을 때 잘린 JSON 이 남고, 그게 위 손상 경로로 이어진다.
+    tmp = f"{_LEDGER_PATH}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(led, f, indent=2, sort_keys=True)
+    os.replace(tmp, _LEDGER_PATH)
+
+
+def record_usage(tokens: int, model: str = None, caller: str = None):
+    """이번 호출에 쓴(=확정한) 토큰을 사용량 로그에 한 줄 덧붙인다. caller 기본값은 페이서 입장 등급."""
+    line = json.dumps({"ts": round(time.time(), 3), "day": _today(), "tokens": int(tokens), "model": model,
+                       "caller": caller or current_priority()}, ensure_ascii=False) + "\n"
+    try:
+        os.makedirs(os.path.dirname(_LEDGER_PATH), exist_ok=True)
+        with _file_lock(exclusive=False):
+            fd = os.open(_log_path(), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, line.encode("utf-8"))
+                size = os.fstat(fd).st_size
+            finally:
+                os.close(fd)
+    except OSError:
+        return            # 원장을 못 써도 실행 자체를 막지는 않는다
+    if size >= USAGE_COMPACT_BYTES:
+        compact_usage()
+
+
+def compact_usage():
+    """로그를 일별 합계 JSON 으로 접고 로그를 지운다. 합계를 못 쓰면 로그를 남긴다(잃지 않게)."""
+    with _LEDGER_LOCK, _file_lock(exclusive=True):
         led = _load_ledger()
-        led[_today()] = int(led.get(_today(), 0)) + int(tokens)
-        for k in sorted(led)[:-7]:      # 날짜 키가 무한히 쌓이지 않게 최근 7일만
+        try:
+            with open(_log_path(), "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            data = b""
+        _fold(data[:data.rfind(b"\n") + 1], led)
+        for k in sorted(led)[:-_LEDGER_DAYS]:
             led.pop(k, None)
         try:
-            os.makedirs(os.path.dirname(_LEDGER_PATH), exist_ok=True)
-            # 임시 파일 → os.replace 로 원자적 교체. 곧바로 open(..,"w") 하면
-            # 쓰다가 죽었을 때 잘린 JSON 이 남고, 그게 위 손상 경로로 이어진다.
-            tmp = f"{_LEDGER_PATH}.{os.getpid()}.tmp"
-            with open(tmp, "w", encoding="utf-8") as f:
-                json.dump(led, f, indent=2, sort_keys=True)
-            os.replace(tmp, _LEDGER_PATH)
+            _write_ledger(led)
+            if data:
+                os.remove(_log_path())
         except OSError:
-            pass          # 원장을 못 써도 실행 자체를 막지는 않는다
+            pass
 
 
 def used_today() -> int:
-    return int(_load_ledger().get(_today(), 0))
+    with _LEDGER_LOCK, _file_lock(exclusive=False):
+        return int(_aggregate().refresh().get(_today(), 0))
 
 
 def remaining_today() -> int:
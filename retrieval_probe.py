@@ -12,13 +12,25 @@
 import re
 from collections import Counter
 
-from rag_corpus import load_corpus, build_retriever
+from rag_corpus import EMBED_MODEL, load_corpus, build_retriever
 
-MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+MODEL = EMBED_MODEL
 MAX_SEQ = 256  # 모델 카드 기준 max_seq_length (word pieces)
 
 _HANGUL = re.compile(r"[가-힣]")
 
+# ③ 교차언어 질의 — 영어로 묻고 정답은 한국어 온프레 문서. evals/bench_retrieval.py 도
+# 이 목록을 recall 질의로 쓴다(정답 vendor = KETI_VENDOR).
+KETI = "onprem_mlops_reference.md"
+KETI_VENDOR = "self / on-prem"
+CROSS_LINGUAL_PROBES = [
+    "How does the on-prem pipeline serve models with Triton?",
+    "What CI pipeline validates ONNX models before deployment?",
+    "How is data drift monitored in the on-prem MLOps stack?",
+    "How are model versions governed in the on-prem registry?",
+    "What monitoring dashboards exist for inference metrics?",
+]
+
 
 def is_korean(text, ratio=0.10):
     """한글 문자 비율이 임계 이상이면 한국어 청크로 본다."""
@@ -69,15 +81,10 @@ def main():
 
     # ── ③ 교차언어 검색 ──────────────────────────────────────────
     print("\n[③ 교차언어 검색 — 영어 질의 → 한국어 목표 문서(온프레)]")
-    r = build_retriever(corpus, k=5)
-    KETI = "onprem_mlops_reference.md"
-    probes = [
-        "How does the on-prem pipeline serve models with Triton?",
-        "What CI pipeline validates ONNX models before deployment?",
-        "How is data drift monitored in the on-prem MLOps stack?",
-        "How are model versions governed in the on-prem registry?",
-        "What monitoring dashboards exist for inference metrics?",
-    ]
+    # corpus 를 넘기지 않는다 — 기본 코퍼스 경로여야 앱·평가 하니스와 같은 인덱스 스냅샷
+    # (rag_index/)을 재사용한다. 위 corpus 도 같은 기본 파라미터로 청킹한 것이라 내용은 같다.
+    r = build_retriever(k=5)
+    probes = CROSS_LINGUAL_PROBES
     miss = 0
     for q in probes:
         hits = sum(1 for d in r.invoke(q) if d.metadata["source_file"] == KETI)
@@ -88,6 +95,7 @@ def main():
 
     print("\n" + "=" * 74)
     print("주의: n이 작다(질의 5건). 경향 진단이지 벤치마크가 아니다.")
+    print("지연·recall 추이는 python evals/bench_retrieval.py (evals/runs/ 에 기록).")
     print("=" * 74)
 
 
@@ -0,0 +1,55 @@
+"""테스트 공용 fixture.
+
+pacer — agent_rag 테스트용 가짜 페이서. 파일마다 _Pacer 사본을 두면 사본끼리 기록하는 필드가
+갈라지고, 페이서 인터페이스가 바뀔 때 여러 곳을 고쳐야 한다 — 하나만 둔다.
+agent_rag 는 reserve(need, deadline) · release(held, tokens) 만 부른다 — 등급은 문맥(ratelimit.priority)으로
+넘어오므로 reserve 때의 current_priority 를 남긴다.
+"""
+import threading
+
+import pytest
+
+from ratelimit import current_priority
+
+
+class FakePacer:
+    """창 없이 바로 통과시키고 예약·확정을 기록한다. fail_first 번째 예약까지는 마감 초과로 실패한다."""
+
+    def __init__(self, fail_first=0):
+        self.fail_first = fail_first
+        self.lock = threading.Lock()       # 추측 생성 스레드도 부른다
+        self.needs = []                    # reserve 에 넘어온 need — 실패한 예약 포함
+        self.classes = []                  # reserve 때의 입장 등급
+        self.held = []                     # 통과한 예약
+        self.released = []                 # (예약, 확정 토큰)
+
+    @property
+    def calls(self):
+        return len(self.needs)
+
+    @property
+    def tokens(self):
+        return [t for _, t in self.released]
+
+    def reserve(self, need, deadline=None):
+        with self.lock:
+            self.needs.append(need)
+            self.classes.append(current_priority())
+            if len(self.needs) <= self.fail_first:
+                raise TimeoutError("pacing wait would exceed this turn's deadline")
+            entry = [0, need]
+            self.held.append(entry)
+            return entry
+
+    def release(self, held, tokens):
+        with self.lock:
+            self.released.append((held, tokens))
+
+
+@pytest.fixture
+def pacer(monkeypatch):
+    """agent_rag.pacer_for 를 FakePacer 하나로 바꾼다 — 모든 모델이 같은 페이서를 본다."""
+    agent_rag = pytest.importorskip("agent_rag")
+    p = FakePacer()
+    monkeypatch.setattr(agent_rag, "pacer_for", lambda model: p)
+    return p
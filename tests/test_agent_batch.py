@@ -0,0 +1,114 @@
+"""여러 질문을 한 번에 도는 agentic_answer_batch · HybridRetriever.search_batch 회귀.
+
+지키는 것: (1) 배치 검색 결과가 질의마다 search(q) 와 같고, 미스 질의는 인코더 한 번으로 묶인다,
+(2) 배치 결과 dict 가 질문을 하나씩 돈 결과와 같다(입력 순서 그대로), (3) 한 질문의 실패는
+그 자리에 예외로 남고 나머지는 끝난다, (4) 일일 한도에 걸리면 아직 시작 안 한 질문은 돌지 않는다.
+콜이 동시에 나가므로 응답 순서에 기대는 FakeListChatModel 대신 프롬프트로 응답을 고른다.
+"""
+import re
+import warnings
+
+import pytest
+
+pytest.importorskip("faiss")
+pytest.importorskip("langchain_core")
+with warnings.catch_warnings():
+    warnings.simplefilter("ignore", DeprecationWarning)
+    lc_community = pytest.importorskip("langchain_community.vectorstores")
+from langchain_core.documents import Document  # noqa: E402
+from langchain_core.embeddings import DeterministicFakeEmbedding  # noqa: E402
+from langchain_core.language_models.fake_chat_models import FakeListChatModel  # noqa: E402
+
+import agent_rag  # noqa: E402
+import rag_corpus  # noqa: E402
+from rag_corpus import HybridRetriever, QueryEmbeddingCache  # noqa: E402
+
+_TEXTS = ("vertex ai pipelines run kubeflow", "sagemaker pipelines step types", "triton model serving on-prem",
+          "kubeflow on-prem cluster", "azure ml pipeline components", "mlops maturity level one")
+_QUESTIONS = ["how does triton serving work", "what are sagemaker step types", "vertex kubeflow pipelines"]
+
+
+class _Counting(DeterministicFakeEmbedding):
+    doc_calls: int = 0
+    query_calls: int = 0
+
+    def embed_documents(self, texts):
+        self.doc_calls += 1
+        return super().embed_documents(texts)
+
+    def embed_query(self, text):
+        self.query_calls += 1
+        return super().embed_query(text)
+
+
+def _retriever():
+    emb = _Counting(size=16)
+    docs = [Document(page_content=t, metadata={"vendor": t.split()[0]}) for t in _TEXTS]
+    vs = lc_community.FAISS.from_documents(docs, embedding=emb)
+    emb.doc_calls = 0
+    return HybridRetriever(vs, docs, rag_corpus.bm25_index(docs), k=2, query_cache=QueryEmbeddingCache()), emb
+
+
+class _RoutedLLM(FakeListChatModel):
+    """프롬프트 종류로 응답을 고른다 — 답은 질문을 되풀이해 질문별 결과가 섞이면 드러나게."""
+
+    fail_on: str = ""
+    error: str = "boom"
+
+    def _call(self, messages, *args, **kwargs):
+        text = messages[-1].content
+        question = re.search(r"\[Question\]\s*\n(.*)", text).group(1).strip() if "[Question]" in text else ""
+        if self.fail_on and self.fail_on in question:
+            raise RuntimeError(self.error)
+        if "USE" in text and "SEARCH:" in text:
+            return "USE"
+        if "groundedness checker" in text:
+            return "YES"
+        return f"About {question} [1]."
+
+
+pytestmark = pytest.mark.usefixtures("pacer")
+
+
+def test_search_batch_matches_search_and_encodes_once():
+    r, emb = _retriever()
+    batch = r.search_batch(_QUESTIONS)
+    assert emb.doc_calls == 1 and emb.query_calls == 0, "미스 질의는 한 배치로 인코딩해야 한다"
+    fresh, _ = _retriever()
+    for q, (docs, legs) in zip(_QUESTIONS, batch):
+        want_docs, want_legs = fresh.search(q)
+        assert docs == want_docs
+        assert legs["scores"] == want_legs["scores"] and legs["degraded"] is None
+    assert r.search_batch([]) == []
+
+
+def test_batch_results_equal_one_by_one():
+    r, _ = _retriever()
+    batch = agent_rag.agentic_answer_batch(_RoutedLLM(responses=["-"]), r, _QUESTIONS, concurrency=3,
+                                           speculative=False, self_check="llm")
+    seq = [agent_rag.agentic_answer(_RoutedLLM(responses=["-"]), r, q, speculative=False, self_check="llm")
+           for q in _QUESTIONS]
+
+    def strip_ms(res):
+        # 다리별 소요 시간만 다르다(배치는 dense 시간을 질의 수로 나눈 값)
+        trace = [{k: v for k, v in s.items() if k not in ("legs", "detail")} for s in res["trace"]]
+        return {**res, "trace": trace}
+
+    assert [strip_ms(b) for b in batch] == [strip_ms(s) for s in seq]
+    assert [b["answer"] for b in batch] == [f"About {q} [1]." for q in _QUESTIONS]
+
+
+def test_failures_stay_in_place():
+    r, _ = _retriever()
+    out = agent_rag.agentic_answer_batch(_RoutedLLM(responses=["-"], fail_on="sagemaker"), r, _QUESTIONS,
+                                         speculative=False)
+    assert isinstance(out[1], RuntimeError)
+    assert out[0]["answer"].startswith("About how does triton") and out[2]["answer"].startswith("About vertex")
+
+
+def test_daily_limit_stops_unstarted_questions():
+    r, _ = _retriever()
+    llm = _RoutedLLM(responses=["-"], fail_on="triton", error="429 Rate limit reached: tokens per day (TPD)")
+    out = agent_rag.agentic_answer_batch(llm, r, _QUESTIONS, concurrency=1, speculative=False)
+    assert all(isinstance(o, Exception) for o in out)
+    assert out[1] is out[0] and out[2] is out[0], "한도 뒤의 질문을 돌렸다"
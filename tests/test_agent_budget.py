@@ -0,0 +1,88 @@
+"""턴 예산 안에서 선택 단계를 건너뛰는 계획 회귀.
+
+지키는 것: (1) 남은 시간이 판정 + 생성 예상 지연을 못 덮으면 판정을 건너뛰고 지금 청크로 답한다,
+(2) 재작성도 같다 — 빗나간 청크라도 인용 달린 답을 낸다, (3) 근거점검을 건너뛰면 로컬 판정이
+라벨이 된다, (4) 판정 호출이 페이서 마감(TimeoutError)에 걸려도 답은 나온다 — 예산이 없는
+하니스에서는 예전처럼 올린다, (5) 지연 추정은 측정값의 이동평균이다.
+"""
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("langchain_core")
+from langchain_core.documents import Document  # noqa: E402
+from langchain_core.language_models.fake_chat_models import FakeListChatModel  # noqa: E402
+
+import agent_rag  # noqa: E402
+import observability  # noqa: E402
+
+_DOCS = [Document(page_content="Vertex AI Pipelines run Kubeflow pipelines as serverless jobs.",
+                  metadata={"vendor": "Google Cloud"})]
+_ANSWER = "Vertex AI Pipelines run Kubeflow pipelines as serverless jobs [1]."
+
+
+def _setup(monkeypatch, estimates):
+    monkeypatch.setattr(agent_rag, "step_latency_ms", lambda step: estimates.get(step, 0))
+
+
+def _run(responses, budget, queries=None, **kw):
+    queries = [] if queries is None else queries
+
+    def invoke(q):
+        queries.append(q)
+        return _DOCS
+    return agent_rag.agentic_answer(FakeListChatModel(responses=responses), SimpleNamespace(invoke=invoke),
+                                    "How do Vertex AI Pipelines run?", turn_budget_s=budget,
+                                    speculative=False, self_check="llm", **kw)
+
+
+def test_grade_skipped_when_it_would_eat_the_generate_budget(monkeypatch, pacer):
+    _setup(monkeypatch, {"grade": 20_000, "generate": 1000, "self_check": 10})
+    res = _run([_ANSWER, "YES"], budget=5)
+    grade = res["trace"][1]
+    assert grade["step"] == "grade" and grade["skipped"] and "needed" in grade["detail"]
+    assert res["answer"] == _ANSWER and res["skipped"] == ["grade"]
+    assert res["grounded"] == "YES" and pacer.calls == 2   # 생성 + 근거점검, 판정 콜 없음
+
+
+def test_rewrite_skipped_keeps_the_first_chunks(monkeypatch, pacer):
+    _setup(monkeypatch, {"grade": 0, "rewrite": 20_000, "generate": 1000, "self_check": 0})
+    queries = []
+    res = _run(["NO", _ANSWER, "YES"], budget=5, queries=queries, grade_mode="separate")
+    assert [s["step"] for s in res["trace"]] == ["retrieve", "grade", "rewrite", "generate", "self_check"]
+    assert res["trace"][2]["skipped"] and not res["rewrote"]
+    assert queries == ["How do Vertex AI Pipelines run?"] and res["answer"] == _ANSWER
+
+
+def test_self_check_falls_back_to_the_local_verdict(monkeypatch, pacer):
+    _setup(monkeypatch, {"grade": 0, "generate": 0, "self_check": 60_000})
+    res = _run(["USE", _ANSWER], budget=5)
+    check = res["trace"][-1]
+    assert check["step"] == "self_check" and check["skipped"] and check["source"] == "local"
+    assert res["grounded"] == check["grounding"]["verdict"] and res["skipped"] == ["self_check"]
+    assert pacer.calls == 2
+
+
+def test_pacer_timeout_on_grade_still_answers(monkeypatch, pacer):
+    _setup(monkeypatch, {})
+    pacer.fail_first = 1
+    res = _run([_ANSWER, "YES"], budget=30)
+    assert res["trace"][1]["skipped"] and "TimeoutError" in res["trace"][1]["detail"]
+    assert res["answer"] == _ANSWER
+
+
+def test_without_a_budget_nothing_is_skipped(monkeypatch, pacer):
+    _setup(monkeypatch, {"grade": 10 ** 9, "generate": 10 ** 9})
+    pacer.fail_first = 1
+    with pytest.raises(TimeoutError):
+        _run([_ANSWER, "YES"], budget=None)
+
+
+def test_step_latency_is_a_running_average(monkeypatch):
+    monkeypatch.setattr(observability, "_LATENCY", {})
+    assert observability.step_latency_ms("grade") == observability.STEP_LATENCY_PRIOR_MS["grade"]
+    observability.record_step_latency("grade", 1000)
+    observability.record_step_latency("grade", 2000)
+    a = observability.LATENCY_EWMA_ALPHA
+    assert observability.step_latency_ms("grade") == pytest.approx(1000 + a * 1000)
+    assert observability.step_latency_stats()["grade"]["n"] == 2
@@ -0,0 +1,121 @@
+"""추측 생성(판정과 나란히 도는 답 생성) 회귀.
+
+지키는 것: (1) 판정 YES 면 추측 결과가 순차 결과와 같다 — 켜고 끄는 게 답을 바꾸면 안 된다,
+(2) NO 면 추측을 버리고 재검색한 청크로 다시 생성하며, 낭비한 토큰을 trace 에 남긴다,
+(3) 추측 생성도 페이서에 예약하고 전부 확정·취소한다(새는 예약이 없다), (4) 끝나기 전에 버린 추측의
+낭비는 측정값이 아니라 상한 추정으로 표시한다.
+호출이 동시에 나가므로 응답 순서에 기대는 FakeListChatModel 대신 프롬프트로 응답을 고른다.
+"""
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("langchain_core")
+from langchain_core.documents import Document  # noqa: E402
+from langchain_core.language_models.fake_chat_models import FakeListChatModel  # noqa: E402
+
+import agent_rag  # noqa: E402
+
+_DOCS = [Document(page_content="Vertex AI Pipelines run Kubeflow pipelines.",
+                  metadata={"vendor": "Google Cloud", "section": "Pipelines"})]
+_ANSWER = "Vertex AI Pipelines run Kubeflow pipelines [1]."
+
+
+class _RoutedLLM(FakeListChatModel):
+    """프롬프트 종류(판정·재작성·근거점검·답)로 응답을 고른다. 호출 순서와 무관."""
+
+    grade: str = "YES"
+    grade_delay: float = 0.0
+    seen: list = []
+
+    def _pick(self, messages):
+        text = messages[-1].content
+        if "deciding ONE thing" in text:
+            time.sleep(self.grade_delay)
+            return self.grade
+        if "Rewrite it" in text:
+            return "vertex kubeflow"
+        if "groundedness checker" in text:
+            return "YES"
+        self.seen.append(text)
+        return _ANSWER
+
+    def _call(self, messages, *args, **kwargs):
+        return self._pick(messages)
+
+    def _stream(self, messages, *args, **kwargs):
+        self.responses = [self._pick(messages)]
+        self.i = 0
+        yield from super()._stream(messages, *args, **kwargs)
+
+
+def _llm(**kw):
+    return _RoutedLLM(responses=["unused"], seen=[], **kw)
+
+
+def _retriever(log):
+    def invoke(q):
+        log.append(q)
+        return [Document(page_content=f"{d.page_content} ({q})", metadata=d.metadata) for d in _DOCS]
+    return SimpleNamespace(invoke=invoke)
+
+
+@pytest.mark.parametrize("stream", [False, True])
+def test_speculation_used_on_yes_matches_the_sequential_answer(pacer, stream):
+    def run(speculative):
+        if stream:
+            events = list(agent_rag.agentic_stream(_llm(grade_delay=0.05), _retriever([]), "q",
+                                                   speculative=speculative))
+            return events[-1]["result"]
+        return agent_rag.agentic_answer(_llm(grade_delay=0.05), _retriever([]), "q",
+                                        speculative=speculative)
+
+    plain, spec = run(False), run(True)
+    steps = [s["step"] for s in spec["trace"]]
+    assert steps == ["retrieve", "grade", "speculate", "generate", "self_check"]
+    info = spec["trace"][2]["speculation"]
+    assert info["used"] and info["wasted_tokens"] == 0 and info["saved_ms"] > 0
+    plain_trace = [s for s in spec["trace"] if s["step"] != "speculate"]
+    assert {**spec, "trace": plain_trace} == plain
+    assert len(pacer.released) == len(pacer.held), "예약이 확정·취소되지 않고 남았다"
+
+
+def test_speculation_discarded_on_no_and_regenerated_from_the_rewrite(pacer):
+    queries = []
+    llm = _llm(grade="NO", grade_delay=0.1)
+    res = agent_rag.agentic_answer(llm, _retriever(queries), "q", speculative=True)
+
+    assert [s["step"] for s in res["trace"]] == \
+        ["retrieve", "grade", "speculate", "rewrite", "retrieve", "generate", "self_check"]
+    info = res["trace"][2]["speculation"]
+    assert not info["used"] and info["wasted_tokens"] > 0 and info["wasted_estimate"] is False
+    assert info["wasted_tokens"] in pacer.tokens, "보고한 낭비가 페이서에 확정된 값과 다르다"
+    assert queries == ["q", "vertex kubeflow"]
+    # 답 생성은 두 번 나갔고(버린 추측 + 재생성), 마지막 것이 재검색 청크를 봤다
+    assert len(llm.seen) == 2 and "(vertex kubeflow)" in llm.seen[-1]
+    assert res["rewrote"] and res["answer"] == _ANSWER
+    assert len(pacer.released) == len(pacer.held)
+
+
+def test_off_by_default(pacer, monkeypatch):
+    monkeypatch.setattr(agent_rag, "SPECULATIVE_ANSWER", False)
+    res = agent_rag.agentic_answer(_llm(), _retriever([]), "q")
+    assert "speculate" not in [s["step"] for s in res["trace"]]
+
+
+def test_waste_of_a_still_running_speculation_is_marked_as_an_estimate(pacer):
+    release = threading.Event()
+
+    class _Slow(_RoutedLLM):
+        def _stream(self, messages, *args, **kwargs):
+            release.wait(5)                            # 첫 청크 전 — 요청이 나가 있는 동안
+            yield from super()._stream(messages, *args, **kwargs)
+
+    spec = agent_rag._Speculation(_Slow(responses=["unused"], seen=[]), "ctx", "q", deadline=None)
+    wasted, estimated = spec.cancel(timeout=0.05)
+    assert estimated and wasted == spec.meter["reserved"], "아직 도는 추측의 낭비는 상한 추정이어야 한다"
+    release.set()
+    spec._thread.join(5)
+    assert spec.cancel(timeout=0.05) == (spec.meter["tokens"], False)
@@ -0,0 +1,138 @@
+"""agentic_stream(스트리밍 agentic RAG) 회귀.
+
+지키는 것: (1) 스트리밍과 dict API(agentic_answer, 평가 하니스)가 같은 결과를 낸다 — 둘이
+갈라지면 평가가 앱을 대변하지 않는다, (2) 첫 토큰 전 LLM 호출은 판정 1콜뿐이고 근거점검은
+답 뒤에 온다, (3) 스트림 호출도 페이서에 예약·기록된다(중간에 끊겨도), (4) 429 재시도는
+첫 청크 전에만 한다, (5) 판정+재작성 한 콜(combined)은 응답을 결정적으로 읽고 trace 모양을
+두 콜 방식과 같게 남긴다. LLM 은 langchain_core 의 가짜 채팅 모델로 세운다.
+"""
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("langchain_core")
+from langchain_core.documents import Document  # noqa: E402
+from langchain_core.language_models.fake_chat_models import FakeListChatModel  # noqa: E402
+
+import agent_rag  # noqa: E402
+
+_DOCS = [Document(page_content="Vertex AI Pipelines run Kubeflow pipelines.",
+                  metadata={"vendor": "Google Cloud", "section": "Pipelines"})]
+_ANSWER = "Vertex AI Pipelines run Kubeflow pipelines as managed jobs on Google Cloud [1]."
+
+
+def _llm(*responses):
+    return FakeListChatModel(responses=list(responses))
+
+
+def _retriever():
+    return SimpleNamespace(invoke=lambda q: list(_DOCS))
+
+
+def test_stream_and_dict_api_agree(pacer):
+    events = list(agent_rag.agentic_stream(_llm("YES", _ANSWER, "YES"), _retriever(), "What runs Vertex?"))
+    streamed = events[-1]["result"]
+    plain = agent_rag.agentic_answer(_llm("YES", _ANSWER, "YES"), _retriever(), "What runs Vertex?")
+    assert streamed == plain
+    assert streamed["answer"] == _ANSWER
+    assert "".join(ev["chunk"].content for ev in events if ev["event"] == "token") == _ANSWER
+
+
+def test_answer_streams_after_one_call_and_the_verdict_trails(pacer):
+    order, calls_at_first_token = [], None
+    for ev in agent_rag.agentic_stream(_llm("YES", _ANSWER, "NO"), _retriever(), "q"):
+        kind = ev["step"]["step"] if ev["event"] == "step" else ev["event"]
+        if kind == "token" and calls_at_first_token is None:
+            calls_at_first_token = len(pacer.needs)
+        if not order or order[-1] != kind:
+            order.append(kind)
+    assert order == ["retrieve", "grade", "token", "generate", "self_check", "done"]
+    assert calls_at_first_token == 2, "첫 토큰 전에는 판정 + 생성 시작뿐이어야 한다"
+
+
+def test_rewrite_path_keeps_the_trace_shape(pacer):
+    res = list(agent_rag.agentic_stream(_llm("NO", "vertex pipelines kubeflow", _ANSWER, "YES"),
+                                        _retriever(), "q"))[-1]["result"]
+    assert [s["step"] for s in res["trace"]] == \
+        ["retrieve", "grade", "rewrite", "retrieve", "generate", "self_check"]
+    assert res["rewrote"] and res["grounded"] == "YES"
+
+
+def test_stream_is_paced_and_recorded_even_when_abandoned(pacer):
+    gen = agent_rag._ask_stream(_llm(_ANSWER), "{q}", _max_tokens=32, q="hi")
+    next(gen)
+    gen.close()                       # 방문자가 페이지를 떠났다
+    assert len(pacer.needs) == 1 and pacer.tokens == [pacer.needs[0]]
+
+
+def test_stream_retries_only_before_the_first_chunk(monkeypatch):
+    monkeypatch.setattr(agent_rag.time, "sleep", lambda s: None)
+
+    class Chain:
+        def __init__(self, fail_after):
+            self.calls, self.fail_after = 0, fail_after
+
+        def stream(self, variables):
+            self.calls += 1
+            if self.fail_after == 0 and self.calls == 1:
+                raise RuntimeError("429 rate limit, try again in 1s")
+            yield "a"
+            if self.fail_after == 1:
+                raise RuntimeError("429 rate limit, try again in 1s")
+            yield "b"
+
+    early = Chain(fail_after=0)
+    assert list(agent_rag._stream_with_retry(early, {})) == ["a", "b"] and early.calls == 2
+    late = Chain(fail_after=1)
+    with pytest.raises(RuntimeError, match="429"):
+        list(agent_rag._stream_with_retry(late, {}))
+    assert late.calls == 1, "토큰을 흘린 뒤 다시 시작하면 답이 두 번 찍힌다"
+
+
+@pytest.mark.parametrize("out, expected", [
+    ("USE", ("YES", None)),
+    ("  use\n", ("YES", None)),
+    ("SEARCH: vertex pipelines kubeflow 파이프라인", ("NO", "vertex pipelines kubeflow 파이프라인")),
+    ('**SEARCH:** "triton explicit mode"', ("NO", "triton explicit mode")),
+    ("SEARCH:", ("NO", None)),          # 쿼리가 비었다 → 재작성 1콜로 메운다
+    ("NO", ("NO", None)),
+    ("YES", ("YES", None)),
+    ("", ("YES", None)),                # 못 읽으면 지금 청크를 쓴다
+    ("SEARCHING the docs for kubeflow", ("YES", None)),   # 콜론 없는 SEARCH 는 쿼리가 아니다
+    ("DON'T USE", ("NO", None)),        # 부정 표현은 부분 문자열 USE 로 읽지 않는다
+    ("Not useful for this question.", ("NO", None)),
+    ("UNUSABLE", ("NO", None)),
+    ("UNKNOWN", ("YES", None)),         # 부분 문자열 NO 로 읽지 않는다 — 못 읽은 응답
+    ("NONE", ("YES", None)),
+    ("No, search again.", ("NO", None)),
+    ("Yes — use them", ("YES", None)),
+])
+def test_grade_or_rewrite_parses_deterministically(pacer, out, expected):
+    assert agent_rag._grade_or_rewrite(_llm(out), "q", "ctx") == expected
+
+
+def test_combined_grade_saves_the_rewrite_call_and_keeps_the_trace(pacer):
+    queries = []
+    retriever = SimpleNamespace(invoke=lambda q: queries.append(q) or list(_DOCS))
+    res = agent_rag.agentic_answer(_llm("SEARCH: vertex kubeflow", _ANSWER, "YES"), retriever, "q",
+                                   grade_mode="combined")
+    assert [s["step"] for s in res["trace"]] == \
+        ["retrieve", "grade", "rewrite", "retrieve", "generate", "self_check"]
+    assert res["trace"][2] == {"step": "rewrite", "detail": "vertex kubeflow", "combined": True}
+    assert queries == ["q", "vertex kubeflow"] and res["rewrote"]
+    assert len(pacer.needs) == 3, "판정+재작성 1콜 · 생성 · 근거점검 — 예전보다 한 콜 적다"
+
+    pacer.needs.clear()
+    sep = agent_rag.agentic_answer(_llm("NO", "vertex kubeflow", _ANSWER, "YES"), _retriever(), "q",
+                                   grade_mode="separate")
+    assert [s["step"] for s in sep["trace"]] == [s["step"] for s in res["trace"]]
+    assert len(pacer.needs) == 4
+
+
+def test_no_retries_means_no_grade_call_in_either_mode(pacer):
+    for mode in ("combined", "separate"):
+        pacer.needs.clear()
+        res = agent_rag.agentic_answer(_llm(_ANSWER, "YES"), _retriever(), "q", max_retries=0,
+                                       grade_mode=mode)
+        assert [s["step"] for s in res["trace"]] == ["retrieve", "generate", "self_check"]
+        assert len(pacer.needs) == 2
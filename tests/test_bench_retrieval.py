@@ -0,0 +1,74 @@
+"""검색 벤치마크(evals/bench_retrieval.py) 회귀.
+
+벤치마크 숫자가 틀리면 '빨라졌다/나빠졌다'는 판단 자체가 틀린다. 그래서 지표 계산
+(백분위·recall@k)과 질의 집합(라벨 있는 케이스만, archive·교차언어 포함)을 고정한다.
+실제 구축·검색까지 도는 왕복은 faiss·langchain 이 있어야 돌아 CI 에서는 skip 된다.
+"""
+import json
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "evals"))
+
+import bench_retrieval as bench  # noqa: E402
+
+
+def test_percentiles_are_nearest_rank_and_skip_missing_legs():
+    vals = list(range(1, 21))            # 1..20
+    assert bench.percentiles(vals) == {"p50": 10, "p95": 19}
+    assert bench.percentiles([5.0, None, 1.0]) == {"p50": 1.0, "p95": 5.0}
+    assert bench.percentiles([None, None]) is None
+
+
+def test_recall_at_k_uses_the_expect_vendor_label():
+    doc = lambda v: SimpleNamespace(metadata={"vendor": v})
+    cases = [{"expect_vendor": "AWS"}, {"expect_vendor": "Google Cloud"}]
+    results = [[doc("AWS"), doc("Google Cloud")],
+               [doc("AWS"), doc("AWS"), doc("Google Cloud")]]
+    assert bench.recall_at(results, cases, ks=(1, 2, 3)) == {"1": 0.5, "2": 0.5, "3": 1.0}
+
+
+def test_cases_are_every_labelled_query_and_nothing_else():
+    cases = bench.load_cases()
+    assert all(c["expect_vendor"] for c in cases)
+    assert {c["source"] for c in cases} == {"golden_rag.jsonl", "golden_rag.dropped.jsonl", "retrieval_probe"}
+    assert len({c["id"] for c in cases}) == len(cases)
+    # 거절 케이스(라벨 없음)가 섞이면 recall 분모가 부풀어 점수가 조용히 내려간다.
+    golden = [json.loads(l) for l in (ROOT / "evals" / "golden_rag.jsonl").read_text(encoding="utf-8").splitlines()
+              if l.strip()]
+    refuse_ids = {c["id"] for c in golden if not c.get("expect_vendor")}
+    assert not refuse_ids & {c["id"] for c in cases}
+
+
+def test_scaled_copies_have_distinct_text_and_keep_their_labels():
+    pytest.importorskip("langchain_core")
+    from langchain_core.documents import Document
+
+    docs = [Document(page_content="alpha", metadata={"vendor": "AWS"}),
+            Document(page_content="beta", metadata={"vendor": "Google Cloud"})]
+    out = bench.scale_corpus(docs, 3)
+    assert len(out) == 6
+    assert len({d.page_content for d in out}) == 6, "복제본 본문이 같으면 RRF 가 합쳐 규모가 안 커진다"
+    assert [d.metadata["vendor"] for d in out] == ["AWS", "Google Cloud"] * 3
+
+
+def test_run_writes_a_comparable_record(tmp_path):
+    for mod in ("faiss", "langchain_community", "langchain_text_splitters"):
+        pytest.importorskip(mod)
+    from langchain_core.embeddings import DeterministicFakeEmbedding
+
+    rec = bench.run(scales=(1, 2), repeat=2, embedding=DeterministicFakeEmbedding(size=16), out_dir=tmp_path)
+    saved = json.loads(Path(rec["path"]).read_text(encoding="utf-8"))
+    assert Path(rec["path"]).name.endswith(f"_retrieval-{saved['corpus_key']}.json")
+    assert saved["kind"] == "retrieval_bench" and saved["queries"] == len(bench.load_cases())
+    one, two = saved["results"]
+    assert two["chunks"] == 2 * one["chunks"]
+    for res in saved["results"]:
+        assert set(res["latency_ms"]) == {"cold", "warm"}
+        assert set(res["latency_ms"]["cold"]) == {"dense", "sparse", "total"}
+        assert set(res["recall_at_k"]) == {"1", "3", "5"}
+        assert res["build_s"]["dense"] >= 0 and res["memory_mb"]["faiss"] > 0
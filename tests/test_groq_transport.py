@@ -0,0 +1,124 @@
+"""Groq 응답 헤더 → 모델 페이서(groq_transport.observe_response · TokenPacer.observe_headers) 회귀.
+
+지키는 것: (1) 스트리밍 응답도 본문을 읽기 전에 헤더가 그 요청 모델의 페이서에 들어간다,
+(2) 서버가 본 사용량(limit - remaining-tokens)에는 헤더를 읽은 뒤의 로컬 예약만 더한다 — 그 앞의 몫은
+이미 서버 값에 들어 있다, 그래서 헤더 뒤로 예약을 쌓아도 서버 쪽 합이 예산을 넘지 않는다,
+(3) 하한이 풀리면 기다리던 예약이 창이 빌 60초를 기다리지 않고 들어간다, (4) remaining-requests 가
+0 이면 reset-requests 까지 막힌다, (5) 공유 창이면 다른 프로세스의 페이서도 같은 하한을 본다,
+(6) 레이트리밋 헤더나 모델이 없는 응답은 건드리지 않는다, (7) 헤더를 못 먹여도 응답은 살리고
+모델마다 한 번 경고한다.
+"""
+import time
+
+import httpx
+import pytest
+
+import groq_transport
+import ratelimit
+from groq_transport import observe_response
+from ratelimit import SharedTokenPacer, TokenPacer
+
+_URL = "https://api.groq.com/openai/v1/chat/completions"
+_MODEL = "qwen/qwen3.6-27b"
+
+
+@pytest.fixture(autouse=True)
+def _fresh(tmp_path, monkeypatch):
+    monkeypatch.setattr(ratelimit, "_LEDGER_PATH", str(tmp_path / "daily_usage.json"))
+    monkeypatch.setattr(ratelimit, "_PACERS", {})
+    monkeypatch.setattr(groq_transport, "_WARNED", set())
+
+
+def _client(headers):
+    def handler(request):
+        return httpx.Response(200, headers=headers, content=b'data: {"x": 1}\n\ndata: [DONE]\n\n')
+    return httpx.Client(transport=httpx.MockTransport(handler), event_hooks={"response": [observe_response]})
+
+
+def _headers(remaining, reset="30s", limit=6000, **extra):
+    return {"x-ratelimit-limit-tokens": str(limit), "x-ratelimit-remaining-tokens": str(remaining),
+            "x-ratelimit-reset-tokens": reset, **extra}
+
+
+def test_streaming_headers_reach_the_model_pacer():
+    with _client(_headers(remaining=3800, limit=9000)) as c:
+        with c.stream("POST", _URL, json={"model": _MODEL, "stream": True, "messages": []}) as r:
+            p = ratelimit.pacer_for(_MODEL)          # 첫 청크를 읽기 전
+            assert p.limit == 9000 and p._used(time.time()) == 5200
+            list(r.iter_lines())
+
+
+def test_server_floor_is_not_added_to_local_usage():
+    p = TokenPacer(tpm_limit=6000, safety=1.0, verbose=False)
+    p.commit(p.reserve(1000), 900)
+    p.observe_headers(_headers(remaining=5000))       # 서버 몫에 이 호출도 이미 들어 있다
+    assert p._used(time.time()) == 1000
+    p.observe_headers(_headers(remaining=5400))
+    assert p._used(time.time()) == 900, "로컬 창보다 작으면 로컬 합계를 쓴다"
+
+
+@pytest.mark.parametrize("shared", [False, True])
+def test_reservations_after_headers_stay_within_the_server_budget(tmp_path, shared):
+    if shared:
+        p = SharedTokenPacer("k:m", path=str(tmp_path / "p.sqlite"), tpm_limit=8000, verbose=False)
+    else:
+        p = TokenPacer(tpm_limit=8000, verbose=False)
+    p.observe_headers(_headers(remaining=4000, limit=8000))   # 서버는 4000 을 봤다
+    held = []
+    with pytest.raises(TimeoutError):
+        for _ in range(10):
+            held.append(p.reserve(1500, deadline=time.monotonic() + 0.05))
+    assert held, "서버 쪽 여유가 있는데 막았다"
+    assert 4000 + sum(h[1] for h in held) <= p.budget, "헤더 뒤의 로컬 예약을 서버 값에 더하지 않았다"
+    assert p._used(time.time()) == 4000 + sum(h[1] for h in held)
+    p.release(held.pop())                              # 헤더 뒤 예약을 취소하면 그만큼 풀린다
+    p.release(p.reserve(1500, deadline=time.monotonic() + 0.05))
+
+
+def test_floor_blocks_until_reset_then_wakes():
+    p = TokenPacer(tpm_limit=1000, safety=1.0, verbose=False)
+    p.observe_headers(_headers(remaining=100, reset="0.4s", limit=1000))   # 다른 클라이언트가 900 을 썼다
+    with pytest.raises(TimeoutError):
+        p.reserve(500, deadline=time.monotonic() + 0.1)
+    t = time.monotonic()
+    p.release(p.reserve(500, deadline=time.monotonic() + 5))
+    assert time.monotonic() - t < 1.5, "하한이 풀린 뒤에도 창이 빌 때까지 잤다"
+
+
+def test_no_requests_left_blocks_the_whole_window():
+    p = TokenPacer(tpm_limit=1000, safety=1.0, verbose=False)
+    p.observe_headers(_headers(remaining=1000, reset="0s", limit=1000,
+                               **{"x-ratelimit-remaining-requests": "0", "x-ratelimit-reset-requests": "2s"}))
+    assert p._used(time.time()) == 1000
+    with pytest.raises(TimeoutError):
+        p.reserve(10, deadline=time.monotonic() + 0.1)
+
+
+def test_shared_window_sees_the_floor(tmp_path):
+    a, b = (SharedTokenPacer("k:m", path=str(tmp_path / "p.sqlite"), tpm_limit=1000, safety=1.0, verbose=False)
+            for _ in range(2))
+    a.observe_headers(_headers(remaining=200, limit=1000))
+    assert b._used(time.time()) == 800
+    with pytest.raises(TimeoutError):
+        b.reserve(500, deadline=time.monotonic() + 0.05)
+
+
+def test_responses_without_limits_or_model_are_ignored():
+    with _client({"content-type": "application/json"}) as c:
+        c.post(_URL, json={"model": _MODEL})
+    with _client(_headers(remaining=10)) as c:
+        c.post(_URL, content=b"not json")
+    assert ratelimit._PACERS == {}
+
+
+def test_a_failing_pacer_warns_once_per_model_and_keeps_the_response(monkeypatch, caplog):
+    class _Broken:
+        def observe_headers(self, headers):
+            raise ValueError("bad header")
+
+    monkeypatch.setattr(groq_transport, "pacer_for", lambda model: _Broken())
+    with caplog.at_level("WARNING", logger="groq_transport"), _client(_headers(remaining=10)) as c:
+        for model in (_MODEL, _MODEL, "other-model"):
+            assert c.post(_URL, json={"model": model}).status_code == 200
+    warned = [r for r in caplog.records if r.name == "groq_transport"]
+    assert [r.args[0] for r in warned] == [_MODEL, "other-model"]
@@ -0,0 +1,121 @@
+"""HybridRetriever 의 dense/sparse 다리 동시 실행 · 다리별 마감 회귀.
+
+지켜야 할 것 셋: 두 다리가 정말 겹쳐 돈다(순서대로면 지연이 합이 된다), 마감을 넘긴 다리는
+턴을 붙잡지 않고 한 다리 결과로 내려간다, 마감이 없으면(평가 하니스) 결과가 예전과 같다.
+다리는 sleep 하는 대역으로 세운다 — 실제 인코더·FAISS 속도와 무관하게 타이밍만 본다.
+"""
+import time
+from types import SimpleNamespace
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+import rag_store
+from rag_corpus import HybridRetriever, QueryEmbeddingCache
+
+_DOCS = [SimpleNamespace(page_content=t, metadata={}) for t in ("a", "b", "c", "d")]
+
+
+class _SlowIndex:
+    """search 가 delay 초 걸리는 FAISS 인덱스 대역(행 번호 = 청크 id)."""
+
+    def __init__(self, delay, order=(0, 1, 2, 3), error=None):
+        self.delay, self.order, self.error = delay, order, error
+        self.ntotal = len(_DOCS)
+
+    def search(self, x, k):
+        time.sleep(self.delay)
+        if self.error:
+            raise self.error
+        rows = list(self.order)[:k]
+        dist = [float(i) for i in range(len(rows))] + [np.inf] * (k - len(rows))
+        return np.asarray([dist]), np.asarray([rows + [-1] * (k - len(rows))])
+
+
+def _slow_store(delay, **kw):
+    return SimpleNamespace(index=_SlowIndex(delay, **kw),
+                           embeddings=SimpleNamespace(model_name="fake", embed_query=lambda text: [0.0]))
+
+
+class _SlowBM25:
+    def __init__(self, delay, order=(3, 2, 1, 0)):
+        self.delay, self.order = delay, order
+
+    def get_scores(self, tokens):
+        time.sleep(self.delay)
+        scores = np.zeros(len(self.order))
+        scores[list(self.order)] = np.arange(len(self.order), 0, -1)   # order 순으로 내림차순
+        return scores
+
+
+def _retriever(dense_delay, sparse_delay, **kw):
+    return HybridRetriever(_slow_store(dense_delay, **kw), _DOCS, _SlowBM25(sparse_delay), k=2,
+                           query_cache=QueryEmbeddingCache())
+
+
+def test_legs_run_concurrently():
+    r = _retriever(0.3, 0.3)
+    t0 = time.perf_counter()
+    _, legs = r.search("q")
+    elapsed = time.perf_counter() - t0
+    assert elapsed < 0.5, f"두 다리가 겹치지 않았다({elapsed:.2f}s ≈ 합)"
+    assert legs["dense_ms"] >= 250 and legs["sparse_ms"] >= 250
+    assert legs["degraded"] is None
+
+
+def test_without_deadline_result_equals_sequential_fusion():
+    r = _retriever(0.05, 0.0)
+    docs, _ = r.search("q")
+    assert docs == [_DOCS[i] for i in rag_store.rrf([(0, 1, 2, 3), (3, 2, 1, 0)], k=2)]
+    assert r.invoke("q") == docs
+
+
+def test_search_reports_the_scores_the_local_gate_reads():
+    _, legs = _retriever(0.0, 0.0).search("q")
+    assert legs["scores"] == {"dense_top": 1.0, "sparse_top": 4.0, "overlap": 0.0}
+    _, legs = _retriever(0.0, 0.0, order=(3, 2, 0, 1)).search("q")
+    assert legs["scores"]["overlap"] == 1.0, "두 다리 top-2 가 같으면 완전 일치"
+    _, legs = _retriever(0.2, 0.0).search("q", leg_timeout_s=0.05)
+    assert legs["scores"] is None, "한 다리만 남으면 일치도를 잴 수 없다"
+
+
+def test_slow_leg_degrades_to_the_other_leg():
+    r = _retriever(1.0, 0.0)
+    t0 = time.perf_counter()
+    docs, legs = r.search("q", leg_timeout_s=0.1)
+    assert time.perf_counter() - t0 < 0.5, "느린 다리가 턴을 붙잡았다"
+    assert legs["degraded"] == "dense" and legs["dense_ms"] is None
+    assert docs == [_DOCS[3], _DOCS[2]]
+
+
+def test_when_both_legs_are_late_the_first_to_finish_is_used():
+    """둘 다 마감을 넘겨도 빈 결과로 답하게 할 수는 없다 — 먼저 끝난 다리를 기다린다."""
+    r = _retriever(1.0, 0.2)
+    docs, legs = r.search("q", leg_timeout_s=0.05)
+    assert legs["degraded"] == "dense"
+    assert docs == [_DOCS[3], _DOCS[2]]
+
+
+def test_leg_errors_are_not_swallowed():
+    r = _retriever(0.0, 0.0, error=RuntimeError("faiss broke"))
+    with pytest.raises(RuntimeError, match="faiss broke"):
+        r.search("q")
+
+
+def test_agent_trace_reports_leg_timings_and_caps_the_leg_deadline():
+    pytest.importorskip("langchain_core")
+    import agent_rag
+
+    r = _retriever(1.0, 0.0)
+    # 턴 마감이 0.1s 남았으면 다리 마감도 RETRIEVAL_LEG_TIMEOUT_S 가 아니라 0.1s 다.
+    t0 = time.perf_counter()
+    chunks, step = agent_rag._retrieve(r, "q", deadline=time.monotonic() + 0.1)
+    assert time.perf_counter() - t0 < 0.5
+    assert step["step"] == "retrieve" and step["legs"]["degraded"] == "dense"
+    assert "single-leg" in step["detail"] and "sparse" in step["detail"]
+
+    # .search 가 없는 검색기는 .invoke 로 — 시간 정보 없이.
+    plain = SimpleNamespace(invoke=lambda q: _DOCS[:2])
+    chunks, step = agent_rag._retrieve(plain, "q")
+    assert chunks == _DOCS[:2] and "legs" not in step
@@ -0,0 +1,93 @@
+"""agent_rag 의 LLM 호출 계층(컴파일한 템플릿·바인딩한 모델 캐시) 회귀.
+
+지키는 것: (1) 같은 템플릿·(모델, max_tokens) 는 한 번만 컴파일·바인딩한다, (2) 한 번 렌더한
+메시지로 낸 결과와 예약 추정치가 예전 경로(from_template → bind → format → invoke)와 같다,
+(3) 캐시가 다른 모델 객체의 바인딩을 돌려주지 않는다, (4) 콜마다 오버헤드·네트워크 시간을 나눠
+기록한다 — 첫 청크 전에 실패한 스트림은 빼고, (5) 오버헤드 벤치마크가 두 경로를 모두 재서 기록을 남긴다.
+"""
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("langchain_core")
+from langchain_core.language_models.fake_chat_models import FakeListChatModel  # noqa: E402
+from langchain_core.prompts import ChatPromptTemplate  # noqa: E402
+
+import agent_rag  # noqa: E402
+import observability  # noqa: E402
+from prompts import RAG_GRADE_PROMPT_TEMPLATE  # noqa: E402
+from ratelimit import estimate_tokens  # noqa: E402
+
+ROOT = Path(__file__).resolve().parents[1]
+_VARS = {"question": "How do Vertex AI Pipelines run?", "context": "[1] Vertex AI Pipelines run Kubeflow."}
+
+
+def test_templates_and_bindings_are_reused(pacer):
+    llm = FakeListChatModel(responses=["YES"])
+    for _ in range(3):
+        agent_rag._ask(llm, RAG_GRADE_PROMPT_TEMPLATE, _max_tokens=4, **_VARS)
+    assert agent_rag._compiled(RAG_GRADE_PROMPT_TEMPLATE) is agent_rag._compiled(RAG_GRADE_PROMPT_TEMPLATE)
+    assert agent_rag._bound(llm, 4) is agent_rag._bound(llm, 4)
+    assert agent_rag._bound(llm, 8) is not agent_rag._bound(llm, 4)
+    assert agent_rag._bound(llm, None) is llm
+
+
+def test_rendered_once_matches_the_old_path(pacer):
+    llm = FakeListChatModel(responses=["<think>hmm</think>YES"])
+    got = agent_rag._ask(llm, RAG_GRADE_PROMPT_TEMPLATE, _max_tokens=4, **_VARS)
+    prompt = ChatPromptTemplate.from_template(RAG_GRADE_PROMPT_TEMPLATE)
+    want = agent_rag.clean_response((prompt | llm.bind(max_tokens=4)).invoke(_VARS).content)
+    assert got == want == "YES"
+    assert pacer.needs == [estimate_tokens(prompt.format(**_VARS)) + 4], "예약 추정치가 달라졌다"
+
+
+def test_binding_cache_checks_identity():
+    a = FakeListChatModel(responses=["a"])
+    bound = agent_rag._bound(a, 4)
+    key = (id(a), 4)
+    b = FakeListChatModel(responses=["b"])
+    # 죽은 객체의 id 가 재사용된 상황을 흉내 낸다
+    with agent_rag._BOUND_LOCK:
+        agent_rag._BOUND[(id(b), 4)] = agent_rag._BOUND[key]
+    assert agent_rag._bound(b, 4) is not bound
+    assert agent_rag._bound(b, 4).invoke("x").content == "b"
+
+
+def test_overhead_and_network_recorded_separately(pacer, monkeypatch):
+    monkeypatch.setattr(observability, "_LLM_CALLS", {"n": 0, "overhead_ms": 0.0, "network_ms": 0.0})
+    assert observability.llm_call_stats() == {"n": 0, "overhead_ms_avg": None, "network_ms_avg": None}
+    llm = FakeListChatModel(responses=["YES"])
+    agent_rag._ask(llm, RAG_GRADE_PROMPT_TEMPLATE, _max_tokens=4, **_VARS)
+    list(agent_rag._ask_stream(llm, RAG_GRADE_PROMPT_TEMPLATE, _max_tokens=4, **_VARS))
+    st = observability.llm_call_stats()
+    assert st["n"] == 2 and st["overhead_ms_avg"] >= 0 and st["network_ms_avg"] >= 0
+
+
+def test_stream_failing_before_the_first_chunk_is_not_recorded(pacer, monkeypatch):
+    monkeypatch.setattr(observability, "_LLM_CALLS", {"n": 0, "overhead_ms": 0.0, "network_ms": 0.0})
+
+    def fail(model, messages, deadline=None):
+        raise RuntimeError("connection reset")
+        yield  # 제너레이터로 만든다(도달하지 않는다)
+
+    monkeypatch.setattr(agent_rag, "_stream_with_retry", fail)
+    llm = FakeListChatModel(responses=["YES"])
+    with pytest.raises(RuntimeError):
+        list(agent_rag._ask_stream(llm, RAG_GRADE_PROMPT_TEMPLATE, _max_tokens=4, **_VARS))
+    assert observability.llm_call_stats()["n"] == 0
+
+
+def test_bench_compares_both_paths(tmp_path):
+    sys.path.insert(0, str(ROOT / "evals"))
+    import bench_llm_overhead as bench
+
+    real = agent_rag.pacer_for
+    rec = bench.run(n=3, out_dir=tmp_path)
+    assert agent_rag.pacer_for is real, "벤치마크가 가짜 페이서를 되돌려 놓지 않았다"
+    saved = json.loads(Path(rec["path"]).read_text(encoding="utf-8"))
+    assert Path(rec["path"]).name.endswith("_llm-overhead.json")
+    assert saved["kind"] == "llm_overhead_bench" and set(saved["results"]) == set(bench.TEMPLATES)
+    for row in saved["results"].values():
+        assert row["legacy_us"] > 0 and row["cached_us"] > 0
@@ -0,0 +1,104 @@
+"""TokenPacer 의 동시성 회귀 — 합계 장부·원자적 예약·조건 변수 깨우기.
+
+지키는 것: (1) 여러 스레드가 한꺼번에 예약·확정·취소해도 창 합계가 예산을 넘는 순간이 없다,
+(2) 들고 다니는 합계가 창 안 기록의 실제 합과 늘 같다(만료·확정·창 밖 확정 포함), (3) 취소·축소가
+기다리던 호출을 바로 깨운다 — 창이 비는 60초를 기다리지 않는다, (4) 공유 창도 같은 불변식을 지킨다.
+"""
+import random
+import threading
+import time
+
+import pytest
+
+import ratelimit
+from ratelimit import SharedTokenPacer, TokenPacer
+
+
+@pytest.fixture(autouse=True)
+def ledger(tmp_path, monkeypatch):
+    monkeypatch.setattr(ratelimit, "_LEDGER_PATH", str(tmp_path / "daily_usage.json"))
+
+
+def _checked(base):
+    """통과할 때마다 창 합계가 예산 안인지 잠금 안에서 확인하는 페이서."""
+
+    class Checked(base):
+        peak = 0
+
+        def _take(self, need, hold, share):
+            ok, got = super()._take(need, hold, share)
+            if ok:
+                used = self._used(time.time())
+                Checked.peak = max(Checked.peak, used)
+                assert used <= self.budget, f"창 합계 {used} > 예산 {self.budget}"
+            return ok, got
+    return Checked
+
+
+def _hammer(p, threads=16, rounds=150, max_need=1500):
+    errors = []
+
+    def work(seed):
+        rnd = random.Random(seed)
+        try:
+            for _ in range(rounds):
+                held = p.reserve(rnd.randint(50, max_need), deadline=time.monotonic() + 10)
+                time.sleep(rnd.random() / 2000)
+                if rnd.random() < 0.5:
+                    p.release(held)                  # 호출이 안 나갔다
+                else:
+                    p.commit(held, 1)                # 실제로는 조금만 썼다
+        except Exception as e:  # noqa: BLE001
+            errors.append(e)
+
+    ts = [threading.Thread(target=work, args=(i,)) for i in range(threads)]
+    for t in ts:
+        t.start()
+    for t in ts:
+        t.join(60)
+    assert not errors, errors[:3]
+
+
+def test_concurrent_reservations_never_exceed_the_budget():
+    p = _checked(TokenPacer)(tpm_limit=5000, safety=1.0, verbose=False)
+    _hammer(p)
+    assert 1500 < type(p).peak <= 5000, "경합이 없었다 — 테스트가 아무것도 확인하지 않았다"
+    assert p.events.total == sum(t for _, t in p.events) == p._used(time.time())
+
+
+def test_running_total_tracks_expiry_and_late_commits():
+    p = TokenPacer(tpm_limit=10_000, safety=1.0, verbose=False)
+    old = p.reserve(300)
+    old[0] = time.time() - 120                     # 창 밖으로 밀려날 예약
+    p.record(200)
+    assert p._used(time.time()) == 200 and p.events.total == 200
+    p.commit(old, 50)                              # 이미 창 밖 — 합계를 건드리면 안 된다
+    fresh = p.reserve(400)
+    p.commit(fresh, 100)
+    assert p._used(time.time()) == 300 == sum(t for _, t in p.events)
+
+
+def test_release_wakes_a_waiter_without_polling():
+    p = TokenPacer(tpm_limit=1000, safety=1.0, verbose=False)
+    held = p.reserve(900)
+    got = []
+
+    def waiter():
+        t = time.monotonic()
+        p.release(p.reserve(500, deadline=time.monotonic() + 70))
+        got.append(time.monotonic() - t)
+
+    t = threading.Thread(target=waiter)
+    t.start()
+    time.sleep(0.1)
+    assert not got, "예산이 없는데 통과했다"
+    p.release(held)
+    t.join(5)
+    assert got and got[0] < 1.0, "취소가 기다리던 호출을 깨우지 못했다(창이 빌 때까지 잤다)"
+
+
+def test_shared_window_keeps_the_same_invariant(tmp_path):
+    p = _checked(SharedTokenPacer)("k:m", path=str(tmp_path / "p.sqlite"), tpm_limit=5000, safety=1.0,
+                                    verbose=False)
+    _hammer(p, threads=6, rounds=40)
+    assert type(p).peak <= 5000
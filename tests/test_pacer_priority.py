@@ -0,0 +1,94 @@
+"""페이서 앞 우선순위 입장 줄(ratelimit.PRIORITY_CLASSES) 회귀.
+
+지키는 것: (1) 중첩한 등급은 낮은 쪽이 이긴다, (2) 창이 비면 먼저 온 batch 보다 나중에 온 answer 가
+들어간다, (3) batch 는 INTERACTIVE_HEADROOM 몫을 남기고만 들어간다, (4) 등급별 대기·줄 길이가
+observability 에 남는다, (5) 에이전트 콜은 생성 answer·나머지 check 로, 배치 안에서는 (추측 생성
+스레드까지) batch 로 줄 선다.
+"""
+import threading
+import time
+
+import pytest
+
+import observability
+import ratelimit
+from ratelimit import TokenPacer, current_priority, priority
+
+
+@pytest.fixture(autouse=True)
+def _fresh(tmp_path, monkeypatch):
+    monkeypatch.setattr(ratelimit, "_LEDGER_PATH", str(tmp_path / "daily_usage.json"))
+    monkeypatch.setattr(observability, "_ADMISSION", {})
+
+
+def test_nested_classes_only_demote():
+    assert current_priority() == "answer"
+    with priority("batch"):
+        with priority("answer"):
+            assert current_priority() == "batch"
+    with priority("check"):
+        with priority("mcp"):
+            assert current_priority() == "mcp"
+        assert current_priority() == "check"
+
+
+def test_interactive_overtakes_a_waiting_batch():
+    p = TokenPacer(tpm_limit=1000, safety=1.0, verbose=False)
+    p.events.append((time.time() - 59.4, 1000))       # 창이 ~0.9초 뒤 빈다
+    order, errors = [], []
+
+    def wait(cls, delay, budget_s):
+        time.sleep(delay)
+        try:
+            p.reserve(600, deadline=time.monotonic() + budget_s, priority=cls)
+            order.append(cls)
+        except TimeoutError:
+            errors.append(cls)
+
+    threads = [threading.Thread(target=wait, args=("batch", 0, 2.0)),
+               threading.Thread(target=wait, args=("answer", 0.2, 2.0))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert order == ["answer"] and errors == ["batch"], "먼저 온 batch 가 방문자 답변보다 먼저 들어갔다"
+    stats = observability.admission_stats()
+    assert stats["answer"]["granted"] == 1 and stats["answer"]["wait_ms_max"] > 0
+    assert stats["batch"]["granted"] == 0 and stats["batch"]["peak_queued"] == 1
+    assert all(r["queued"] == 0 for r in stats.values())
+
+
+def test_batch_leaves_headroom_for_visitors():
+    p = TokenPacer(tpm_limit=1000, safety=1.0, verbose=False)
+    p.events.append((time.time(), 600))
+    with pytest.raises(TimeoutError):
+        p.reserve(200, deadline=time.monotonic() + 0.1, priority="batch")
+    p.reserve(200, deadline=time.monotonic() + 0.1, priority="answer")
+    assert p._used(time.time()) == 800
+
+
+def test_agent_calls_carry_their_class(pacer):
+    pytest.importorskip("langchain_core")
+    from types import SimpleNamespace
+
+    from langchain_core.documents import Document
+    from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+    import agent_rag
+
+    class _Routed(FakeListChatModel):
+        def _call(self, messages, *args, **kwargs):
+            text = messages[-1].content
+            if "USE" in text and "SEARCH:" in text:
+                return "USE"
+            return "YES" if "groundedness checker" in text else "Vertex runs Kubeflow [1]."
+
+    docs = [Document(page_content="Vertex AI Pipelines run Kubeflow.", metadata={"vendor": "Google Cloud"})]
+    retriever = SimpleNamespace(invoke=lambda q: docs)
+    agent_rag.agentic_answer(_Routed(responses=["-"]), retriever, "How does Vertex run?",
+                             speculative=False, self_check="llm")
+    assert pacer.classes == ["check", "answer", "check"]
+    pacer.classes.clear()
+    agent_rag.agentic_answer_batch(_Routed(responses=["-"]), retriever, ["How does Vertex run?"],
+                                   speculative=True, self_check="llm")
+    assert pacer.classes and set(pacer.classes) == {"batch"}, pacer.classes
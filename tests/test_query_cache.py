@@ -0,0 +1,100 @@
+"""질의 임베딩 캐시(rag_corpus.QueryEmbeddingCache) 회귀.
+
+캐시가 틀리는 방식은 둘이다: 다른 모델의 벡터를 돌려주거나(키에 모델이 빠짐), 상한 없이
+자라 무료 티어 메모리를 먹거나. 둘 다 조용히 일어나므로 여기서 고정한다.
+LRU 자체는 stdlib 만 써서 CI 에서 돈다. 검색기 통합 테스트만 faiss 가 있어야 돈다.
+"""
+import pytest
+
+from rag_corpus import QueryEmbeddingCache, HybridRetriever
+
+
+class _Encoder:
+    """embed_query 호출 횟수만 세는 인코더 — 벡터 값은 (모델, 텍스트)로 정해진다."""
+
+    def __init__(self, model_name="m1"):
+        self.model_name = model_name
+        self.calls = []
+
+    def embed_query(self, text):
+        self.calls.append(text)
+        return [float(len(text)), float(hash((self.model_name, text)) % 997)]
+
+
+def test_hit_skips_the_encoder_and_counts():
+    cache, enc = QueryEmbeddingCache(maxsize=8), _Encoder()
+    first = cache.embed(enc, "What is MLOps?")
+    assert cache.embed(enc, "What is MLOps?") == first
+    assert enc.calls == ["What is MLOps?"]
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+
+def test_whitespace_is_normalized_but_case_is_not():
+    """공백만 다른 예시 질문은 같은 키. 대소문자는 인코더가 구분할 수 있으니 다른 키."""
+    cache, enc = QueryEmbeddingCache(), _Encoder()
+    cache.embed(enc, "  What is\n MLOps? ")
+    cache.embed(enc, "What is MLOps?")
+    cache.embed(enc, "what is mlops?")
+    assert enc.calls == ["What is MLOps?", "what is mlops?"]
+
+
+def test_key_includes_the_embedding_model():
+    cache = QueryEmbeddingCache()
+    a, b = _Encoder("model-a"), _Encoder("model-b")
+    cache.embed(a, "q")
+    cache.embed(b, "q")
+    assert len(a.calls) == len(b.calls) == 1, "다른 모델의 벡터가 캐시에서 나갔다"
+
+
+def test_size_is_bounded_and_eviction_is_least_recently_used():
+    cache, enc = QueryEmbeddingCache(maxsize=2), _Encoder()
+    cache.embed(enc, "a")
+    cache.embed(enc, "b")
+    cache.embed(enc, "a")          # a 를 최근으로
+    cache.embed(enc, "c")          # b 가 밀려난다
+    assert cache.stats()["size"] == 2
+    cache.embed(enc, "a")
+    cache.embed(enc, "b")
+    assert enc.calls == ["a", "b", "c", "b"]
+
+
+def test_clear_resets_vectors_and_counters():
+    cache, enc = QueryEmbeddingCache(), _Encoder()
+    cache.embed(enc, "q")
+    cache.embed(enc, "q")
+    cache.clear()
+    assert cache.stats() == {"hits": 0, "misses": 0, "size": 0, "maxsize": cache.maxsize, "hit_rate": 0.0}
+
+
+def test_retriever_searches_by_cached_vector():
+    """적중 시 인코더 없이 같은 결과 — 예전 similarity_search(질의) 경로와도 같아야 한다."""
+    pytest.importorskip("faiss")
+    pytest.importorskip("langchain_community")
+    from langchain_community.vectorstores import FAISS
+    from langchain_core.documents import Document
+    from langchain_core.embeddings import DeterministicFakeEmbedding
+
+    import rag_corpus
+
+    class Counting(DeterministicFakeEmbedding):
+        query_calls: int = 0
+
+        def embed_query(self, text):
+            self.query_calls += 1
+            return super().embed_query(text)
+
+    emb = Counting(size=16)
+    docs = [Document(page_content=t) for t in
+            ("vertex ai pipelines", "sagemaker pipelines steps", "triton model serving", "kubeflow on-prem")]
+    vs = FAISS.from_documents(docs, embedding=emb)
+    r = HybridRetriever(vs, docs, rag_corpus.bm25_index(docs), k=2, query_cache=QueryEmbeddingCache())
+
+    first = [d.page_content for d in r.invoke("triton serving")]
+    second = [d.page_content for d in r.invoke("triton serving")]
+    assert first == second
+    assert emb.query_calls == 1
+    assert r.query_cache.stats()["hits"] == 1
+
+    dense_old = [d.page_content for d in vs.similarity_search("triton serving", k=6)]
+    vec = r.query_cache.embed(emb, "triton serving")
+    assert [d.page_content for d in vs.similarity_search_by_vector(vec, k=6)] == dense_old
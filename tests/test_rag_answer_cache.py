@@ -0,0 +1,84 @@
+"""의미 기반 답변 캐시(rag_answer_cache) 회귀.
+
+지키는 것: (1) 말바꿈(가까운 벡터)은 적중하고 숫자가 다른 질문은 벡터가 같아도 빗나간다,
+(2) 코퍼스·프롬프트 키가 바뀌면 통째로 비운다, (3) 적중 턴은 LLM 을 부르지 않고 저장된
+답·청크·근거 라벨을 돌려주며 아낀 토큰을 센다, (4) 근거점검 NO 인 답은 저장하지 않는다.
+"""
+from types import SimpleNamespace
+
+import pytest
+
+from rag_answer_cache import AnswerCache
+
+
+def test_paraphrase_hits_and_numbers_must_match():
+    c = AnswerCache(threshold=0.9)
+    c.store("k", "What is MLOps maturity level 1?", [1.0, 0.0], {"answer": "a"}, tokens=1200)
+    hit = c.lookup("k", "what's MLOps maturity level 1", [0.98, 0.1])
+    assert hit["result"] == {"answer": "a"} and hit["similarity"] >= 0.9 and hit["tokens"] == 1200
+    assert c.lookup("k", "What is MLOps maturity level 2?", [1.0, 0.0]) is None, "숫자가 다르면 다른 질문"
+    assert c.lookup("k", "unrelated", [0.0, 1.0]) is None
+    st = c.stats()
+    assert (st["hits"], st["misses"], st["tokens_saved"]) == (1, 2, 1200)
+
+
+def test_key_change_invalidates():
+    c = AnswerCache(threshold=0.9)
+    c.store("corpus-a:prompts", "q", [1.0, 0.0], {"answer": "old"}, tokens=10)
+    assert c.lookup("corpus-b:prompts", "q", [1.0, 0.0]) is None
+    assert c.stats()["invalidations"] == 1 and c.stats()["size"] == 0
+
+
+def test_lru_bound():
+    c = AnswerCache(maxsize=2, threshold=0.99)
+    for i, v in enumerate(([1.0, 0.0], [0.0, 1.0], [0.7, 0.7])):
+        c.store("k", f"q{chr(97 + i)}", v, {"i": i}, tokens=1)
+    assert c.stats()["size"] == 2 and c.lookup("k", "qa", [1.0, 0.0]) is None
+
+
+def test_agent_serves_repeat_questions_from_cache(pacer):
+    pytest.importorskip("langchain_core")
+    from langchain_core.documents import Document
+    from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+    import agent_rag
+    from rag_corpus import QueryEmbeddingCache
+
+    class _Emb:
+        def embed_query(self, text):
+            return [1.0, 0.0] if "vertex" in text.lower() else [0.0, 1.0]
+
+    docs = [Document(page_content="Vertex AI Pipelines run Kubeflow pipelines.",
+                     metadata={"vendor": "Google Cloud"})]
+    retriever = SimpleNamespace(invoke=lambda q: docs, vs=SimpleNamespace(embeddings=_Emb()),
+                                query_cache=QueryEmbeddingCache(), build_stats={"key": "corpus"})
+    cache = AnswerCache(threshold=0.9)
+
+    def run(q, responses):
+        before = pacer.calls
+        res = agent_rag.agentic_answer(FakeListChatModel(responses=responses), retriever, q,
+                                       self_check="llm", answer_cache=cache)
+        return res, pacer.calls - before
+
+    first, _ = run("How do Vertex AI Pipelines run?", ["USE", "Vertex AI Pipelines run Kubeflow [1].", "YES"])
+    again, calls = run("how do vertex ai pipelines run", ["unused"])
+    assert calls == 0, "적중 턴에서 LLM 이 불렸다"
+    assert again["trace"][0]["step"] == "cache" and again["trace"][1:] == first["trace"]
+    assert {k: again[k] for k in ("answer", "chunks", "grounded")} == \
+        {k: first[k] for k in ("answer", "chunks", "grounded")}
+    assert again["trace"][0]["cache"]["tokens_saved"] == cache.stats()["tokens_saved"] > 0
+
+    # 근거점검 NO 면 저장하지 않는다 — 같은 질문이 다시 체인을 돈다
+    run("Who won the 2022 World Cup?", ["USE", "Messi [1].", "NO"])
+    res, calls = run("Who won the 2022 World Cup?", ["USE", "Not in the indexed docs.", "YES"])
+    assert calls == 3 and res["trace"][0]["step"] != "cache"
+
+
+def test_unknown_corpus_is_not_cached():
+    pytest.importorskip("langchain_core")
+    import agent_rag
+
+    llm = SimpleNamespace(model_name="m")
+    assert agent_rag._cache_key(llm, SimpleNamespace(build_stats={"source": "built", "key": None})) is None
+    assert agent_rag._cache_key(llm, SimpleNamespace()) is None
+    assert agent_rag._cache_key(llm, SimpleNamespace(build_stats={"key": "c"})).startswith("c:")
@@ -0,0 +1,110 @@
+"""BM25 CSR 엔진(rag_bm25) 회귀.
+
+이 엔진이 지켜야 하는 약속은 '빠르다'가 아니라 **검색 결과가 바뀌지 않는다**이다.
+rank_bm25 를 갈아 끼운 뒤 순위가 한 칸이라도 달라지면 골든셋 retrieval 점수가 조용히
+움직이고, 그게 모델 탓인지 엔진 탓인지 아무도 가를 수 없다. 그래서 점수는 BM25Okapi 와
+비트 단위로, 순위는 예전 `sorted(..., reverse=True)[:k]` 와 동점 처리까지 똑같이 고정한다.
+
+rank_bm25 는 비교 기준으로만 쓴다(CI 가 깔아 둔다). numpy 만 있으면 나머지는 돈다.
+"""
+import random
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+import rag_corpus
+from rag_bm25 import BM25Index, top_k
+
+_WORDS = ("mlops pipeline training serving triton model registry drift monitoring feature "
+          "store vertex sagemaker azure kubeflow 파이프라인 학습 서빙 모델 모니터링").split()
+
+
+def _corpus(n_docs=300, seed=0):
+    rng = random.Random(seed)
+    # 일부러 짧은 문서·빈 문서·모든 문서에 나오는 항(음수 idf → epsilon 하한)을 섞는다.
+    docs = [[rng.choice(_WORDS) for _ in range(rng.randint(0, 25))] + ["mlops"] for _ in range(n_docs)]
+    docs[7] = []
+    return docs
+
+
+_QUERIES = [
+    ["triton", "serving"],
+    ["mlops"],                              # 모든 문서에 있는 항 — idf 하한 경로
+    ["model", "model", "registry"],         # 중복 질의어는 중복해서 더한다
+    ["없는단어"],                            # 전부 0점 — 순위는 문서 순서
+    ["파이프라인", "drift", "kubeflow", "vertex"],
+    [],
+]
+
+
+def _old_order(scores, k):
+    """교체 전 HybridRetriever 의 sparse 순위 — 이것과 같아야 한다."""
+    return sorted(range(len(scores)), key=lambda i: scores[i], reverse=True)[:k]
+
+
+@pytest.fixture(scope="module")
+def okapi():
+    return pytest.importorskip("rank_bm25").BM25Okapi
+
+
+@pytest.mark.parametrize("query", _QUERIES)
+def test_scores_are_bit_identical_to_bm25okapi(okapi, query):
+    docs = _corpus()
+    assert BM25Index.from_tokens(docs).get_scores(query).tolist() == okapi(docs).get_scores(query).tolist()
+
+
+@pytest.mark.parametrize("query", _QUERIES)
+@pytest.mark.parametrize("k", [1, 5, 15, 299, 300, 1000])
+def test_top_n_matches_the_old_full_sort_including_ties(okapi, query, k):
+    docs = _corpus()
+    assert BM25Index.from_tokens(docs).top_n(query, k).tolist() == \
+        _old_order(okapi(docs).get_scores(query), k)
+
+
+def test_top_k_breaks_ties_at_the_boundary_by_document_order():
+    """경계 동점을 argpartition 에 맡기면 어느 문서가 뽑힐지 임의다 — 앞 문서부터여야 한다."""
+    scores = np.array([1.0, 3.0, 2.0, 2.0, 2.0, 0.0, 2.0])
+    assert top_k(scores, 3).tolist() == [1, 2, 3]
+    assert top_k(scores, 0).tolist() == []
+    assert top_k(np.zeros(0), 5).tolist() == []
+
+
+def test_splice_equals_a_full_rebuild_bit_for_bit():
+    """증분 재색인 경로: 일부 행을 지우고·유지하고·새로 넣은 결과가 처음부터 만든 색인과 같다."""
+    docs = _corpus(60)
+    new = [["brand", "new", "terms", "serving"], [], ["triton", "triton"]]
+    base = BM25Index.from_tokens(docs)
+    spliced = base.splice([("keep", 0, 10), ("new", new), ("keep", 30, 60)])
+    full = BM25Index.from_tokens(docs[0:10] + new + docs[30:60])
+
+    assert spliced.vocab == full.vocab
+    for name in ("indptr", "term_ids", "tf", "df"):
+        assert spliced.state()[name].tolist() == full.state()[name].tolist(), name
+    for q in _QUERIES + [["brand", "terms"]]:
+        assert spliced.get_scores(q).tolist() == full.get_scores(q).tolist()
+
+
+def test_splice_drops_terms_that_only_removed_documents_had():
+    base = BM25Index.from_tokens([["alpha", "shared"], ["beta", "shared"]])
+    spliced = base.splice([("keep", 0, 1)])
+    assert "beta" not in spliced.term_index
+    assert spliced.df.tolist() == [1, 1]
+
+
+def test_state_round_trip():
+    idx = BM25Index.from_tokens(_corpus(50))
+    again = BM25Index.from_state(idx.state())
+    assert again.get_scores(["triton", "model"]).tolist() == idx.get_scores(["triton", "model"]).tolist()
+
+
+def test_rag_corpus_tokenizer_feeds_the_engine():
+    """두 HybridRetriever(MLOps 문서·데이터 분석)가 공유하는 색인 빌더가 _tok 을 쓰는지."""
+    from types import SimpleNamespace
+
+    docs = [SimpleNamespace(page_content="Triton 서빙 파이프라인"),
+            SimpleNamespace(page_content="Vertex AI Pipelines"),
+            SimpleNamespace(page_content="SageMaker model registry")]
+    idx = rag_corpus.bm25_index(docs)
+    assert idx.top_n(rag_corpus._tok("triton 서빙"), 1).tolist() == [0]
+    assert idx.top_n(rag_corpus._tok("VERTEX pipelines"), 1).tolist() == [1]
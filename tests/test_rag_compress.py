@@ -0,0 +1,102 @@
+"""생성 전 컨텍스트 압축(rag_compress) 회귀.
+
+지키는 것: (1) 압축한 컨텍스트가 예산 안이다, (2) 청크 수·순서·metadata 가 그대로고 청크마다
+문장이 하나 이상 남는다 — [n] 인용이 가리키는 대상이 사라지지 않는다, (3) 질문과 가까운 문장이
+남는다, (4) 예산 안이면 손대지 않는다, (5) 에이전트 trace·결과에 아낀 토큰이 남는다.
+임베더는 가짜 벡터로 세운다.
+"""
+from types import SimpleNamespace
+
+import pytest
+
+import rag_compress
+from rag_corpus import format_context
+from ratelimit import estimate_tokens
+
+_FILLER = ("Cloud Build runs container builds on managed workers. "
+           "Artifact Registry stores images next to the build output. "
+           "IAM roles scope who can trigger each build step. ")
+_CHUNKS = [
+    SimpleNamespace(page_content=_FILLER + "Vertex AI Pipelines run Kubeflow pipelines as serverless jobs.",
+                    metadata={"vendor": "Google Cloud", "section": "Pipelines"}),
+    SimpleNamespace(page_content=_FILLER * 2 + "SageMaker Model Monitor detects data drift on endpoints.",
+                    metadata={"vendor": "AWS", "section": "Monitor"}),
+    SimpleNamespace(page_content="온프레 KETI 파이프라인은 Triton 으로 모델을 서빙한다. " * 6,
+                    metadata={"vendor": "KETI", "section": "Serving"}),
+]
+
+
+def _tokens(chunks):
+    return estimate_tokens(format_context(chunks))
+
+
+def test_budget_respected_and_numbering_preserved():
+    budget = _tokens(_CHUNKS) // 2
+    out, stats = rag_compress.compress("How do Vertex AI Pipelines run Kubeflow pipelines?", _CHUNKS,
+                                       budget=budget)
+    assert len(out) == len(_CHUNKS)
+    assert [c.metadata for c in out] == [c.metadata for c in _CHUNKS]
+    assert all(c.page_content.strip() for c in out), "청크마다 문장이 하나는 남아야 [n] 이 유효하다"
+    assert stats["tokens_after"] == _tokens(out) <= budget
+    assert stats["saved"] == stats["tokens_before"] - stats["tokens_after"] > 0
+    assert stats["sentences_kept"] < stats["sentences_total"]
+    # 어휘 겹침(임베더 없음)으로도 질문과 맞는 문장이 남는다
+    assert "Kubeflow" in out[0].page_content
+
+
+def test_untouched_within_budget_or_disabled():
+    for budget in (10_000, 0):
+        out, stats = rag_compress.compress("anything", _CHUNKS, budget=budget)
+        assert [c.page_content for c in out] == [c.page_content for c in _CHUNKS]
+        assert stats["saved"] == 0 and stats["sentences_kept"] is None
+
+
+class _Emb:
+    """'drift' 가 들어간 문장만 질문 방향을 가리키는 가짜 임베더."""
+
+    def embed_documents(self, texts):
+        return [[1.0, 0.0] if "drift" in t else [0.0, 1.0] for t in texts]
+
+    def embed_query(self, text):
+        return [1.0, 0.0]
+
+
+def test_embedding_ranks_sentences():
+    out, _ = rag_compress.compress("what watches model inputs?", _CHUNKS[1:2],
+                                   embedding=_Emb(), budget=_tokens(_CHUNKS[1:2]) // 3)
+    text = out[0].page_content
+    assert text.startswith("SageMaker Model Monitor detects data drift"), text
+
+
+def test_broken_embedder_falls_back_to_terms():
+    class Broken:
+        def embed_documents(self, texts):
+            raise RuntimeError("model not loaded")
+
+    out, stats = rag_compress.compress("Vertex AI Pipelines Kubeflow", _CHUNKS, embedding=Broken(),
+                                       budget=_tokens(_CHUNKS) // 2)
+    assert stats["saved"] > 0 and "Kubeflow" in out[0].page_content
+
+
+def test_agent_trace_reports_saved_tokens(pacer):
+    pytest.importorskip("langchain_core")
+    from langchain_core.documents import Document
+    from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+    import agent_rag
+
+    docs = [Document(page_content=c.page_content, metadata=c.metadata) for c in _CHUNKS]
+    retriever = SimpleNamespace(invoke=lambda q: docs)
+
+    def run(budget):
+        llm = FakeListChatModel(responses=["USE", "Vertex AI Pipelines run Kubeflow pipelines [1].", "YES"])
+        return agent_rag.agentic_answer(llm, retriever, "How do Vertex AI Pipelines run Kubeflow?",
+                                        speculative=False, self_check="llm", grade_mode="combined",
+                                        context_budget=budget)
+
+    full, cut = run(0), run(_tokens(_CHUNKS) // 2)
+    assert "compression" not in full["trace"][0] and full["context_tokens_saved"] == 0
+    stats = cut["trace"][0]["compression"]
+    # 판정·생성·근거점검 세 콜이 같은 압축 컨텍스트를 실었다
+    assert cut["context_tokens_saved"] == 3 * stats["saved"] > 0
+    assert cut["chunks"] == docs, "결과 청크는 출처 표시용 원본이다"
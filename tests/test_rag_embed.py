@@ -0,0 +1,118 @@
+"""임베딩 백엔드(rag_embed) 회귀.
+
+INT8 백엔드의 위험은 느린 게 아니라 **벡터가 조금 다르다**는 것이다. 그래서 지키는 것은
+(1) 백엔드가 벡터 공간 id(model_name)에 들어가 스냅샷·질의 캐시 키가 갈라진다,
+(2) 동치성 지표가 최솟값 기준으로 계산된다(평균은 한 문서의 붕괴를 가린다),
+(3) 실제 모델이 있으면 FP32 와의 코사인 최솟값 ≥ PARITY_MIN_COSINE.
+(3)은 sentence-transformers[onnx] 와 모델 가중치가 있어야 돌아 CI 에서는 skip 된다.
+"""
+import pytest
+
+import rag_corpus
+import rag_embed
+
+
+class _Fixed:
+    def __init__(self, vecs, model_name="fixed"):
+        self.vecs, self.model_name = vecs, model_name
+
+    def embed_documents(self, texts):
+        return self.vecs[:len(texts)]
+
+
+def test_unknown_backend_is_rejected():
+    with pytest.raises(ValueError, match="onnx-int8"):
+        rag_embed.get_embedding("onnx-fp16")
+
+
+def test_parity_reports_the_worst_text_not_just_the_mean():
+    pytest.importorskip("numpy")
+    ref = _Fixed([[1.0, 0.0], [0.0, 1.0], [1.0, 1.0]])
+    cand = _Fixed([[2.0, 0.0], [0.0, 3.0], [1.0, -1.0]])      # 마지막만 직교
+    p = rag_embed.parity(["a", "b", "c"], ref, cand)
+    assert p["n"] == 3
+    assert p["min"] == pytest.approx(0.0, abs=1e-12)
+    assert p["mean"] == pytest.approx(2 / 3)
+
+
+def test_backend_is_part_of_the_vector_space_id():
+    """FP32 로 만든 스냅샷을 INT8 질의로 검색하면 안 된다 — 키가 달라야 한다."""
+    pytest.importorskip("langchain_core")
+    cls = rag_embed._st_embeddings_class()
+    onnx = cls(model=None, model_name=f"{rag_corpus.EMBED_MODEL}@onnx-int8-{rag_embed.ONNX_QUANT}")
+    assert rag_corpus._model_id(onnx) != rag_corpus.EMBED_MODEL
+    assert rag_corpus.corpus_key(model=rag_corpus._model_id(onnx)) != rag_corpus.corpus_key()
+
+
+def test_quantized_models_live_outside_the_snapshot_dir():
+    """rag_index/ 안에 두면 _prune_snapshots 가 오래된 스냅샷으로 보고 지운다."""
+    import os
+
+    assert os.path.commonpath([rag_embed.ONNX_DIR, rag_corpus.INDEX_DIR]) != rag_corpus.INDEX_DIR
+
+
+def test_int8_vectors_match_fp32_on_the_corpus():
+    for mod in ("sentence_transformers", "onnxruntime", "optimum", "langchain_community"):
+        pytest.importorskip(mod)
+    try:
+        torch_emb = rag_embed.get_embedding("torch")
+        onnx_emb = rag_embed.get_embedding("onnx-int8")
+    except OSError as e:   # 모델 가중치를 내려받을 수 없는 환경
+        pytest.skip(f"모델을 불러오지 못함: {e}")
+    texts = [d.page_content for d in rag_corpus.load_corpus()][:40]
+    assert rag_embed.parity(texts, torch_emb, onnx_emb)["min"] >= rag_embed.PARITY_MIN_COSINE
+
+
+# ── 공유 서비스 ────────────────────────────────────────────────────
+@pytest.fixture
+def services(monkeypatch):
+    """get_embedding 을 로드 횟수만 세는 가짜로 바꾸고 서비스 레지스트리를 비운다."""
+    pytest.importorskip("langchain_core")
+    from langchain_core.embeddings import DeterministicFakeEmbedding
+
+    loads = []
+
+    class Fake(DeterministicFakeEmbedding):
+        model_name: str = "fake-model"
+        batches: list = []
+
+        def embed_documents(self, texts):
+            self.batches.append(len(texts))
+            return super().embed_documents(texts)
+
+    def fake_get_embedding(backend=None, model=rag_corpus.EMBED_MODEL, threads=None):
+        loads.append((backend, model))
+        return Fake(size=8, batches=[])
+
+    monkeypatch.setattr(rag_embed, "get_embedding", fake_get_embedding)
+    monkeypatch.setattr(rag_embed, "_SERVICES", {})
+    return loads
+
+
+def test_service_is_loaded_once_per_process_and_shared(services):
+    assert rag_embed.service_stats() == []
+    a = rag_embed.embedding_service("torch")
+    b = rag_embed.embedding_service("torch")
+    assert a is b and len(services) == 1, "같은 프로세스에서 모델을 두 번 올렸다"
+    assert a.model_name == "fake-model"       # 스냅샷·질의 캐시 키가 안쪽 모델의 id 를 그대로 본다
+    rag_embed.embedding_service("onnx-int8")
+    assert len(services) == 2
+
+
+def test_concurrent_first_calls_load_the_model_once(services):
+    from concurrent.futures import ThreadPoolExecutor
+
+    with ThreadPoolExecutor(8) as pool:
+        got = list(pool.map(lambda _: rag_embed.embedding_service("torch"), range(16)))
+    assert len({id(s) for s in got}) == 1 and len(services) == 1
+
+
+def test_service_batches_documents_and_counts_calls(services, monkeypatch):
+    monkeypatch.setattr(rag_embed, "EMBED_BATCH_SIZE", 4)
+    svc = rag_embed.embedding_service("torch")
+    vecs = svc.embed_documents([f"t{i}" for i in range(10)])
+    svc.embed_query("q")
+    assert len(vecs) == 10 and svc.inner.batches == [4, 4, 2]
+    assert vecs == svc.inner.embed_documents([f"t{i}" for i in range(10)])
+    st = rag_embed.service_stats()[0]
+    assert (st["doc_calls"], st["docs"], st["query_calls"]) == (1, 10, 1)
@@ -0,0 +1,105 @@
+"""로컬 검색 신뢰도 게이트(rag_gate) 회귀.
+
+지키는 것: (1) 점수가 분명할 때만 결정하고 나머지는 LLM 에 맡긴다, (2) 보정은 일치율 하한을
+지키는 안에서 결정 비율을 최대로 하고, 지킬 수 없으면 아무것도 결정하지 않는다, (3) 게이트가
+켜지면 판정 콜이 실제로 빠지고, 꺼져 있으면 shadow 결정이 LLM 판정과 나란히 trace 에 남는다,
+(4) 보정 파일 없이 게이트를 켜면 손값으로 판정을 건너뛴다는 경고를 한 번 남긴다.
+"""
+from types import SimpleNamespace
+
+import pytest
+
+import rag_gate
+
+
+def _doc(text):
+    return SimpleNamespace(page_content=text, metadata={})
+
+
+def _sig(dense, overlap=0.6, sparse=3.0, lang=1.0):
+    return {"dense_top": dense, "sparse_top": sparse, "overlap": overlap, "lang_match": lang}
+
+
+def test_signals_measure_the_script_match_between_query_and_chunks():
+    legs = {"scores": {"dense_top": 0.7, "sparse_top": 2.0, "overlap": 0.4}}
+    chunks = [_doc("Vertex AI Pipelines"), _doc("온프레 파이프라인은 Triton 으로 서빙한다")]
+    assert rag_gate.signals(legs, "How does Vertex run pipelines?", chunks)["lang_match"] == 0.5
+    assert rag_gate.signals(legs, "Triton 서빙은?", chunks)["lang_match"] == 0.5
+    assert rag_gate.signals({"scores": None}, "q", chunks) is None, "다리 하나를 버린 검색은 판단 재료가 없다"
+    assert rag_gate.signals(None, "q", chunks) is None
+
+
+def test_decides_only_at_the_extremes():
+    th = rag_gate.DEFAULT_THRESHOLDS
+    assert rag_gate.decide(_sig(0.8, overlap=0.6), th) == "YES"
+    assert rag_gate.decide(_sig(0.8, overlap=0.6, lang=0.2), th) is None, "교차언어는 LLM 에 맡긴다"
+    assert rag_gate.decide(_sig(0.1, sparse=0.0), th) == "NO"
+    assert rag_gate.decide(_sig(0.1, sparse=1.5), th) is None, "키워드가 맞으면 NO 라 단정하지 않는다"
+    assert rag_gate.decide(_sig(0.45), th) is None
+    assert rag_gate.decide(None, th) is None
+
+
+def test_fit_maximises_coverage_within_the_agreement_floor():
+    rows = [(_sig(0.9), "YES"), (_sig(0.85), "YES"), (_sig(0.8), "YES"),
+            (_sig(0.55), "NO"), (_sig(0.5), "YES"),
+            (_sig(0.1, sparse=0.0), "NO"), (_sig(0.05, sparse=0.0), "NO")]
+    th, rep = rag_gate.fit(rows, min_agreement=1.0)
+    assert rep["agreement"] == 1.0 and rep["decided"] == 5
+    assert rag_gate.decide(_sig(0.55), th) is None, "YES 경계는 NO 라벨(0.55) 위에 있어야 한다"
+
+    # 하한을 지킬 수 없으면(신호와 라벨이 엇갈린다) 아무것도 결정하지 않는다
+    th, rep = rag_gate.fit([(_sig(0.9), "NO"), (_sig(0.1, sparse=0.0), "YES")], min_agreement=0.95)
+    assert rep["decided"] == 0 and rep["agreement"] is None
+
+
+def test_thresholds_come_from_the_fit_file_when_present(tmp_path, monkeypatch):
+    path = tmp_path / "gate_fit.json"
+    monkeypatch.setattr(rag_gate, "GATE_FIT_PATH", str(path))
+    rag_gate._fitted.cache_clear()
+    assert rag_gate.thresholds() == rag_gate.DEFAULT_THRESHOLDS
+    path.write_text('{"thresholds": {"yes_dense": 0.5, "yes_overlap": 0.2, "yes_lang": 0.5, '
+                    '"no_dense": 0.1, "no_sparse": 0.0}}', encoding="utf-8")
+    rag_gate._fitted.cache_clear()
+    try:
+        assert rag_gate.thresholds()["yes_dense"] == 0.5
+    finally:
+        rag_gate._fitted.cache_clear()
+
+
+def test_enabling_the_gate_without_a_fit_warns_once(tmp_path, monkeypatch, caplog):
+    monkeypatch.setattr(rag_gate, "GATE_FIT_PATH", str(tmp_path / "missing.json"))
+    monkeypatch.setattr(rag_gate, "GATE_ENABLED", True)
+    rag_gate._fitted.cache_clear()
+    try:
+        with caplog.at_level("WARNING", logger="rag_gate"):
+            assert rag_gate.thresholds() == rag_gate.DEFAULT_THRESHOLDS
+            rag_gate.thresholds()
+    finally:
+        rag_gate._fitted.cache_clear()
+    assert len([r for r in caplog.records if "fit_gate.py" in r.getMessage()]) == 1
+
+
+# ── agent_rag 연동 ──────────────────────────────────────────────────
+def test_gate_skips_the_grade_call_and_shadows_it_when_off(monkeypatch, pacer):
+    pytest.importorskip("langchain_core")
+    from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+    import agent_rag
+
+    monkeypatch.setattr(rag_gate, "thresholds", lambda: dict(rag_gate.DEFAULT_THRESHOLDS))
+    docs = [_doc("Vertex AI Pipelines run Kubeflow pipelines.")]
+    legs = {"dense_ms": 1.0, "sparse_ms": 1.0, "degraded": None,
+            "scores": {"dense_top": 0.9, "sparse_top": 5.0, "overlap": 0.8}}
+    retriever = SimpleNamespace(search=lambda q, leg_timeout_s=None: (list(docs), dict(legs)))
+
+    on = agent_rag.agentic_answer(FakeListChatModel(responses=["answer [1]", "YES"]), retriever,
+                                  "How do Vertex pipelines run?", gate=True)
+    grade = on["trace"][1]
+    assert grade["gate"]["source"] == "gate" and "skipped" in grade["detail"]
+    assert on["answer"] == "answer [1]" and on["grounded"] == "YES"
+
+    off = agent_rag.agentic_answer(FakeListChatModel(responses=["NO", "vertex", "answer [1]", "YES"]),
+                                   retriever, "How do Vertex pipelines run?", gate=False)
+    shadow = off["trace"][1]["gate"]
+    assert shadow == {"verdict": "YES", "source": "llm", "llm": "NO", "signals": shadow["signals"]}
+    assert off["rewrote"], "꺼져 있으면 게이트 결정은 기록만 — 제어는 LLM 판정이 한다"
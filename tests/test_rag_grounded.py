@@ -0,0 +1,90 @@
+"""로컬 근거 점검(rag_grounded) 회귀.
+
+지키는 것: (1) 인용한 청크에 없는 주장 문장은 support 가 낮아 NO 가 된다, (2) 한국어 답은 조사가
+붙어도 맞는다(글자 2-gram), (3) 거절 문장은 근거가 필요 없다, (4) 임베더가 고장 나면 어휘만으로
+판정한다, (5) local 모드에서는 근거점검 LLM 콜이 실제로 빠진다. 임베더는 가짜 벡터로 세운다.
+"""
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import rag_grounded
+
+_CHUNKS = [SimpleNamespace(page_content="Vertex AI Pipelines run Kubeflow pipelines as managed serverless jobs.",
+                           metadata={}),
+           SimpleNamespace(page_content="온프레 KETI 파이프라인은 Triton Inference Server 로 모델을 EXPLICIT 모드로 서빙한다.",
+                           metadata={})]
+
+
+def test_each_sentence_is_scored_against_its_cited_chunk():
+    res = rag_grounded.check("Vertex AI Pipelines run Kubeflow pipelines as managed jobs [1]. "
+                             "SageMaker bills GPU training hourly at five dollars [1].", _CHUNKS)
+    first, second = res["sentences"]
+    assert first["cites"] == [1] and first["support"] >= rag_grounded.SUPPORT_MIN
+    assert second["support"] < rag_grounded.SUPPORT_MIN
+    assert res["verdict"] == "NO" and res["min_support"] == second["support"]
+
+
+def test_citing_the_wrong_chunk_is_not_support():
+    right = rag_grounded.check("KETI 파이프라인은 Triton 으로 모델을 EXPLICIT 모드로 서빙했다 [2].", _CHUNKS)
+    wrong = rag_grounded.check("KETI 파이프라인은 Triton 으로 모델을 EXPLICIT 모드로 서빙했다 [1].", _CHUNKS)
+    assert right["verdict"] == "YES", "조사가 달라도(서빙한다/서빙했다) 한국어 근거는 맞아야 한다"
+    assert wrong["verdict"] == "NO"
+    # 범위 밖 번호는 인용 없음 — 청크 전체와 비교된다
+    assert rag_grounded.check("KETI 파이프라인은 Triton 으로 서빙한다 [9].", _CHUNKS)["sentences"][0]["cites"] == []
+
+
+def test_refusal_needs_no_support():
+    res = rag_grounded.check("That is not in the indexed docs.", _CHUNKS)
+    assert res["verdict"] == "YES" and res["refusal"] and res["sentences"] == []
+    assert rag_grounded.check("해당 내용은 색인된 문서에 없습니다.", _CHUNKS)["refusal"]
+
+
+def test_semantic_score_blends_in_and_a_broken_embedder_falls_back_to_lexical():
+    class Emb:
+        def embed_documents(self, texts):
+            return [[1.0, 0.0] for _ in texts]          # 전부 같은 방향 → 코사인 1
+
+    text = "SageMaker bills GPU training hourly at five dollars [1]."
+    res = rag_grounded.check(text, _CHUNKS, embedding=Emb())
+    s = res["sentences"][0]
+    assert s["semantic"] == 1.0 and s["support"] == pytest.approx(
+        (1 - rag_grounded.SEMANTIC_WEIGHT) * s["lexical"] + rag_grounded.SEMANTIC_WEIGHT, abs=1e-3)
+
+    class Broken:
+        def embed_documents(self, texts):
+            raise RuntimeError("model not loaded")
+
+    res = rag_grounded.check(text, _CHUNKS, embedding=Broken())
+    assert res["sentences"][0]["semantic"] is None and res["verdict"] == "NO"
+
+
+def test_lexical_check_runs_in_milliseconds():
+    answer = " ".join(f"Vertex AI Pipelines run Kubeflow pipelines step {i} [1]." for i in range(40))
+    chunks = _CHUNKS * 5
+    t0 = time.perf_counter()
+    res = rag_grounded.check(answer, chunks)
+    assert (time.perf_counter() - t0) < 0.05 and len(res["sentences"]) == 40
+
+
+def test_local_mode_drops_the_self_check_call(pacer):
+    pytest.importorskip("langchain_core")
+    from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+    import agent_rag
+
+    retriever = SimpleNamespace(invoke=lambda q: list(_CHUNKS))
+    answer = "Vertex AI Pipelines run Kubeflow pipelines as managed jobs [1]."
+
+    res = agent_rag.agentic_answer(FakeListChatModel(responses=["YES", answer, "NO"]), retriever, "q",
+                                   self_check="llm")
+    assert pacer.calls == 3 and res["grounded"] == "NO"
+    shadow = res["trace"][-1]["grounding"]
+    assert shadow["verdict"] == "YES", "llm 모드에서도 로컬 결과가 옆에 남아야 일치율을 잰다"
+
+    pacer.needs.clear()
+    res = agent_rag.agentic_answer(FakeListChatModel(responses=["YES", answer]), retriever, "q",
+                                   self_check="local")
+    assert pacer.calls == 2, "local 모드는 근거점검 LLM 콜을 쓰지 않는다"
+    assert res["grounded"] == "YES" and "local" in res["trace"][-1]["detail"]
@@ -0,0 +1,180 @@
+"""MLOps 문서 인덱스 스냅샷(rag_index/) · 증분 재색인 회귀.
+
+스냅샷의 위험은 느린 게 아니라 **낡은 인덱스가 조용히 적중하는 것**이다. 문서를 고쳤는데
+키가 안 바뀌면 앱·평가 하니스·retrieval_probe 가 전부 옛 벡터로 검색하고, 아무도 모른다.
+그래서 키에 들어가야 하는 입력(문서 바이트·청킹 파라미터·모델)을 하나씩 바꿔 보며 고정한다.
+증분 재색인은 '바뀐 문서만 임베딩했다'보다 '결과가 처음부터 만든 인덱스와 같다'가 더 중요하다.
+
+왕복(저장 → 복원) 테스트는 faiss·langchain 이 있어야 돌아서 CI 에서는 skip 된다.
+"""
+import pytest
+
+import rag_corpus
+
+
+@pytest.fixture
+def docs_dir(tmp_path, monkeypatch):
+    d = tmp_path / "rag_docs"
+    d.mkdir()
+    (d / "a.md").write_text("<!-- vendor: A -->\n# A\n## Intro\nalpha pipeline training\n", encoding="utf-8")
+    (d / "b.md").write_text("<!-- vendor: B -->\n# B\n## Serving\nbeta model serving triton\n", encoding="utf-8")
+    monkeypatch.setattr(rag_corpus, "RAG_DIR", str(d))
+    monkeypatch.setattr(rag_corpus, "INDEX_DIR", str(tmp_path / "rag_index"))
+    return d
+
+
+def test_key_is_stable_for_unchanged_inputs(docs_dir):
+    assert rag_corpus.corpus_key() == rag_corpus.corpus_key()
+
+
+def test_key_changes_when_a_document_changes(docs_dir):
+    before = rag_corpus.corpus_key()
+    (docs_dir / "b.md").write_text("<!-- vendor: B -->\n# B\nchanged\n", encoding="utf-8")
+    assert rag_corpus.corpus_key() != before
+
+
+def test_key_changes_when_a_document_is_added_or_removed(docs_dir):
+    before = rag_corpus.corpus_key()
+    (docs_dir / "c.md").write_text("# C\n", encoding="utf-8")
+    added = rag_corpus.corpus_key()
+    assert added != before
+    (docs_dir / "c.md").unlink()
+    assert rag_corpus.corpus_key() == before
+
+
+@pytest.mark.parametrize("kwargs", [
+    {"chunk_size": rag_corpus.CHUNK_SIZE + 1},
+    {"chunk_overlap": rag_corpus.CHUNK_OVERLAP + 1},
+    {"model": "sentence-transformers/some-other-model"},
+])
+def test_key_covers_chunking_and_model(docs_dir, kwargs):
+    """청킹만 바꾸고 문서는 그대로여도 벡터는 달라진다 — 키가 그걸 봐야 한다."""
+    assert rag_corpus.corpus_key(**kwargs) != rag_corpus.corpus_key()
+
+
+# ── 왕복 ────────────────────────────────────────────────────────────
+@pytest.fixture
+def heavy():
+    for mod in ("faiss", "langchain_community", "langchain_text_splitters"):
+        pytest.importorskip(mod)
+
+
+def _CountingEmbedding():
+    """DeterministicFakeEmbedding 에 호출 횟수만 얹는다 — 적중 시 문서 임베딩 0회를 확인."""
+    from langchain_core.embeddings import DeterministicFakeEmbedding
+
+    class Counting(DeterministicFakeEmbedding):
+        doc_calls: int = 0
+
+        def embed_documents(self, texts):
+            self.doc_calls += len(texts)
+            return super().embed_documents(texts)
+
+    return Counting(size=16)
+
+
+def test_second_build_restores_without_embedding(docs_dir, heavy):
+    first = rag_corpus.build_retriever(k=2, embedding=_CountingEmbedding())
+    assert first.build_stats["source"] == "built"
+
+    emb = _CountingEmbedding()
+    second = rag_corpus.build_retriever(k=2, embedding=emb)
+    assert second.build_stats["source"] == "snapshot"
+    assert emb.doc_calls == 0, "스냅샷 적중인데 문서를 다시 임베딩했다"
+    q = "beta model serving triton"
+    assert [d.page_content for d in second.invoke(q)] == [d.page_content for d in first.invoke(q)]
+    assert second.bm25.get_scores(rag_corpus._tok(q)).tolist() == \
+        first.bm25.get_scores(rag_corpus._tok(q)).tolist()
+
+
+def test_edited_document_is_not_served_from_a_stale_snapshot(docs_dir, heavy):
+    rag_corpus.build_retriever(k=2, embedding=_CountingEmbedding())
+    (docs_dir / "a.md").write_text("<!-- vendor: A -->\n# A\n## Intro\ngamma drift monitoring\n",
+                                   encoding="utf-8")
+    r = rag_corpus.build_retriever(k=2, embedding=_CountingEmbedding())
+    assert r.build_stats["source"] != "snapshot"
+    assert any("gamma" in d.page_content for d in r.splits)
+    assert not any("alpha" in d.page_content for d in r.splits)
+
+
+# ── 증분 재색인 ──────────────────────────────────────────────────────
+def _chunks_of(r, fname):
+    return sum(1 for d in r.splits if d.metadata["source_file"] == fname)
+
+
+def _assert_same_as_full_rebuild(r, query):
+    """증분 결과가 처음부터 다시 만든 인덱스와 같아야 한다 — 순서·벡터·BM25 점수 모두."""
+    full = rag_corpus.build_retriever(rag_corpus.load_corpus(), k=2, embedding=_CountingEmbedding())
+    assert [d.page_content for d in r.splits] == [d.page_content for d in full.splits]
+    assert r.vs.index.reconstruct_n(0, r.vs.index.ntotal).tolist() == \
+        full.vs.index.reconstruct_n(0, full.vs.index.ntotal).tolist()
+    assert r.bm25.vocab == full.bm25.vocab
+    assert r.bm25.get_scores(rag_corpus._tok(query)).tolist() == \
+        full.bm25.get_scores(rag_corpus._tok(query)).tolist()
+
+
+def test_only_the_changed_document_is_reembedded(docs_dir, heavy):
+    rag_corpus.build_retriever(k=2, embedding=_CountingEmbedding())
+    (docs_dir / "a.md").write_text("<!-- vendor: A -->\n# A\n## Intro\ngamma drift monitoring\n",
+                                   encoding="utf-8")
+    emb = _CountingEmbedding()
+    r = rag_corpus.build_retriever(k=2, embedding=emb)
+    b = r.build_stats
+    assert b["source"] == "incremental"
+    assert b["embedded"] == emb.doc_calls == _chunks_of(r, "a.md")
+    assert b["reused"] == _chunks_of(r, "b.md")
+    _assert_same_as_full_rebuild(r, "gamma serving triton")
+
+
+def test_deleted_document_leaves_the_index_and_the_term_statistics(docs_dir, heavy):
+    first = rag_corpus.build_retriever(k=2, embedding=_CountingEmbedding())
+    n_b = _chunks_of(first, "b.md")
+    (docs_dir / "b.md").unlink()
+    emb = _CountingEmbedding()
+    r = rag_corpus.build_retriever(k=2, embedding=emb)
+    assert emb.doc_calls == 0, "남은 문서는 하나도 다시 임베딩할 필요가 없다"
+    assert r.build_stats["removed"] == n_b
+    assert _chunks_of(r, "b.md") == 0
+    assert "triton" not in r.bm25.term_index, "지운 문서의 항이 문서 빈도에 남았다"
+    _assert_same_as_full_rebuild(r, "alpha triton")
+
+
+def test_added_document_is_the_only_one_embedded(docs_dir, heavy):
+    rag_corpus.build_retriever(k=2, embedding=_CountingEmbedding())
+    (docs_dir / "0_new.md").write_text("<!-- vendor: C -->\n# C\n## Registry\nmodel registry lineage\n",
+                                       encoding="utf-8")
+    emb = _CountingEmbedding()
+    r = rag_corpus.build_retriever(k=2, embedding=emb)
+    assert emb.doc_calls == _chunks_of(r, "0_new.md") > 0
+    _assert_same_as_full_rebuild(r, "registry lineage")
+
+
+def test_manifest_maps_each_file_to_its_chunk_ids_and_rows(docs_dir, heavy):
+    import json
+
+    r = rag_corpus.build_retriever(k=2, embedding=_CountingEmbedding())
+    snap = docs_dir.parent / "rag_index" / r.build_stats["key"]
+    files = json.loads((snap / "manifest.json").read_text(encoding="utf-8"))["files"]
+    assert set(files) == {"a.md", "b.md"}
+    for fname, entry in files.items():
+        s, e = entry["rows"]
+        rows = r.splits[s:e]
+        assert [d.metadata["source_file"] for d in rows] == [fname] * (e - s)
+        assert entry["chunk_ids"] == [d.metadata["chunk_id"] for d in rows]
+
+
+def test_explicit_docs_bypass_the_snapshot(docs_dir, heavy):
+    """호출부가 넘긴 코퍼스(청킹 실험 등)는 기본 코퍼스 키로 저장·복원되면 안 된다."""
+    docs = rag_corpus.load_corpus(chunk_size=50, chunk_overlap=0)
+    r = rag_corpus.build_retriever(docs, k=2, embedding=_CountingEmbedding())
+    assert r.build_stats["source"] == "built" and r.build_stats["key"] is None
+    assert not (docs_dir.parent / "rag_index").exists()
+
+
+def test_empty_corpus_without_a_snapshot_builds_an_empty_index(docs_dir, heavy):
+    for f in docs_dir.iterdir():
+        f.unlink()
+    r = rag_corpus.build_retriever(k=2, embedding=_CountingEmbedding())
+    assert r.build_stats["source"] == "built" and r.build_stats["chunks"] == 0
+    assert r.vs.index.ntotal == 0 and r.vs.index.d == 16
+    assert r.invoke("anything") == []
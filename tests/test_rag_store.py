@@ -0,0 +1,66 @@
+"""열 방향 청크 저장소 + 정수 id RRF(rag_store) 회귀.
+
+지키는 것: (1) id 위의 RRF 가 예전 본문 키 RRF 와 순위·동점 처리까지 같다, (2) 저장소에서
+꺼낸 Document 가 넣은 것과 같다(메타데이터 타입·빠진 키 포함), (3) 본문이 같은 청크는
+canon 으로 합쳐져 예전처럼 한 후보가 된다.
+"""
+import random
+from types import SimpleNamespace
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from rag_store import ChunkStore, _old_rrf, rrf  # noqa: E402
+
+
+def _doc(text, **meta):
+    return SimpleNamespace(page_content=text, metadata=meta)
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_id_rrf_matches_the_old_text_keyed_fusion(seed):
+    rng = random.Random(seed)
+    n = rng.randint(1, 12)
+    docs = [_doc(f"chunk {i}") for i in range(n)]
+    lists = [rng.sample(range(n), rng.randint(0, n)) for _ in range(rng.randint(1, 3))]
+    k = rng.randint(1, n)
+    old = _old_rrf([[docs[i] for i in l] for l in lists], k=k)
+    assert [docs[i] for i in rrf(lists, k=k)] == old
+
+
+def test_ties_go_to_the_first_seen_id():
+    # 1 과 3 은 점수가 같다(1/61 + 1/62) — 예전 dict 삽입 순서대로 dense 쪽 첫 id 가 먼저.
+    assert rrf([[1, 3], [3, 1]], k=2).tolist() == [1, 3]
+    assert rrf([], k=3).tolist() == [] and rrf([[], []], k=3).tolist() == []
+
+
+def test_documents_round_trip_through_the_columns():
+    docs = [_doc("가나다 triton", source_file="a.md", vendor="KETI", row=3),
+            _doc("vertex pipelines", source_file="b.md", vendor="Google Cloud", row=10**12),
+            _doc("no row here", source_file="a.md", vendor="KETI", tags=["x", "y"])]
+    store = ChunkStore.from_documents(docs)
+    assert len(store) == 3
+    assert list(store) == docs
+    assert store[1:] == docs[1:] and store[-1] == docs[-1]
+    assert type(store[0].metadata["row"]) is int
+    assert "row" not in store[2].metadata and "tags" not in store[0].metadata
+    with pytest.raises(IndexError):
+        store[3]
+
+
+def test_identical_text_is_stored_once_and_fused_as_one_candidate():
+    docs = [_doc("same row", row=0), _doc("other", row=1), _doc("same row", row=2)]
+    store = ChunkStore.from_documents(docs)
+    assert store.canon.tolist() == [0, 1, 0]
+    assert store.text(2) == "same row" and store.metadata(2) == {"row": 2}
+    top = rrf([store.canon[[2, 1]], store.canon[[0]]], k=3)
+    assert top.tolist() == [0, 1], "본문이 같은 두 청크가 따로 top-k 를 채웠다"
+
+
+def test_retriever_rejects_a_vector_index_out_of_step_with_the_chunks():
+    from rag_corpus import HybridRetriever
+
+    vs = SimpleNamespace(index=SimpleNamespace(ntotal=2), embeddings=None)
+    with pytest.raises(ValueError, match="청크 3"):
+        HybridRetriever(vs, [_doc("a"), _doc("b"), _doc("c")], bm25=None)
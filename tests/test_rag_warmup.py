@@ -0,0 +1,78 @@
+"""검색기 백그라운드 예열(rag_warmup) 회귀.
+
+지키는 것: (1) 기본은 꺼져 있다(opt-in), (2) 프로세스당 한 번만 돈다 — 홈은 매 상호작용마다
+다시 실행된다, (3) 진행 중에 페이지가 검색기를 달라고 하면 **기다렸다가 같은 객체**를 받는다
+(직접 한 벌 더 만들면 모델·인덱스가 두 번 올라간다), (4) 실패하면 None 으로 호출부가 직접 구축.
+무거운 단계는 가짜로 바꿔 stdlib 만으로 돈다.
+"""
+import threading
+
+import pytest
+
+import rag_warmup
+
+
+@pytest.fixture
+def warm(monkeypatch):
+    """단계를 가짜로 바꾸고 상태를 새로. gate 가 열릴 때까지 검색기 구축이 멈춘다."""
+    monkeypatch.setattr(rag_warmup, "_WARM", rag_warmup._Warmup())
+    gate = threading.Event()
+    calls = []
+
+    class Retriever:
+        build_stats = {"source": "snapshot"}
+
+        def invoke(self, q):
+            calls.append(("query", q))
+
+    def build(embedding):
+        calls.append(("build", embedding))
+        gate.wait(5)
+        return Retriever()
+
+    monkeypatch.setattr(rag_warmup, "_import_stacks", lambda: calls.append(("imports",)))
+    monkeypatch.setattr(rag_warmup, "_load_embedder", lambda: "emb")
+    monkeypatch.setattr(rag_warmup, "_build_retriever", build)
+    return gate, calls
+
+
+def test_off_by_default(warm, monkeypatch):
+    monkeypatch.setattr(rag_warmup, "WARMUP_ENABLED", False)
+    assert rag_warmup.start() is False
+    assert rag_warmup.status()["status"] == "idle"
+    assert rag_warmup.retriever() is None, "예열이 안 돌았으면 기다리지 말고 바로 None"
+
+
+def test_runs_once_and_hands_the_same_retriever_to_a_waiting_page(warm):
+    gate, calls = warm
+    assert rag_warmup.start(force=True) is True
+    assert rag_warmup.start(force=True) is False          # 홈 재실행
+    assert rag_warmup.status()["status"] == "running"
+
+    got = []
+    page = threading.Thread(target=lambda: got.append(rag_warmup.retriever()))
+    page.start()
+    page.join(0.1)
+    assert page.is_alive(), "진행 중이면 페이지는 예열을 기다려야 한다"
+    gate.set()
+    page.join(5)
+
+    st = rag_warmup.status()
+    assert got[0] is not None and got[0] is rag_warmup.retriever()
+    assert st["status"] == "ready" and st["source"] == "snapshot" and st["error"] is None
+    assert list(st["steps"]) == ["imports", "embedder", "retriever", "first_query"]
+    assert st["total_s"] >= 0
+    assert [c[0] for c in calls] == ["imports", "build", "query"]
+    assert calls[1] == ("build", "emb"), "예열한 공유 임베더로 검색기를 만들어야 한다"
+
+
+def test_failure_falls_back_to_the_caller(warm, monkeypatch):
+    def boom(embedding):
+        raise OSError("no weights")
+
+    monkeypatch.setattr(rag_warmup, "_build_retriever", boom)
+    rag_warmup.start(force=True)
+    assert rag_warmup.retriever(timeout=5) is None
+    st = rag_warmup.status()
+    assert st["status"] == "failed" and "no weights" in st["error"]
+    assert "retriever" not in st["steps"]                  # 실패한 단계는 시간을 남기지 않는다
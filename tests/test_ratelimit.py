@@ -10,6 +10,7 @@
 집계가 조용히 0으로 리셋되면 하루 예산을 다 쓴 날에도 새 실행이 승인된다.
 """
 import json
+import time
 
 import pytest
 
@@ -82,6 +83,30 @@ def test_pacer_forgets_events_older_than_the_window():
     assert p._used(now) == 50
 
 
+def test_reservation_holds_the_window_until_released(ledger):
+    """동시에 나가는 두 호출(판정 + 추측 생성)이 같은 여유를 보고 둘 다 통과하면 안 된다."""
+    p = TokenPacer(tpm_limit=1000, safety=1.0, verbose=False)
+    held = p.reserve(700)
+    assert p._used(time.time()) == 700
+    with pytest.raises(TimeoutError) as err:
+        p.reserve(700, deadline=time.monotonic() + 0.05)
+    assert 55 < parse_wait_seconds(err.value) <= 61, "포기할 때 창이 비는 시각을 알려야 한다"
+    p.release(held, 0)                    # 호출이 안 나갔다 → 예약 취소, 원장에도 안 적는다
+    assert p._used(time.time()) == 0 and ratelimit.used_today() == 0
+    p.release(p.reserve(700), 120)        # 실제 사용량으로 확정
+    assert p._used(time.time()) == 120 and ratelimit.used_today() == 120
+
+
+def test_settled_window_gives_up_at_once_with_the_retry_time(ledger):
+    p = TokenPacer(tpm_limit=1000, safety=1.0, verbose=False)
+    p.commit(p.reserve(700), 700)         # 풀릴 예약이 없다 — 마감까지 기다릴 이유가 없다
+    t = time.monotonic()
+    with pytest.raises(TimeoutError) as err:
+        p.reserve(700, deadline=time.monotonic() + 5)
+    assert time.monotonic() - t < 1
+    assert 55 < parse_wait_seconds(err.value) <= 61
+
+
 def test_pacer_reads_the_real_limit_from_headers():
     p = TokenPacer(tpm_limit=8000, verbose=False)
     p.update_limit({"x-ratelimit-limit-tokens": "30000"})
@@ -132,6 +157,7 @@ def test_record_usage_accumulates(ledger):
 
 def test_ledger_write_is_atomic_and_leaves_no_temp_file(ledger):
     ratelimit.record_usage(10)
+    ratelimit.compact_usage()                      # 일별 합계 JSON 은 압축 때 쓴다
     leftovers = list(ledger.parent.glob("*.tmp"))
     assert not leftovers, f"임시 파일이 남았다: {leftovers}"
     assert json.loads(ledger.read_text())          # 유효한 JSON
@@ -159,4 +185,5 @@ def test_corrupt_ledger_is_quarantined_not_silently_zeroed(ledger, capsys):
 def test_ledger_keeps_only_recent_days(ledger):
     ledger.write_text(json.dumps({f"2026-01-{d:02d}": 1 for d in range(1, 21)}))
     ratelimit.record_usage(5)
+    ratelimit.compact_usage()
     assert len(json.loads(ledger.read_text())) <= 7
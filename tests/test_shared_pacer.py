@@ -0,0 +1,116 @@
+"""프로세스 간 공유 페이서 창(ratelimit.SharedTokenPacer) 회귀.
+
+지키는 것: (1) 같은 파일·버킷의 두 페이서는 한 창을 본다 — 한쪽 예약이 다른 쪽을 막고, 취소하면
+풀린다, (2) 다른 버킷(모델·키)끼리는 막지 않는다, (3) 헤더로 배운 상한을 다른 페이서도 쓴다,
+(4) 여러 프로세스가 동시에 예약해도 합이 예산을 넘지 않는다, (5) 기본은 메모리 창이다,
+(6) 다른 프로세스가 파일 쓰기 잠금을 쥐고 있어도 조건 변수는 잡혀 있지 않다 — 같은 프로세스의
+다른 호출이 마감대로 포기하고, 창을 읽는 쪽은 쓰기를 기다리지 않는다.
+"""
+import multiprocessing
+import sqlite3
+import threading
+import time
+
+import pytest
+
+import ratelimit
+from ratelimit import SharedTokenPacer, TokenPacer
+
+
+@pytest.fixture(autouse=True)
+def ledger(tmp_path, monkeypatch):
+    monkeypatch.setattr(ratelimit, "_LEDGER_PATH", str(tmp_path / "daily_usage.json"))
+
+
+def _pacer(path, bucket="k:m", limit=1000):
+    return SharedTokenPacer(bucket, path=str(path), tpm_limit=limit, safety=1.0, verbose=False)
+
+
+def test_two_pacers_share_one_window(tmp_path):
+    a, b = _pacer(tmp_path / "p.sqlite"), _pacer(tmp_path / "p.sqlite")
+    held = a.reserve(700)
+    assert b._used(time.time()) == 700
+    with pytest.raises(TimeoutError):
+        b.reserve(700, deadline=time.monotonic() + 0.05)
+    a.release(held, 0)
+    assert b._used(time.time()) == 0 and ratelimit.used_today() == 0
+    b.release(b.reserve(700), 120)
+    assert a._used(time.time()) == 120 and ratelimit.used_today() == 120
+
+
+def test_other_buckets_do_not_block(tmp_path):
+    a = _pacer(tmp_path / "p.sqlite", bucket="k:qwen")
+    b = _pacer(tmp_path / "p.sqlite", bucket="k:llama")
+    a.reserve(1000)
+    b.release(b.reserve(900, deadline=time.monotonic() + 0.05), 900)
+
+
+def test_learned_limit_is_shared(tmp_path):
+    a, b = _pacer(tmp_path / "p.sqlite"), _pacer(tmp_path / "p.sqlite")
+    a.update_limit({"x-ratelimit-limit-tokens": "30000"})
+    b._used(time.time())
+    assert b.limit == 30000
+
+
+def test_file_lock_wait_does_not_hold_the_condition_lock(tmp_path):
+    path = tmp_path / "p.sqlite"
+    p = _pacer(path)
+    other = sqlite3.connect(str(path), isolation_level=None)
+    other.execute("BEGIN IMMEDIATE")                # 다른 프로세스가 쓰는 중
+    got = []
+    head = threading.Thread(target=lambda: got.append(p.reserve(100)))
+    head.start()
+    time.sleep(0.2)                                 # 줄 맨 앞이 파일 잠금을 기다린다
+    try:
+        assert p._cond.acquire(timeout=0.5), "파일 잠금을 기다리며 조건 변수를 쥐고 있다"
+        p._cond.release()
+        t = time.monotonic()
+        with pytest.raises(TimeoutError):
+            p.reserve(100, deadline=time.monotonic() + 0.2)
+        assert time.monotonic() - t < 1, "마감이 지났는데 파일 잠금이 풀릴 때까지 묶였다"
+        assert _pacer(path)._used(time.time()) == 0, "읽기가 쓰기 잠금을 기다렸다"
+    finally:
+        other.execute("COMMIT")
+        head.join(5)
+    assert got and p._used(time.time()) == 100
+
+
+def _grab(path, need, out):
+    p = _pacer(path)
+    try:
+        p.reserve(need, deadline=time.monotonic() + 0.5)
+        out.put(need)
+    except TimeoutError:
+        out.put(0)
+
+
+def test_processes_never_overbook(tmp_path):
+    try:
+        ctx = multiprocessing.get_context("fork")
+    except ValueError:
+        pytest.skip("fork 가 없는 플랫폼")
+    path = tmp_path / "p.sqlite"
+    _pacer(path)                                    # 스키마를 먼저 만든다
+    out = ctx.Queue()
+    procs = [ctx.Process(target=_grab, args=(str(path), 300, out)) for _ in range(6)]
+    for p in procs:
+        p.start()
+    for p in procs:
+        p.join(10)
+    got = [out.get(timeout=5) for _ in procs]
+    assert sum(got) == 900, "1000 토큰 창에 300 짜리는 세 개만 들어가야 한다"
+    assert _pacer(path)._used(time.time()) == 900
+
+
+def test_memory_window_is_the_default(tmp_path, monkeypatch):
+    monkeypatch.setattr(ratelimit, "_PACERS", {})
+    assert type(ratelimit.pacer_for("m")) is TokenPacer
+    monkeypatch.setattr(ratelimit, "PACER_BACKEND", "sqlite")
+    monkeypatch.setattr(ratelimit, "PACER_DB_PATH", str(tmp_path / "shared.sqlite"))
+    ratelimit.set_api_key("gsk_other")
+    try:
+        p = ratelimit.pacer_for("m")
+        assert isinstance(p, SharedTokenPacer) and p is ratelimit.pacer_for("m")
+        assert "gsk_other" not in p.bucket and p.bucket.endswith(":m")
+    finally:
+        ratelimit.set_api_key(None)
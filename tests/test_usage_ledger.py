@@ -0,0 +1,114 @@
+"""덧붙이기 전용 사용량 로그(ratelimit.record_usage · compact_usage · used_today) 회귀.
+
+지키는 것: (1) 콜마다 한 줄(모델·토큰·호출자·시각)만 덧붙이고 합계 JSON 은 압축 때만 쓴다,
+(2) used_today 는 새로 붙은 줄만 읽어 더한다(쓰는 중인 마지막 줄은 기다린다), (3) 크기 상한에서
+압축해도 합계가 그대로다 — 다른 프로세스가 압축해도, (4) 여러 프로세스가 동시에 붙여도 줄을 잃거나
+섞지 않는다, (5) 페이서 확정이 모델과 입장 등급을 남긴다 — priority 블록 밖에서 확정해도 입장한 등급으로.
+"""
+import json
+import multiprocessing
+
+import pytest
+
+import ratelimit
+from ratelimit import TokenPacer, priority
+
+
+@pytest.fixture
+def ledger(tmp_path, monkeypatch):
+    path = tmp_path / "daily_usage.json"
+    monkeypatch.setattr(ratelimit, "_LEDGER_PATH", str(path))
+    return path
+
+
+def _lines(ledger):
+    return [json.loads(l) for l in ledger.with_suffix(".log").read_text().splitlines()]
+
+
+def test_one_line_per_call_and_no_rewrite(ledger):
+    ratelimit.record_usage(120, model="qwen", caller="mcp")
+    ratelimit.record_usage(30)
+    rows = _lines(ledger)
+    assert [(r["tokens"], r["model"], r["caller"]) for r in rows] == [(120, "qwen", "mcp"), (30, None, "answer")]
+    assert all(r["day"] == ratelimit._today() and r["ts"] > 0 for r in rows)
+    assert not ledger.exists(), "합계 JSON 을 콜마다 다시 쓰고 있다"
+    assert ratelimit.used_today() == 150
+
+
+def test_aggregate_reads_only_new_lines(ledger):
+    ratelimit.record_usage(100)
+    assert ratelimit.used_today() == 100
+    offset = ratelimit._aggregate().offset
+    log = ledger.with_suffix(".log")
+    with open(log, "a", encoding="utf-8") as f:        # 다른 프로세스의 덧붙이기 + 쓰는 중인 줄
+        f.write(json.dumps({"day": ratelimit._today(), "tokens": 40}) + "\n" + '{"day": "')
+    assert ratelimit.used_today() == 140
+    assert ratelimit._aggregate().offset > offset
+    with open(log, "a", encoding="utf-8") as f:
+        f.write(f'{ratelimit._today()}", "tokens": 2}}\n')
+    assert ratelimit.used_today() == 142, "끝난 줄은 다음 읽기에 잡혀야 한다"
+
+
+def test_compaction_keeps_the_totals(ledger, monkeypatch):
+    monkeypatch.setattr(ratelimit, "USAGE_COMPACT_BYTES", 400)
+    assert ratelimit.used_today() == 0                 # 집계를 먼저 올려 둔다(압축 전 상태)
+    for _ in range(10):
+        ratelimit.record_usage(7, model="qwen")
+    assert json.loads(ledger.read_text())[ratelimit._today()] > 0, "크기 상한에서 압축하지 않았다"
+    assert ratelimit.used_today() == 70
+    ratelimit.compact_usage()
+    assert not ledger.with_suffix(".log").exists()
+    ratelimit.record_usage(5)
+    assert ratelimit.used_today() == 75
+
+
+def _append(n):
+    for _ in range(n):
+        ratelimit.record_usage(3, model="m")
+
+
+def test_processes_append_without_losing_lines(ledger, monkeypatch):
+    try:
+        ctx = multiprocessing.get_context("fork")
+    except ValueError:
+        pytest.skip("fork 가 없는 플랫폼")
+    monkeypatch.setattr(ratelimit, "USAGE_COMPACT_BYTES", 4000)   # 도중에 압축도 일어나게
+    procs = [ctx.Process(target=_append, args=(60,)) for _ in range(4)]
+    for p in procs:
+        p.start()
+    for p in procs:
+        p.join(20)
+    assert all(p.exitcode == 0 for p in procs)
+    assert ratelimit.used_today() == 4 * 60 * 3
+
+
+def test_pacer_commit_records_model_and_class(ledger):
+    p = TokenPacer(tpm_limit=10_000, verbose=False, model="qwen/qwen3.6-27b")
+    p.commit(p.reserve(50), 20)
+    with priority("batch"):
+        p.commit(p.reserve(50), 10)
+    p.release(p.reserve(50))                           # 취소는 로그에 안 남는다
+    assert [(r["tokens"], r["model"], r["caller"]) for r in _lines(ledger)] == \
+        [(20, "qwen/qwen3.6-27b", "answer"), (10, "qwen/qwen3.6-27b", "batch")]
+
+
+def test_commit_outside_the_priority_block_keeps_the_class(ledger):
+    p = TokenPacer(tpm_limit=10_000, verbose=False, model="m")
+    with priority("check"):
+        held = p.reserve(50)
+    p.commit(held, 20)                                 # 문맥 등급은 다시 answer
+    assert _lines(ledger)[-1]["caller"] == "check"
+
+
+def test_agent_check_call_is_logged_as_check(ledger, monkeypatch):
+    pytest.importorskip("langchain_core")
+    from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+    import agent_rag
+    from prompts import RAG_GRADE_PROMPT_TEMPLATE
+
+    p = TokenPacer(tpm_limit=100_000, verbose=False, model="m")
+    monkeypatch.setattr(agent_rag, "pacer_for", lambda model: p)
+    agent_rag._ask(FakeListChatModel(responses=["YES"]), RAG_GRADE_PROMPT_TEMPLATE, _max_tokens=4,
+                   question="q", context="c")
+    assert [r["caller"] for r in _lines(ledger)] == ["check"]